@@ -19,7 +19,10 @@ from dataclasses import dataclass, field
 from datetime import datetime
 
 from config import DATA_DIR, INITIAL_CAPITAL, COMMISSION
+from utils.market_data_store import load_ohlcv
+from utils.timeframes import TIMEFRAME_PERIODS, TimeframeSet, last_closed_map
 from strategy.ict_hybrid_strategy import ICTHybridStrategy
+from backtest.context_views import ContextViewProvider
 
 
 @dataclass
@@ -127,16 +130,9 @@ def load_multi_timeframe_data(symbol: str = "XAUUSD") -> Dict[str, pd.DataFrame]
         
         if os.path.exists(csv_path):
             try:
-                # Lee el CSV
-                df = pd.read_csv(csv_path)
-                
-                # Asegura que tenga la columna 'timestamp'
-                if 'timestamp' not in df.columns and 'time' in df.columns:
-                    df.rename(columns={'time': 'timestamp'}, inplace=True)
-                
-                # Convierte timestamp a datetime
-                df['timestamp'] = pd.to_datetime(df['timestamp'])
-                df.set_index('timestamp', inplace=True)
+                # Lee el CSV (desde la caché binaria si el CSV no cambió;
+                # acepta la columna de tiempo como 'timestamp' o 'time')
+                df = load_ohlcv(csv_path)
                 
                 # Verifica que tenga las columnas necesarias (OHLCV)
                 required_cols = ['open', 'high', 'low', 'close', 'volume']
@@ -169,14 +165,16 @@ def synchronize_timeframes(data_dict: Dict[str, pd.DataFrame],
     - Etc.
     
     Esta función asegura que para cada vela de M1, tengas acceso a las velas
-    correspondientes de todos los timeframes superiores.
+    correspondientes de todos los timeframes superiores: para cada vela base
+    guarda la posición de la última vela *cerrada* de cada timeframe
+    (`last_closed`), sin duplicar los DataFrames superiores.
     
     Args:
         data_dict: Diccionario con DataFrames de cada timeframe
         base_timeframe: Timeframe base para sincronizar (default: "M1")
     
     Returns:
-        Diccionario con DataFrames sincronizados
+        TimeframeSet (diccionario de DataFrames) con el mapa last_closed de cada timeframe
     """
     print(f"\n🔄 Sincronizando timeframes (base: {base_timeframe})...")
     
@@ -184,47 +182,47 @@ def synchronize_timeframes(data_dict: Dict[str, pd.DataFrame],
         print(f"⚠️ Timeframe base {base_timeframe} no encontrado")
         return data_dict
     
-    base_df = data_dict[base_timeframe].copy()
-    synchronized = {base_timeframe: base_df}
+    base_df = data_dict[base_timeframe]
+    if not base_df.index.is_monotonic_increasing:
+        base_df = base_df.sort_index(kind='stable')
+    base_period = TIMEFRAME_PERIODS[base_timeframe]
+    synchronized = TimeframeSet(base_timeframe)
     
     # Orden de timeframes de mayor a menor
     timeframe_order = ["D1", "H4", "H1", "M15", "M5", "M3", "M1"]
     
-    # Para cada timeframe superior, alinea con el base
+    # Para cada timeframe superior, calcula qué vela suya está cerrada en cada vela base
+    # (un array int32 por timeframe en lugar de copiar D1/H4/etc. sobre el índice base)
     for tf in timeframe_order:
         if tf == base_timeframe:
             continue
         
-        if tf not in data_dict:
+        if tf not in data_dict or tf not in TIMEFRAME_PERIODS:
             continue
         
-        df = data_dict[tf].copy()
-        
-        # Re-muestrea al timeframe base usando forward fill
-        # Esto significa que cada vela de M1 "hereda" los valores de la última
-        # vela de D1/H4/etc. que se completó
-        df_resampled = df.reindex(base_df.index, method='ffill')
-        
-        # Elimina filas donde no hay datos del timeframe superior
-        df_resampled = df_resampled.dropna()
-        
-        if len(df_resampled) > 0:
-            synchronized[tf] = df_resampled
-            print(f"   ✓ {tf}: {len(df_resampled)} velas sincronizadas")
-    
-    # Filtra el base para que solo tenga velas donde todos los timeframes tienen datos
-    if len(synchronized) > 1:
-        # Encuentra la intersección de índices
-        common_index = base_df.index
-        for tf, df in synchronized.items():
-            if tf != base_timeframe:
-                common_index = common_index.intersection(df.index)
+        df = data_dict[tf]
+        if not df.index.is_monotonic_increasing:
+            df = df.sort_index(kind='stable')
         
-        # Filtra todos los DataFrames al índice común
-        for tf in synchronized:
-            synchronized[tf] = synchronized[tf].loc[common_index]
+        last_closed = last_closed_map(base_df.index, base_period, df.index, TIMEFRAME_PERIODS[tf])
         
-        print(f"   ✓ {len(common_index)} velas comunes después de sincronización")
+        if len(last_closed) > 0 and last_closed[-1] >= 0:
+            # Solo hacen falta las velas cerradas hasta la última vela base
+            synchronized[tf] = df.iloc[:int(last_closed[-1]) + 1]
+            synchronized.last_closed[tf] = last_closed
+            print(f"   ✓ {tf}: {last_closed[-1] + 1} velas sincronizadas")
+    
+    # Recorta el base a las velas donde todos los timeframes tienen una vela cerrada
+    start = 0
+    for last_closed in synchronized.last_closed.values():
+        start = max(start, int(np.searchsorted(last_closed, 0, side='left')))
+    
+    synchronized[base_timeframe] = base_df.iloc[start:]
+    for tf in synchronized.last_closed:
+        synchronized.last_closed[tf] = synchronized.last_closed[tf][start:]
+    
+    if synchronized.last_closed:
+        print(f"   ✓ {len(base_df) - start} velas comunes después de sincronización")
     
     return synchronized
 
@@ -283,6 +281,14 @@ def run_backtest(data_dict: Dict[str, pd.DataFrame],
     print(f"✓ Comisión: {commission*100:.3f}%")
     print("-" * 70)
     
+    # Posiciones de corte de cada timeframe precalculadas una sola vez: solo
+    # velas cerradas al cierre de cada vela base (sin la vela H4/D1 en formación)
+    last_closed = getattr(data_dict, 'last_closed', None)
+    if getattr(data_dict, 'base_timeframe', None) != base_timeframe:
+        last_closed = None
+    context_views = ContextViewProvider(data_dict, base_data.index, last_closed=last_closed,
+                                        base_period=TIMEFRAME_PERIODS[base_timeframe])
+    
     # Estado del backtest
     position = None  # Posición actual (None = sin posición)
     trades: List[Trade] = []
@@ -294,11 +300,9 @@ def run_backtest(data_dict: Dict[str, pd.DataFrame],
         current_time = base_data.index[i]
         
         # Construye el contexto multi-temporal para esta vela
-        # Solo usa datos hasta el momento actual (no futuro)
-        contexto = {}
-        for tf_key, df in data_dict.items():
-            # Filtra datos hasta el momento actual
-            contexto[tf_key] = df[df.index <= current_time].copy()
+        # Solo usa velas cerradas hasta el momento actual (no futuro), como
+        # vistas de solo lectura sin copiar los DataFrames
+        contexto = context_views.context_at(i)
         
         # Gestiona posición actual (verifica SL y TPs)
         if position is not None:
@@ -309,23 +313,23 @@ def run_backtest(data_dict: Dict[str, pd.DataFrame],
             if exit_reason:
                 # Cierra la posición
                 pnl, pnl_pct = _calculate_pnl(position, exit_price, commission)
-                capital += position.size * exit_price * (1 - commission)
+                capital += position["size"] * exit_price * (1 - commission)
                 
                 trade = Trade(
-                    entry_time=position.entry_time,
+                    entry_time=position["entry_time"],
                     exit_time=current_time,
-                    entry_price=position.entry_price,
+                    entry_price=position["entry_price"],
                     exit_price=exit_price,
-                    direction=position.direction,
-                    stop_loss=position.stop_loss,
-                    take_profit_1=position.take_profit_1,
-                    take_profit_2=position.take_profit_2,
-                    take_profit_final=position.take_profit_final,
-                    size=position.size,
+                    direction=position["direction"],
+                    stop_loss=position["stop_loss"],
+                    take_profit_1=position["take_profit_1"],
+                    take_profit_2=position["take_profit_2"],
+                    take_profit_final=position["take_profit_final"],
+                    size=position["size"],
                     pnl=pnl,
                     pnl_pct=pnl_pct,
                     exit_reason=exit_reason,
-                    risk_reward=position.risk_reward
+                    risk_reward=position["risk_reward"]
                 )
                 
                 trades.append(trade)
@@ -0,0 +1,120 @@
+"""
+backtest/context_views.py - Vistas del contexto multi-temporal sin copias
+
+En cada vela del backtest la estrategia necesita, para cada timeframe, las
+velas cerradas hasta ese momento. Filtrar con `df[df.index <= current_time].copy()`
+recorre todo el índice y copia el DataFrame en cada vela (O(n²) en total).
+Además incluye la vela de H4/D1 que sigue formándose (su timestamp de apertura
+es anterior a la vela actual), con máximos y mínimos que todavía no existen.
+
+ContextViewProvider calcula una sola vez, con searchsorted sobre los cierres
+de las velas, cuántas velas cerradas de cada timeframe hay al cierre de cada
+vela base, y entrega `iloc[:k]` sobre datos de solo lectura: sin máscaras,
+sin copias, sin mirar al futuro y sin riesgo de que la estrategia modifique
+los datos del backtest.
+"""
+
+import pandas as pd
+import numpy as np
+from typing import Dict, Optional
+
+from utils.timeframes import TIMEFRAME_PERIODS, last_closed_map
+
+
+def read_only_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Copia df una vez sobre arrays de numpy marcados como no escribibles
+    (si los datos ya son de solo lectura, p. ej. arrays memory-mapped, no copia).
+
+    Las vistas `iloc[:k]` de este DataFrame comparten esos arrays: escribir
+    directamente en ellos lanza ValueError, y las asignaciones de pandas
+    (loc/iloc/nuevas columnas) copian la vista antes de modificarla, así que
+    los datos del backtest nunca cambian.
+
+    Args:
+        df: DataFrame OHLCV
+
+    Returns:
+        DataFrame con el mismo índice y columnas, de solo lectura
+    """
+    columns = {}
+    for col in df.columns:
+        values = df[col].to_numpy()
+        if not _is_read_only(values):
+            values = values.copy()
+            values.flags.writeable = False
+        columns[col] = values
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+
+def _is_read_only(values: np.ndarray) -> bool:
+    """True si ni el array ni ninguno de sus arrays base es escribible (p. ej. un memmap 'r')"""
+    while isinstance(values, np.ndarray):
+        if values.flags.writeable:
+            return False
+        values = values.base
+    return True
+
+
+class ContextViewProvider:
+    """
+    Entrega el contexto multi-temporal de cada vela base como vistas.
+
+    Con base_period, cada timeframe conocido (TIMEFRAME_PERIODS) se corta en
+    su última vela cerrada al cierre de la vela base. Sin base_period equivale
+    a `{tf: df[df.index <= base_index[i]] for tf, df in data_dict.items()}`,
+    pero con las posiciones de corte precalculadas.
+    """
+
+    def __init__(self, data_dict: Dict[str, pd.DataFrame], base_index: pd.Index,
+                 last_closed: Optional[Dict[str, np.ndarray]] = None,
+                 base_period: Optional[pd.Timedelta] = None):
+        """
+        Args:
+            data_dict: DataFrames de cada timeframe (índice de timestamps)
+            base_index: Timestamps de las velas del timeframe base
+            last_closed: Posición de la última vela a incluir de cada timeframe
+                         en cada vela base (p. ej. TimeframeSet.last_closed)
+            base_period: Duración de la vela base. Si se indica, los timeframes
+                         sin last_closed se cortan en su última vela cerrada
+                         (los de duración desconocida, por timestamp de apertura)
+        """
+        self.base_index = base_index
+        self.frames: Dict[str, pd.DataFrame] = {}
+        self.cut_positions: Dict[str, np.ndarray] = {}
+        last_closed = last_closed or {}
+
+        for tf_key, df in data_dict.items():
+            if tf_key in last_closed:
+                self.frames[tf_key] = read_only_frame(df)
+                self.cut_positions[tf_key] = np.asarray(last_closed[tf_key], dtype=np.int64) + 1
+                continue
+            if not df.index.is_monotonic_increasing:
+                df = df.sort_index(kind='stable')
+            self.frames[tf_key] = read_only_frame(df)
+            if base_period is not None and tf_key in TIMEFRAME_PERIODS:
+                # Velas cerradas (cierre <= cierre de cada vela base)
+                self.cut_positions[tf_key] = last_closed_map(
+                    base_index, base_period, df.index, TIMEFRAME_PERIODS[tf_key]
+                ).astype(np.int64) + 1
+            else:
+                # Velas con timestamp <= cada vela base
+                self.cut_positions[tf_key] = df.index.searchsorted(base_index, side='right')
+
+    def __len__(self) -> int:
+        return len(self.base_index)
+
+    def context_at(self, i: int) -> Dict[str, pd.DataFrame]:
+        """
+        Contexto de la vela base i.
+
+        Args:
+            i: Posición de la vela en base_index
+
+        Returns:
+            Diccionario {timeframe: vista de solo lectura de las velas disponibles en base_index[i]}
+        """
+        return {
+            tf_key: df.iloc[:self.cut_positions[tf_key][i]]
+            for tf_key, df in self.frames.items()
+        }
@@ -13,6 +13,8 @@ from datetime import datetime
 
 from config import INITIAL_CAPITAL, COMMISSION, MAX_POSITION_SIZE
 from strategy.ict_hybrid_strategy import ICTHybridStrategy, TradingSignal
+from backtest.context_views import ContextViewProvider
+from utils.timeframes import TIMEFRAME_PERIODS
 
 
 @dataclass
@@ -69,7 +71,8 @@ class ICTBacktestEngine:
     """
     
     def __init__(self, initial_capital: float = None, commission: float = None,
-                 slippage: float = 0.0001, position_size_pct: float = None):
+                 slippage: float = 0.0001, position_size_pct: float = None,
+                 min_rr: Optional[float] = None, batch_signals: bool = False):
         """
         Inicializa el motor de backtesting ICT.
         
@@ -78,6 +81,10 @@ class ICTBacktestEngine:
             commission: Comisión por operación (ej: 0.001 = 0.1%)
             slippage: Slippage estimado (ej: 0.0001 = 0.01%)
             position_size_pct: Porcentaje del capital por operación
+            min_rr: Risk:Reward mínimo para ejecutar una señal (None = sin filtro)
+            batch_signals: Si True, calcula las señales de todas las velas en una
+                           pasada (strategy.generate_signals) y el bucle solo
+                           gestiona posiciones; mismas operaciones que vela a vela
         """
         from config import INITIAL_CAPITAL, COMMISSION, MAX_POSITION_SIZE
         
@@ -85,6 +92,8 @@ class ICTBacktestEngine:
         self.commission = commission or COMMISSION
         self.slippage = slippage
         self.position_size_pct = position_size_pct or MAX_POSITION_SIZE
+        self.min_rr = min_rr
+        self.batch_signals = batch_signals
         
         self.capital = self.initial_capital
         self.position: Optional[Trade] = None
@@ -92,6 +101,9 @@ class ICTBacktestEngine:
         self.equity_curve: List[Dict] = []
         self.signals_generated = 0
         self.signals_executed = 0
+        # Curvas internas (float64 preasignadas en run)
+        self._equity = np.empty(0, dtype=np.float64)
+        self._capital_curve = np.empty(0, dtype=np.float64)
     
     def run(self, data_dict: Dict[str, pd.DataFrame], strategy: ICTHybridStrategy,
            start_date: Optional[str] = None, end_date: Optional[str] = None) -> BacktestResults:
@@ -124,7 +136,7 @@ class ICTBacktestEngine:
         
         # Usa M1 o M3 como timeframe de ejecución (el más granular disponible)
         execution_tf = 'M1' if 'M1' in data_dict else 'M3' if 'M3' in data_dict else 'M5'
-        execution_data = data_dict[execution_tf].copy()
+        execution_data = data_dict[execution_tf]
         
         if start_date:
             execution_data = execution_data[execution_data.index >= pd.to_datetime(start_date)]
@@ -142,72 +154,155 @@ class ICTBacktestEngine:
         print(f"\nAnálisis multi-temporal cada {analysis_interval} velas")
         print("-" * 70)
         
-        # Itera sobre cada vela del timeframe de ejecución
-        for i in range(len(execution_data)):
-            current_bar = execution_data.iloc[i]
-            current_time = execution_data.index[i]
+        # Núcleo por eventos: arrays de numpy en lugar de una Serie por vela.
+        # Solo se crean objetos de Python cuando se abre o se cierra una posición.
+        times = execution_data.index
+        high = execution_data['high'].to_numpy(dtype=np.float64)
+        low = execution_data['low'].to_numpy(dtype=np.float64)
+        close = execution_data['close'].to_numpy(dtype=np.float64)
+        n = len(execution_data)
+        
+        self._equity = np.empty(n, dtype=np.float64)
+        self._capital_curve = np.empty(n, dtype=np.float64)
+        # Contexto de cada vela: solo velas cerradas de cada timeframe (sin look-ahead)
+        context_views = ContextViewProvider(data_dict, times,
+                                            base_period=TIMEFRAME_PERIODS[execution_tf])
+        
+        # Modo en lote: señales de todas las velas antes del bucle
+        signals = None
+        if self.batch_signals:
+            signals = self._generate_batch_signals(strategy, execution_data, context_views,
+                                                   analysis_interval)
+        
+        i = 0
+        while i < n:
+            current_time = times[i]
             
             # Ejecuta análisis multi-temporal periódicamente
-            if i % analysis_interval == 0 or i == 0:
-                try:
-                    # Actualiza datos para análisis (solo hasta el momento actual)
-                    current_data_dict = {}
-                    for tf_key, df in data_dict.items():
-                        current_data_dict[tf_key] = df[df.index <= current_time].copy()
-                    
-                    # Ejecuta análisis multi-temporal
-                    self._run_multi_timeframe_analysis(current_data_dict, strategy, current_time)
-                except Exception as e:
-                    print(f"⚠️ Error en análisis multi-temporal en {current_time}: {e}")
+            if signals is None and i % analysis_interval == 0:
+                self._analyze_at(i, context_views, strategy)
             
-            # Gestiona posición actual
+            # Gestiona posición actual (SL/TP de la vela)
             if self.position is not None:
-                self._manage_position(current_bar, current_time, execution_data)
+                self._manage_position(high[i], low[i], current_time)
             
             # Busca nuevas señales
             if self.position is None:
-                signal = self._check_for_signals(strategy, current_time, execution_data, i)
-                if signal:
-                    self._execute_signal(signal, current_bar, current_time)
+                if signals is None:
+                    signal = self._check_for_signals(strategy, current_time, execution_data, i)
+                else:
+                    signal = strategy.signal_at(signals, i)
+                    if signal:
+                        self.signals_generated += 1
+                if signal and (self.min_rr is None or signal.risk_reward >= self.min_rr):
+                    self._execute_signal(signal, close[i], current_time)
+            
+            self._capital_curve[i] = self.capital
+            if self.position is None:
+                self._equity[i] = self.capital
+                i += 1
+                continue
+            
+            # Posición abierta: salta directo a la vela de salida. Mientras
+            # tanto no se buscan señales y el equity solo depende del cierre.
+            self._equity[i] = self._calculate_equity(close[i])
+            exit_bar = self._find_exit_bar(i + 1, high, low)
+            stop = n if exit_bar < 0 else exit_bar
+            self._equity[i + 1:stop] = self.capital + self.position.size * close[i + 1:stop]
+            self._capital_curve[i + 1:stop] = self.capital
             
-            # Registra equity
-            current_equity = self._calculate_equity(current_bar['close'])
-            self.equity_curve.append({
-                'timestamp': current_time,
-                'equity': current_equity,
-                'capital': self.capital
-            })
+            # De los análisis saltados solo importa el último antes de la salida
+            if signals is None and exit_bar >= 0 and exit_bar % analysis_interval != 0:
+                last_due = (exit_bar - 1) - (exit_bar - 1) % analysis_interval
+                if last_due > i:
+                    self._analyze_at(last_due, context_views, strategy)
+            
+            i = stop
+        
+        # Curva de equity en el formato público (una sola vez al final)
+        self.equity_curve = [
+            {'timestamp': t, 'equity': e, 'capital': c}
+            for t, e, c in zip(times, self._equity.tolist(), self._capital_curve.tolist())
+        ]
         
         # Cierra posición abierta al final
         if self.position is not None:
-            last_bar = execution_data.iloc[-1]
-            self._close_position(last_bar, execution_data.index[-1], 'END_OF_DATA')
+            self._close_position(close[-1], times[-1], 'END_OF_DATA')
         
         # Calcula resultados
         results = self._calculate_results()
         
         return results
     
+    def _analyze_at(self, i: int, context_views: ContextViewProvider,
+                    strategy: ICTHybridStrategy):
+        """Análisis multi-temporal con las velas hasta la vela de ejecución i"""
+        current_time = context_views.base_index[i]
+        try:
+            # Datos hasta el momento actual, como vistas de solo lectura
+            current_data_dict = context_views.context_at(i)
+            
+            # Ejecuta análisis multi-temporal
+            self._run_multi_timeframe_analysis(current_data_dict, strategy, current_time)
+        except Exception as e:
+            print(f"⚠️ Error en análisis multi-temporal en {current_time}: {e}")
+    
+    def _generate_batch_signals(self, strategy: ICTHybridStrategy, execution_data: pd.DataFrame,
+                                context_views: ContextViewProvider,
+                                analysis_interval: int) -> pd.DataFrame:
+        """
+        Señales de todas las velas de ejecución en una pasada.
+        
+        Cada vela usa la tendencia D1 del último análisis periódico anterior,
+        igual que el bucle vela a vela (que solo busca señales con el contexto
+        de ese análisis).
+        """
+        bars = np.arange(len(execution_data))
+        if 'D1' in context_views.frames:
+            analysis_bars = bars - bars % analysis_interval
+            counts = context_views.cut_positions['D1'][analysis_bars]
+            d1_trend = strategy.d1_trends(context_views.frames['D1'], counts)
+        else:
+            d1_trend = strategy.context.d1_trend
+        
+        signals = strategy.generate_signals(execution_data, d1_trend=d1_trend)
+        print(f"Señales en lote: {int((signals['signal'] != 'HOLD').sum())} velas con señal")
+        return signals
+    
+    def _find_exit_bar(self, start: int, high: np.ndarray, low: np.ndarray) -> int:
+        """
+        Primera vela desde start en la que la posición toca el SL o algún TP.
+        
+        Recorre los arrays en bloques crecientes con comparaciones vectorizadas
+        (coste proporcional a la duración de la operación).
+        
+        Returns:
+            Índice de la vela de salida o -1 si no sale antes del final
+        """
+        position = self.position
+        take_profits = [position.take_profit_1, position.take_profit_2, position.take_profit_final]
+        
+        n = len(high)
+        chunk = 64
+        while start < n:
+            stop = min(n, start + chunk)
+            if position.direction == 'BUY':
+                hits = (low[start:stop] <= position.stop_loss) | (high[start:stop] >= np.fmin.reduce(take_profits))
+            else:
+                hits = (high[start:stop] >= position.stop_loss) | (low[start:stop] <= np.fmax.reduce(take_profits))
+            found = np.flatnonzero(hits)
+            if len(found):
+                return start + int(found[0])
+            start = stop
+            chunk = min(chunk * 2, 1 << 16)
+        return -1
+    
     def _run_multi_timeframe_analysis(self, data_dict: Dict[str, pd.DataFrame],
                                      strategy: ICTHybridStrategy, current_time: pd.Timestamp):
         """Ejecuta análisis multi-temporal hasta el momento actual"""
         try:
-            # D1
-            if 'D1' in data_dict and len(data_dict['D1']) > 10:
-                strategy.analyze_D1(data_dict['D1'])
-            
-            # H4
-            if 'H4' in data_dict and len(data_dict['H4']) > 10:
-                strategy.analyze_H4(data_dict['H4'])
-            
-            # H1
-            if 'H1' in data_dict and len(data_dict['H1']) > 10:
-                strategy.analyze_H1(data_dict['H1'])
-            
-            # M15/M5
-            if 'M15' in data_dict and 'M5' in data_dict:
-                if len(data_dict['M15']) > 10 and len(data_dict['M5']) > 10:
-                    strategy.analyze_M15_M5(data_dict['M15'], data_dict['M5'])
+            # D1 → H4 → H1 → M15/M5 (las etapas cuyas velas no cambiaron salen de la caché)
+            strategy.analyze_context(data_dict)
         except Exception as e:
             # Silenciosamente maneja errores en análisis (puede ser por datos insuficientes)
             pass
@@ -237,9 +332,9 @@ class ICTBacktestEngine:
         
         return None
     
-    def _execute_signal(self, signal: TradingSignal, current_bar: pd.Series, current_time: pd.Timestamp):
-        """Ejecuta una señal de trading"""
-        entry_price = current_bar['close']
+    def _execute_signal(self, signal: TradingSignal, current_close: float, current_time: pd.Timestamp):
+        """Ejecuta una señal de trading al cierre de la vela actual"""
+        entry_price = current_close
         
         # Aplica slippage
         if signal.operation_type == 'BUY':
@@ -282,16 +377,12 @@ class ICTBacktestEngine:
         print(f"   SL: ${signal.stop_loss:.2f}")
         print(f"   TP1: ${signal.take_profit_1:.2f}, TP2: ${signal.take_profit_2:.2f}, TP Final: ${signal.take_profit_final:.2f}")
     
-    def _manage_position(self, current_bar: pd.Series, current_time: pd.Timestamp,
-                        execution_data: pd.DataFrame):
-        """Gestiona la posición actual (verifica SL y TPs)"""
+    def _manage_position(self, current_high: float, current_low: float,
+                         current_time: pd.Timestamp):
+        """Gestiona la posición actual (verifica SL y TPs con el high/low de la vela)"""
         if self.position is None:
             return
         
-        current_high = current_bar['high']
-        current_low = current_bar['low']
-        current_close = current_bar['close']
-        
         exit_price = None
         exit_reason = None
         
@@ -330,16 +421,16 @@ class ICTBacktestEngine:
                 exit_reason = 'TP1'
         
         if exit_price:
-            self._close_position(current_bar, current_time, exit_reason, exit_price)
+            self._close_position(None, current_time, exit_reason, exit_price)
     
-    def _close_position(self, current_bar: pd.Series, current_time: pd.Timestamp,
+    def _close_position(self, current_close: Optional[float], current_time: pd.Timestamp,
                         exit_reason: str, exit_price: Optional[float] = None):
-        """Cierra la posición actual"""
+        """Cierra la posición actual (a exit_price o, si no se indica, al cierre de la vela)"""
         if self.position is None:
             return
         
         if exit_price is None:
-            exit_price = current_bar['close']
+            exit_price = current_close
             if self.position.direction == 'BUY':
                 exit_price *= (1 - self.slippage)
             else:
@@ -432,7 +523,7 @@ class ICTBacktestEngine:
         profit_factor = total_wins / total_losses if total_losses > 0 else 0
         
         # Drawdown
-        equity_series = pd.Series([e['equity'] for e in self.equity_curve])
+        equity_series = pd.Series(self._equity)
         running_max = equity_series.expanding().max()
         drawdown = (equity_series - running_max) / running_max * 100
         max_drawdown = drawdown.min()
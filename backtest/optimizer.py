@@ -0,0 +1,346 @@
+"""
+backtest/optimizer.py - Optimizador de parámetros de la estrategia ICT en paralelo
+
+Recorre combinaciones de parámetros (grid search o random search) de
+ICTHybridStrategy y ejecuta un backtest de ICTBacktestEngine por combinación,
+repartiendo los backtests entre los núcleos con un ProcessPoolExecutor.
+
+Los datos de cada timeframe se escriben una sola vez en disco como arrays de
+numpy y cada proceso los abre memory-mapped (solo lectura): todos los procesos
+comparten las mismas páginas de memoria y no se serializan DataFrames por tarea.
+Como cada backtest es independiente, escala de forma lineal con los núcleos.
+
+Parámetros soportados en cada combinación:
+- Cualquier campo de StrategyParams (lookback_d1, lookback_h4, ..., min_score,
+  d1_fvg_min_pct, confirmation_weights)
+- 'weight.<CONFIRMACIÓN>': peso de una confirmación (p. ej. 'weight.SWEEP')
+- 'min_rr': Risk:Reward mínimo para ejecutar señales en el motor
+
+Uso (en Windows el pool necesita el guard de __main__):
+
+    if __name__ == "__main__":
+        grid = grid_search_space({'lookback_sniper': [3, 5, 7], 'min_rr': [1.5, 2.0]})
+        result = optimize(data_dict, grid, max_workers=4)
+        print(result.table.head())
+"""
+
+import contextlib
+import dataclasses
+import itertools
+import json
+import os
+import random
+import shutil
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backtest.ict_backtest_engine import ICTBacktestEngine, BacktestResults
+from strategy.ict_hybrid_strategy import ICTHybridStrategy, StrategyParams
+from utils.market_data_store import save_mmap_frame, open_mmap_frame
+
+
+# Métricas de BacktestResults que se copian a la tabla de resultados
+RESULT_METRICS = [
+    'total_return_pct', 'total_pnl', 'total_trades', 'win_rate_pct',
+    'profit_factor', 'max_drawdown_pct', 'sharpe_ratio',
+    'signals_generated', 'signals_executed'
+]
+
+ENGINE_PARAMS = ('min_rr',)
+WEIGHT_PREFIX = 'weight.'
+
+
+@dataclass
+class OptimizationResult:
+    """Resultado de una optimización"""
+    table: pd.DataFrame  # Una fila por combinación (parámetros + métricas), ordenada por rank_by
+    results: List[BacktestResults]  # BacktestResults de cada combinación, en el orden de param_sets
+    param_sets: List[Dict[str, Any]]
+
+    def best(self) -> Dict[str, Any]:
+        """Parámetros de la combinación mejor rankeada"""
+        return self.param_sets[int(self.table.iloc[0]['run'])]
+
+
+# ==================== ESPACIOS DE BÚSQUEDA ====================
+
+def grid_search_space(param_grid: Dict[str, Sequence]) -> List[Dict[str, Any]]:
+    """
+    Todas las combinaciones de una grilla de parámetros.
+
+    Args:
+        param_grid: {parámetro: lista de valores}
+
+    Returns:
+        Lista de combinaciones {parámetro: valor}
+    """
+    keys = list(param_grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(param_grid[k] for k in keys))]
+
+
+def random_search_space(param_space: Dict[str, Any], n_samples: int,
+                        seed: int = 42) -> List[Dict[str, Any]]:
+    """
+    Combinaciones aleatorias (reproducibles con seed).
+
+    Args:
+        param_space: {parámetro: lista de valores o tupla (mínimo, máximo)}.
+                     Con una tupla de enteros se sortea un entero; con floats,
+                     un valor uniforme en el rango.
+        n_samples: Número de combinaciones
+        seed: Semilla del generador
+
+    Returns:
+        Lista de combinaciones {parámetro: valor}
+    """
+    rng = random.Random(seed)
+    samples = []
+    for _ in range(n_samples):
+        sample = {}
+        for key, space in param_space.items():
+            if isinstance(space, tuple):
+                low, high = space
+                if isinstance(low, int) and isinstance(high, int):
+                    sample[key] = rng.randint(low, high)
+                else:
+                    sample[key] = rng.uniform(low, high)
+            else:
+                sample[key] = rng.choice(list(space))
+        samples.append(sample)
+    return samples
+
+
+def build_params(param_set: Dict[str, Any]) -> Tuple[StrategyParams, Dict[str, Any]]:
+    """
+    Separa una combinación en StrategyParams y parámetros del motor.
+
+    Args:
+        param_set: Combinación {parámetro: valor}
+
+    Returns:
+        Tupla (StrategyParams, kwargs extra para ICTBacktestEngine)
+    """
+    params = StrategyParams()
+    fields = {f.name for f in dataclasses.fields(StrategyParams)}
+    engine_kwargs = {}
+
+    for key, value in param_set.items():
+        if key in ENGINE_PARAMS:
+            engine_kwargs[key] = value
+        elif key.startswith(WEIGHT_PREFIX):
+            params.confirmation_weights[key[len(WEIGHT_PREFIX):]] = value
+        elif key in fields:
+            setattr(params, key, dict(value) if key == 'confirmation_weights' else value)
+        else:
+            raise ValueError(f"Parámetro desconocido: {key}")
+
+    return params, engine_kwargs
+
+
+# ==================== DATOS COMPARTIDOS (MEMORY-MAPPED) ====================
+
+def save_shared_data(data_dict: Dict[str, pd.DataFrame], directory: str) -> Dict[str, Dict]:
+    """
+    Escribe cada timeframe como arrays .npy (timestamps + columnas numéricas).
+
+    Args:
+        data_dict: DataFrames de cada timeframe
+        directory: Carpeta destino
+
+    Returns:
+        Metadatos de cada timeframe
+    """
+    meta = {}
+    for tf_key, df in data_dict.items():
+        meta[tf_key] = save_mmap_frame(df.select_dtypes(include='number'),
+                                       os.path.join(directory, tf_key))
+
+    with open(os.path.join(directory, "timeframes.json"), "w") as f:
+        json.dump(list(meta), f)
+    return meta
+
+
+def load_shared_data(directory: str) -> Dict[str, pd.DataFrame]:
+    """
+    Abre los datos de save_shared_data memory-mapped y de solo lectura.
+
+    Args:
+        directory: Carpeta con los arrays
+
+    Returns:
+        Diccionario {timeframe: DataFrame} sobre los arrays mapeados
+    """
+    with open(os.path.join(directory, "timeframes.json")) as f:
+        timeframes = json.load(f)
+
+    return {tf_key: open_mmap_frame(os.path.join(directory, tf_key))[0] for tf_key in timeframes}
+
+
+# ==================== EJECUCIÓN ====================
+
+# Estado de cada proceso del pool (se carga una vez en _init_worker)
+_WORKER_STATE: Dict[str, Any] = {}
+
+
+def _init_worker(directory: str, engine_kwargs: Dict[str, Any],
+                 start_date: Optional[str], end_date: Optional[str]):
+    """Inicializa un proceso del pool: abre los datos compartidos una sola vez"""
+    _WORKER_STATE['data_dict'] = load_shared_data(directory)
+    _WORKER_STATE['engine_kwargs'] = engine_kwargs
+    _WORKER_STATE['start_date'] = start_date
+    _WORKER_STATE['end_date'] = end_date
+
+
+def run_param_set(data_dict: Dict[str, pd.DataFrame], param_set: Dict[str, Any],
+                  engine_kwargs: Optional[Dict[str, Any]] = None,
+                  start_date: Optional[str] = None, end_date: Optional[str] = None,
+                  keep_equity_curve: bool = False,
+                  analysis_cache: Optional["OrderedDict[Tuple, Dict]"] = None,
+                  analysis_cache_size: int = 64) -> BacktestResults:
+    """
+    Ejecuta el backtest de una combinación de parámetros (sin imprimir el progreso).
+
+    Args:
+        data_dict: DataFrames de cada timeframe
+        param_set: Combinación {parámetro: valor}
+        engine_kwargs: Argumentos base de ICTBacktestEngine
+        start_date: Fecha de inicio (opcional)
+        end_date: Fecha de fin (opcional)
+        keep_equity_curve: Si False, descarta la curva de equity (menos datos entre procesos)
+        analysis_cache: Caché de análisis de la estrategia a reutilizar. Solo debe
+                        compartirse entre backtests con los mismos parámetros.
+        analysis_cache_size: Entradas máximas de la caché de análisis
+
+    Returns:
+        BacktestResults del backtest
+    """
+    params, engine_overrides = build_params(param_set)
+    engine = ICTBacktestEngine(**{**(engine_kwargs or {}), **engine_overrides})
+    strategy = ICTHybridStrategy(params=params, analysis_cache_size=analysis_cache_size)
+    if analysis_cache is not None:
+        strategy.analysis_cache = analysis_cache
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        results = engine.run(data_dict, strategy, start_date=start_date, end_date=end_date)
+
+    if not keep_equity_curve:
+        results.equity_curve = []
+    return results
+
+
+def _run_in_worker(task: Tuple[Dict[str, Any], bool]) -> BacktestResults:
+    param_set, keep_equity_curve = task
+    return run_param_set(
+        _WORKER_STATE['data_dict'], param_set,
+        engine_kwargs=_WORKER_STATE['engine_kwargs'],
+        start_date=_WORKER_STATE['start_date'],
+        end_date=_WORKER_STATE['end_date'],
+        keep_equity_curve=keep_equity_curve
+    )
+
+
+def results_table(param_sets: List[Dict[str, Any]], results: List[BacktestResults],
+                  rank_by: str = 'sharpe_ratio', ascending: bool = False) -> pd.DataFrame:
+    """
+    Tabla rankeada: una fila por combinación con sus parámetros y métricas.
+
+    Args:
+        param_sets: Combinaciones ejecutadas
+        results: BacktestResults de cada combinación (mismo orden)
+        rank_by: Métrica por la que se ordena
+        ascending: Orden ascendente (p. ej. para max_drawdown_pct)
+
+    Returns:
+        DataFrame ordenado con columnas 'rank', 'run', parámetros y métricas
+    """
+    rows = []
+    for run, (param_set, result) in enumerate(zip(param_sets, results)):
+        row = {'run': run}
+        row.update(param_set)
+        row.update({metric: getattr(result, metric) for metric in RESULT_METRICS})
+        rows.append(row)
+
+    table = pd.DataFrame(rows)
+    if table.empty:
+        return table
+    table = table.sort_values([rank_by, 'run'], ascending=[ascending, True], kind='stable')
+    table.insert(0, 'rank', np.arange(1, len(table) + 1))
+    return table.reset_index(drop=True)
+
+
+def optimize(data_dict: Dict[str, pd.DataFrame], param_sets: List[Dict[str, Any]],
+             max_workers: Optional[int] = None, rank_by: str = 'sharpe_ratio',
+             ascending: bool = False, engine_kwargs: Optional[Dict[str, Any]] = None,
+             start_date: Optional[str] = None, end_date: Optional[str] = None,
+             keep_equity_curve: bool = False) -> OptimizationResult:
+    """
+    Ejecuta un backtest por combinación de parámetros en paralelo.
+
+    Args:
+        data_dict: DataFrames de cada timeframe (se cargan una vez por proceso)
+        param_sets: Combinaciones (ver grid_search_space / random_search_space)
+        max_workers: Procesos del pool (None = núcleos disponibles; 1 = sin pool)
+        rank_by: Métrica de BacktestResults por la que se rankea
+        ascending: Orden ascendente de rank_by
+        engine_kwargs: Argumentos base de ICTBacktestEngine (capital, comisión, ...)
+        start_date: Fecha de inicio del backtest (opcional)
+        end_date: Fecha de fin del backtest (opcional)
+        keep_equity_curve: Conserva la curva de equity de cada backtest
+
+    Returns:
+        OptimizationResult con la tabla rankeada y los BacktestResults
+    """
+    # Valida todas las combinaciones antes de lanzar procesos
+    for param_set in param_sets:
+        build_params(param_set)
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(param_sets)))
+
+    print(f"🔧 Optimizando {len(param_sets)} combinaciones con {max_workers} proceso(s)...")
+
+    if max_workers == 1:
+        results = [
+            run_param_set(data_dict, param_set, engine_kwargs, start_date, end_date, keep_equity_curve)
+            for param_set in param_sets
+        ]
+    else:
+        directory = tempfile.mkdtemp(prefix="ict_optimizer_")
+        try:
+            save_shared_data(data_dict, directory)
+            with ProcessPoolExecutor(
+                max_workers=max_workers,
+                initializer=_init_worker,
+                initargs=(directory, engine_kwargs, start_date, end_date)
+            ) as pool:
+                # Una tarea por combinación: el pool reparte la carga entre núcleos
+                results = list(pool.map(_run_in_worker,
+                                        [(param_set, keep_equity_curve) for param_set in param_sets]))
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    table = results_table(param_sets, results, rank_by=rank_by, ascending=ascending)
+    print(f"✓ Optimización completada. Mejor {rank_by}: "
+          f"{table.iloc[0][rank_by] if not table.empty else 'N/A'}")
+
+    return OptimizationResult(table=table, results=results, param_sets=list(param_sets))
+
+
+if __name__ == "__main__":
+    from utils.multi_timeframe_loader import load_multi_timeframe_data
+
+    data_dict = load_multi_timeframe_data("XAUUSD")
+    grid = grid_search_space({
+        'lookback_sniper': [3, 5, 7],
+        'weight.SWEEP': [1.5, 2.0],
+        'min_rr': [1.5, 2.0]
+    })
+    result = optimize(data_dict, grid)
+    print(result.table.to_string())
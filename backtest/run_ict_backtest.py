@@ -58,7 +58,7 @@ def run_ict_backtest(symbol: str = "XAUUSD", start_date: str = None, end_date: s
                 break
         
         if base_data is not None and not base_data.empty:
-            resampled = resample_to_timeframes(base_data, base_timeframes[0])
+            resampled = resample_to_timeframes(base_data, tf)
             # Combina con datos existentes
             for key, df in resampled.items():
                 if key not in data_dict:
@@ -0,0 +1,385 @@
+"""
+backtest/walk_forward.py - Análisis walk-forward de la estrategia ICT
+
+Divide los datos multi-temporales en ventanas deslizantes. En cada fold se
+optimizan los parámetros sobre la ventana in-sample (IS) y la mejor
+combinación se evalúa sobre la ventana out-of-sample (OOS) siguiente.
+El resultado reúne las métricas de cada fold y la curva de equity OOS
+encadenada de todos los folds.
+
+Los folds son independientes y se reparten entre procesos (como en
+backtest/optimizer.py, los datos se comparten memory-mapped). Cada proceso
+guarda una caché de análisis por combinación de parámetros: como el contexto
+de cada vela sale de los datos completos, las ventanas que se solapan vuelven
+a pedir los mismos swings y bloques de D1/H4/H1/M15/M5 y los reutilizan.
+
+Uso (en Windows el pool necesita el guard de __main__):
+
+    if __name__ == "__main__":
+        data_dict = load_multi_timeframe_data("XAUUSD")
+        grid = grid_search_space({'lookback_sniper': [3, 5, 7], 'min_rr': [1.5, 2.0]})
+        result = walk_forward(data_dict, grid, in_sample='60D', out_of_sample='20D')
+        print(result.table)
+"""
+
+import math
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from backtest.ict_backtest_engine import BacktestResults
+from backtest.optimizer import (
+    RESULT_METRICS, build_params, run_param_set, results_table,
+    save_shared_data, load_shared_data
+)
+
+
+@dataclass
+class WalkForwardWindow:
+    """Ventanas de un fold (timestamps de velas de ejecución, ambos extremos incluidos)"""
+    fold: int
+    is_start: pd.Timestamp
+    is_end: pd.Timestamp
+    oos_start: pd.Timestamp
+    oos_end: pd.Timestamp
+
+
+@dataclass
+class WalkForwardFold:
+    """Resultado de un fold"""
+    window: WalkForwardWindow
+    best_params: Dict[str, Any]
+    in_sample_table: pd.DataFrame  # Tabla rankeada de la optimización IS
+    oos_results: BacktestResults  # Backtest OOS con best_params (con curva de equity)
+
+
+@dataclass
+class WalkForwardResult:
+    """Resultado completo del análisis walk-forward"""
+    folds: List[WalkForwardFold]
+    table: pd.DataFrame  # Una fila por fold: ventanas, mejores parámetros y métricas IS/OOS
+    oos_equity: pd.Series  # Curva de equity OOS encadenada (índice: timestamp)
+
+    def summary(self) -> Dict[str, float]:
+        """Métricas agregadas de todos los tramos OOS"""
+        trades = [t for fold in self.folds for t in fold.oos_results.trades]
+        wins = sum(1 for t in trades if t.pnl is not None and t.pnl > 0)
+        equity = self.oos_equity
+        if len(equity):
+            drawdown = (equity - equity.cummax()) / equity.cummax() * 100
+            initial = self.folds[0].oos_results.initial_capital
+            return_pct = (equity.iloc[-1] / initial - 1) * 100
+        else:
+            drawdown = pd.Series([0.0])
+            return_pct = 0.0
+        return {
+            'folds': len(self.folds),
+            'oos_return_pct': float(return_pct),
+            'oos_max_drawdown_pct': float(abs(drawdown.min())),
+            'oos_total_trades': len(trades),
+            'oos_win_rate_pct': wins / len(trades) * 100 if trades else 0.0
+        }
+
+
+# ==================== VENTANAS ====================
+
+def execution_timeframe(data_dict: Dict[str, pd.DataFrame]) -> str:
+    """Timeframe de ejecución que usa ICTBacktestEngine (el más granular disponible)"""
+    return 'M1' if 'M1' in data_dict else 'M3' if 'M3' in data_dict else 'M5'
+
+
+def walk_forward_windows(index: pd.DatetimeIndex,
+                         in_sample: Union[str, pd.Timedelta],
+                         out_of_sample: Union[str, pd.Timedelta],
+                         step: Optional[Union[str, pd.Timedelta]] = None,
+                         anchored: bool = False) -> List[WalkForwardWindow]:
+    """
+    Ventanas IS/OOS deslizantes sobre las velas de ejecución.
+
+    Args:
+        index: Timestamps de las velas de ejecución (ordenados)
+        in_sample: Duración de la ventana in-sample (ej: '60D')
+        out_of_sample: Duración de la ventana out-of-sample (ej: '20D')
+        step: Desplazamiento entre folds (por defecto out_of_sample: tramos OOS contiguos)
+        anchored: Si True, la ventana IS empieza siempre al inicio de los datos (ventana creciente)
+
+    Returns:
+        Lista de WalkForwardWindow (los folds sin velas IS u OOS se omiten)
+    """
+    in_sample = pd.Timedelta(in_sample)
+    out_of_sample = pd.Timedelta(out_of_sample)
+    step = pd.Timedelta(step) if step is not None else out_of_sample
+    if in_sample <= pd.Timedelta(0) or out_of_sample <= pd.Timedelta(0) or step <= pd.Timedelta(0):
+        raise ValueError("in_sample, out_of_sample y step deben ser positivos")
+
+    windows = []
+    n = len(index)
+    if n == 0:
+        return windows
+
+    origin = index[0]
+    k = 0
+    while True:
+        is_from = origin if anchored else origin + k * step
+        is_to = origin + k * step + in_sample
+        oos_to = is_to + out_of_sample
+
+        # Posiciones [a, b) para IS y [b, c) para OOS
+        a = index.searchsorted(is_from, side='left')
+        b = index.searchsorted(is_to, side='left')
+        c = index.searchsorted(oos_to, side='left')
+        if b >= n:
+            break
+        if a < b < c:
+            windows.append(WalkForwardWindow(
+                fold=len(windows),
+                is_start=index[a], is_end=index[b - 1],
+                oos_start=index[b], oos_end=index[c - 1]
+            ))
+        k += 1
+
+    return windows
+
+
+# ==================== FOLDS ====================
+
+def _param_key(param_set: Dict[str, Any]) -> str:
+    """Clave estable de una combinación (para la caché de análisis)"""
+    return repr(sorted(param_set.items()))
+
+
+def run_fold(data_dict: Dict[str, pd.DataFrame], window: WalkForwardWindow,
+             param_sets: List[Dict[str, Any]], engine_kwargs: Optional[Dict[str, Any]] = None,
+             rank_by: str = 'sharpe_ratio', ascending: bool = False,
+             analysis_caches: Optional[Dict[str, "OrderedDict"]] = None,
+             analysis_cache_size: int = 1024) -> WalkForwardFold:
+    """
+    Optimiza un fold sobre su ventana IS y evalúa la mejor combinación en la OOS.
+
+    Args:
+        data_dict: DataFrames de cada timeframe (datos completos)
+        window: Ventanas del fold
+        param_sets: Combinaciones a evaluar en la ventana IS
+        engine_kwargs: Argumentos base de ICTBacktestEngine
+        rank_by: Métrica con la que se elige la mejor combinación
+        ascending: Orden ascendente de rank_by
+        analysis_caches: Cachés de análisis por combinación, compartidas entre folds
+        analysis_cache_size: Entradas máximas de cada caché
+
+    Returns:
+        WalkForwardFold del fold
+    """
+    if analysis_caches is None:
+        analysis_caches = {}
+
+    def run(param_set, start_date, end_date, keep_equity_curve):
+        cache = analysis_caches.setdefault(_param_key(param_set), OrderedDict())
+        return run_param_set(data_dict, param_set, engine_kwargs, start_date, end_date,
+                             keep_equity_curve=keep_equity_curve,
+                             analysis_cache=cache, analysis_cache_size=analysis_cache_size)
+
+    is_results = [run(param_set, window.is_start, window.is_end, False) for param_set in param_sets]
+    table = results_table(param_sets, is_results, rank_by=rank_by, ascending=ascending)
+    best_params = param_sets[int(table.iloc[0]['run'])]
+
+    oos_results = run(best_params, window.oos_start, window.oos_end, True)
+    return WalkForwardFold(window=window, best_params=best_params,
+                           in_sample_table=table, oos_results=oos_results)
+
+
+# Estado de cada proceso del pool (se carga una vez en _init_worker)
+_WORKER_STATE: Dict[str, Any] = {}
+
+
+def _init_worker(directory: str, engine_kwargs: Optional[Dict[str, Any]], rank_by: str,
+                 ascending: bool, analysis_cache_size: int):
+    """Inicializa un proceso del pool: abre los datos compartidos y crea sus cachés"""
+    _WORKER_STATE['data_dict'] = load_shared_data(directory)
+    _WORKER_STATE['engine_kwargs'] = engine_kwargs
+    _WORKER_STATE['rank_by'] = rank_by
+    _WORKER_STATE['ascending'] = ascending
+    _WORKER_STATE['analysis_cache_size'] = analysis_cache_size
+    _WORKER_STATE['analysis_caches'] = {}
+
+
+def _run_fold_in_worker(task: Tuple[WalkForwardWindow, List[Dict[str, Any]]]) -> WalkForwardFold:
+    window, param_sets = task
+    return run_fold(
+        _WORKER_STATE['data_dict'], window, param_sets,
+        engine_kwargs=_WORKER_STATE['engine_kwargs'],
+        rank_by=_WORKER_STATE['rank_by'],
+        ascending=_WORKER_STATE['ascending'],
+        analysis_caches=_WORKER_STATE['analysis_caches'],
+        analysis_cache_size=_WORKER_STATE['analysis_cache_size']
+    )
+
+
+# ==================== RESULTADOS ====================
+
+def stitch_oos_equity(folds: List[WalkForwardFold]) -> pd.Series:
+    """
+    Encadena las curvas de equity OOS de los folds.
+
+    Cada tramo se reescala para empezar donde terminó el anterior (rendimiento
+    compuesto). Si los tramos OOS se solapan (step < out_of_sample), cada fold
+    aporta solo sus velas anteriores al inicio OOS del fold siguiente.
+
+    Args:
+        folds: Folds en orden cronológico
+
+    Returns:
+        Serie de equity indexada por timestamp
+    """
+    parts = []
+    level = None
+    for k, fold in enumerate(folds):
+        curve = fold.oos_results.equity_curve
+        if not curve:
+            continue
+        initial = fold.oos_results.initial_capital
+        if level is None:
+            level = initial
+        equity = pd.Series([point['equity'] for point in curve],
+                           index=pd.DatetimeIndex([point['timestamp'] for point in curve]),
+                           dtype=np.float64)
+        if k + 1 < len(folds):
+            equity = equity[equity.index < folds[k + 1].window.oos_start]
+        if equity.empty:
+            continue
+        equity = equity * (level / initial)
+        parts.append(equity)
+        level = equity.iloc[-1]
+
+    if not parts:
+        return pd.Series(dtype=np.float64, name='equity')
+    return pd.concat(parts).rename('equity')
+
+
+def folds_table(folds: List[WalkForwardFold], rank_by: str = 'sharpe_ratio') -> pd.DataFrame:
+    """
+    Tabla con una fila por fold.
+
+    Args:
+        folds: Folds ejecutados
+        rank_by: Métrica usada en la optimización IS (se reporta como 'is_<rank_by>')
+
+    Returns:
+        DataFrame con ventanas, mejores parámetros, métrica IS y métricas OOS ('oos_*')
+    """
+    rows = []
+    for fold in folds:
+        window = fold.window
+        row = {
+            'fold': window.fold,
+            'is_start': window.is_start, 'is_end': window.is_end,
+            'oos_start': window.oos_start, 'oos_end': window.oos_end
+        }
+        row.update(fold.best_params)
+        row[f'is_{rank_by}'] = fold.in_sample_table.iloc[0][rank_by]
+        row.update({f'oos_{metric}': getattr(fold.oos_results, metric) for metric in RESULT_METRICS})
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def walk_forward(data_dict: Dict[str, pd.DataFrame], param_sets: List[Dict[str, Any]],
+                 in_sample: Union[str, pd.Timedelta], out_of_sample: Union[str, pd.Timedelta],
+                 step: Optional[Union[str, pd.Timedelta]] = None, anchored: bool = False,
+                 max_workers: Optional[int] = None, rank_by: str = 'sharpe_ratio',
+                 ascending: bool = False, engine_kwargs: Optional[Dict[str, Any]] = None,
+                 analysis_cache_size: int = 1024) -> WalkForwardResult:
+    """
+    Ejecuta el análisis walk-forward completo.
+
+    Args:
+        data_dict: DataFrames de cada timeframe (ver load_multi_timeframe_data)
+        param_sets: Combinaciones a optimizar en cada fold (ver grid_search_space)
+        in_sample: Duración de la ventana in-sample (ej: '60D')
+        out_of_sample: Duración de la ventana out-of-sample (ej: '20D')
+        step: Desplazamiento entre folds (por defecto out_of_sample)
+        anchored: Ventana IS creciente desde el inicio de los datos
+        max_workers: Procesos del pool (None = núcleos disponibles; 1 = sin pool)
+        rank_by: Métrica de BacktestResults con la que se elige la mejor combinación
+        ascending: Orden ascendente de rank_by
+        engine_kwargs: Argumentos base de ICTBacktestEngine (capital, comisión, ...)
+        analysis_cache_size: Entradas máximas de la caché de análisis de cada combinación
+
+    Returns:
+        WalkForwardResult con los folds, la tabla por fold y la equity OOS encadenada
+    """
+    # Valida todas las combinaciones antes de lanzar procesos
+    for param_set in param_sets:
+        build_params(param_set)
+    if not param_sets:
+        raise ValueError("param_sets está vacío")
+
+    index = data_dict[execution_timeframe(data_dict)].index
+    if not index.is_monotonic_increasing:
+        index = index.sort_values()
+    windows = walk_forward_windows(index, in_sample, out_of_sample, step=step, anchored=anchored)
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(windows)))
+
+    print(f"🔁 Walk-forward: {len(windows)} folds x {len(param_sets)} combinaciones "
+          f"con {max_workers} proceso(s)...")
+
+    if not windows:
+        folds = []
+    elif max_workers == 1:
+        analysis_caches = {}
+        folds = [
+            run_fold(data_dict, window, param_sets, engine_kwargs, rank_by, ascending,
+                     analysis_caches, analysis_cache_size)
+            for window in windows
+        ]
+    else:
+        directory = tempfile.mkdtemp(prefix="ict_walk_forward_")
+        try:
+            save_shared_data(data_dict, directory)
+            with ProcessPoolExecutor(
+                max_workers=max_workers,
+                initializer=_init_worker,
+                initargs=(directory, engine_kwargs, rank_by, ascending, analysis_cache_size)
+            ) as pool:
+                # Folds consecutivos al mismo proceso: sus ventanas se solapan y comparten caché
+                chunksize = math.ceil(len(windows) / max_workers)
+                folds = list(pool.map(_run_fold_in_worker,
+                                      [(window, param_sets) for window in windows],
+                                      chunksize=chunksize))
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    result = WalkForwardResult(
+        folds=folds,
+        table=folds_table(folds, rank_by=rank_by),
+        oos_equity=stitch_oos_equity(folds)
+    )
+
+    summary = result.summary()
+    print(f"✓ Walk-forward completado. Retorno OOS: {summary['oos_return_pct']:.2f}% | "
+          f"Max DD OOS: {summary['oos_max_drawdown_pct']:.2f}% | "
+          f"Trades OOS: {summary['oos_total_trades']}")
+
+    return result
+
+
+if __name__ == "__main__":
+    from utils.multi_timeframe_loader import load_multi_timeframe_data
+    from backtest.optimizer import grid_search_space
+
+    data_dict = load_multi_timeframe_data("XAUUSD")
+    grid = grid_search_space({
+        'lookback_sniper': [3, 5, 7],
+        'min_rr': [1.5, 2.0]
+    })
+    result = walk_forward(data_dict, grid, in_sample='60D', out_of_sample='20D')
+    print(result.table.to_string())
+    print(result.summary())
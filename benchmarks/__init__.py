@@ -0,0 +1,3 @@
+"""
+benchmarks - Mediciones de rendimiento de los detectores y de la estrategia
+"""
@@ -0,0 +1,112 @@
+"""
+benchmarks/bench_detectors.py - Speedup de los detectores ICT vectorizados
+
+Mide cada detector de strategy/ict_utils.py (sobre las primitivas de
+utils/rolling_windows.py) frente a su implementación original vela a vela
+(las funciones reference_* de tests/test_ict_utils.py), sobre las mismas
+velas sintéticas, y comprueba de paso que los resultados coinciden.
+
+Uso:
+
+    python -m benchmarks.bench_detectors --bars 3000 --repeat 3
+"""
+
+import argparse
+import time
+from dataclasses import dataclass
+from typing import Callable, List
+
+from benchmarks.synthetic import synthetic_ohlcv
+from strategy.ict_utils import (
+    detect_swings, detect_liquidity_sweeps, detect_order_blocks,
+    detect_rejection_blocks, detect_mitigation_blocks, detect_breaker_blocks
+)
+from tests.test_ict_utils import (
+    reference_detect_swings, reference_detect_liquidity_sweeps,
+    reference_detect_rejection_blocks, reference_detect_mitigation_blocks,
+    reference_detect_breaker_blocks
+)
+
+
+@dataclass
+class DetectorTiming:
+    """Tiempos (mejor de N repeticiones) de un detector"""
+    name: str
+    reference_seconds: float
+    fast_seconds: float
+
+    @property
+    def speedup(self) -> float:
+        return self.reference_seconds / self.fast_seconds if self.fast_seconds > 0 else float('inf')
+
+
+def _best_time(func: Callable, repeat: int):
+    """Mejor tiempo de `repeat` ejecuciones y el resultado de la última"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run_benchmark(bars: int = 3000, lookback: int = 5, repeat: int = 3) -> List[DetectorTiming]:
+    """
+    Ejecuta cada detector y su referencia sobre `bars` velas sintéticas.
+
+    Args:
+        bars: Número de velas
+        lookback: Lookback de los swings
+        repeat: Repeticiones por medición (se queda con la mejor)
+
+    Returns:
+        Lista de DetectorTiming, uno por detector
+    """
+    df = synthetic_ohlcv(bars)
+    highs, lows = detect_swings(df, lookback)
+    obs = detect_order_blocks(df, highs, lows)
+
+    def unmitigated():
+        return detect_order_blocks(df, highs, lows)
+
+    cases = [
+        ('detect_swings',
+         lambda: reference_detect_swings(df, lookback),
+         lambda: detect_swings(df, lookback)),
+        ('detect_liquidity_sweeps',
+         lambda: reference_detect_liquidity_sweeps(df, highs, lows),
+         lambda: detect_liquidity_sweeps(df, highs, lows)),
+        ('detect_rejection_blocks',
+         lambda: reference_detect_rejection_blocks(df, lookback),
+         lambda: detect_rejection_blocks(df, lookback)),
+        ('detect_mitigation_blocks',
+         lambda: reference_detect_mitigation_blocks(df, unmitigated()),
+         lambda: detect_mitigation_blocks(df, unmitigated())),
+        ('detect_breaker_blocks',
+         lambda: reference_detect_breaker_blocks(df, obs),
+         lambda: detect_breaker_blocks(df, obs)),
+    ]
+
+    timings = []
+    for name, reference, fast in cases:
+        reference_seconds, expected = _best_time(reference, repeat)
+        fast_seconds, actual = _best_time(fast, repeat)
+        if expected != actual:
+            raise AssertionError(f"{name}: el resultado no coincide con la referencia")
+        timings.append(DetectorTiming(name, reference_seconds, fast_seconds))
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Speedup de los detectores ICT vectorizados")
+    parser.add_argument('--bars', type=int, default=3000)
+    parser.add_argument('--lookback', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"📊 Detectores ICT sobre {args.bars} velas (lookback={args.lookback}, mejor de {args.repeat})\n")
+    print(f"{'Detector':<28}{'Original (ms)':>15}{'Vectorizado (ms)':>18}{'Speedup':>10}")
+    for timing in run_benchmark(args.bars, args.lookback, args.repeat):
+        print(f"{timing.name:<28}{timing.reference_seconds * 1000:>15.2f}"
+              f"{timing.fast_seconds * 1000:>18.2f}{timing.speedup:>9.1f}x")
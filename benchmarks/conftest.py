@@ -0,0 +1,231 @@
+"""
+benchmarks/conftest.py - Baselines JSON y umbral de regresión para pytest-benchmark
+
+Cada benchmark se ejecuta con el fixture `bench` (sobre el `benchmark` de
+pytest-benchmark) y la mediana de sus rondas se compara con la de
+benchmarks/baselines.json. Si es más lenta que la baseline en más del
+umbral (25% por defecto), el test falla.
+
+Las llamadas cortas (milisegundos) se calientan y se calibran: cada ronda
+repite la llamada hasta durar MIN_ROUND_TIME (o, si necesitan `setup`, se
+hacen más rondas hasta MIN_TOTAL_TIME), así una ronda no es una sola medida
+de 1-2 ms dominada por el ruido. La calibración (rondas e iteraciones) se
+guarda en la baseline y se repite igual al comparar.
+
+Los tiempos dependen de la máquina: el archivo guarda la máquina en la que
+se midieron y, si no es la actual, no se compara. Por eso baselines.json no
+se versiona: se genera con --save-baselines en la máquina donde se vaya a
+comparar (sin baseline, los benchmarks solo miden).
+
+Uso:
+
+    python -m pytest benchmarks                       # compara con la baseline
+    python -m pytest benchmarks --save-baselines      # regenera la baseline
+    python -m pytest benchmarks --regression-threshold 0.5
+    python -m pytest benchmarks -k "1000]"            # solo 1k velas
+"""
+
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import time
+import warnings
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+
+BASELINES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+DEFAULT_THRESHOLD = 0.25
+
+# Mediciones completas extra antes de dar por buena una regresión (descarta picos de carga)
+CONFIRM_ROUNDS = 3
+
+# Calibración de las llamadas cortas (los benchmarks con rounds=1 no se calibran)
+MIN_ROUND_TIME = 0.05  # segundos por ronda (iteraciones de la llamada sin setup)
+MIN_TOTAL_TIME = 1.0   # segundos por benchmark con setup (una llamada por ronda)
+MIN_ROUNDS = 5
+MAX_ROUNDS = 200
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('baselines', 'Baselines JSON de los benchmarks')
+    group.addoption('--baselines-file', default=BASELINES_FILE,
+                    help="Archivo JSON con los tiempos de referencia")
+    group.addoption('--save-baselines', action='store_true', default=False,
+                    help="Guarda los tiempos de esta ejecución como baseline (no compara)")
+    group.addoption('--regression-threshold', type=float, default=DEFAULT_THRESHOLD,
+                    help="Regresión máxima permitida sobre la baseline (0.25 = 25%%)")
+
+
+def machine_info() -> Dict[str, str]:
+    """Máquina en la que se mide (las baselines solo valen para la misma)"""
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpus': str(os.cpu_count())
+    }
+
+
+class BaselineStore:
+    """Baselines de la sesión: las guardadas en disco y las medidas ahora"""
+
+    def __init__(self, path: str, save: bool, threshold: float):
+        self.path = path
+        self.save = save
+        self.threshold = threshold
+        self.machine = machine_info()
+        self.measured: Dict[str, Dict] = {}
+
+        self.saved: Dict[str, Dict] = {}
+        self.same_machine = False
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.saved = data.get('benchmarks', {})
+            self.same_machine = data.get('machine') == self.machine
+
+    def expected(self, name: str) -> Optional[Dict]:
+        """Entrada de la baseline (None si no hay, es de otra máquina o no tiene calibración)"""
+        entry = self.saved.get(name)
+        if entry is None or not self.same_machine or 'iterations' not in entry:
+            return None
+        return entry
+
+    def record(self, name: str, stats, iterations: int) -> None:
+        self.measured[name] = {
+            'median': stats.median,
+            'min': stats.min,
+            'rounds': stats.rounds,
+            'iterations': iterations
+        }
+
+    def write(self) -> None:
+        # Conserva las entradas de benchmarks que no se ejecutaron esta vez (-k),
+        # salvo que la baseline anterior sea de otra máquina
+        benchmarks = {**(self.saved if self.same_machine else {}), **self.measured}
+        data = {
+            'machine': self.machine,
+            'benchmarks': dict(sorted(benchmarks.items()))
+        }
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+            f.write('\n')
+
+
+@pytest.fixture(scope='session')
+def baselines(request) -> BaselineStore:
+    store = BaselineStore(request.config.getoption('--baselines-file'),
+                          request.config.getoption('--save-baselines'),
+                          request.config.getoption('--regression-threshold'))
+    if store.saved and not store.same_machine and not store.save:
+        warnings.warn(f"{store.path} es de otra máquina: no se compara "
+                      f"(regenerar con --save-baselines)")
+    yield store
+    if store.save and store.measured:
+        store.write()
+        print(f"\n💾 Baselines guardadas en {store.path} ({len(store.measured)} benchmarks)")
+
+
+def quiet(func: Callable) -> Callable:
+    """Ejecuta func sin los prints de análisis (solo se mide el cálculo)"""
+    def wrapper(*args, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def calibrate(func: Callable, setup: Callable, rounds: int, per_round_setup: bool) -> Tuple[int, int]:
+    """
+    Rondas e iteraciones por ronda para una llamada corta.
+
+    La llamada de calibración sirve también de calentamiento (cachés,
+    importaciones perezosas, primera asignación de memoria).
+
+    Returns:
+        (rondas, iteraciones)
+    """
+    call_args, call_kwargs = setup()
+    start = time.perf_counter()
+    func(*call_args, **call_kwargs)
+    elapsed = max(time.perf_counter() - start, 1e-6)
+    if per_round_setup:
+        # pytest-benchmark no admite varias iteraciones con setup: más rondas
+        return min(MAX_ROUNDS, max(rounds, MIN_ROUNDS, math.ceil(MIN_TOTAL_TIME / elapsed))), 1
+    return max(rounds, MIN_ROUNDS), max(1, math.ceil(MIN_ROUND_TIME / elapsed))
+
+
+def median_time(func: Callable, setup: Callable, rounds: int, iterations: int) -> float:
+    """Mediana por llamada de rounds rondas de iterations llamadas (sin pytest-benchmark)"""
+    times = []
+    for _ in range(rounds):
+        call_args, call_kwargs = setup()
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func(*call_args, **call_kwargs)
+        times.append((time.perf_counter() - start) / iterations)
+    return float(np.median(times))
+
+
+@pytest.fixture
+def bench(benchmark, baselines, request):
+    """
+    Mide func con pytest-benchmark y la compara con la baseline.
+
+    bench(func, *args, rounds=5, setup=None, **kwargs) devuelve el resultado
+    de func. `setup` (como en benchmark.pedantic) prepara argumentos nuevos
+    en cada ronda, sin contarlo en el tiempo. Con rounds > 1 la llamada se
+    calienta y calibra (ver calibrate); con rounds=1 (llamadas de segundos)
+    se mide una vez. Si la mediana supera la baseline, se repite la medición
+    completa hasta CONFIRM_ROUNDS veces antes de fallar.
+    """
+    module = request.node.module.__name__.rsplit('.', 1)[-1]
+    name = f"{module}::{request.node.name}"
+
+    def run(func: Callable, *args, rounds: int = 5, setup: Optional[Callable] = None, **kwargs):
+        func = quiet(func)
+        per_round_setup = setup is not None
+        if setup is None:
+            setup = lambda: (args, kwargs)
+
+        expected = baselines.expected(name)
+        iterations = 1
+        if expected is not None:
+            rounds, iterations = expected['rounds'], expected['iterations']
+        elif rounds > 1 and not benchmark.disabled:
+            rounds, iterations = calibrate(func, setup, rounds, per_round_setup)
+
+        if iterations > 1:
+            call_args, call_kwargs = setup()
+            result = benchmark.pedantic(func, args=call_args, kwargs=call_kwargs,
+                                        rounds=rounds, iterations=iterations, warmup_rounds=1)
+        else:
+            result = benchmark.pedantic(func, setup=setup, rounds=rounds,
+                                        warmup_rounds=1 if rounds > 1 else 0)
+        if benchmark.disabled:
+            return result
+
+        stats = benchmark.stats.stats
+        baselines.record(name, stats, iterations)
+        if not baselines.save and expected is not None:
+            limit = expected['median'] * (1 + baselines.threshold)
+            measured = stats.median
+            for _ in range(CONFIRM_ROUNDS):
+                if measured <= limit:
+                    break
+                measured = min(measured, median_time(func, setup, rounds, iterations))
+            if measured > limit:
+                pytest.fail(f"Regresión de rendimiento en {name}: mediana {measured * 1000:.2f} ms "
+                            f"> {limit * 1000:.2f} ms (baseline {expected['median'] * 1000:.2f} ms "
+                            f"+ {baselines.threshold:.0%})")
+        return result
+
+    return run
@@ -0,0 +1,50 @@
+"""
+benchmarks/synthetic.py - Datos sintéticos de tamaño fijo para los benchmarks
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+
+# Tamaños de datos sintéticos (velas) de los benchmarks
+BENCHMARK_SIZES = [1_000, 10_000, 100_000]
+
+# Rondas por tamaño (con 100k velas algunas etapas tardan segundos por ronda)
+ROUNDS = {1_000: 10, 10_000: 3, 100_000: 1}
+
+
+def synthetic_ohlcv(bars: int, seed: int = 0) -> pd.DataFrame:
+    """Velas M5 sintéticas (paseo aleatorio alrededor de 2000)"""
+    rng = np.random.default_rng(seed)
+    close = 2000 + np.cumsum(rng.normal(0, 1.5, bars))
+    open_ = np.concatenate([[close[0]], close[:-1]]) + rng.normal(0, 0.3, bars)
+    wick = rng.exponential(1.0, (2, bars))
+    index = pd.date_range('2024-01-01', periods=bars, freq='5min', name='timestamp')
+    return pd.DataFrame({
+        'open': open_,
+        'high': np.maximum(open_, close) + wick[0],
+        'low': np.minimum(open_, close) - wick[1],
+        'close': close,
+        'volume': rng.integers(100, 1000, bars).astype(float)
+    }, index=index)
+
+
+def synthetic_events(now_utc: datetime, count: int = 40, seed: int = 0) -> List[Dict]:
+    """Calendario de noticias sintético de un día alrededor de now_utc"""
+    rng = np.random.default_rng(seed)
+    currencies = ['USD', 'EUR', 'GBP', 'JPY', 'AUD']
+    impacts = ['LOW', 'MED', 'HIGH']
+    titles = ['Retail Sales', 'CPI m/m', 'EIA Crude Oil Stocks', 'Fed Chair Speech',
+              'Unemployment Claims', 'PMI', 'Trade Balance']
+    return [
+        {
+            'timestamp_utc': (now_utc + timedelta(minutes=int(offset))).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'currency': currencies[rng.integers(len(currencies))],
+            'impact': impacts[rng.integers(len(impacts))],
+            'title': titles[rng.integers(len(titles))]
+        }
+        for offset in np.sort(rng.integers(-720, 720, count))
+    ]
@@ -0,0 +1,45 @@
+"""
+benchmarks/test_bench_backtest.py - Benchmark de run_backtest sobre data/XAUUSD_*.csv
+"""
+
+import os
+
+import pandas as pd
+import pytest
+
+from backtest.backtest import run_backtest
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+# Últimas velas de cada CSV: run_backtest llama a generate_signal en cada vela
+# base (M5), así que se limita el tramo para que una ronda dure segundos
+BACKTEST_BARS = {
+    'D1': ('XAUUSD_1d.csv', 40),
+    'H4': ('XAUUSD_4h.csv', 60),
+    'H1': ('XAUUSD_1h.csv', 120),
+    'M15': ('XAUUSD_15m.csv', 200),
+    'M5': ('XAUUSD_5m.csv', 300),
+    'M3': ('XAUUSD_3m.csv', 500)
+}
+
+
+def load_csv(name, bars):
+    df = pd.read_csv(os.path.join(DATA_DIR, name))
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    df.set_index('timestamp', inplace=True)
+    return df.tail(bars)
+
+
+@pytest.fixture(scope='module')
+def data_dict():
+    missing = [name for name, _ in BACKTEST_BARS.values()
+               if not os.path.exists(os.path.join(DATA_DIR, name))]
+    if missing:
+        pytest.skip(f"Faltan CSV en data/: {', '.join(missing)}")
+    return {tf: load_csv(name, bars) for tf, (name, bars) in BACKTEST_BARS.items()}
+
+
+def test_run_backtest(bench, data_dict):
+    result = bench(run_backtest, data_dict, rounds=1)
+    assert result is not None
+    assert len(result.equity_curve) == len(data_dict['M5'])
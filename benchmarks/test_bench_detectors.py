@@ -0,0 +1,30 @@
+"""
+benchmarks/test_bench_detectors.py - Benchmarks de los detectores ICT
+"""
+
+import pytest
+
+from benchmarks.synthetic import BENCHMARK_SIZES, ROUNDS, synthetic_ohlcv
+from strategy.ict_utils import detect_swings, detect_bos_choch, detect_liquidity_sweeps
+
+
+@pytest.fixture(scope='module', params=BENCHMARK_SIZES, ids=str)
+def data(request):
+    df = synthetic_ohlcv(request.param)
+    return request.param, df, detect_swings(df, 5)
+
+
+def test_detect_swings(bench, data):
+    bars, df, _ = data
+    highs, lows = bench(detect_swings, df, 5, rounds=ROUNDS[bars])
+    assert highs and lows
+
+
+def test_detect_bos_choch(bench, data):
+    bars, df, (highs, lows) = data
+    assert bench(detect_bos_choch, df, highs, lows, rounds=ROUNDS[bars])
+
+
+def test_detect_liquidity_sweeps(bench, data):
+    bars, df, (highs, lows) = data
+    assert bench(detect_liquidity_sweeps, df, highs, lows, rounds=ROUNDS[bars])
@@ -0,0 +1,20 @@
+"""
+benchmarks/test_bench_news_gate.py - Benchmark del News Risk Gate
+"""
+
+from datetime import datetime
+
+from benchmarks.synthetic import synthetic_events
+from risk.news_gate import should_block_new_entries
+
+NOW_UTC = datetime(2024, 6, 5, 14, 0)
+
+
+def test_should_block_new_entries(bench):
+    events = synthetic_events(NOW_UTC)
+    blocked, mode, reasons, _ = bench(
+        should_block_new_entries, NOW_UTC, 'XAUUSD', events,
+        spread=25.0, atr_ratio=1.2, open_positions_count=1, daily_dd_pct=-1.0, config={},
+        rounds=200
+    )
+    assert mode in ('NORMAL', 'CONSERVATIVE', 'BLOCKED')
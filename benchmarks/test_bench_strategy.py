@@ -0,0 +1,55 @@
+"""
+benchmarks/test_bench_strategy.py - Benchmarks del análisis multi-temporal y la entrada sniper
+"""
+
+import pytest
+
+from benchmarks.synthetic import BENCHMARK_SIZES, ROUNDS, synthetic_ohlcv
+from strategy.ict_hybrid_strategy import ICTHybridStrategy
+
+CONTEXT_TIMEFRAMES = ('D1', 'H4', 'H1', 'M15', 'M5', 'M3')
+
+
+@pytest.fixture(scope='module', params=BENCHMARK_SIZES, ids=str)
+def data(request):
+    return request.param, synthetic_ohlcv(request.param)
+
+
+def fresh_strategy(*args):
+    """Estrategia nueva por ronda: la caché de análisis no se reutiliza entre rondas"""
+    return lambda: ((ICTHybridStrategy(), *args), {})
+
+
+def test_analyze_d1(bench, data):
+    bars, df = data
+    bench(lambda strategy, df: strategy.analyze_D1(df), setup=fresh_strategy(df), rounds=ROUNDS[bars])
+
+
+def test_analyze_h4(bench, data):
+    bars, df = data
+    bench(lambda strategy, df: strategy.analyze_H4(df), setup=fresh_strategy(df), rounds=ROUNDS[bars])
+
+
+def test_analyze_h1(bench, data):
+    bars, df = data
+    bench(lambda strategy, df: strategy.analyze_H1(df), setup=fresh_strategy(df), rounds=ROUNDS[bars])
+
+
+def test_analyze_m15_m5(bench, data):
+    bars, df = data
+    bench(lambda strategy, df: strategy.analyze_M15_M5(df, df),
+          setup=fresh_strategy(df), rounds=ROUNDS[bars])
+
+
+def test_find_sniper_entry(bench, data):
+    bars, df = data
+    bench(lambda strategy, df: strategy.find_sniper_entry(df, df, strategy.context),
+          setup=fresh_strategy(df), rounds=ROUNDS[bars])
+
+
+def test_generate_signal(bench, data):
+    bars, df = data
+    contexto = {tf: df for tf in CONTEXT_TIMEFRAMES}
+    signal = bench(lambda strategy, contexto: strategy.generate_signal(contexto),
+                   setup=fresh_strategy(contexto), rounds=ROUNDS[bars])
+    assert signal['signal'] in ('BUY', 'SELL', 'HOLD')
@@ -136,3 +136,17 @@ HIGH_NEWS_BLOCK_PRE_MINUTES = int(get_env("HIGH_NEWS_BLOCK_PRE_MINUTES", "30"))
 HIGH_NEWS_BLOCK_POST_MINUTES = int(get_env("HIGH_NEWS_BLOCK_POST_MINUTES", "60"))  # Minutos después de evento HIGH
 HIGH_NEWS_COOLDOWN_MINUTES = int(get_env("HIGH_NEWS_COOLDOWN_MINUTES", "30"))  # Cooldown después de evento HIGH
 
+
+# ==================== DESCARGA DE VELAS ====================
+MT5_PARALLEL_FETCH = get_env("MT5_PARALLEL_FETCH", "true").lower() == "true"  # Descarga todos los timeframes del contexto a la vez
+MT5_FETCH_TIMEOUT = float(get_env("MT5_FETCH_TIMEOUT", "5.0"))  # Segundos máximos por descarga (el timeframe se omite en ese ciclo)
+
+# ==================== INSTRUMENTACIÓN ====================
+TIMING_REPORT_INTERVAL = int(get_env("TIMING_REPORT_INTERVAL", "900"))  # Segundos entre líneas de tiempos por etapa (0 = desactivado)
+TIMING_STATS_FILE = get_env("TIMING_STATS_FILE", os.path.join("logs", "timing_stats.json"))  # JSON con p50/p95/max por etapa
+
+# ==================== BASE DE DATOS ====================
+DB_WRITE_BEHIND = get_env("DB_WRITE_BEHIND", "true").lower() == "true"  # Escrituras por lotes en segundo plano
+DB_FLUSH_INTERVAL_MS = int(get_env("DB_FLUSH_INTERVAL_MS", "200"))  # Espera máxima de una escritura a su lote
+DB_MAX_BATCH = int(get_env("DB_MAX_BATCH", "100"))  # Escrituras por lote como máximo
+BOT_STATE_RAW_DAYS = int(get_env("BOT_STATE_RAW_DAYS", "7"))  # Días de bot_state completo (el resto se resume por hora)
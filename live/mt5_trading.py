@@ -158,6 +158,20 @@ NEWS_COOLDOWN_MINUTES = config_module.NEWS_COOLDOWN_MINUTES
 EIA_BLOCK_PRE_MINUTES = config_module.EIA_BLOCK_PRE_MINUTES
 EIA_BLOCK_POST_MINUTES = config_module.EIA_BLOCK_POST_MINUTES
 
+# Instrumentación de tiempos (opcional en config.py)
+TIMING_REPORT_INTERVAL = getattr(config_module, 'TIMING_REPORT_INTERVAL', 900)
+TIMING_STATS_FILE = getattr(config_module, 'TIMING_STATS_FILE', os.path.join('logs', 'timing_stats.json'))
+
+# Escrituras de la base de datos en segundo plano (opcional en config.py)
+DB_WRITE_BEHIND = getattr(config_module, 'DB_WRITE_BEHIND', True)
+DB_FLUSH_INTERVAL_MS = getattr(config_module, 'DB_FLUSH_INTERVAL_MS', 200)
+DB_MAX_BATCH = getattr(config_module, 'DB_MAX_BATCH', 100)
+BOT_STATE_RAW_DAYS = getattr(config_module, 'BOT_STATE_RAW_DAYS', 7)
+
+# Descarga concurrente de los timeframes del contexto (opcional en config.py)
+MT5_PARALLEL_FETCH = getattr(config_module, 'MT5_PARALLEL_FETCH', True)
+MT5_FETCH_TIMEOUT = getattr(config_module, 'MT5_FETCH_TIMEOUT', 5.0)
+
 import MetaTrader5 as mt5
 import pandas as pd
 import numpy as np
@@ -165,11 +179,18 @@ import time
 from datetime import datetime, timedelta, time, timezone
 from typing import Dict, List, Optional
 
+# Tiempos por etapa del ciclo de análisis (línea periódica en el log + JSON)
+from utils.timing import timings
+
+# Velas de MT5 a DataFrame sin copias y descarga concurrente de timeframes
+from utils.mt5_rates import ParallelFetcher, rates_to_frame
+
 # Importar News Risk Gate
 try:
     from news.provider import get_news_provider
     from risk.news_gate import should_block_new_entries
     from utils.indicators import calculate_atr, calculate_atr_ratio
+    should_block_new_entries = timings.timed('news_gate')(should_block_new_entries)
     NEWS_GATE_AVAILABLE = True
 except ImportError as e:
     NEWS_GATE_AVAILABLE = False
@@ -357,37 +378,28 @@ def fetch_candles(symbol: str, timeframe: str, count: int = 500) -> Optional[pd.
     
     # Obtiene las velas desde MT5
     # copy_rates_from_pos obtiene las últimas N velas desde la posición 0 (más reciente)
-    rates = mt5.copy_rates_from_pos(symbol, mt5_timeframe, 0, count)
+    with timings.span('mt5.copy_rates'):
+        rates = mt5.copy_rates_from_pos(symbol, mt5_timeframe, 0, count)
     
     if rates is None or len(rates) == 0:
         print(f"⚠️ No se pudieron obtener velas para {symbol} {timeframe}")
         return None
     
-    # Convierte a DataFrame de pandas
-    df = pd.DataFrame(rates)
-    
-    # Convierte el timestamp a datetime
-    df['time'] = pd.to_datetime(df['time'], unit='s')
-    df.set_index('time', inplace=True)
-    
-    # Renombra columnas para que coincidan con nuestro formato
-    df.rename(columns={
-        'open': 'open',
-        'high': 'high',
-        'low': 'low',
-        'close': 'close',
-        'tick_volume': 'volume'
-    }, inplace=True)
-    
-    # Asegura que tenga todas las columnas necesarias
-    required_cols = ['open', 'high', 'low', 'close', 'volume']
-    if not all(col in df.columns for col in required_cols):
+    # Convierte a DataFrame de pandas directamente sobre los campos del array
+    # (open/high/low/close y tick_volume como 'volume', índice 'time')
+    df = rates_to_frame(rates)
+    if df is None:
         print(f"⚠️ Faltan columnas en los datos de {symbol} {timeframe}")
         return None
     
-    return df[required_cols]
+    return df
+
 
+# Pool de hilos para descargar los timeframes del contexto a la vez
+candle_fetcher = ParallelFetcher(max_workers=7)
 
+
+@timings.timed('context')
 def build_multitimeframe_context(symbol: str = None) -> Dict[str, pd.DataFrame]:
     """
     Construye el contexto multi-temporal obteniendo datos de todos los timeframes.
@@ -418,12 +430,7 @@ def build_multitimeframe_context(symbol: str = None) -> Dict[str, pd.DataFrame]:
     """
     symbol = symbol or MT5_SYMBOL
     
-    # Forzar flush antes de imprimir
-    sys.stdout.flush()
-    sys.stderr.flush()
-    
     print(f"📊 Obteniendo datos multi-temporales para {symbol}...", flush=True)
-    sys.stdout.flush()
     
     # Timeframes a obtener (de mayor a menor)
     timeframes = ["D1", "H4", "H1", "M15", "M5", "M3", "M1"]
@@ -440,20 +447,28 @@ def build_multitimeframe_context(symbol: str = None) -> Dict[str, pd.DataFrame]:
         "M1": 500
     }
     
-    context = {}
+    calls = {tf: (symbol, tf, counts.get(tf, 500)) for tf in timeframes}
+    timed_out = []
+    if MT5_PARALLEL_FETCH:
+        # Todas las descargas a la vez: el contexto tarda lo que la más lenta
+        frames, timed_out = candle_fetcher.fetch_all(fetch_candles, calls, MT5_FETCH_TIMEOUT)
+    else:
+        frames = {tf: fetch_candles(*args) for tf, args in calls.items()}
     
+    context = {}
+    lines = []
     for tf in timeframes:
-        df = fetch_candles(symbol, tf, counts.get(tf, 500))
+        df = frames.get(tf)
         if df is not None and len(df) > 10:
             context[tf] = df
-            print(f"   ✓ {tf}: {len(df)} velas", flush=True)
-            sys.stdout.flush()
+            lines.append(f"   ✓ {tf}: {len(df)} velas")
+        elif tf in timed_out:
+            lines.append(f"   ⚠️ {tf}: MT5 no respondió en {MT5_FETCH_TIMEOUT:.0f}s")
         else:
-            print(f"   ⚠️ {tf}: No se pudieron obtener datos suficientes", flush=True)
-            sys.stdout.flush()
+            lines.append(f"   ⚠️ {tf}: No se pudieron obtener datos suficientes")
     
-    print(f"✓ Contexto construido con {len(context)} timeframes", flush=True)
-    sys.stdout.flush()
+    lines.append(f"✓ Contexto construido con {len(context)} timeframes")
+    print("\n".join(lines), flush=True)
     return context
 
 
@@ -556,6 +571,7 @@ def calculate_lot_size(balance: float, risk_pct: float, entry_price: float,
     return lot_size
 
 
+@timings.timed('order_send')
 def send_order(direction: str, entry_price: float, stop_loss: float,
               take_profit: float, lot_size: float, symbol: str = None,
               comment: str = "ICT Strategy") -> Optional[int]:
@@ -683,6 +699,33 @@ def get_current_spread(symbol: str = None) -> float:
     return 0.0
 
 
+def get_candle_close_latency(context: Dict[str, pd.DataFrame], symbol: str = None) -> Optional[float]:
+    """
+    Segundos desde el cierre de la última vela cerrada hasta ahora.
+    
+    Usa el timeframe más bajo del contexto: copy_rates_from_pos incluye la
+    vela en formación, cuya apertura es el cierre de la última vela cerrada.
+    Se compara con la hora del último tick (hora del servidor, como las velas).
+    
+    Args:
+        context: Contexto multi-temporal de build_multitimeframe_context()
+        symbol: Símbolo (default: MT5_SYMBOL)
+    
+    Returns:
+        Latencia en segundos o None si no hay datos
+    """
+    symbol = symbol or MT5_SYMBOL
+    for tf in ("M1", "M3", "M5"):
+        if tf in context and len(context[tf]) > 0:
+            tick = mt5.symbol_info_tick(symbol)
+            if not tick:
+                return None
+            tick_time = getattr(tick, 'time_msc', tick.time * 1000) / 1000
+            return tick_time - context[tf].index[-1].timestamp()
+    return None
+
+
+@timings.timed('atr_ratio')
 def get_atr_ratio(symbol: str = None, period: int = 14, lookback: int = 50) -> float:
     """
     Calcula el ratio ATR actual / ATR promedio.
@@ -726,6 +769,7 @@ def get_atr_ratio(symbol: str = None, period: int = 14, lookback: int = 50) -> f
         return 1.0
 
 
+@timings.timed('mt5.positions')
 def update_open_positions(symbol: str = None) -> List[Dict]:
     """
     Obtiene y muestra información de todas las posiciones abiertas.
@@ -867,7 +911,9 @@ def run_auto_trading_loop(analysis_interval: int = 300, update_interval: int = 6
     db = None
     if TradingDatabase:
         try:
-            db = TradingDatabase()
+            db = TradingDatabase(write_behind=DB_WRITE_BEHIND,
+                                 flush_interval=DB_FLUSH_INTERVAL_MS / 1000,
+                                 max_batch=DB_MAX_BATCH)
             if logger:
                 logger.info("✅ Base de datos inicializada")
         except Exception as e:
@@ -929,7 +975,7 @@ def run_auto_trading_loop(analysis_interval: int = 300, update_interval: int = 6
                 try:
                     test_success = telegram.send_message("🧪 Mensaje de prueba - Bot iniciado correctamente")
                     if test_success:
-                        print("✅ Mensaje de prueba enviado a Telegram", flush=True)
+                        print("✅ Mensaje de prueba encolado para Telegram", flush=True)
                     else:
                         print("⚠️ No se pudo enviar mensaje de prueba a Telegram", flush=True)
                         if logger:
@@ -994,7 +1040,8 @@ def run_auto_trading_loop(analysis_interval: int = 300, update_interval: int = 6
     start_time = datetime.now()
     
     # 2. Inicializa la estrategia
-    strategy = ICTHybridStrategy()
+    # (modo incremental: cada ciclo solo procesa las velas nuevas de cada timeframe)
+    strategy = ICTHybridStrategy(incremental=True)
     
     # Asignar pivots_manager al contexto de la estrategia
     if pivots_manager:
@@ -1048,6 +1095,9 @@ def run_auto_trading_loop(analysis_interval: int = 300, update_interval: int = 6
                 print("=" * 70, flush=True)
                 sys.stdout.flush()
                 
+                # Mide desde el inicio del análisis hasta tener la señal
+                analysis_span = timings.start('cycle.to_signal')
+                
                 # ========== NEWS RISK GATE ==========
                 # Verifica condiciones de mercado antes de generar señales
                 blocked_by_news = False
@@ -1060,7 +1110,8 @@ def run_auto_trading_loop(analysis_interval: int = 300, update_interval: int = 6
                         # Obtener eventos del día
                         news_provider = get_news_provider()
                         today_utc = datetime.now(timezone.utc).date()
-                        events_today = news_provider.get_events_for_day(today_utc)
+                        with timings.span('news.events'):
+                            events_today = news_provider.get_events_for_day(today_utc)
                         
                         # Calcular métricas de mercado
                         current_spread = get_current_spread(MT5_SYMBOL)
@@ -1231,7 +1282,12 @@ def run_auto_trading_loop(analysis_interval: int = 300, update_interval: int = 6
                     strategy.context.symbol = MT5_SYMBOL
                 
                 # Genera señal usando la estrategia
-                signal = strategy.generate_signal(context)
+                with timings.span('signal'):
+                    signal = strategy.generate_signal(context)
+                analysis_span.stop()
+                candle_latency = get_candle_close_latency(context)
+                if candle_latency is not None:
+                    timings.record('latency.candle_to_signal', candle_latency)
                 
                 # Forzar flush después del análisis
                 sys.stdout.flush()
@@ -1335,7 +1391,8 @@ def run_auto_trading_loop(analysis_interval: int = 300, update_interval: int = 6
                                     try:
                                         news_provider = get_news_provider()
                                         today_utc = datetime.now(timezone.utc).date()
-                                        events_today = news_provider.get_events_for_day(today_utc)
+                                        with timings.span('news.events'):
+                                            events_today = news_provider.get_events_for_day(today_utc)
                                         current_spread = get_current_spread(MT5_SYMBOL)
                                         atr_ratio = get_atr_ratio(MT5_SYMBOL)
                                         open_positions_check = update_open_positions(MT5_SYMBOL)
@@ -1424,6 +1481,10 @@ def run_auto_trading_loop(analysis_interval: int = 300, update_interval: int = 6
                                         )
                                         
                                         if ticket:
+                                            candle_latency = get_candle_close_latency(context)
+                                            if candle_latency is not None:
+                                                timings.record('latency.candle_to_order', candle_latency)
+                                            
                                             # Guarda el trade en la base de datos
                                             if db:
                                                 try:
@@ -1482,11 +1543,7 @@ def run_auto_trading_loop(analysis_interval: int = 300, update_interval: int = 6
                                             # Marcar en base de datos
                                             if db:
                                                 try:
-                                                    db.conn.execute(
-                                                        "UPDATE signals SET rejection_reason = ? WHERE id = ?",
-                                                        ("Error al ejecutar orden en MT5", signal_id)
-                                                    )
-                                                    db.conn.commit()
+                                                    db.set_signal_rejection_reason(signal_id, "Error al ejecutar orden en MT5")
                                                 except Exception as e:
                                                     if logger:
                                                         logger.warning(f"Error al actualizar señal en BD: {e}")
@@ -1749,6 +1806,24 @@ def run_auto_trading_loop(analysis_interval: int = 300, update_interval: int = 6
                 sys.stderr.flush()
                 last_status_time = current_time
             
+            # Retención de bot_state: resume por hora el histórico antiguo una vez al día
+            last_db_compaction = getattr(run_auto_trading_loop, 'last_db_compaction', None)
+            if db and (last_db_compaction is None or 
+                (current_time - last_db_compaction).total_seconds() >= 86400):  # Cada 24 horas
+                try:
+                    with timings.span('db.compact_bot_state'):
+                        compaction = db.compact_bot_state(BOT_STATE_RAW_DAYS)
+                    if logger:
+                        logger.info(f"🗜️ bot_state compactado: {compaction['compacted_rows']} filas -> "
+                                    f"{compaction['hours']} horas, {compaction['freed_pages']} páginas liberadas")
+                except Exception as e:
+                    if logger:
+                        logger.warning(f"Error al compactar bot_state: {e}")
+                run_auto_trading_loop.last_db_compaction = current_time
+            
+            # Línea de tiempos por etapa en el log y JSON de estadísticas
+            timings.maybe_report(TIMING_REPORT_INTERVAL, logger, TIMING_STATS_FILE)
+            
             # Forzar flush antes de esperar
             sys.stdout.flush()
             sys.stderr.flush()
@@ -1838,6 +1913,24 @@ def run_auto_trading_loop(analysis_interval: int = 300, update_interval: int = 6
                 if logger:
                     logger.warning(f"Error al generar reporte final: {e}")
         
+        # Guarda las estadísticas de tiempos de la sesión
+        try:
+            timings.report(logger, TIMING_STATS_FILE)
+        except Exception as e:
+            if logger:
+                logger.warning(f"No se pudieron guardar las estadísticas de tiempos: {e}")
+        
+        # Envía los mensajes de Telegram pendientes y detiene el hilo de envío
+        if telegram:
+            try:
+                telegram.close(timeout=15)
+            except Exception as e:
+                if logger:
+                    logger.warning(f"Error al cerrar Telegram: {e}")
+        
+        # Detiene el pool de descargas de velas
+        candle_fetcher.close()
+        
         # Cierra conexión con MT5
         if logger:
             logger.info("Cerrando conexión con MT5")
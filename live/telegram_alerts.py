@@ -2,10 +2,19 @@
 live/telegram_alerts.py - Sistema de Alertas de Telegram
 
 Envía notificaciones al bot de Telegram cuando ocurren eventos importantes.
+
+Los mensajes se encolan y los envía un hilo en segundo plano (sesión HTTP
+reutilizada, reintentos con backoff y límite de mensajes por segundo del
+chat), así que los send_* vuelven al instante y una API de Telegram lenta
+no retrasa las órdenes ni la gestión de posiciones.
 """
 
+import threading
+import time
 import requests
-from typing import Dict, Optional
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional
 from datetime import datetime
 
 # Importar logger si está disponible
@@ -14,6 +23,136 @@ try:
 except ImportError:
     logger = None
 
+from utils.timing import timings
+
+
+# Prioridades de los mensajes (menor = se envía antes)
+PRIORITY_HIGH = 0      # Trades, errores, parada del bot
+PRIORITY_NORMAL = 1    # Alertas de riesgo, News Gate
+PRIORITY_LOW = 2       # Reportes, métricas, condiciones de mercado
+
+# Cola de salida
+MAX_QUEUE_SIZE = 100          # Mensajes pendientes como máximo
+LOW_PRIORITY_BACKLOG = 20     # Con más pendientes, los de prioridad baja se descartan
+
+# Entrega
+MIN_SEND_INTERVAL = 1.0       # Segundos entre mensajes al mismo chat (límite de Telegram)
+SEND_TIMEOUT = 10             # Timeout de cada petición HTTP
+MAX_RETRIES = 3               # Reintentos por mensaje (errores de red, 429 y 5xx)
+RETRY_BACKOFF = 2.0           # Espera base entre reintentos (se duplica en cada uno)
+
+
+@dataclass
+class OutgoingMessage:
+    """Mensaje pendiente de envío"""
+    text: str
+    parse_mode: str = "HTML"
+    priority: int = PRIORITY_NORMAL
+    coalesce_key: Optional[str] = None
+    queued_at: float = field(default_factory=time.monotonic)
+
+
+class TelegramOutbox:
+    """
+    Cola acotada de mensajes con prioridades, segura entre hilos.
+    
+    - get() devuelve primero los de mayor prioridad (FIFO dentro de cada una)
+    - Un mensaje con coalesce_key sustituye al pendiente con la misma clave
+      (solo se envía el estado más reciente, p. ej. condiciones de mercado)
+    - Con backlog, los mensajes de prioridad baja se descartan; con la cola
+      llena, se descarta el pendiente más antiguo de menor prioridad que el nuevo
+    """
+    
+    def __init__(self, maxsize: int = MAX_QUEUE_SIZE, low_priority_backlog: int = LOW_PRIORITY_BACKLOG):
+        self.maxsize = maxsize
+        self.low_priority_backlog = low_priority_backlog
+        self.queues: List[Deque[OutgoingMessage]] = [deque() for _ in (PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW)]
+        self.unfinished = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.closed = False
+        self._cond = threading.Condition()
+    
+    def __len__(self) -> int:
+        return sum(len(q) for q in self.queues)
+    
+    def put(self, message: OutgoingMessage) -> bool:
+        """
+        Encola un mensaje sin bloquear.
+        
+        Returns:
+            True si quedó encolado (o sustituyó a uno pendiente), False si se descartó
+        """
+        with self._cond:
+            if self.closed:
+                return False
+            
+            if message.coalesce_key is not None:
+                for queue in self.queues:
+                    for i, pending in enumerate(queue):
+                        if pending.coalesce_key == message.coalesce_key:
+                            del queue[i]
+                            self.queues[message.priority].append(message)
+                            self.coalesced += 1
+                            self._cond.notify()
+                            return True
+            
+            pending_count = len(self)
+            if message.priority == PRIORITY_LOW and pending_count >= self.low_priority_backlog:
+                self.dropped += 1
+                return False
+            
+            if pending_count >= self.maxsize:
+                # Hace sitio descartando el más antiguo de menor prioridad
+                for queue in reversed(self.queues[message.priority + 1:]):
+                    if queue:
+                        queue.popleft()
+                        self.unfinished -= 1
+                        self.dropped += 1
+                        break
+                else:
+                    self.dropped += 1
+                    return False
+            
+            self.queues[message.priority].append(message)
+            self.unfinished += 1
+            self._cond.notify()
+            return True
+    
+    def get(self, timeout: Optional[float] = None) -> Optional[OutgoingMessage]:
+        """Siguiente mensaje (espera hasta timeout; None si no hay o la cola está cerrada y vacía)"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.closed or len(self) > 0, timeout):
+                return None
+            for queue in self.queues:
+                if queue:
+                    return queue.popleft()
+            return None
+    
+    def task_done(self) -> None:
+        """Marca como procesado (enviado o no) un mensaje obtenido con get()"""
+        with self._cond:
+            self.unfinished -= 1
+            self._cond.notify_all()
+    
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Espera a que todos los mensajes encolados estén procesados"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.unfinished <= 0, timeout)
+    
+    def clear(self) -> None:
+        with self._cond:
+            for queue in self.queues:
+                self.unfinished -= len(queue)
+                queue.clear()
+            self._cond.notify_all()
+    
+    def close(self) -> None:
+        """No acepta más mensajes; get() devuelve los pendientes y luego None"""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
 
 class TelegramAlerts:
     """
@@ -27,90 +166,203 @@ class TelegramAlerts:
     - Se realiza un cierre parcial
     - Hay métricas importantes
     - Hay errores críticos
+    
+    Con background=True (por defecto) los mensajes se envían desde un hilo:
+    send_message() y los send_* devuelven True si el mensaje quedó encolado.
     """
     
-    def __init__(self, bot_token: str, chat_id: str):
+    def __init__(self, bot_token: str, chat_id: str, background: bool = True):
         """
         Inicializa el sistema de alertas de Telegram.
         
         Args:
             bot_token: Token del bot de Telegram (obtenido de @BotFather)
             chat_id: ID del chat donde enviar mensajes (tu ID o ID del grupo)
+            background: Si True, verifica el bot y envía los mensajes en un hilo
+                        (no bloquea); si False, todo es síncrono
         """
         self.bot_token = bot_token
         self.chat_id = chat_id
         self.base_url = f"https://api.telegram.org/bot{bot_token}"
         self.enabled = bool(bot_token and chat_id)
+        self.background = background
+        self.session = requests.Session()
+        self.outbox = TelegramOutbox()
+        self.last_sent_at: Optional[float] = None
+        self._worker: Optional[threading.Thread] = None
         
         if self.enabled:
-            try:
-                # Verifica que el bot funciona
-                response = requests.get(f"{self.base_url}/getMe", timeout=5)
-                if response.status_code == 200:
-                    bot_info = response.json()
-                    if bot_info.get("ok"):
-                        bot_username = bot_info['result'].get('username', 'Unknown')
-                        if logger:
-                            logger.info(f"✅ Telegram bot conectado: @{bot_username}")
-                        print(f"✅ Telegram bot conectado: @{bot_username}")
-                    else:
-                        if logger:
-                            logger.warning("⚠️ Token de Telegram inválido")
-                        print("⚠️ Token de Telegram inválido")
-                        self.enabled = False
+            if background:
+                self._worker = threading.Thread(target=self._run_worker, name="telegram-sender", daemon=True)
+                self._worker.start()
+            else:
+                self.verify()
+    
+    def verify(self) -> bool:
+        """
+        Verifica el token con getMe (deshabilita las alertas si falla).
+        
+        Returns:
+            True si el bot responde correctamente
+        """
+        try:
+            # Verifica que el bot funciona
+            response = self.session.get(f"{self.base_url}/getMe", timeout=5)
+            if response.status_code == 200:
+                bot_info = response.json()
+                if bot_info.get("ok"):
+                    bot_username = bot_info['result'].get('username', 'Unknown')
+                    if logger:
+                        logger.info(f"✅ Telegram bot conectado: @{bot_username}")
+                    print(f"✅ Telegram bot conectado: @{bot_username}")
+                    return True
                 else:
                     if logger:
-                        logger.warning("⚠️ No se pudo conectar con Telegram")
-                    print("⚠️ No se pudo conectar con Telegram")
-                    self.enabled = False
-            except Exception as e:
+                        logger.warning("⚠️ Token de Telegram inválido")
+                    print("⚠️ Token de Telegram inválido")
+            else:
                 if logger:
-                    logger.warning(f"⚠️ Error al verificar Telegram: {e}")
-                print(f"⚠️ Error al verificar Telegram: {e}")
-                self.enabled = False
+                    logger.warning("⚠️ No se pudo conectar con Telegram")
+                print("⚠️ No se pudo conectar con Telegram")
+        except Exception as e:
+            if logger:
+                logger.warning(f"⚠️ Error al verificar Telegram: {e}")
+            print(f"⚠️ Error al verificar Telegram: {e}")
+        self.enabled = False
+        return False
     
-    def send_message(self, message: str, parse_mode: str = "HTML") -> bool:
+    def _run_worker(self) -> None:
+        """Hilo de envío: verifica el bot y vacía la cola respetando el límite del chat"""
+        if not self.verify():
+            self.outbox.close()
+            self.outbox.clear()
+            return
+        
+        while True:
+            message = self.outbox.get()
+            if message is None:
+                if self.outbox.closed:
+                    return
+                continue
+            
+            # Límite de mensajes por segundo al mismo chat
+            if self.last_sent_at is not None:
+                wait = MIN_SEND_INTERVAL - (time.monotonic() - self.last_sent_at)
+                if wait > 0:
+                    time.sleep(wait)
+            
+            timings.record('telegram.queue_wait', time.monotonic() - message.queued_at)
+            try:
+                self.deliver(message.text, message.parse_mode)
+            finally:
+                self.last_sent_at = time.monotonic()
+                self.outbox.task_done()
+    
+    def send_message(self, message: str, parse_mode: str = "HTML",
+                     priority: int = PRIORITY_NORMAL, coalesce_key: Optional[str] = None) -> bool:
         """
-        Envía un mensaje a Telegram.
+        Envía un mensaje a Telegram (lo encola si el envío es en segundo plano).
         
         Args:
             message: Mensaje a enviar
             parse_mode: Modo de parseo (HTML o Markdown)
+            priority: PRIORITY_HIGH, PRIORITY_NORMAL o PRIORITY_LOW
+            coalesce_key: Si hay un mensaje pendiente con la misma clave, se sustituye
         
         Returns:
-            True si se envió exitosamente, False en caso contrario
+            True si se envió (o encoló) exitosamente, False en caso contrario
         """
         if not self.enabled:
             return False
         
-        try:
-            url = f"{self.base_url}/sendMessage"
-            data = {
-                "chat_id": self.chat_id,
-                "text": message,
-                "parse_mode": parse_mode
-            }
-            
-            response = requests.post(url, json=data, timeout=10)
-            
-            if response.status_code == 200:
-                result = response.json()
-                if result.get("ok"):
-                    return True
-                else:
+        if not self.background:
+            return self.deliver(message, parse_mode)
+        
+        queued = self.outbox.put(OutgoingMessage(message, parse_mode, priority, coalesce_key))
+        if not queued and logger:
+            if not self.enabled:
+                logger.warning("⚠️ Telegram deshabilitado (falló la verificación del bot): mensaje descartado")
+            elif self.outbox.closed:
+                logger.warning("⚠️ Telegram cerrado: mensaje descartado")
+            else:
+                logger.warning(f"⚠️ Cola de Telegram llena: mensaje descartado ({len(self.outbox)} pendientes)")
+        return queued
+    
+    @timings.timed('telegram.send')
+    def deliver(self, message: str, parse_mode: str = "HTML") -> bool:
+        """
+        Envía un mensaje a Telegram de forma síncrona, con reintentos.
+        
+        Reintenta errores de red, 429 (respetando retry_after) y 5xx con
+        backoff exponencial; el resto de errores no se reintenta.
+        
+        Args:
+            message: Mensaje a enviar
+            parse_mode: Modo de parseo (HTML o Markdown)
+        
+        Returns:
+            True si se envió exitosamente, False en caso contrario
+        """
+        url = f"{self.base_url}/sendMessage"
+        data = {
+            "chat_id": self.chat_id,
+            "text": message,
+            "parse_mode": parse_mode
+        }
+        
+        for attempt in range(MAX_RETRIES + 1):
+            delay = RETRY_BACKOFF * 2 ** attempt
+            try:
+                response = self.session.post(url, json=data, timeout=SEND_TIMEOUT)
+                
+                if response.status_code == 200:
+                    result = response.json()
+                    if result.get("ok"):
+                        return True
                     error_desc = result.get('description', 'Unknown error')
                     if logger:
                         logger.warning(f"⚠️ Error Telegram: {error_desc}")
                     return False
-            else:
-                if logger:
-                    logger.warning(f"⚠️ Error HTTP Telegram: {response.status_code}")
-                return False
                 
-        except Exception as e:
-            if logger:
-                logger.error(f"❌ Error al enviar mensaje a Telegram: {e}")
-            return False
+                if response.status_code == 429:
+                    try:
+                        delay = float(response.json().get('parameters', {}).get('retry_after', delay))
+                    except ValueError:
+                        pass
+                elif response.status_code < 500:
+                    if logger:
+                        logger.warning(f"⚠️ Error HTTP Telegram: {response.status_code}")
+                    return False
+                error = f"HTTP {response.status_code}"
+            except requests.RequestException as e:
+                error = str(e)
+            
+            if attempt < MAX_RETRIES:
+                if logger:
+                    logger.warning(f"⚠️ Telegram no disponible ({error}), reintento en {delay:.0f}s")
+                time.sleep(delay)
+        
+        if logger:
+            logger.error(f"❌ Error al enviar mensaje a Telegram tras {MAX_RETRIES} reintentos: {error}")
+        return False
+    
+    def flush(self, timeout: float = 10.0) -> bool:
+        """
+        Espera a que se envíen los mensajes pendientes.
+        
+        Returns:
+            True si se procesaron todos antes del timeout
+        """
+        return self.outbox.join(timeout)
+    
+    def close(self, timeout: float = 10.0) -> None:
+        """Envía los mensajes pendientes (hasta timeout) y detiene el hilo de envío"""
+        self.outbox.close()
+        if self._worker is not None:
+            self._worker.join(timeout)
+            if self._worker.is_alive() and logger:
+                logger.warning(f"⚠️ Telegram: {len(self.outbox)} mensajes sin enviar al cerrar")
+        self.session.close()
     
     def send_signal_alert(self, signal: Dict) -> bool:
         """
@@ -169,7 +421,7 @@ class TelegramAlerts:
 ⏰ {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 """
         
-        return self.send_message(message)
+        return self.send_message(message, priority=PRIORITY_HIGH)
     
     def send_trade_closed(self, ticket: int, pnl: float, pnl_pct: float, 
                          exit_reason: str) -> bool:
@@ -195,7 +447,7 @@ class TelegramAlerts:
 ⏰ {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 """
         
-        return self.send_message(message)
+        return self.send_message(message, priority=PRIORITY_HIGH)
     
     def send_position_update(self, action: str, ticket: int, details: str = "") -> bool:
         """
@@ -233,7 +485,7 @@ class TelegramAlerts:
         
         message += f"\n⏰ {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
         
-        return self.send_message(message)
+        return self.send_message(message, priority=PRIORITY_HIGH)
     
     def send_metrics(self, metrics: Dict) -> bool:
         """
@@ -266,7 +518,7 @@ class TelegramAlerts:
 ⏰ {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 """
         
-        return self.send_message(message)
+        return self.send_message(message, priority=PRIORITY_LOW, coalesce_key="metrics")
     
     def send_error(self, error_message: str) -> bool:
         """
@@ -283,7 +535,7 @@ class TelegramAlerts:
 ⏰ {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 """
         
-        return self.send_message(message)
+        return self.send_message(message, priority=PRIORITY_HIGH)
     
     def send_daily_report(self, report: Dict) -> bool:
         """
@@ -428,7 +680,7 @@ class TelegramAlerts:
 ⏰ {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 """
         
-        return self.send_message(message)
+        return self.send_message(message, priority=PRIORITY_LOW)
     
     def send_operations_report(self, db, include_open_positions: bool = True, current_positions: list = None) -> bool:
         """
@@ -670,7 +922,7 @@ class TelegramAlerts:
                     message += f"   {pnl_emoji} P&L No Realizado: ${unrealized_pnl:.2f}\n"
                     message += f"   📊 Entrada: ${pos.get('entry_price', 0):.2f} | Actual: ${pos.get('current_price', 0):.2f} | SL: ${pos.get('stop_loss', 0):.2f} | TP: ${pos.get('take_profit', 0):.2f}\n"
             
-            return self.send_message(message)
+            return self.send_message(message, priority=PRIORITY_LOW, coalesce_key="hourly_report")
         except Exception as e:
             if logger:
                 logger.error(f"Error al generar reporte horario: {e}", exc_info=True)
@@ -701,7 +953,7 @@ class TelegramAlerts:
         
         message += f"\n🤖 El bot está operando y monitoreando el mercado..."
         
-        return self.send_message(message)
+        return self.send_message(message, priority=PRIORITY_HIGH)
     
     def send_bot_stopped(self, reason: str = "Usuario", uptime: str = None) -> bool:
         """
@@ -732,7 +984,7 @@ class TelegramAlerts:
         
         message += f"\n\n✅ El bot se ha cerrado correctamente"
         
-        return self.send_message(message)
+        return self.send_message(message, priority=PRIORITY_HIGH)
     
     def send_news_gate_blocked(self, reasons: list, mode: str, cooldown_until: str = None) -> bool:
         """
@@ -759,7 +1011,7 @@ class TelegramAlerts:
         
         message += f"\n\n⏰ {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
         
-        return self.send_message(message)
+        return self.send_message(message, coalesce_key="news_gate")
     
     def send_market_conditions_alert(self, spread: float, spread_max: float, 
                                      atr_ratio: float, atr_max: float) -> bool:
@@ -790,7 +1042,7 @@ class TelegramAlerts:
         
         message += f"\n⏰ {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
         
-        return self.send_message(message)
+        return self.send_message(message, priority=PRIORITY_LOW, coalesce_key="market_conditions")
     
     def send_drawdown_alert(self, drawdown_pct: float, limit: float) -> bool:
         """
@@ -819,7 +1071,7 @@ class TelegramAlerts:
         
         message += f"\n⏰ {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
         
-        return self.send_message(message)
+        return self.send_message(message, coalesce_key="drawdown")
     
     def send_losing_streak_alert(self, losing_streak: int, max_streak: int = 3) -> bool:
         """
@@ -881,7 +1133,7 @@ class TelegramAlerts:
         
         message += f"\n⏰ {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
         
-        return self.send_message(message)
+        return self.send_message(message, priority=PRIORITY_LOW)
     
     def send_upcoming_news_alert(self, event: Dict, minutes_until: int) -> bool:
         """
@@ -907,7 +1159,7 @@ class TelegramAlerts:
 ⏰ {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 """
         
-        return self.send_message(message)
+        return self.send_message(message, priority=PRIORITY_LOW)
     
     def send_weekly_report(self, report: Dict) -> bool:
         """
@@ -949,7 +1201,7 @@ class TelegramAlerts:
 ⏰ {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 """
         
-        return self.send_message(message)
+        return self.send_message(message, priority=PRIORITY_LOW)
     
     def send_connection_lost_alert(self, component: str, error: str = None) -> bool:
         """
@@ -970,7 +1222,7 @@ class TelegramAlerts:
         message += f"\n🔄 <b>El bot intentará reconectar...</b>"
         message += f"\n\n⏰ {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
         
-        return self.send_message(message)
+        return self.send_message(message, priority=PRIORITY_HIGH)
     
     def send_high_risk_alert(self, open_positions: int, max_positions: int, 
                             total_exposure: float = None) -> bool:
@@ -1002,5 +1254,5 @@ class TelegramAlerts:
         
         message += f"\n⏰ {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
         
-        return self.send_message(message)
+        return self.send_message(message, coalesce_key="high_risk")
 
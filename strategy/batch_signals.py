@@ -0,0 +1,300 @@
+"""
+strategy/batch_signals.py - Evaluación vectorizada de la entrada sniper
+
+find_sniper_entry evalúa una sola vela: vuelve a detectar swings, barridas,
+bloques y BOS/CHoCH sobre todo el DataFrame M3 hasta esa vela. En un
+backtest eso se repite en cada vela (O(n²) en total).
+
+evaluate_sniper_batch calcula para todas las velas a la vez lo que
+find_sniper_entry vería con los datos hasta cada una:
+- Los swings se detectan una vez sobre todo el DataFrame; el swing de la
+  vela j se conoce desde la vela j + lookback (necesita velas a su derecha)
+- Cada barrida y cada mitigación es un intervalo de velas en el que cuenta
+  como confirmación reciente; los intervalos se expanden con np.repeat
+- Los BOS después de la barrida se buscan con el mínimo/máximo acumulado de
+  los swings conocidos en cada vela (searchsorted)
+
+Solo el ajuste del TP final al próximo swing se hace vela a vela, y solo en
+las velas con señal. Las señales coinciden con las de find_sniper_entry
+(sin la confluencia con pivots diarios, que solo existe en vivo).
+"""
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from strategy.ict_utils import (
+    detect_swings, detect_blocks_array, FirstTouchResolver, BlockType,
+    BLOCK_TYPE_CODES, TrendDirection, _first_broken_swing, _sweep_bars
+)
+from utils.indicators import calculate_rsi
+
+
+# Confirmaciones (columnas booleanas) en el orden de find_sniper_entry
+SIGNAL_FLAG_COLUMNS = ['sweep', 'mitigation', 'bos_choch', 'institutional_candle', 'rsi_divergence']
+
+SIGNAL_COLUMNS = ['signal', 'direction', 'score'] + SIGNAL_FLAG_COLUMNS + [
+    'entry_price', 'stop_loss', 'take_profit_1', 'take_profit_2', 'take_profit_final', 'risk_reward'
+]
+
+MIN_BARS = 50               # Velas mínimas para buscar entrada
+RECENT_BARS = 10            # Barridas y bloques "recientes"
+SWEEP_BARS = 20             # Velas que necesita un swing para buscar su barrida
+MITIGATION_TOLERANCE = 0.001
+
+
+def _take(values: np.ndarray, positions: np.ndarray, fill) -> np.ndarray:
+    """values[positions], con fill donde positions < 0"""
+    if len(values) == 0:
+        return np.full(len(positions), fill)
+    return np.where(positions >= 0, values[np.maximum(positions, 0)], fill)
+
+
+def _last_active(start: np.ndarray, stop: np.ndarray, n: int) -> np.ndarray:
+    """
+    Para cada vela t, el último intervalo (en el orden de los arrays) con
+    start <= t <= stop.
+
+    Returns:
+        Array int64 (n) con la posición del intervalo (-1 = ninguno)
+    """
+    result = np.full(n, -1, dtype=np.int64)
+    start = np.maximum(start, 0)
+    stop = np.minimum(stop, n - 1)
+    active = np.flatnonzero(start <= stop)
+    if len(active) == 0:
+        return result
+
+    lengths = stop[active] - start[active] + 1
+    owner = np.repeat(active, lengths)
+    offsets = np.arange(len(owner)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    bars = start[owner] + offsets
+
+    # Orden por vela y, dentro de cada vela, por posición del intervalo
+    order = np.lexsort((owner, bars))
+    bars, owner = bars[order], owner[order]
+    last = np.append(bars[1:] != bars[:-1], True)
+    result[bars[last]] = owner[last]
+    return result
+
+
+def _first_break_bar(values: np.ndarray, swings, swing_idx: np.ndarray,
+                     lookback: int, bullish: bool) -> int:
+    """Primera vela en la que detect_bos_choch ya ve algún BOS de esa dirección (n = nunca)"""
+    bars, positions = _first_broken_swing(values, swings, bullish=bullish)
+    if len(bars) == 0:
+        return len(values)
+    # La ruptura en la vela i del swing k se ve cuando el swing ya está confirmado
+    return int(np.maximum(bars, swing_idx[positions] + lookback).min())
+
+
+def _d1_bearish(d1_trend, n: int) -> np.ndarray:
+    """Máscara de velas con tendencia D1 bajista (d1_trend escalar o alineado con las velas)"""
+    if d1_trend is None or isinstance(d1_trend, TrendDirection):
+        return np.full(n, d1_trend == TrendDirection.BEARISH)
+    return np.fromiter((trend == TrendDirection.BEARISH for trend in d1_trend), dtype=bool, count=n)
+
+
+def evaluate_sniper_batch(data: pd.DataFrame, params, d1_trend=None) -> pd.DataFrame:
+    """
+    Evalúa la entrada sniper de find_sniper_entry en todas las velas a la vez.
+
+    La fila t equivale a find_sniper_entry(data.iloc[:t + 1], ...) con la
+    tendencia D1 de la vela t.
+
+    Args:
+        data: DataFrame OHLCV del timeframe de entrada (M3 o M1)
+        params: StrategyParams (lookback_sniper, confirmation_weights, min_score)
+        d1_trend: TrendDirection para todas las velas, secuencia alineada con
+                  data (una tendencia por vela) o None
+
+    Returns:
+        DataFrame indexado como data con SIGNAL_COLUMNS. Las velas sin señal
+        tienen signal 'HOLD', direction 'NEUTRAL' y niveles en 0.0
+    """
+    n = len(data)
+    lookback = params.lookback_sniper
+    weights = params.confirmation_weights
+
+    open_ = data['open'].to_numpy(dtype=np.float64)
+    high = data['high'].to_numpy(dtype=np.float64)
+    low = data['low'].to_numpy(dtype=np.float64)
+    close = data['close'].to_numpy(dtype=np.float64)
+    volume = data['volume'].to_numpy(dtype=np.float64)
+    bars = np.arange(n)
+
+    # Swings del DataFrame completo y cuántos se conocen en cada vela (j <= t - lookback)
+    swing_highs, swing_lows = detect_swings(data, lookback=lookback)
+    hi_idx = np.array([s.index for s in swing_highs], dtype=np.int64)
+    hi_price = np.array([s.price for s in swing_highs], dtype=np.float64)
+    lo_idx = np.array([s.index for s in swing_lows], dtype=np.int64)
+    lo_price = np.array([s.price for s in swing_lows], dtype=np.float64)
+    n_hi = np.searchsorted(hi_idx, bars - lookback, side='right')
+    n_lo = np.searchsorted(lo_idx, bars - lookback, side='right')
+
+    # 1. Sweep: la barrida de un swing se busca cuando el swing tiene 20 velas
+    sweep_bar = np.concatenate([
+        _sweep_bars(high, low, close, hi_idx, hi_price, high_sweep=True),
+        _sweep_bars(high, low, close, lo_idx, lo_price, high_sweep=False)
+    ])
+    sweep_from = np.concatenate([hi_idx, lo_idx]) + max(SWEEP_BARS, lookback)
+    last_sweep = _last_active(np.where(sweep_bar >= 0, sweep_from, n),
+                              sweep_bar + RECENT_BARS, n)
+    has_sweep = last_sweep >= 0
+    last_sweep_bar = _take(sweep_bar, last_sweep, -1)
+
+    # 2. Mitigación de OB o FVG (primero los OB y luego los FVG, como find_sniper_entry)
+    blocks = detect_blocks_array(data, swing_highs, swing_lows, rejection_lookback=None)
+    is_ob = blocks['block_type'] == BLOCK_TYPE_CODES.index(BlockType.ORDER_BLOCK)
+    order = np.concatenate([np.flatnonzero(is_ob), np.flatnonzero(~is_ob)])
+    blocks, is_ob = blocks[order], is_ob[order]
+    block_end = blocks['end_index']
+    bullish_block = blocks['direction'] > 0
+    # Un FVG se conoce con la vela siguiente; un OB, cuando se confirma su swing
+    known_from = np.where(is_ob, block_end + 1 + lookback, block_end + 1)
+
+    resolver = FirstTouchResolver(data)
+    touch = np.full(len(blocks), -1, dtype=np.int64)
+    touch[bullish_block] = resolver.first_low_at_or_below(
+        block_end[bullish_block] + 1,
+        blocks['end_price'][bullish_block] * (1 + MITIGATION_TOLERANCE))
+    touch[~bullish_block] = resolver.first_high_at_or_above(
+        block_end[~bullish_block] + 1,
+        blocks['start_price'][~bullish_block] * (1 - MITIGATION_TOLERANCE))
+    mitigated = _last_active(np.where(touch >= 0, np.maximum(known_from, touch), n),
+                             block_end + RECENT_BARS, n)
+    has_mitigation = mitigated >= 0
+
+    # 3. BOS/CHoCH interno luego de la barrida (velas last_sweep_bar + 1 .. t)
+    hi_prefix_min = np.fmin.accumulate(hi_price) if len(hi_price) else hi_price
+    lo_prefix_max = np.fmax.accumulate(lo_price) if len(lo_price) else lo_price
+    has_break = np.zeros(n, dtype=bool)
+    for offset in range(RECENT_BARS):
+        i = bars - offset
+        after_sweep = has_sweep & (i > last_sweep_bar)
+        i = np.maximum(i, 0)
+        # Swings conocidos en t con índice anterior a la vela i
+        limit = np.minimum(i, bars - lookback + 1)
+        broken_high = _take(hi_prefix_min, np.searchsorted(hi_idx, limit, side='left') - 1, np.inf)
+        broken_low = _take(lo_prefix_max, np.searchsorted(lo_idx, limit, side='left') - 1, -np.inf)
+        has_break |= after_sweep & ((high[i] > broken_high) | (low[i] < broken_low))
+
+    # CHoCH: último swing conocido frente al penúltimo, ambos en las últimas 50 velas
+    bull_choch = ((n_lo >= 3) & (_take(lo_idx, n_lo - 2, -1) >= bars - 49)
+                  & (_take(lo_price, n_lo - 1, np.nan) > _take(lo_price, n_lo - 2, np.nan)))
+    bear_choch = ((n_hi >= 3) & (_take(hi_idx, n_hi - 2, -1) >= bars - 49)
+                  & (_take(hi_price, n_hi - 1, np.nan) < _take(hi_price, n_hi - 2, np.nan)))
+    has_bos_choch = has_sweep & (
+        has_break
+        | (bull_choch & (_take(lo_idx, n_lo - 1, -1) > last_sweep_bar))
+        | (bear_choch & (_take(hi_idx, n_hi - 1, -1) > last_sweep_bar))
+    )
+
+    # 4. Vela institucional + volumen alto (volumen medio de las últimas 20 velas)
+    body = np.abs(close - open_)
+    candle_range = high - low
+    avg_volume = np.cumsum(volume) / (bars + 1)
+    if n >= 20:
+        avg_volume[19:] = sliding_window_view(volume, 20).sum(axis=1) / 20
+    with np.errstate(divide='ignore', invalid='ignore'):
+        body_ratio = np.where(candle_range > 0, body / candle_range, 0.0)
+        volume_ratio = np.where(avg_volume > 0, volume / avg_volume, 0.0)
+        candle_size_pct = np.where(close > 0, candle_range / close * 100, 0.0)
+    has_institutional_candle = (
+        ((body_ratio > 0.6) & (volume_ratio > 1.3))
+        | ((body_ratio > 0.5) & (volume_ratio > 2.0))
+        | ((body_ratio > 0.8) & (volume_ratio > 1.0))
+    ) & (candle_size_pct > 0.15)
+
+    # 5. Divergencias RSI con los dos últimos swings conocidos
+    rsi = calculate_rsi(data['close'], period=14).to_numpy(dtype=np.float64)
+    enough_swings = (n_hi >= 2) & (n_lo >= 2)
+    lo_last, lo_prev = _take(lo_idx, n_lo - 1, -1), _take(lo_idx, n_lo - 2, -1)
+    hi_last, hi_prev = _take(hi_idx, n_hi - 1, -1), _take(hi_idx, n_hi - 2, -1)
+    bullish_divergence = (enough_swings
+                          & (_take(lo_price, n_lo - 1, np.nan) < _take(lo_price, n_lo - 2, np.nan))
+                          & (_take(rsi, lo_last, np.nan) > _take(rsi, lo_prev, np.nan)))
+    bearish_divergence = (enough_swings
+                          & (_take(hi_price, n_hi - 1, np.nan) > _take(hi_price, n_hi - 2, np.nan))
+                          & (_take(rsi, hi_last, np.nan) < _take(rsi, hi_prev, np.nan)))
+
+    # Score con el mismo orden de suma que find_sniper_entry
+    # (las dos divergencias suman por separado: find_sniper_entry puede añadir ambas)
+    evaluated = bars >= MIN_BARS - 1
+    confirmations = [
+        ('SWEEP', has_sweep), ('MITIGATION', has_mitigation), ('BOS_CHOCH', has_bos_choch),
+        ('INSTITUTIONAL_CANDLE', has_institutional_candle),
+        ('RSI_DIVERGENCE', bullish_divergence), ('RSI_DIVERGENCE', bearish_divergence)
+    ]
+    score = np.zeros(n, dtype=np.float64)
+    for name, flag in confirmations:
+        score += np.where(flag & evaluated, weights.get(name, 1.0), 0.0)
+    is_signal = evaluated & (score >= params.min_score)
+
+    # Dirección: D1 bajista, o la de la última ruptura (BOS alcistas, BOS bajistas, CHoCH)
+    first_bull = _first_break_bar(high, swing_highs, hi_idx, lookback, bullish=True)
+    first_bear = _first_break_bar(low, swing_lows, lo_idx, lookback, bullish=False)
+    bearish = np.select(
+        [_d1_bearish(d1_trend, n), bear_choch, bull_choch, bars >= first_bear, bars >= first_bull],
+        [True, True, False, True, False], default=False
+    )
+
+    # Niveles: SL en el bloque mitigado (o 0.5%), TPs a 1.5R, 2.5R y 4R
+    entry_price = close
+    block_start = _take(blocks['start_price'], mitigated, np.nan)
+    block_stop = _take(blocks['end_price'], mitigated, np.nan)
+    stop_loss = np.where(
+        has_mitigation,
+        np.where(bearish, block_stop * 1.001, block_start * 0.999),
+        entry_price * np.where(bearish, 1.005, 0.995)
+    )
+    risk = np.abs(entry_price - stop_loss)
+    take_profit_1 = np.where(bearish, entry_price - (risk * 1.5), entry_price + (risk * 1.5))
+    take_profit_2 = np.where(bearish, entry_price - (risk * 2.5), entry_price + (risk * 2.5))
+    take_profit_final = np.where(bearish, entry_price - (risk * 4), entry_price + (risk * 4))
+
+    # TP final ajustado al próximo swing conocido (solo en las velas con señal)
+    for t in np.flatnonzero(is_signal):
+        entry = entry_price[t]
+        target = take_profit_final[t]
+        if not bearish[t] and n_hi[t] > 0:
+            prices = hi_price[:n_hi[t]]
+            beyond = prices[prices > entry]
+            if len(beyond) and beyond.max() > target:
+                target = beyond.max()
+            closer = prices[(prices > entry) & (prices < target)]
+            if len(closer):
+                target = closer.max()
+        elif bearish[t] and n_lo[t] > 0:
+            prices = lo_price[:n_lo[t]]
+            beyond = prices[prices < entry]
+            if len(beyond) and beyond.min() < target:
+                target = beyond.min()
+            closer = prices[(prices > target) & (prices < entry)]
+            if len(closer):
+                target = closer.min()
+        take_profit_final[t] = target
+
+    reward = np.where(bearish, entry_price - take_profit_1, take_profit_1 - entry_price)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        risk_reward = np.where(risk > 0, reward / risk, 0.0)
+
+    def _levels(values):
+        return np.where(is_signal, values, 0.0)
+
+    return pd.DataFrame({
+        'signal': np.where(is_signal, np.where(bearish, 'SELL', 'BUY'), 'HOLD'),
+        'direction': np.where(is_signal, np.where(bearish, 'BEARISH', 'BULLISH'), 'NEUTRAL'),
+        'score': score,
+        'sweep': has_sweep & evaluated,
+        'mitigation': has_mitigation & evaluated,
+        'bos_choch': has_bos_choch & evaluated,
+        'institutional_candle': has_institutional_candle & evaluated,
+        'rsi_divergence': (bullish_divergence | bearish_divergence) & evaluated,
+        'entry_price': _levels(entry_price),
+        'stop_loss': _levels(stop_loss),
+        'take_profit_1': _levels(take_profit_1),
+        'take_profit_2': _levels(take_profit_2),
+        'take_profit_final': _levels(take_profit_final),
+        'risk_reward': _levels(risk_reward),
+    }, index=data.index, columns=SIGNAL_COLUMNS)
@@ -18,6 +18,7 @@ Timeframes analizados:
 
 import pandas as pd
 import numpy as np
+from collections import OrderedDict
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass, field
 from datetime import datetime
@@ -27,10 +28,12 @@ from strategy.ict_utils import (
     detect_swings, detect_bos_choch, detect_liquidity_sweeps,
     detect_fair_value_gaps, detect_order_blocks, detect_mitigation_blocks,
     detect_breaker_blocks, detect_rejection_blocks, detect_liquidity_voids,
-    detect_trend, detect_equal_highs_lows,
+    detect_trend, detect_equal_highs_lows, detect_blocks_array, blocks_from_array,
     SwingPoint, StructureBreak, LiquiditySweep, InstitutionalBlock,
-    InstitutionalZone, BlockType, TrendDirection
+    InstitutionalZone, BlockType, TrendDirection, FirstTouchResolver
 )
+from strategy.incremental_analyzer import IncrementalStructureAnalyzer
+from strategy.batch_signals import evaluate_sniper_batch, SIGNAL_FLAG_COLUMNS
 from utils.indicators import calculate_rsi
 
 # Importar módulo de pivots (opcional, no bloquea si no está disponible)
@@ -64,6 +67,74 @@ class MultiTimeframeContext:
     m15_m5_unmitigated_fvgs: List[InstitutionalBlock] = field(default_factory=list)
 
 
+# Sistema de peso por confirmación (prioriza confirmaciones más importantes)
+CONFIRMATION_WEIGHTS = {
+    'SWEEP': 2.0,              # Más importante - barrida de liquidez
+    'MITIGATION': 2.0,         # Más importante - mitigación de OB/FVG
+    'BOS_CHOCH': 1.5,          # Importante - ruptura de estructura
+    'INSTITUTIONAL_CANDLE': 1.0,  # Normal - vela institucional
+    'RSI_DIVERGENCE': 0.5      # Menos importante - divergencia (opcional)
+}
+
+
+@dataclass
+class StrategyParams:
+    """
+    Parámetros ajustables de la estrategia ICT.
+    
+    Los valores por defecto son los de siempre; backtest/optimizer.py los
+    recorre para buscar la mejor combinación.
+    """
+    lookback_d1: int = 3        # Velas a cada lado para confirmar swings en D1
+    lookback_h4: int = 5
+    lookback_h1: int = 7
+    lookback_m15: int = 7
+    lookback_m5: int = 10
+    lookback_sniper: int = 5    # M1/M3 (entrada sniper)
+    confirmation_weights: Dict[str, float] = field(default_factory=lambda: dict(CONFIRMATION_WEIGHTS))
+    min_score: float = 4.0      # Score mínimo de confirmaciones (2 confirmaciones fuertes)
+    d1_fvg_min_pct: float = 0.3  # Tamaño mínimo (% del precio) de un FVG grande en D1
+
+
+# Campos del contexto que escribe cada etapa del análisis (ver _run_stage_cached).
+# H1 además marca como mitigados bloques de H4, así que su snapshot incluye los de H4.
+STAGE_CONTEXT_FIELDS = {
+    'D1': ('d1_trend', 'd1_liquidity_zones', 'd1_fvgs', 'd1_order_blocks'),
+    'H4': ('h4_bos_choch', 'h4_accumulation_zones', 'h4_fvgs', 'h4_order_blocks'),
+    'H1': ('h4_accumulation_zones', 'h4_fvgs', 'h4_order_blocks',
+           'h1_active_zones', 'h1_validated_mitigations'),
+    'M15_M5': ('m15_m5_bos_choch', 'm15_m5_sweeps', 'm15_m5_unmitigated_fvgs'),
+}
+
+
+def _mitigation_states(values) -> List[Tuple[InstitutionalBlock, bool, Optional[int]]]:
+    """Estado de mitigación de los bloques (sueltos o dentro de zonas) de unos campos"""
+    states = []
+    for value in values:
+        if not isinstance(value, list):
+            continue
+        for item in value:
+            blocks = item.blocks if isinstance(item, InstitutionalZone) else [item]
+            for block in blocks:
+                if isinstance(block, InstitutionalBlock):
+                    states.append((block, block.mitigated, block.mitigation_index))
+    return states
+
+
+def frame_cache_key(df: pd.DataFrame) -> Tuple:
+    """
+    Clave barata que identifica el estado de un DataFrame OHLCV.
+    
+    Usa la longitud, la primera y la última vela y los precios de la última
+    vela (que cambian mientras la vela en vivo se está formando).
+    """
+    if len(df) == 0:
+        return (0,)
+    last = df.iloc[-1]
+    return (len(df), df.index[0], df.index[-1],
+            float(last['open']), float(last['high']), float(last['low']), float(last['close']))
+
+
 @dataclass
 class TradingSignal:
     """Señal de trading estructurada con toda la información institucional"""
@@ -91,32 +162,104 @@ class ICTHybridStrategy(BaseStrategy):
     - Confluencias técnicas
     """
     
-    def __init__(self):
-        """Inicializa la estrategia ICT Híbrida"""
+    def __init__(self, incremental: bool = False, analysis_cache_size: int = 64,
+                 params: Optional[StrategyParams] = None):
+        """
+        Inicializa la estrategia ICT Híbrida.
+        
+        Args:
+            incremental: Si True, mantiene un IncrementalStructureAnalyzer por
+                         timeframe y solo procesa las velas nuevas en cada análisis
+                         (swings, BOS/CHoCH, FVG, OB y mitigaciones)
+            analysis_cache_size: Entradas máximas (LRU) de la caché de análisis
+                                 por timeframe de generate_signal (0 = sin caché)
+            params: Parámetros ajustables (lookbacks, pesos, umbrales); por
+                    defecto StrategyParams()
+        """
         super().__init__("ICT Hybrid Strategy 2022")
         self.context = MultiTimeframeContext()
         self.signals_history = []
+        self.params = params or StrategyParams()
+        self.incremental = incremental
+        self.analyzers: Dict[Tuple[str, int], IncrementalStructureAnalyzer] = {}
+        self.analysis_cache_size = analysis_cache_size
+        self.analysis_cache: "OrderedDict[Tuple, Dict]" = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
     
-    def generate_signals(self, data: pd.DataFrame) -> pd.DataFrame:
+    def generate_signals(self, data: pd.DataFrame, d1_trend=None) -> pd.DataFrame:
         """
-        Genera señales de trading basadas en análisis multi-temporal.
+        Genera las señales sniper de todas las velas en una pasada vectorizada.
         
-        NOTA: Esta estrategia requiere datos de múltiples timeframes.
-        Para uso completo, debes pasar datos de D1, H4, H1, M15, M5, M1, M3.
+        La fila de cada vela equivale a find_sniper_entry con las velas hasta
+        ella (ver strategy/batch_signals.py), sin recalcular nada vela a vela.
         
         Args:
-            data: DataFrame con datos OHLCV del timeframe principal
+            data: DataFrame con datos OHLCV del timeframe de entrada (M3 o M1)
+            d1_trend: Tendencia D1 de cada vela (ver d1_trends), un TrendDirection
+                      para todas o None para usar self.context.d1_trend
         
         Returns:
-            DataFrame con columna 'signal' añadida
+            DataFrame indexado como data con 'signal' ('BUY'/'SELL'/'HOLD'), las
+            confirmaciones (booleanas), el score y los niveles de cada señal
         """
-        # Inicializa la columna de señales
-        data['signal'] = 'HOLD'
+        if d1_trend is None:
+            d1_trend = self.context.d1_trend
+        return evaluate_sniper_batch(data, self.params, d1_trend=d1_trend)
+    
+    def d1_trends(self, df_D1: pd.DataFrame, counts: np.ndarray) -> np.ndarray:
+        """
+        Tendencia D1 (la de analyze_D1) con las primeras counts[i] velas diarias.
         
-        # Esta función se usa principalmente para backtesting simple
-        # El análisis completo se hace con las funciones específicas por timeframe
+        Cada cantidad distinta de velas se analiza una sola vez. Con 10 velas o
+        menos analyze_context no analiza D1, así que queda la tendencia actual
+        del contexto.
+        
+        Args:
+            df_D1: DataFrame D1 completo
+            counts: Velas D1 disponibles en cada vela de entrada
         
-        return data
+        Returns:
+            Array (object) de TrendDirection alineado con counts
+        """
+        values, inverse = np.unique(np.asarray(counts), return_inverse=True)
+        trends = np.empty(len(values), dtype=object)
+        for k, count in enumerate(values):
+            if count <= 10:
+                trends[k] = self.context.d1_trend
+                continue
+            df = df_D1.iloc[:count]
+            swing_highs, swing_lows = detect_swings(df, lookback=self.params.lookback_d1)
+            trends[k] = detect_trend(df, swing_highs, swing_lows)
+        return trends[inverse]
+    
+    def signal_at(self, signals: pd.DataFrame, i: int) -> Optional[TradingSignal]:
+        """
+        TradingSignal de la vela i de generate_signals (None si es 'HOLD').
+        
+        Las señales en lote no traen zonas activas de H1 ni datos de gráfico;
+        las justificaciones son las confirmaciones encontradas.
+        """
+        row = signals.iloc[i]
+        if row['signal'] == 'HOLD':
+            return None
+        
+        signal = TradingSignal(
+            direction=row['direction'],
+            active_zones=[],
+            operation_type=row['signal'],
+            entry_price=float(row['entry_price']),
+            stop_loss=float(row['stop_loss']),
+            take_profit_1=float(row['take_profit_1']),
+            take_profit_2=float(row['take_profit_2']),
+            take_profit_final=float(row['take_profit_final']),
+            risk_reward=float(row['risk_reward']),
+            justifications=[column for column in SIGNAL_FLAG_COLUMNS if row[column]]
+                           + [f"Score de confirmaciones: {row['score']:.1f}"],
+            chart_data={}
+        )
+        self.signals_history.append(signal)
+        return signal
     
     def should_buy(self, data: pd.DataFrame, current_index: int) -> bool:
         """Determina si se debe comprar (implementación básica)"""
@@ -128,8 +271,144 @@ class ICTHybridStrategy(BaseStrategy):
         # La lógica completa está en find_sniper_entry()
         return False
     
+    # ==================== DETECCIÓN (BATCH O INCREMENTAL) ====================
+    
+    def _get_analyzer(self, key: str, df: pd.DataFrame,
+                      lookback: int) -> Optional[IncrementalStructureAnalyzer]:
+        """Analizador incremental de `key` sincronizado con df (None si incremental=False)"""
+        if not self.incremental:
+            return None
+        analyzer = self.analyzers.get((key, lookback))
+        if analyzer is None:
+            analyzer = IncrementalStructureAnalyzer(lookback=lookback, timeframe=key)
+            self.analyzers[(key, lookback)] = analyzer
+        analyzer.update(df)
+        return analyzer
+    
+    def _swings(self, key: str, df: pd.DataFrame, lookback: int):
+        analyzer = self._get_analyzer(key, df, lookback)
+        if analyzer is not None:
+            return analyzer.swings(df)
+        return detect_swings(df, lookback=lookback)
+    
+    def _bos_choch(self, key: str, df: pd.DataFrame, lookback: int,
+                   swing_highs: List[SwingPoint], swing_lows: List[SwingPoint]) -> List[StructureBreak]:
+        analyzer = self._get_analyzer(key, df, lookback)
+        if analyzer is not None:
+            return analyzer.structure_breaks(df)
+        return detect_bos_choch(df, swing_highs, swing_lows)
+    
+    def _fair_value_gaps(self, key: str, df: pd.DataFrame, lookback: int,
+                         with_mitigation: bool = False) -> List[InstitutionalBlock]:
+        analyzer = self._get_analyzer(key, df, lookback)
+        if analyzer is not None:
+            return analyzer.fair_value_gaps(df, with_mitigation=with_mitigation)
+        fvgs = detect_fair_value_gaps(df)
+        if with_mitigation:
+            fvgs = detect_mitigation_blocks(df, fvgs)
+        return fvgs
+    
+    def _blocks(self, key: str, df: pd.DataFrame, lookback: int,
+                swing_highs: List[SwingPoint], swing_lows: List[SwingPoint],
+                with_mitigation: bool = False) -> Tuple[List[InstitutionalBlock], List[InstitutionalBlock]]:
+        """FVGs y Order Blocks de df en una sola pasada (detect_blocks_array)"""
+        analyzer = self._get_analyzer(key, df, lookback)
+        if analyzer is not None:
+            return (analyzer.fair_value_gaps(df, with_mitigation=with_mitigation),
+                    analyzer.order_blocks(df, with_mitigation=with_mitigation))
+        blocks = detect_blocks_array(df, swing_highs, swing_lows, rejection_lookback=None)
+        fvgs = blocks_from_array(blocks, df, BlockType.FAIR_VALUE_GAP)
+        obs = blocks_from_array(blocks, df, BlockType.ORDER_BLOCK)
+        if with_mitigation:
+            # Un solo FirstTouchResolver para FVGs y OBs
+            detect_mitigation_blocks(df, fvgs + obs)
+        return fvgs, obs
+    
+    # ==================== CACHÉ DE ANÁLISIS POR TIMEFRAME ====================
+    
+    def _run_stage_cached(self, stage: str, key: Tuple, run) -> None:
+        """
+        Ejecuta una etapa del análisis (analyze_D1, analyze_H4, ...) solo si
+        sus datos cambiaron desde la última vez.
+        
+        La caché guarda los campos del contexto que escribe la etapa
+        (STAGE_CONTEXT_FIELDS) y los restaura en un acierto. Los bloques se
+        comparten con la caché; lo único que las etapas posteriores modifican
+        es su mitigación (H1 marca bloques de H4), así que también se guarda
+        mitigated/mitigation_index de cada bloque y se reaplica al restaurar.
+        
+        Args:
+            stage: 'D1', 'H4', 'H1' o 'M15_M5'
+            key: Clave de los datos de entrada (ver frame_cache_key)
+            run: Función sin argumentos que ejecuta la etapa
+        """
+        if self.analysis_cache_size <= 0:
+            run()
+            return
+        
+        cache_key = (stage,) + key
+        snapshot = self.analysis_cache.get(cache_key)
+        if snapshot is not None:
+            self.analysis_cache.move_to_end(cache_key)
+            self.cache_hits += 1
+            fields, states = snapshot
+            for name, value in fields.items():
+                setattr(self.context, name, list(value) if isinstance(value, list) else value)
+            for block, mitigated, mitigation_index in states:
+                block.mitigated = mitigated
+                block.mitigation_index = mitigation_index
+            return
+        
+        self.cache_misses += 1
+        run()
+        fields = {name: getattr(self.context, name) for name in STAGE_CONTEXT_FIELDS[stage]}
+        self.analysis_cache[cache_key] = (
+            {name: list(value) if isinstance(value, list) else value for name, value in fields.items()},
+            _mitigation_states(fields.values())
+        )
+        while len(self.analysis_cache) > self.analysis_cache_size:
+            self.analysis_cache.popitem(last=False)
+    
+    def clear_analysis_cache(self) -> None:
+        """Vacía la caché de análisis por timeframe"""
+        self.analysis_cache.clear()
+        self.cache_hits = 0
+        self.cache_misses = 0
+    
     # ==================== FUNCIONES DE ANÁLISIS MULTI-TEMPORAL ====================
     
+    def analyze_context(self, contexto: Dict[str, pd.DataFrame]) -> None:
+        """
+        Ejecuta el análisis D1 → H4 → H1 → M15/M5 sobre un contexto multi-temporal.
+        
+        Cada etapa se salta si sus velas no cambiaron (ver _run_stage_cached).
+        
+        Args:
+            contexto: Diccionario {timeframe: DataFrame} con las velas hasta el momento actual
+        """
+        h4_key = ()
+        if "D1" in contexto and len(contexto["D1"]) > 10:
+            df_D1 = contexto["D1"]
+            self._run_stage_cached('D1', frame_cache_key(df_D1),
+                                   lambda: self.analyze_D1(df_D1))
+        
+        if "H4" in contexto and len(contexto["H4"]) > 10:
+            df_H4 = contexto["H4"]
+            h4_key = frame_cache_key(df_H4)
+            self._run_stage_cached('H4', h4_key, lambda: self.analyze_H4(df_H4))
+        
+        if "H1" in contexto and len(contexto["H1"]) > 10:
+            # H1 depende de los bloques de H4: la clave incluye ambos
+            df_H1 = contexto["H1"]
+            self._run_stage_cached('H1', frame_cache_key(df_H1) + h4_key,
+                                   lambda: self.analyze_H1(df_H1))
+        
+        if "M15" in contexto and "M5" in contexto:
+            if len(contexto["M15"]) > 10 and len(contexto["M5"]) > 10:
+                df_M15, df_M5 = contexto["M15"], contexto["M5"]
+                self._run_stage_cached('M15_M5', frame_cache_key(df_M15) + frame_cache_key(df_M5),
+                                       lambda: self.analyze_M15_M5(df_M15, df_M5))
+    
     def analyze_D1(self, df_D1: pd.DataFrame) -> Dict:
         """
         Análisis del timeframe D1 (diario).
@@ -149,7 +428,7 @@ class ICTHybridStrategy(BaseStrategy):
         print("🔍 Analizando D1: Tendencia macro y zonas institucionales mayores...")
         
         # 1. Detecta swings
-        swing_highs, swing_lows = detect_swings(df_D1, lookback=3)
+        swing_highs, swing_lows = self._swings('D1', df_D1, lookback=self.params.lookback_d1)
         print(f"   ✓ Swings detectados: {len(swing_highs)} highs, {len(swing_lows)} lows")
         
         # 2. Detecta tendencia macro
@@ -163,30 +442,26 @@ class ICTHybridStrategy(BaseStrategy):
         print(f"   ✓ Zonas de liquidez mayor: {len(liquidity_zones)}")
         
         # 4. Detecta FVG grandes (solo los significativos)
-        all_fvgs = detect_fair_value_gaps(df_D1, lookback=2)
-        # Filtra solo FVGs grandes (más del 0.3% del precio)
+        # (FVGs y Order Blocks salen de la misma pasada, ya con su mitigación)
+        all_fvgs, order_blocks = self._blocks('D1', df_D1, self.params.lookback_d1, swing_highs, swing_lows,
+                                              with_mitigation=True)
+        # Filtra solo FVGs grandes (más del d1_fvg_min_pct del precio, 0.3% por defecto)
         large_fvgs = []
         for fvg in all_fvgs:
             gap_size = abs(fvg.end_price - fvg.start_price)
             avg_price = (fvg.start_price + fvg.end_price) / 2
             gap_pct = (gap_size / avg_price) * 100
-            if gap_pct > 0.3:  # FVG grande
+            if gap_pct > self.params.d1_fvg_min_pct:  # FVG grande
                 large_fvgs.append(fvg)
         
         self.context.d1_fvgs = large_fvgs
         print(f"   ✓ FVG grandes detectados: {len(large_fvgs)}")
         
-        # 5. Detecta Order Blocks macro
-        order_blocks = detect_order_blocks(df_D1, swing_highs, swing_lows)
-        # Filtra solo los más fuertes
+        # 5. Order Blocks macro: filtra solo los más fuertes
         strong_obs = [ob for ob in order_blocks if ob.strength >= 2.5]
         self.context.d1_order_blocks = strong_obs
         print(f"   ✓ Order Blocks macro: {len(strong_obs)}")
         
-        # 6. Verifica mitigaciones
-        self.context.d1_fvgs = detect_mitigation_blocks(df_D1, self.context.d1_fvgs)
-        self.context.d1_order_blocks = detect_mitigation_blocks(df_D1, self.context.d1_order_blocks)
-        
         return {
             'trend': trend,
             'liquidity_zones': liquidity_zones,
@@ -215,11 +490,11 @@ class ICTHybridStrategy(BaseStrategy):
         print("🔍 Analizando H4: BOS/CHoCH institucionales y estructuras...")
         
         # 1. Detecta swings
-        swing_highs, swing_lows = detect_swings(df_H4, lookback=5)
+        swing_highs, swing_lows = self._swings('H4', df_H4, lookback=self.params.lookback_h4)
         print(f"   ✓ Swings detectados: {len(swing_highs)} highs, {len(swing_lows)} lows")
         
         # 2. Detecta BOS/CHoCH institucionales
-        bos_choch = detect_bos_choch(df_H4, swing_highs, swing_lows)
+        bos_choch = self._bos_choch('H4', df_H4, self.params.lookback_h4, swing_highs, swing_lows)
         self.context.h4_bos_choch = bos_choch
         print(f"   ✓ BOS/CHoCH detectados: {len(bos_choch)}")
         
@@ -229,7 +504,9 @@ class ICTHybridStrategy(BaseStrategy):
         accumulation_zones = []
         redistribution_zones = []
         
-        order_blocks = detect_order_blocks(df_H4, swing_highs, swing_lows)
+        # FVGs y Order Blocks en una sola pasada, ya con su mitigación
+        fvgs, order_blocks = self._blocks('H4', df_H4, self.params.lookback_h4, swing_highs, swing_lows,
+                                          with_mitigation=True)
         
         # Agrupa OBs cerca de swings para identificar acumulación/redistribución
         for swing_low in swing_lows[-5:]:  # Últimos 5 swing lows
@@ -268,16 +545,12 @@ class ICTHybridStrategy(BaseStrategy):
         print(f"   ✓ Estructuras detectadas: {len(accumulation_zones)} acumulación, {len(redistribution_zones)} redistribución")
         
         # 4. Detecta FVG activos (no mitigados)
-        fvgs = detect_fair_value_gaps(df_H4, lookback=3)
-        fvgs = detect_mitigation_blocks(df_H4, fvgs)
         active_fvgs = [fvg for fvg in fvgs if not fvg.mitigated]
         self.context.h4_fvgs = active_fvgs
         print(f"   ✓ FVG activos: {len(active_fvgs)}")
         
         # 5. Detecta Order Blocks (filtra solo los no mitigados)
-        obs = detect_order_blocks(df_H4, swing_highs, swing_lows)
-        obs = detect_mitigation_blocks(df_H4, obs)
-        active_obs = [ob for ob in obs if not ob.mitigated]
+        active_obs = [ob for ob in order_blocks if not ob.mitigated]
         self.context.h4_order_blocks = active_obs
         print(f"   ✓ Order Blocks activos: {len(active_obs)}")
         
@@ -306,7 +579,7 @@ class ICTHybridStrategy(BaseStrategy):
         print("🔍 Analizando H1: Aterrizando zonas institucionales activas...")
         
         # 1. Detecta swings
-        swing_highs, swing_lows = detect_swings(df_H1, lookback=7)
+        swing_highs, swing_lows = self._swings('H1', df_H1, lookback=self.params.lookback_h1)
         print(f"   ✓ Swings detectados: {len(swing_highs)} highs, {len(swing_lows)} lows")
         
         # 2. Aterriza zonas institucionales desde H4 y D1
@@ -348,28 +621,19 @@ class ICTHybridStrategy(BaseStrategy):
         
         # 3. Valida mitigaciones
         # Detecta Order Blocks y FVGs en H1
-        obs_h1 = detect_order_blocks(df_H1, swing_highs, swing_lows)
-        fvgs_h1 = detect_fair_value_gaps(df_H1, lookback=3)
+        fvgs_h1, obs_h1 = self._blocks('H1', df_H1, self.params.lookback_h1, swing_highs, swing_lows)
         
         # Verifica si alguno de los bloques de H4 fue mitigado en H1
+        # (primer toque desde la primera vela de H1, ver FirstTouchResolver)
         validated_mitigations = []
-        for block in self.context.h4_order_blocks + self.context.h4_fvgs:
-            if not block.mitigated:
-                # Verifica si fue mitigado en H1
-                for i in range(len(df_H1)):
-                    candle = df_H1.iloc[i]
-                    if block.direction == 'BULLISH':
-                        if candle['low'] <= block.end_price:
-                            block.mitigated = True
-                            block.mitigation_index = i
-                            validated_mitigations.append(block)
-                            break
-                    else:
-                        if candle['high'] >= block.start_price:
-                            block.mitigated = True
-                            block.mitigation_index = i
-                            validated_mitigations.append(block)
-                            break
+        pending = [block for block in self.context.h4_order_blocks + self.context.h4_fvgs
+                   if not block.mitigated]
+        touched = FirstTouchResolver(df_H1).first_touch(pending, start=0)
+        for block, index in zip(pending, touched):
+            if index >= 0:
+                block.mitigated = True
+                block.mitigation_index = int(index)
+                validated_mitigations.append(block)
         
         self.context.h1_validated_mitigations = validated_mitigations
         print(f"   ✓ Mitigaciones validadas: {len(validated_mitigations)}")
@@ -400,21 +664,19 @@ class ICTHybridStrategy(BaseStrategy):
         results = {}
         
         # Análisis M15
-        swing_highs_m15, swing_lows_m15 = detect_swings(df_M15, lookback=7)
-        bos_choch_m15 = detect_bos_choch(df_M15, swing_highs_m15, swing_lows_m15)
+        swing_highs_m15, swing_lows_m15 = self._swings('M15', df_M15, lookback=self.params.lookback_m15)
+        bos_choch_m15 = self._bos_choch('M15', df_M15, self.params.lookback_m15, swing_highs_m15, swing_lows_m15)
         sweeps_m15 = detect_liquidity_sweeps(df_M15, swing_highs_m15, swing_lows_m15)
-        fvgs_m15 = detect_fair_value_gaps(df_M15, lookback=3)
-        fvgs_m15 = detect_mitigation_blocks(df_M15, fvgs_m15)
+        fvgs_m15 = self._fair_value_gaps('M15', df_M15, lookback=self.params.lookback_m15, with_mitigation=True)
         unmitigated_fvgs_m15 = [fvg for fvg in fvgs_m15 if not fvg.mitigated]
         
         print(f"   ✓ M15 - BOS/CHoCH: {len(bos_choch_m15)}, Barridas: {len(sweeps_m15)}, FVG no mitigados: {len(unmitigated_fvgs_m15)}")
         
         # Análisis M5
-        swing_highs_m5, swing_lows_m5 = detect_swings(df_M5, lookback=10)
-        bos_choch_m5 = detect_bos_choch(df_M5, swing_highs_m5, swing_lows_m5)
+        swing_highs_m5, swing_lows_m5 = self._swings('M5', df_M5, lookback=self.params.lookback_m5)
+        bos_choch_m5 = self._bos_choch('M5', df_M5, self.params.lookback_m5, swing_highs_m5, swing_lows_m5)
         sweeps_m5 = detect_liquidity_sweeps(df_M5, swing_highs_m5, swing_lows_m5)
-        fvgs_m5 = detect_fair_value_gaps(df_M5, lookback=3)
-        fvgs_m5 = detect_mitigation_blocks(df_M5, fvgs_m5)
+        fvgs_m5 = self._fair_value_gaps('M5', df_M5, lookback=self.params.lookback_m5, with_mitigation=True)
         unmitigated_fvgs_m5 = [fvg for fvg in fvgs_m5 if not fvg.mitigated]
         
         print(f"   ✓ M5 - BOS/CHoCH: {len(bos_choch_m5)}, Barridas: {len(sweeps_m5)}, FVG no mitigados: {len(unmitigated_fvgs_m5)}")
@@ -467,31 +729,24 @@ class ICTHybridStrategy(BaseStrategy):
         rsi = calculate_rsi(df['close'], period=14)
         
         # Detecta swings en M3
-        swing_highs, swing_lows = detect_swings(df, lookback=5)
+        swing_highs, swing_lows = self._swings('SNIPER', df, lookback=self.params.lookback_sniper)
         
         # Detecta BOS/CHoCH internos
-        bos_choch = detect_bos_choch(df, swing_highs, swing_lows)
+        bos_choch = self._bos_choch('SNIPER', df, self.params.lookback_sniper, swing_highs, swing_lows)
         
         # Detecta barridas de liquidez
         sweeps = detect_liquidity_sweeps(df, swing_highs, swing_lows)
         
         # Detecta Order Blocks y FVGs
-        obs = detect_order_blocks(df, swing_highs, swing_lows)
-        fvgs = detect_fair_value_gaps(df, lookback=2)
+        fvgs, obs = self._blocks('SNIPER', df, self.params.lookback_sniper, swing_highs, swing_lows)
         
         # Obtiene la última vela
         last_candle = df.iloc[-1]
         current_price = last_candle['close']
         current_index = len(df) - 1
         
-        # Sistema de peso por confirmación (prioriza confirmaciones más importantes)
-        CONFIRMATION_WEIGHTS = {
-            'SWEEP': 2.0,              # Más importante - barrida de liquidez
-            'MITIGATION': 2.0,         # Más importante - mitigación de OB/FVG
-            'BOS_CHOCH': 1.5,          # Importante - ruptura de estructura
-            'INSTITUTIONAL_CANDLE': 1.0,  # Normal - vela institucional
-            'RSI_DIVERGENCE': 0.5      # Menos importante - divergencia (opcional)
-        }
+        # Sistema de peso por confirmación (CONFIRMATION_WEIGHTS por defecto)
+        confirmation_weights = self.params.confirmation_weights
         
         # Verifica confirmaciones
         confirmations = []
@@ -672,16 +927,18 @@ class ICTHybridStrategy(BaseStrategy):
         pivot_level = None
         pivot_distance = 0.0
         
-        if PIVOTS_AVAILABLE and contexto_global.pivots_manager:
+        # El pivots_manager solo existe si el bot en vivo lo asignó al contexto
+        pivots_manager = getattr(contexto_global, 'pivots_manager', None)
+        if PIVOTS_AVAILABLE and pivots_manager:
             try:
                 # Obtiene pivots (se actualizan automáticamente si es necesario)
                 # Usa el símbolo del contexto o por defecto XAUUSD
                 symbol = getattr(contexto_global, 'symbol', 'XAUUSD')
-                pivots = contexto_global.pivots_manager.get_pivots(symbol=symbol)
+                pivots = pivots_manager.get_pivots(symbol=symbol)
                 
                 if pivots:
                     # Verifica confluencia con pivots
-                    has_confluence, level, distance_pct = contexto_global.pivots_manager.check_pivot_confluence(
+                    has_confluence, level, distance_pct = pivots_manager.check_pivot_confluence(
                         price=current_price,
                         direction=operation_type,
                         pivots=pivots,
@@ -706,7 +963,7 @@ class ICTHybridStrategy(BaseStrategy):
                         print(f"   ✅ Confluencia con pivot {level} detectada (distancia: {distance_pct:.2f}%)")
                     else:
                         # Verifica si está cerca pero no en confluencia (filtro direccional)
-                        nearest_level, nearest_price, nearest_distance = contexto_global.pivots_manager.get_nearest_level(
+                        nearest_level, nearest_price, nearest_distance = pivots_manager.get_nearest_level(
                             current_price, pivots
                         )
                         
@@ -718,17 +975,16 @@ class ICTHybridStrategy(BaseStrategy):
                                 print(f"   ⚠️ Precio cerca de {nearest_level} (soporte) - no ideal para SELL")
             except Exception as e:
                 # Si hay error, continúa sin pivots (no bloquea la señal)
-                if logger:
-                    logger.warning(f"Error al verificar pivots: {e}")
+                print(f"   ⚠️ Error al verificar pivots: {e}")
         
         # Sistema de peso: calcular score total de confirmaciones
-        total_score = sum(CONFIRMATION_WEIGHTS.get(c, 1.0) for c in confirmations)
+        total_score = sum(confirmation_weights.get(c, 1.0) for c in confirmations)
         
         # Agregar score de pivots si hay confluencia
         if pivot_score > 0:
             total_score += pivot_score
         
-        min_score_required = 4.0  # Requiere al menos 2 confirmaciones fuertes (2.0 + 2.0)
+        min_score_required = self.params.min_score  # Por defecto 4.0: 2 confirmaciones fuertes (2.0 + 2.0)
         
         # Verifica score mínimo (equivalente a 2 confirmaciones fuertes o combinación equivalente)
         if total_score < min_score_required:
@@ -844,8 +1100,8 @@ class ICTHybridStrategy(BaseStrategy):
         print(f"      SL: ${stop_loss:.2f}")
         print(f"      TP1: ${take_profit_1:.2f}, TP2: ${take_profit_2:.2f}, TP Final: ${take_profit_final:.2f}")
         print(f"      Risk:Reward: 1:{risk_reward:.2f}")
-        if pivot_info:
-            print(f"      🎯 Confluencia con Pivot {pivot_info['level']} (score: +{pivot_score:.1f})")
+        if pivot_level:
+            print(f"      🎯 Confluencia con Pivot {pivot_level} (score: +{pivot_score:.1f})")
         
         return signal
     
@@ -885,18 +1141,7 @@ class ICTHybridStrategy(BaseStrategy):
         """
         try:
             # Ejecuta análisis multi-temporal
-            if "D1" in contexto and len(contexto["D1"]) > 10:
-                self.analyze_D1(contexto["D1"])
-            
-            if "H4" in contexto and len(contexto["H4"]) > 10:
-                self.analyze_H4(contexto["H4"])
-            
-            if "H1" in contexto and len(contexto["H1"]) > 10:
-                self.analyze_H1(contexto["H1"])
-            
-            if "M15" in contexto and "M5" in contexto:
-                if len(contexto["M15"]) > 10 and len(contexto["M5"]) > 10:
-                    self.analyze_M15_M5(contexto["M15"], contexto["M5"])
+            self.analyze_context(contexto)
             
             # Busca entrada sniper en M1/M3
             m1_data = contexto.get("M1")
@@ -15,10 +15,15 @@ Este módulo contiene funciones para detectar patrones institucionales ICT:
 
 import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from dataclasses import dataclass
 from typing import List, Optional, Dict, Tuple
 from enum import Enum
 
+from utils.rolling_windows import (
+    SparseTable, window_max, window_min, window_indices, first_true
+)
+
 
 class TrendDirection(Enum):
     """Dirección de la tendencia"""
@@ -96,6 +101,115 @@ class InstitutionalZone:
     active: bool
 
 
+# Orden de los códigos de tipo en BLOCK_DTYPE['block_type']
+BLOCK_TYPE_CODES = list(BlockType)
+
+# Formato columnar compacto de bloques institucionales (un registro por bloque)
+BLOCK_DTYPE = np.dtype([
+    ('block_type', np.int8),    # Posición en BLOCK_TYPE_CODES
+    ('direction', np.int8),     # 1 = BULLISH, -1 = BEARISH
+    ('start_index', np.int64),
+    ('end_index', np.int64),
+    ('start_price', np.float64),
+    ('end_price', np.float64),
+    ('strength', np.float64)
+])
+
+
+def _block_array(block_type: BlockType, direction: np.ndarray, start_index: np.ndarray,
+                 end_index: np.ndarray, start_price: np.ndarray, end_price: np.ndarray,
+                 strength: float) -> np.ndarray:
+    """Construye un array BLOCK_DTYPE a partir de columnas"""
+    blocks = np.empty(len(start_index), dtype=BLOCK_DTYPE)
+    blocks['block_type'] = BLOCK_TYPE_CODES.index(block_type)
+    blocks['direction'] = direction
+    blocks['start_index'] = start_index
+    blocks['end_index'] = end_index
+    blocks['start_price'] = start_price
+    blocks['end_price'] = end_price
+    blocks['strength'] = strength
+    return blocks
+
+
+def blocks_from_array(blocks: np.ndarray, data: pd.DataFrame,
+                      block_type: Optional[BlockType] = None) -> List[InstitutionalBlock]:
+    """
+    Convierte un array BLOCK_DTYPE a la lista de InstitutionalBlock.
+    
+    Args:
+        blocks: Array con dtype BLOCK_DTYPE
+        data: DataFrame sobre el que se detectaron (para los timestamps)
+        block_type: Si se indica, solo convierte los bloques de ese tipo
+    
+    Returns:
+        Lista de InstitutionalBlock (sin mitigar), en el orden del array
+    """
+    if block_type is not None:
+        blocks = blocks[blocks['block_type'] == BLOCK_TYPE_CODES.index(block_type)]
+    
+    timestamps = data.index
+    return [
+        InstitutionalBlock(
+            block_type=BLOCK_TYPE_CODES[b['block_type']],
+            start_index=int(b['start_index']),
+            end_index=int(b['end_index']),
+            start_price=b['start_price'],
+            end_price=b['end_price'],
+            timestamp=timestamps[b['end_index']],
+            direction='BULLISH' if b['direction'] > 0 else 'BEARISH',
+            mitigated=False,
+            strength=float(b['strength'])
+        )
+        for b in blocks
+    ]
+
+
+def _swing_arrays(values: np.ndarray, lookback: int,
+                  find_high: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Motor vectorizado de swings sobre un array crudo de precios.
+    
+    Compara cada vela contra el máximo/mínimo de las ventanas deslizantes
+    izquierda (i-lookback..i-1) y derecha (i+1..i+lookback) (window_max /
+    window_min). La comparación es estricta: un empate con cualquier vecina
+    descarta el swing, igual que la versión original vela a vela.
+    
+    Args:
+        values: Array de highs (find_high=True) o lows (find_high=False)
+        lookback: Número de velas a cada lado para confirmar el swing
+        find_high: True para swing highs, False para swing lows
+    
+    Returns:
+        Tupla con (índices de los swings, fuerza de cada swing)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if lookback < 1 or n < 2 * lookback + 1:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    
+    centers = values[lookback:n - lookback]
+    if find_high:
+        mask = ((centers > window_max(values, -lookback, lookback)[lookback:n - lookback])
+                & (centers > window_max(values, 1, lookback)[lookback:n - lookback]))
+    else:
+        mask = ((centers < window_min(values, -lookback, lookback)[lookback:n - lookback])
+                & (centers < window_min(values, 1, lookback)[lookback:n - lookback]))
+    
+    # Fuerza: solo para los swings encontrados (windows[k] = values[k:k+lookback])
+    positions = np.flatnonzero(mask)
+    windows = sliding_window_view(values, lookback)
+    current = centers[positions]
+    avg_surrounding = (windows[positions].mean(axis=1)
+                       + windows[positions + lookback + 1].mean(axis=1)) / 2
+    
+    if find_high:
+        strength = (current - avg_surrounding) / avg_surrounding * 100
+    else:
+        strength = (avg_surrounding - current) / avg_surrounding * 100
+    
+    return positions + lookback, np.minimum(strength, 5.0)  # Limita a 5
+
+
 def detect_swings(data: pd.DataFrame, lookback: int = 5) -> Tuple[List[SwingPoint], List[SwingPoint]]:
     """
     Detecta puntos de swing (máximos y mínimos locales).
@@ -103,6 +217,10 @@ def detect_swings(data: pd.DataFrame, lookback: int = 5) -> Tuple[List[SwingPoin
     Un swing high es un máximo local rodeado de velas más bajas.
     Un swing low es un mínimo local rodeado de velas más altas.
     
+    El cálculo se hace sobre los arrays de numpy de 'high'/'low' (ver
+    _swing_arrays); solo se construyen objetos SwingPoint para los swings
+    encontrados.
+    
     Args:
         data: DataFrame con datos OHLCV
         lookback: Número de velas a cada lado para confirmar el swing
@@ -110,68 +228,133 @@ def detect_swings(data: pd.DataFrame, lookback: int = 5) -> Tuple[List[SwingPoin
     Returns:
         Tupla con (lista de swing highs, lista de swing lows)
     """
-    highs = []
-    lows = []
-    
-    for i in range(lookback, len(data) - lookback):
-        # Detecta swing high
-        current_high = data.iloc[i]['high']
-        is_swing_high = True
-        
-        # Verifica que las velas anteriores y posteriores tengan highs menores
-        for j in range(i - lookback, i + lookback + 1):
-            if j != i and data.iloc[j]['high'] >= current_high:
-                is_swing_high = False
-                break
-        
-        if is_swing_high:
-            # Calcula fuerza del swing (cuánto más alto es respecto a los alrededores)
-            avg_surrounding = (data.iloc[i-lookback:i]['high'].mean() + 
-                             data.iloc[i+1:i+lookback+1]['high'].mean()) / 2
-            strength = (current_high - avg_surrounding) / avg_surrounding * 100
-            
-            highs.append(SwingPoint(
-                index=i,
-                price=current_high,
-                timestamp=data.index[i],
-                swing_type='HIGH',
-                strength=min(strength, 5.0)  # Limita a 5
-            ))
-        
-        # Detecta swing low
-        current_low = data.iloc[i]['low']
-        is_swing_low = True
-        
-        # Verifica que las velas anteriores y posteriores tengan lows mayores
-        for j in range(i - lookback, i + lookback + 1):
-            if j != i and data.iloc[j]['low'] <= current_low:
-                is_swing_low = False
-                break
-        
-        if is_swing_low:
-            # Calcula fuerza del swing
-            avg_surrounding = (data.iloc[i-lookback:i]['low'].mean() + 
-                             data.iloc[i+1:i+lookback+1]['low'].mean()) / 2
-            strength = (avg_surrounding - current_low) / avg_surrounding * 100
-            
-            lows.append(SwingPoint(
-                index=i,
-                price=current_low,
-                timestamp=data.index[i],
-                swing_type='LOW',
-                strength=min(strength, 5.0)
-            ))
+    high_values = data['high'].to_numpy(dtype=np.float64)
+    low_values = data['low'].to_numpy(dtype=np.float64)
+    index = data.index
+    
+    high_idx, high_strength = _swing_arrays(high_values, lookback, find_high=True)
+    low_idx, low_strength = _swing_arrays(low_values, lookback, find_high=False)
+    
+    highs = [
+        SwingPoint(
+            index=int(i),
+            price=high_values[i],
+            timestamp=index[i],
+            swing_type='HIGH',
+            strength=strength
+        )
+        for i, strength in zip(high_idx, high_strength)
+    ]
+    
+    lows = [
+        SwingPoint(
+            index=int(i),
+            price=low_values[i],
+            timestamp=index[i],
+            swing_type='LOW',
+            strength=strength
+        )
+        for i, strength in zip(low_idx, low_strength)
+    ]
     
     return highs, lows
 
 
-def detect_bos_choch(data: pd.DataFrame, swing_highs: List[SwingPoint], 
-                     swing_lows: List[SwingPoint]) -> List[StructureBreak]:
+@dataclass
+class StructureBreakColumns:
     """
-    Detecta Break of Structure (BOS) y Change of Character (CHoCH).
+    BOS/CHoCH en formato columnar (un array de numpy por campo).
     
-    BOS: Ruptura de un swing high/low previo (cambio de estructura)
-    CHoCH: Cambio en la secuencia de máximos/mínimos (cambio de carácter)
+    Mismo orden que detect_bos_choch. Útil cuando solo se necesita contar
+    rupturas o mirar la última sin construir objetos StructureBreak.
+    """
+    index: np.ndarray      # int64: vela de la ruptura
+    is_choch: np.ndarray   # bool: True = CHoCH, False = BOS
+    direction: np.ndarray  # int8: 1 = BULLISH, -1 = BEARISH
+    price: np.ndarray      # float64
+    strength: np.ndarray   # float64
+    
+    def __len__(self) -> int:
+        return len(self.index)
+    
+    def to_list(self, data: pd.DataFrame) -> List[StructureBreak]:
+        """Convierte las columnas a la lista de StructureBreak de detect_bos_choch"""
+        timestamps = data.index
+        return [
+            StructureBreak(
+                index=int(i),
+                timestamp=timestamps[i],
+                break_type='CHoCH' if choch else 'BOS',
+                direction='BULLISH' if d > 0 else 'BEARISH',
+                price=price,
+                strength=strength
+            )
+            for i, choch, d, price, strength in zip(
+                self.index, self.is_choch, self.direction, self.price, self.strength
+            )
+        ]
+
+
+def _first_broken_swing(values: np.ndarray, swings: List[SwingPoint],
+                        bullish: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Para cada vela, el primer swing (en el orden de la lista) con índice
+    anterior a la vela que su high/low rompe.
+    
+    Con los swings en orden cronológico, los swings anteriores a la vela i
+    son un prefijo de la lista. El mínimo acumulado de los precios de los
+    swing highs (máximo acumulado para lows) es monótono, así que el primer
+    swing roto se encuentra con searchsorted para todas las velas a la vez:
+    O((n + swings) log swings) en lugar de O(n * swings).
+    
+    Args:
+        values: highs (bullish=True) o lows (bullish=False) de cada vela
+        swings: Swing highs o swing lows
+        bullish: True para rupturas de swing highs
+    
+    Returns:
+        Tupla con (velas con ruptura, posición en `swings` del swing roto)
+    """
+    n = len(values)
+    if n == 0 or not swings:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    
+    swing_idx = np.fromiter((s.index for s in swings), dtype=np.int64, count=len(swings))
+    swing_price = np.fromiter((s.price for s in swings), dtype=np.float64, count=len(swings))
+    
+    if np.any(np.diff(swing_idx) < 0):
+        # Lista fuera de orden cronológico: recorrido directo (misma semántica)
+        bars, positions = [], []
+        for i in range(n):
+            for k in range(len(swings)):
+                if swing_idx[k] < i and (values[i] > swing_price[k] if bullish
+                                         else values[i] < swing_price[k]):
+                    bars.append(i)
+                    positions.append(k)
+                    break
+        return np.asarray(bars, dtype=np.int64), np.asarray(positions, dtype=np.int64)
+    
+    bar_idx = np.arange(n)
+    # Cantidad de swings con índice < i (prefijo válido para cada vela)
+    available = np.searchsorted(swing_idx, bar_idx, side='left')
+    
+    if bullish:
+        # Primer k con min(precios[:k+1]) < high
+        neg_prefix = -np.fmin.accumulate(swing_price)
+        first = np.searchsorted(neg_prefix, -values, side='right')
+    else:
+        # Primer k con max(precios[:k+1]) > low
+        prefix = np.fmax.accumulate(swing_price)
+        first = np.searchsorted(prefix, values, side='right')
+    
+    bars = np.flatnonzero(first < available)
+    return bars, first[bars]
+
+
+def detect_bos_choch_columns(data: pd.DataFrame, swing_highs: List[SwingPoint],
+                             swing_lows: List[SwingPoint]) -> StructureBreakColumns:
+    """
+    Versión columnar de detect_bos_choch (mismas rupturas, mismo orden).
     
     Args:
         data: DataFrame con datos OHLCV
@@ -179,55 +362,22 @@ def detect_bos_choch(data: pd.DataFrame, swing_highs: List[SwingPoint],
         swing_lows: Lista de swing lows detectados
     
     Returns:
-        Lista de StructureBreak detectados
+        StructureBreakColumns con BOS alcistas, BOS bajistas y luego CHoCH
     """
-    breaks = []
+    high_values = data['high'].to_numpy(dtype=np.float64)
+    low_values = data['low'].to_numpy(dtype=np.float64)
     
-    # Detecta BOS alcista (ruptura de swing high)
-    for i in range(len(data)):
-        current_high = data.iloc[i]['high']
-        
-        # Busca swing highs anteriores que hayan sido rotos
-        for swing in swing_highs:
-            if swing.index < i and current_high > swing.price:
-                # Verifica que no haya sido detectado ya
-                already_detected = any(
-                    b.index == i and b.break_type == 'BOS' and b.direction == 'BULLISH'
-                    for b in breaks
-                )
-                
-                if not already_detected:
-                    breaks.append(StructureBreak(
-                        index=i,
-                        timestamp=data.index[i],
-                        break_type='BOS',
-                        direction='BULLISH',
-                        price=current_high,
-                        strength=swing.strength
-                    ))
-                    break  # Solo el primer swing roto cuenta
-    
-    # Detecta BOS bajista (ruptura de swing low)
-    for i in range(len(data)):
-        current_low = data.iloc[i]['low']
-        
-        for swing in swing_lows:
-            if swing.index < i and current_low < swing.price:
-                already_detected = any(
-                    b.index == i and b.break_type == 'BOS' and b.direction == 'BEARISH'
-                    for b in breaks
-                )
-                
-                if not already_detected:
-                    breaks.append(StructureBreak(
-                        index=i,
-                        timestamp=data.index[i],
-                        break_type='BOS',
-                        direction='BEARISH',
-                        price=current_low,
-                        strength=swing.strength
-                    ))
-                    break
+    bull_bars, bull_swings = _first_broken_swing(high_values, swing_highs, bullish=True)
+    bear_bars, bear_swings = _first_broken_swing(low_values, swing_lows, bullish=False)
+    
+    high_strength = np.array([s.strength for s in swing_highs], dtype=np.float64)
+    low_strength = np.array([s.strength for s in swing_lows], dtype=np.float64)
+    
+    index = [bull_bars, bear_bars]
+    direction = [np.ones(len(bull_bars), dtype=np.int8), -np.ones(len(bear_bars), dtype=np.int8)]
+    price = [high_values[bull_bars], low_values[bear_bars]]
+    strength = [high_strength[bull_swings], low_strength[bear_swings]]
+    choch_count = 0
     
     # Detecta CHoCH (Change of Character)
     # CHoCH alcista: secuencia de mínimos crecientes después de tendencia bajista
@@ -239,30 +389,82 @@ def detect_bos_choch(data: pd.DataFrame, swing_highs: List[SwingPoint],
         if len(recent_lows) >= 2:
             # Si el último mínimo es mayor que el anterior, posible CHoCH alcista
             if recent_lows[-1].price > recent_lows[-2].price:
-                breaks.append(StructureBreak(
-                    index=recent_lows[-1].index,
-                    timestamp=recent_lows[-1].timestamp,
-                    break_type='CHoCH',
-                    direction='BULLISH',
-                    price=recent_lows[-1].price,
-                    strength=2.0
-                ))
+                index.append(np.array([recent_lows[-1].index], dtype=np.int64))
+                direction.append(np.array([1], dtype=np.int8))
+                price.append(np.array([recent_lows[-1].price], dtype=np.float64))
+                strength.append(np.array([2.0]))
+                choch_count += 1
     
     if len(swing_highs) >= 3:
         # Verifica si hay cambio de carácter bajista
         recent_highs = [s for s in swing_highs if s.index >= len(data) - 50]
         if len(recent_highs) >= 2:
             if recent_highs[-1].price < recent_highs[-2].price:
-                breaks.append(StructureBreak(
-                    index=recent_highs[-1].index,
-                    timestamp=recent_highs[-1].timestamp,
-                    break_type='CHoCH',
-                    direction='BEARISH',
-                    price=recent_highs[-1].price,
-                    strength=2.0
-                ))
+                index.append(np.array([recent_highs[-1].index], dtype=np.int64))
+                direction.append(np.array([-1], dtype=np.int8))
+                price.append(np.array([recent_highs[-1].price], dtype=np.float64))
+                strength.append(np.array([2.0]))
+                choch_count += 1
+    
+    is_choch = np.zeros(len(bull_bars) + len(bear_bars) + choch_count, dtype=bool)
+    if choch_count:
+        is_choch[-choch_count:] = True
+    
+    return StructureBreakColumns(
+        index=np.concatenate(index).astype(np.int64),
+        is_choch=is_choch,
+        direction=np.concatenate(direction),
+        price=np.concatenate(price),
+        strength=np.concatenate(strength)
+    )
+
+
+def detect_bos_choch(data: pd.DataFrame, swing_highs: List[SwingPoint], 
+                     swing_lows: List[SwingPoint]) -> List[StructureBreak]:
+    """
+    Detecta Break of Structure (BOS) y Change of Character (CHoCH).
+    
+    BOS: Ruptura de un swing high/low previo (cambio de estructura)
+    CHoCH: Cambio en la secuencia de máximos/mínimos (cambio de carácter)
     
-    return breaks
+    Cada vela genera como mucho un BOS por dirección, con la fuerza del primer
+    swing que rompe. El cálculo es un único barrido vectorizado (ver
+    _first_broken_swing); para contar rupturas o leer la última sin crear
+    objetos usa detect_bos_choch_columns.
+    
+    Args:
+        data: DataFrame con datos OHLCV
+        swing_highs: Lista de swing highs detectados
+        swing_lows: Lista de swing lows detectados
+    
+    Returns:
+        Lista de StructureBreak detectados
+    """
+    return detect_bos_choch_columns(data, swing_highs, swing_lows).to_list(data)
+
+
+# Velas tras el swing en las que se busca su barrida (swing.index + 1 .. + 19)
+SWEEP_WINDOW = 19
+
+
+def _sweep_bars(high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                swing_idx: np.ndarray, swing_price: np.ndarray, high_sweep: bool) -> np.ndarray:
+    """
+    Vela de la barrida de cada swing: primera de las SWEEP_WINDOW velas
+    siguientes que rompe el precio del swing y cierra del otro lado.
+    
+    Returns:
+        Array int64 con la vela de la barrida (-1 = sin barrida)
+    """
+    idx, inside = window_indices(swing_idx + 1, SWEEP_WINDOW, len(high))
+    level = swing_price[:, None]
+    if high_sweep:
+        hits = inside & (high[idx] > level) & (close[idx] < level)
+    else:
+        hits = inside & (low[idx] < level) & (close[idx] > level)
+    
+    first = first_true(hits)
+    return np.where(first >= 0, swing_idx + 1 + first, -1)
 
 
 def detect_liquidity_sweeps(data: pd.DataFrame, swing_highs: List[SwingPoint],
@@ -273,6 +475,9 @@ def detect_liquidity_sweeps(data: pd.DataFrame, swing_highs: List[SwingPoint],
     Una barrida de liquidez ocurre cuando el precio rompe un swing high/low
     pero luego revierte rápidamente, "barriendo" las órdenes stop loss.
     
+    Las 19 velas posteriores a cada swing se evalúan a la vez (ver _sweep_bars);
+    solo se crean objetos LiquiditySweep para las barridas encontradas.
+    
     Args:
         data: DataFrame con datos OHLCV
         swing_highs: Lista de swing highs
@@ -281,50 +486,71 @@ def detect_liquidity_sweeps(data: pd.DataFrame, swing_highs: List[SwingPoint],
     Returns:
         Lista de LiquiditySweep detectados
     """
-    sweeps = []
-    
-    # Detecta barridas de swing highs (high sweeps)
-    for swing in swing_highs:
-        if swing.index >= len(data) - 20:  # Solo swings recientes
-            continue
-        
-        # Busca si después del swing hubo una ruptura y reversión
-        for i in range(swing.index + 1, min(swing.index + 20, len(data))):
-            # Si el precio rompió el swing high
-            if data.iloc[i]['high'] > swing.price:
-                # Verifica si luego revirtió (cierre por debajo del swing)
-                if data.iloc[i]['close'] < swing.price:
-                    sweeps.append(LiquiditySweep(
-                        index=i,
-                        timestamp=data.index[i],
-                        sweep_type='HIGH_SWEEP',
-                        price=data.iloc[i]['high'],
-                        target_price=swing.price,
-                        confirmed=True
-                    ))
-                    break
+    high = data['high'].to_numpy(dtype=np.float64)
+    low = data['low'].to_numpy(dtype=np.float64)
+    close = data['close'].to_numpy(dtype=np.float64)
+    index = data.index
     
-    # Detecta barridas de swing lows (low sweeps)
-    for swing in swing_lows:
-        if swing.index >= len(data) - 20:
+    sweeps = []
+    for swings, high_sweep in ((swing_highs, True), (swing_lows, False)):
+        # Solo swings con al menos 20 velas posteriores
+        recent = [s for s in swings if s.index < len(data) - 20]
+        if not recent:
             continue
+        swing_idx = np.fromiter((s.index for s in recent), dtype=np.int64, count=len(recent))
+        swing_price = np.fromiter((s.price for s in recent), dtype=np.float64, count=len(recent))
+        bars = _sweep_bars(high, low, close, swing_idx, swing_price, high_sweep)
         
-        for i in range(swing.index + 1, min(swing.index + 20, len(data))):
-            if data.iloc[i]['low'] < swing.price:
-                if data.iloc[i]['close'] > swing.price:
-                    sweeps.append(LiquiditySweep(
-                        index=i,
-                        timestamp=data.index[i],
-                        sweep_type='LOW_SWEEP',
-                        price=data.iloc[i]['low'],
-                        target_price=swing.price,
-                        confirmed=True
-                    ))
-                    break
+        for swing, i in zip(recent, bars):
+            if i < 0:
+                continue
+            sweeps.append(LiquiditySweep(
+                index=int(i),
+                timestamp=index[i],
+                sweep_type='HIGH_SWEEP' if high_sweep else 'LOW_SWEEP',
+                price=high[i] if high_sweep else low[i],
+                target_price=swing.price,
+                confirmed=True
+            ))
     
     return sweeps
 
 
+def _fair_value_gap_array(high: np.ndarray, low: np.ndarray) -> np.ndarray:
+    """
+    FVGs con comparaciones de arrays desplazados (vela anterior, actual y siguiente).
+    
+    Returns:
+        Array BLOCK_DTYPE ordenado por vela
+    """
+    n = len(high)
+    if n < 3:
+        return np.empty(0, dtype=BLOCK_DTYPE)
+    
+    prev_high, prev_low = high[:-2], low[:-2]
+    cur_high, cur_low = high[1:-1], low[1:-1]
+    next_high, next_low = high[2:], low[2:]
+    
+    # FVG alcista: el low de la vela actual y de la siguiente quedan sobre el high anterior
+    gap_up = cur_low > prev_high
+    bullish = gap_up & (next_low > prev_high)
+    # FVG bajista (solo si no hubo gap alcista, como el elif original)
+    bearish = ~gap_up & (cur_high < prev_low) & (next_high < prev_low)
+    
+    positions = np.flatnonzero(bullish | bearish)
+    is_bull = bullish[positions]
+    
+    return _block_array(
+        BlockType.FAIR_VALUE_GAP,
+        direction=np.where(is_bull, 1, -1),
+        start_index=positions,
+        end_index=positions + 1,
+        start_price=np.where(is_bull, prev_high[positions], prev_low[positions]),
+        end_price=np.where(is_bull, cur_low[positions], cur_high[positions]),
+        strength=2.0
+    )
+
+
 def detect_fair_value_gaps(data: pd.DataFrame, lookback: int = 3) -> List[InstitutionalBlock]:
     """
     Detecta Fair Value Gaps (FVG).
@@ -339,47 +565,39 @@ def detect_fair_value_gaps(data: pd.DataFrame, lookback: int = 3) -> List[Instit
     Returns:
         Lista de InstitutionalBlock de tipo FVG
     """
-    fvgs = []
+    blocks = _fair_value_gap_array(data['high'].to_numpy(dtype=np.float64),
+                                   data['low'].to_numpy(dtype=np.float64))
+    return blocks_from_array(blocks, data)
+
+
+def _order_block_array(open_: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                       swing_highs: List[SwingPoint], swing_lows: List[SwingPoint]) -> np.ndarray:
+    """
+    Order Blocks a partir de los swings (alcistas primero, luego bajistas).
     
-    for i in range(1, len(data) - 1):
-        prev_candle = data.iloc[i - 1]
-        current_candle = data.iloc[i]
-        next_candle = data.iloc[i + 1]
-        
-        # FVG alcista: la vela actual tiene un gap hacia arriba
-        # El low de la vela actual es mayor que el high de la vela anterior
-        if current_candle['low'] > prev_candle['high']:
-            # Verifica que la siguiente vela no haya mitigado el gap
-            if next_candle['low'] > prev_candle['high']:
-                fvgs.append(InstitutionalBlock(
-                    block_type=BlockType.FAIR_VALUE_GAP,
-                    start_index=i - 1,
-                    end_index=i,
-                    start_price=prev_candle['high'],
-                    end_price=current_candle['low'],
-                    timestamp=data.index[i],
-                    direction='BULLISH',
-                    mitigated=False,
-                    strength=2.0
-                ))
-        
-        # FVG bajista: la vela actual tiene un gap hacia abajo
-        # El high de la vela actual es menor que el low de la vela anterior
-        elif current_candle['high'] < prev_candle['low']:
-            if next_candle['high'] < prev_candle['low']:
-                fvgs.append(InstitutionalBlock(
-                    block_type=BlockType.FAIR_VALUE_GAP,
-                    start_index=i - 1,
-                    end_index=i,
-                    start_price=prev_candle['low'],
-                    end_price=current_candle['high'],
-                    timestamp=data.index[i],
-                    direction='BEARISH',
-                    mitigated=False,
-                    strength=2.0
-                ))
-    
-    return fvgs
+    Returns:
+        Array BLOCK_DTYPE en el orden de detect_order_blocks
+    """
+    low_idx = np.fromiter((s.index for s in swing_lows), dtype=np.int64, count=len(swing_lows)) - 1
+    high_idx = np.fromiter((s.index for s in swing_highs), dtype=np.int64, count=len(swing_highs)) - 1
+    
+    # OB alcista: última vela bajista antes de un swing low
+    low_idx = low_idx[low_idx >= 0]
+    bull = low_idx[close[low_idx] < open_[low_idx]]
+    # OB bajista: última vela alcista antes de un swing high
+    high_idx = high_idx[high_idx >= 0]
+    bear = high_idx[close[high_idx] > open_[high_idx]]
+    
+    idx = np.concatenate([bull, bear])
+    return _block_array(
+        BlockType.ORDER_BLOCK,
+        direction=np.concatenate([np.ones(len(bull)), -np.ones(len(bear))]),
+        start_index=idx,
+        end_index=idx,
+        start_price=low[idx],
+        end_price=high[idx],
+        strength=3.0
+    )
 
 
 def detect_order_blocks(data: pd.DataFrame, swing_highs: List[SwingPoint],
@@ -398,48 +616,94 @@ def detect_order_blocks(data: pd.DataFrame, swing_highs: List[SwingPoint],
     Returns:
         Lista de InstitutionalBlock de tipo ORDER_BLOCK
     """
-    obs = []
-    
-    # Order Block alcista: última vela bajista antes de un swing low
-    for swing_low in swing_lows:
-        if swing_low.index > 0:
-            prev_candle = data.iloc[swing_low.index - 1]
-            # Si la vela anterior fue bajista (cierre < apertura)
-            if prev_candle['close'] < prev_candle['open']:
-                obs.append(InstitutionalBlock(
-                    block_type=BlockType.ORDER_BLOCK,
-                    start_index=swing_low.index - 1,
-                    end_index=swing_low.index - 1,
-                    start_price=prev_candle['low'],
-                    end_price=prev_candle['high'],
-                    timestamp=prev_candle.name,
-                    direction='BULLISH',
-                    mitigated=False,
-                    strength=3.0
-                ))
-    
-    # Order Block bajista: última vela alcista antes de un swing high
-    for swing_high in swing_highs:
-        if swing_high.index > 0:
-            prev_candle = data.iloc[swing_high.index - 1]
-            # Si la vela anterior fue alcista (cierre > apertura)
-            if prev_candle['close'] > prev_candle['open']:
-                obs.append(InstitutionalBlock(
-                    block_type=BlockType.ORDER_BLOCK,
-                    start_index=swing_high.index - 1,
-                    end_index=swing_high.index - 1,
-                    start_price=prev_candle['low'],
-                    end_price=prev_candle['high'],
-                    timestamp=prev_candle.name,
-                    direction='BEARISH',
-                    mitigated=False,
-                    strength=3.0
-                ))
-    
-    return obs
-
-
-def detect_mitigation_blocks(data: pd.DataFrame, blocks: List[InstitutionalBlock]) -> List[InstitutionalBlock]:
+    blocks = _order_block_array(
+        data['open'].to_numpy(dtype=np.float64), data['high'].to_numpy(dtype=np.float64),
+        data['low'].to_numpy(dtype=np.float64), data['close'].to_numpy(dtype=np.float64),
+        swing_highs, swing_lows
+    )
+    return blocks_from_array(blocks, data)
+
+
+class FirstTouchResolver:
+    """
+    Resuelve "¿en qué vela el precio tocó este nivel por primera vez?".
+    
+    Precalcula una SparseTable (utils/rolling_windows.py) del mínimo de 'low'
+    y otra del máximo de 'high' sobre rangos de 2^k velas (O(n log n) una
+    sola vez). Cada consulta salta bloques de velas que no tocan el nivel,
+    de mayor a menor tamaño, así que encuentra la primera vela que lo toca
+    en O(log n) en lugar de recorrer vela a vela. Las consultas están
+    vectorizadas: se resuelven todos los bloques a la vez.
+    
+    Se construye una vez por DataFrame y se comparte entre
+    detect_mitigation_blocks, detect_breaker_blocks y las validaciones de
+    la estrategia.
+    """
+    
+    def __init__(self, data: pd.DataFrame):
+        self.low = data['low'].to_numpy(dtype=np.float64)
+        self.high = data['high'].to_numpy(dtype=np.float64)
+        self.close = data['close'].to_numpy(dtype=np.float64)
+        self.n = len(self.low)
+        self._min_low = SparseTable(self.low, np.fmin)
+        self._max_high = SparseTable(self.high, np.fmax)
+    
+    def first_low_at_or_below(self, start, threshold, stop=None) -> np.ndarray:
+        """
+        Primera vela i en [start, stop) con low[i] <= threshold.
+        
+        Args:
+            start: Vela inicial (escalar o array, una por bloque)
+            threshold: Nivel de precio (escalar o array)
+            stop: Vela final exclusiva (por defecto, el final de los datos)
+        
+        Returns:
+            Array de índices (-1 si el nivel no se tocó)
+        """
+        return self._min_low.first(start, threshold, np.less_equal, stop)
+    
+    def first_high_at_or_above(self, start, threshold, stop=None) -> np.ndarray:
+        """Primera vela i en [start, stop) con high[i] >= threshold (-1 si no hay)"""
+        return self._max_high.first(start, threshold, np.greater_equal, stop)
+    
+    def first_low_below(self, start, threshold, stop=None) -> np.ndarray:
+        """Primera vela i en [start, stop) con low[i] < threshold (-1 si no hay)"""
+        return self._min_low.first(start, threshold, np.less, stop)
+    
+    def first_high_above(self, start, threshold, stop=None) -> np.ndarray:
+        """Primera vela i en [start, stop) con high[i] > threshold (-1 si no hay)"""
+        return self._max_high.first(start, threshold, np.greater, stop)
+    
+    def first_touch(self, blocks: List[InstitutionalBlock], start=None) -> np.ndarray:
+        """
+        Primera vela que toca cada bloque: low <= end_price para bloques
+        alcistas, high >= start_price para bajistas.
+        
+        Args:
+            blocks: Bloques a resolver
+            start: Vela inicial (por defecto, la vela siguiente a end_index)
+        
+        Returns:
+            Array con el índice de mitigación de cada bloque (-1 si no hay)
+        """
+        if not blocks:
+            return np.empty(0, dtype=np.int64)
+        
+        bullish = np.array([b.direction == 'BULLISH' for b in blocks])
+        if start is None:
+            start = np.array([b.end_index + 1 for b in blocks], dtype=np.int64)
+        level = np.array([b.end_price if b.direction == 'BULLISH' else b.start_price
+                          for b in blocks], dtype=np.float64)
+        
+        touched = np.full(len(blocks), -1, dtype=np.int64)
+        start = np.broadcast_to(np.asarray(start, dtype=np.int64), bullish.shape)
+        touched[bullish] = self.first_low_at_or_below(start[bullish], level[bullish])
+        touched[~bullish] = self.first_high_at_or_above(start[~bullish], level[~bullish])
+        return touched
+
+
+def detect_mitigation_blocks(data: pd.DataFrame, blocks: List[InstitutionalBlock],
+                             resolver: Optional[FirstTouchResolver] = None) -> List[InstitutionalBlock]:
     """
     Detecta Mitigation Blocks y marca bloques mitigados.
     
@@ -449,34 +713,30 @@ def detect_mitigation_blocks(data: pd.DataFrame, blocks: List[InstitutionalBlock
     Args:
         data: DataFrame con datos OHLCV
         blocks: Lista de bloques institucionales a verificar
+        resolver: FirstTouchResolver ya construido sobre data (opcional,
+                  para compartirlo entre varias llamadas)
     
     Returns:
         Lista actualizada de bloques con información de mitigación
     """
-    mitigation_blocks = []
-    
-    for block in blocks:
-        # Verifica si el bloque ha sido mitigado
-        if not block.mitigated:
-            for i in range(block.end_index + 1, len(data)):
-                candle = data.iloc[i]
-                
-                # Verifica si el precio tocó el bloque
-                if block.direction == 'BULLISH':
-                    if candle['low'] <= block.end_price:
-                        block.mitigated = True
-                        block.mitigation_index = i
-                        break
-                else:  # BEARISH
-                    if candle['high'] >= block.start_price:
-                        block.mitigated = True
-                        block.mitigation_index = i
-                        break
+    pending = [block for block in blocks if not block.mitigated]
+    if not pending:
+        return blocks
+    
+    if resolver is None:
+        resolver = FirstTouchResolver(data)
+    
+    # Primera vela posterior al bloque que toca su nivel
+    for block, index in zip(pending, resolver.first_touch(pending)):
+        if index >= 0:
+            block.mitigated = True
+            block.mitigation_index = int(index)
     
     return blocks
 
 
-def detect_breaker_blocks(data: pd.DataFrame, order_blocks: List[InstitutionalBlock]) -> List[InstitutionalBlock]:
+def detect_breaker_blocks(data: pd.DataFrame, order_blocks: List[InstitutionalBlock],
+                          resolver: Optional[FirstTouchResolver] = None) -> List[InstitutionalBlock]:
     """
     Detecta Breaker Blocks.
     
@@ -485,56 +745,94 @@ def detect_breaker_blocks(data: pd.DataFrame, order_blocks: List[InstitutionalBl
     Args:
         data: DataFrame con datos OHLCV
         order_blocks: Lista de Order Blocks detectados
+        resolver: FirstTouchResolver ya construido sobre data (opcional)
     
     Returns:
         Lista de Breaker Blocks
     """
-    breakers = []
-    
-    for ob in order_blocks:
-        # Verifica si el OB fue roto después de su formación
-        for i in range(ob.end_index + 1, len(data)):
-            candle = data.iloc[i]
-            
-            if ob.direction == 'BULLISH':
-                # Si el precio rompió por debajo del OB
-                if candle['low'] < ob.start_price:
-                    # Y luego volvió a actuar como soporte
-                    for j in range(i + 1, min(i + 10, len(data))):
-                        if data.iloc[j]['low'] >= ob.start_price and data.iloc[j]['close'] > ob.start_price:
-                            breakers.append(InstitutionalBlock(
-                                block_type=BlockType.BREAKER_BLOCK,
-                                start_index=ob.start_index,
-                                end_index=ob.end_index,
-                                start_price=ob.start_price,
-                                end_price=ob.end_price,
-                                timestamp=ob.timestamp,
-                                direction='BULLISH',
-                                mitigated=False,
-                                strength=4.0
-                            ))
-                            break
-                    break
-            
-            else:  # BEARISH
-                if candle['high'] > ob.end_price:
-                    for j in range(i + 1, min(i + 10, len(data))):
-                        if data.iloc[j]['high'] <= ob.end_price and data.iloc[j]['close'] < ob.end_price:
-                            breakers.append(InstitutionalBlock(
-                                block_type=BlockType.BREAKER_BLOCK,
-                                start_index=ob.start_index,
-                                end_index=ob.end_index,
-                                start_price=ob.start_price,
-                                end_price=ob.end_price,
-                                timestamp=ob.timestamp,
-                                direction='BEARISH',
-                                mitigated=False,
-                                strength=4.0
-                            ))
-                            break
-                    break
+    if not order_blocks:
+        return []
+    
+    if resolver is None:
+        resolver = FirstTouchResolver(data)
+    low, high, close, n = resolver.low, resolver.high, resolver.close, resolver.n
+    
+    bullish = np.array([ob.direction == 'BULLISH' for ob in order_blocks])
+    start = np.array([ob.end_index + 1 for ob in order_blocks], dtype=np.int64)
+    start_price = np.array([ob.start_price for ob in order_blocks], dtype=np.float64)
+    end_price = np.array([ob.end_price for ob in order_blocks], dtype=np.float64)
+    
+    # Primera ruptura del OB (por debajo si es alcista, por encima si es bajista)
+    broken = np.full(len(order_blocks), -1, dtype=np.int64)
+    broken[bullish] = resolver.first_low_below(start[bullish], start_price[bullish])
+    broken[~bullish] = resolver.first_high_above(start[~bullish], end_price[~bullish])
+    
+    # Y luego volvió a actuar como soporte/resistencia en las 9 velas siguientes
+    idx, inside = window_indices(broken + 1, 9, n)
+    valid = inside & (broken >= 0)[:, None]
+    start_level, end_level = start_price[:, None], end_price[:, None]
+    holds_support = (low[idx] >= start_level) & (close[idx] > start_level)
+    holds_resistance = (high[idx] <= end_level) & (close[idx] < end_level)
+    is_breaker = (valid & np.where(bullish[:, None], holds_support, holds_resistance)).any(axis=1)
+    
+    return [
+        InstitutionalBlock(
+            block_type=BlockType.BREAKER_BLOCK,
+            start_index=ob.start_index,
+            end_index=ob.end_index,
+            start_price=ob.start_price,
+            end_price=ob.end_price,
+            timestamp=ob.timestamp,
+            direction=ob.direction,
+            mitigated=False,
+            strength=4.0
+        )
+        for ob, breaker in zip(order_blocks, is_breaker) if breaker
+    ]
+
+
+def _rejection_block_array(open_: np.ndarray, high: np.ndarray, low: np.ndarray,
+                           close: np.ndarray, lookback: int = 5) -> np.ndarray:
+    """
+    Rejection Blocks con el escaneo de 10 velas hacia adelante reemplazado
+    por un máximo/mínimo deslizante de las 9 velas siguientes (window_max /
+    window_min).
     
-    return breakers
+    Returns:
+        Array BLOCK_DTYPE ordenado por vela
+    """
+    n = len(high)
+    if n - 2 * lookback <= 0:
+        return np.empty(0, dtype=BLOCK_DTYPE)
+    
+    forward = 9  # velas i+1 .. i+9 (range(i + 1, i + 10) original)
+    next_max_high = window_max(high, 1, forward)
+    next_min_low = window_min(low, 1, forward)
+    
+    body = np.abs(close - open_)
+    upper_wick = high - np.maximum(open_, close)
+    lower_wick = np.minimum(open_, close) - low
+    
+    in_range = np.zeros(n, dtype=bool)
+    in_range[lookback:n - lookback] = True
+    
+    # Rechazo bajista: mecha superior larga y el precio no volvió al high
+    bearish = in_range & (upper_wick > body * 2) & (close < open_) & (next_max_high < high)
+    # Rechazo alcista: mecha inferior larga y el precio no volvió al low
+    bullish = in_range & (lower_wick > body * 2) & (close > open_) & (next_min_low > low)
+    
+    positions = np.flatnonzero(bearish | bullish)
+    is_bull = bullish[positions]
+    
+    return _block_array(
+        BlockType.REJECTION_BLOCK,
+        direction=np.where(is_bull, 1, -1),
+        start_index=positions,
+        end_index=positions,
+        start_price=np.where(is_bull, low[positions], high[positions] - upper_wick[positions] * 0.5),
+        end_price=np.where(is_bull, low[positions] + lower_wick[positions] * 0.5, high[positions]),
+        strength=2.5
+    )
 
 
 def detect_rejection_blocks(data: pd.DataFrame, lookback: int = 5) -> List[InstitutionalBlock]:
@@ -551,60 +849,48 @@ def detect_rejection_blocks(data: pd.DataFrame, lookback: int = 5) -> List[Insti
     Returns:
         Lista de Rejection Blocks
     """
-    rejections = []
+    blocks = _rejection_block_array(
+        data['open'].to_numpy(dtype=np.float64), data['high'].to_numpy(dtype=np.float64),
+        data['low'].to_numpy(dtype=np.float64), data['close'].to_numpy(dtype=np.float64),
+        lookback
+    )
+    return blocks_from_array(blocks, data)
+
+
+def detect_blocks_array(data: pd.DataFrame, swing_highs: List[SwingPoint],
+                        swing_lows: List[SwingPoint],
+                        rejection_lookback: Optional[int] = 5) -> np.ndarray:
+    """
+    Detecta FVGs, Order Blocks y Rejection Blocks en un solo paso.
     
-    for i in range(lookback, len(data) - lookback):
-        candle = data.iloc[i]
-        
-        # Rechazo alcista: vela con mecha superior larga (wick)
-        upper_wick = candle['high'] - max(candle['open'], candle['close'])
-        body = abs(candle['close'] - candle['open'])
-        
-        if upper_wick > body * 2 and candle['close'] < candle['open']:
-            # Verifica que el precio no volvió a esa zona
-            rejected = True
-            for j in range(i + 1, min(i + 10, len(data))):
-                if data.iloc[j]['high'] >= candle['high']:
-                    rejected = False
-                    break
-            
-            if rejected:
-                rejections.append(InstitutionalBlock(
-                    block_type=BlockType.REJECTION_BLOCK,
-                    start_index=i,
-                    end_index=i,
-                    start_price=candle['high'] - upper_wick * 0.5,
-                    end_price=candle['high'],
-                    timestamp=candle.name,
-                    direction='BEARISH',
-                    mitigated=False,
-                    strength=2.5
-                ))
-        
-        # Rechazo bajista: vela con mecha inferior larga
-        lower_wick = min(candle['open'], candle['close']) - candle['low']
-        
-        if lower_wick > body * 2 and candle['close'] > candle['open']:
-            rejected = True
-            for j in range(i + 1, min(i + 10, len(data))):
-                if data.iloc[j]['low'] <= candle['low']:
-                    rejected = False
-                    break
-            
-            if rejected:
-                rejections.append(InstitutionalBlock(
-                    block_type=BlockType.REJECTION_BLOCK,
-                    start_index=i,
-                    end_index=i,
-                    start_price=candle['low'],
-                    end_price=candle['low'] + lower_wick * 0.5,
-                    timestamp=candle.name,
-                    direction='BULLISH',
-                    mitigated=False,
-                    strength=2.5
-                ))
-    
-    return rejections
+    Extrae una vez los arrays open/high/low/close y devuelve todos los bloques
+    en un array compacto BLOCK_DTYPE: primero los FVG, luego los OB y al final
+    los Rejection Blocks, cada grupo en el mismo orden que su detector.
+    Usa blocks_from_array(blocks, data, BlockType.X) para obtener la lista
+    de InstitutionalBlock de un tipo.
+    
+    Args:
+        data: DataFrame con datos OHLCV
+        swing_highs: Lista de swing highs (para los OB)
+        swing_lows: Lista de swing lows (para los OB)
+        rejection_lookback: lookback de detect_rejection_blocks (None = no detectar)
+    
+    Returns:
+        Array con dtype BLOCK_DTYPE
+    """
+    open_ = data['open'].to_numpy(dtype=np.float64)
+    high = data['high'].to_numpy(dtype=np.float64)
+    low = data['low'].to_numpy(dtype=np.float64)
+    close = data['close'].to_numpy(dtype=np.float64)
+    
+    parts = [
+        _fair_value_gap_array(high, low),
+        _order_block_array(open_, high, low, close, swing_highs, swing_lows)
+    ]
+    if rejection_lookback is not None:
+        parts.append(_rejection_block_array(open_, high, low, close, rejection_lookback))
+    
+    return np.concatenate(parts)
 
 
 def detect_liquidity_voids(data: pd.DataFrame, fvgs: List[InstitutionalBlock]) -> List[InstitutionalBlock]:
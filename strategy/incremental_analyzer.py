@@ -0,0 +1,769 @@
+"""
+strategy/incremental_analyzer.py - Análisis ICT incremental (vela a vela)
+
+Mantiene el estado de estructura de un timeframe (swings confirmados, BOS,
+FVG, Order Blocks y su mitigación) y lo actualiza con cada vela nueva en
+lugar de recalcular todo el DataFrame desde la vela 0.
+
+Cada push() solo toca las últimas `lookback` velas:
+- Un swing en la vela i se confirma cuando llega la vela i + lookback
+- Un FVG en la vela i se confirma cuando llega la vela i + 1
+- Los BOS se buscan con una SparseTable de los precios de los swings
+  (búsqueda binaria del primer swing roto)
+- Los bloques abiertos viven en heaps ordenados por precio, así una vela nueva
+  solo saca los bloques que realmente mitiga
+
+Los resultados son idénticos a los de detect_swings, detect_bos_choch,
+detect_fair_value_gaps, detect_order_blocks y detect_mitigation_blocks sobre
+el DataFrame pasado a update(), tanto si crece por el final (backtest) como
+si es una ventana de las últimas N velas que se desplaza (en vivo).
+
+Todo el estado guarda índices absolutos de vela (desde la primera procesada)
+y se convierte a índices de la ventana solo al exportar. Cuando la ventana se
+desplaza, solo se descartan por el principio las velas, swings y bloques que
+salieron (ver _trim); las listas se compactan cuando la parte descartada
+supera a la viva, así el coste por vela es O(1) amortizado (O(log n) para el
+BOS) y la memoria no crece con el historial.
+"""
+
+import heapq
+from bisect import bisect_left
+from collections import deque
+from dataclasses import replace
+from typing import Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from strategy.ict_utils import (
+    SwingPoint, StructureBreak, InstitutionalBlock, BlockType
+)
+
+
+class _SwingSeries:
+    """
+    Swings confirmados de un lado (highs o lows) en orden cronológico.
+
+    Los swings se agregan por el final y salen por el principio cuando la
+    ventana se desplaza. Cada swing tiene un número de secuencia absoluto;
+    `first` es el primero que sigue en la ventana.
+
+    Para el BOS hay que encontrar el primer swing de la ventana que rompe un
+    precio. Las claves (precio para highs, -precio para lows) se guardan en
+    una SparseTable por extremo derecho: levels[k][p] es el mínimo de las
+    claves p - 2^k + 1 .. p. Agregar un swing cuesta O(log n) y la búsqueda
+    del primer swing roto es binaria sobre mínimos de rango en O(1).
+    """
+
+    def __init__(self, sign: int):
+        """
+        Args:
+            sign: 1 para swing highs (los rompe un high mayor), -1 para swing
+                  lows (los rompe un low menor)
+        """
+        self.sign = sign
+        self.swings: List[SwingPoint] = []
+        self.indices: List[int] = []
+        self.levels: List[List[float]] = [[]]
+        self.base = 0   # Secuencia del primer swing guardado
+        self.first = 0  # Secuencia del primer swing de la ventana
+
+    @property
+    def end(self) -> int:
+        """Secuencia siguiente al último swing"""
+        return self.base + len(self.swings)
+
+    def window(self) -> List[SwingPoint]:
+        """Swings de la ventana"""
+        return self.swings[self.first - self.base:]
+
+    def get(self, seq: int) -> SwingPoint:
+        return self.swings[seq - self.base]
+
+    def append(self, swing: SwingPoint) -> int:
+        """Agrega un swing al final y devuelve su secuencia"""
+        self.swings.append(swing)
+        self.indices.append(swing.index)
+        self.levels[0].append(self.sign * swing.price)
+
+        p = len(self.swings) - 1
+        for k in range(1, len(self.levels)):
+            prev, half = self.levels[k - 1], 1 << (k - 1)
+            self.levels[k].append(min(prev[p], prev[p - half]) if p >= half else prev[p])
+        if (1 << len(self.levels)) <= p + 1:
+            self._add_level()
+        return p + self.base
+
+    def pop(self):
+        """Quita el último swing (revisión de la vela en formación)"""
+        self.swings.pop()
+        self.indices.pop()
+        for level in self.levels:
+            level.pop()
+
+    def drop_before(self, index: int) -> range:
+        """
+        Saca de la ventana los swings con índice de vela < index.
+
+        Returns:
+            Secuencias de los swings descartados
+        """
+        start = self.first
+        end = self.end
+        while self.first < end and self.indices[self.first - self.base] < index:
+            self.first += 1
+
+        # Compacta cuando los descartados superan a los de la ventana
+        dead = self.first - self.base
+        if dead and dead >= len(self.swings) - dead:
+            del self.swings[:dead]
+            del self.indices[:dead]
+            self.levels = [self.levels[0][dead:]]
+            while (1 << len(self.levels)) <= len(self.swings):
+                self._add_level()
+            self.base = self.first
+        return range(start, self.first)
+
+    def count_before(self, bar: int) -> int:
+        """Secuencia siguiente al último swing con índice de vela < bar"""
+        return self.base + bisect_left(self.indices, bar)
+
+    def first_broken(self, value: float, stop: int) -> Optional[int]:
+        """
+        Primer swing de la ventana (secuencia < stop) que `value` rompe.
+
+        Args:
+            value: high de la vela (highs) o low de la vela (lows)
+            stop: Secuencia límite exclusiva (ver count_before)
+
+        Returns:
+            Secuencia del swing roto o None
+        """
+        x = self.sign * value
+        lo = self.first - self.base
+        hi = stop - self.base - 1
+        if hi < lo or self._range_min(lo, hi) >= x:
+            return None
+        left, right = lo, hi
+        while left < right:
+            mid = (left + right) // 2
+            if self._range_min(lo, mid) < x:
+                right = mid
+            else:
+                left = mid + 1
+        return left + self.base
+
+    def first_broken_many(self, values: np.ndarray, bars: np.ndarray) -> np.ndarray:
+        """
+        first_broken para varias velas a la vez (mínimo acumulado de la
+        ventana y searchsorted, como _first_broken_swing).
+
+        Args:
+            values: highs o lows de las velas
+            bars: Índices de las velas (para limitar a los swings anteriores)
+
+        Returns:
+            Secuencia del swing roto por cada vela (-1 si no rompe ninguno)
+        """
+        lo = self.first - self.base
+        prefix = np.minimum.accumulate(np.asarray(self.levels[0][lo:], dtype=np.float64))
+        available = np.searchsorted(np.asarray(self.indices[lo:], dtype=np.int64), bars, side='left')
+        first = np.searchsorted(-prefix, -self.sign * values, side='right')
+        return np.where(first < available, first + self.first, -1)
+
+    def _range_min(self, lo: int, hi: int) -> float:
+        k = (hi - lo + 1).bit_length() - 1
+        level = self.levels[k]
+        return min(level[hi], level[lo + (1 << k) - 1])
+
+    def _add_level(self):
+        prev, half = self.levels[-1], 1 << (len(self.levels) - 1)
+        self.levels.append([min(prev[p], prev[p - half]) if p >= half else prev[p]
+                            for p in range(len(prev))])
+
+
+class IncrementalStructureAnalyzer:
+    """
+    Estado de estructura ICT de un timeframe que se actualiza vela a vela.
+
+    Uso típico:
+        analyzer = IncrementalStructureAnalyzer(lookback=5, timeframe='M3')
+        analyzer.update(df_M3)          # Solo procesa las velas nuevas
+        highs, lows = analyzer.swings(df_M3)
+        breaks = analyzer.structure_breaks(df_M3)
+
+    Los getters aceptan el DataFrame que se está analizando y devuelven los
+    índices relativos a ese DataFrame (útil cuando es una ventana de las
+    últimas N velas, como en vivo).
+    """
+
+    def __init__(self, lookback: int = 5, timeframe: Optional[str] = None):
+        """
+        Args:
+            lookback: Velas a cada lado para confirmar un swing
+            timeframe: Nombre del timeframe (solo informativo)
+        """
+        if lookback < 1:
+            raise ValueError("lookback debe ser >= 1")
+        self.lookback = lookback
+        self.timeframe = timeframe
+        self.reset()
+
+    def reset(self):
+        """Descarta todo el estado acumulado"""
+        # Velas desde el índice absoluto _base; la ventana empieza en _start
+        self._base = 0
+        self._start = 0
+        self._timestamps: List[pd.Timestamp] = []
+        self._open: List[float] = []
+        self._high: List[float] = []
+        self._low: List[float] = []
+        self._close: List[float] = []
+
+        self._swing_highs = _SwingSeries(1)
+        self._swing_lows = _SwingSeries(-1)
+
+        # BOS por vela (alineado con las velas): (precio, fuerza, secuencia del swing roto)
+        self._bullish_breaks: List[Optional[Tuple[float, float, int]]] = []
+        self._bearish_breaks: List[Optional[Tuple[float, float, int]]] = []
+        # Velas cuyo BOS apunta a cada swing (se recalculan si el swing sale)
+        self._bullish_refs: Dict[int, List[int]] = {}
+        self._bearish_refs: Dict[int, List[int]] = {}
+
+        self._fvgs: Deque[InstitutionalBlock] = deque()
+        self._bullish_obs: Deque[InstitutionalBlock] = deque()
+        self._bearish_obs: Deque[InstitutionalBlock] = deque()
+
+        # Bloques abiertos (no mitigados)
+        # BULLISH: max-heap por end_price / BEARISH: min-heap por start_price
+        # Los que salen de la ventana se descartan al llegar a la cima
+        self._open_bullish: List[Tuple[float, int, InstitutionalBlock]] = []
+        self._open_bearish: List[Tuple[float, int, InstitutionalBlock]] = []
+        self._block_seq = 0
+        self._expired_open = 0
+
+        # Registro de cambios del último push() para poder revisar la vela en formación
+        self._journal: Optional[Dict] = None
+
+    @property
+    def _end(self) -> int:
+        """Índice absoluto siguiente a la última vela"""
+        return self._base + len(self._timestamps)
+
+    @property
+    def n_bars(self) -> int:
+        """Número de velas de la ventana"""
+        return self._end - self._start
+
+    @property
+    def last_timestamp(self) -> Optional[pd.Timestamp]:
+        """Timestamp de la última vela procesada"""
+        return self._timestamps[-1] if self.n_bars else None
+
+    # ==================== ACTUALIZACIÓN ====================
+
+    def push(self, candle, timestamp: Optional[pd.Timestamp] = None):
+        """
+        Procesa una vela nueva.
+
+        Args:
+            candle: pd.Series (con el timestamp como name) o dict con
+                    'open', 'high', 'low', 'close' y opcionalmente 'timestamp'
+            timestamp: Timestamp de la vela (si no viene en candle)
+        """
+        if timestamp is None:
+            timestamp = candle.get('timestamp')
+            if timestamp is None:
+                timestamp = getattr(candle, 'name', None)
+        self._push_values(timestamp, float(candle['open']), float(candle['high']),
+                          float(candle['low']), float(candle['close']))
+
+    def update(self, data: pd.DataFrame) -> int:
+        """
+        Sincroniza el estado con un DataFrame procesando solo las velas nuevas.
+
+        - Velas con timestamp posterior a la última procesada se agregan con push()
+        - Si la última vela procesada cambió (vela todavía en formación) se revisa
+        - Si el DataFrame empieza más adelante (ventana deslizante) se descartan
+          las velas que ya no contiene
+        - Si el DataFrame no es continuación de lo procesado, se reconstruye
+
+        Args:
+            data: DataFrame OHLC con índice de timestamps ordenado
+
+        Returns:
+            Número de velas procesadas en esta llamada
+        """
+        if len(data) == 0:
+            return 0
+
+        index = data.index
+        start = 0
+
+        if self.n_bars:
+            last_ts = self._timestamps[-1]
+            pos = int(index.searchsorted(last_ts))
+            first_pos = self.n_bars - 1 - pos
+
+            if (pos < len(index) and index[pos] == last_ts and first_pos >= 0
+                    and self._timestamps[self._start - self._base + first_pos] == index[0]):
+                row = data.iloc[pos]
+                stored = (self._open[-1], self._high[-1], self._low[-1], self._close[-1])
+                current = (float(row['open']), float(row['high']),
+                           float(row['low']), float(row['close']))
+
+                if current == stored:
+                    start = pos + 1
+                elif self._journal is not None:
+                    # La última vela seguía en formación: revierte y reprocesa
+                    self._undo_last_push()
+                    start = pos
+                else:
+                    self.reset()
+
+                if self.n_bars:
+                    self._trim(first_pos)
+            else:
+                self.reset()
+
+        if start >= len(data):
+            return 0
+
+        opens = data['open'].to_numpy(dtype=np.float64)
+        highs = data['high'].to_numpy(dtype=np.float64)
+        lows = data['low'].to_numpy(dtype=np.float64)
+        closes = data['close'].to_numpy(dtype=np.float64)
+
+        for i in range(start, len(data)):
+            self._push_values(index[i], float(opens[i]), float(highs[i]),
+                              float(lows[i]), float(closes[i]))
+
+        return len(data) - start
+
+    def _push_values(self, timestamp, open_: float, high: float, low: float, close: float):
+        """Agrega una vela y actualiza solo el estado que depende de ella"""
+        journal = {
+            'swing_high': False,
+            'swing_low': False,
+            'breaks': [],
+            'blocks': [],
+            'mitigated': []
+        }
+        self._journal = journal
+
+        self._timestamps.append(timestamp)
+        self._open.append(open_)
+        self._high.append(high)
+        self._low.append(low)
+        self._close.append(close)
+        self._bullish_breaks.append(None)
+        self._bearish_breaks.append(None)
+
+        bar = self._end - 1
+
+        # 1. Mitigación de bloques abiertos con la vela nueva
+        self._mitigate_open_blocks(bar)
+
+        # 2. BOS de la vela nueva contra los swings ya confirmados
+        self._check_break(bar, bullish=True)
+        self._check_break(bar, bullish=False)
+
+        # 3. FVG centrado en la vela anterior (ya tiene vela siguiente)
+        if bar - self._start >= 2:
+            self._detect_fvg(bar - 1)
+
+        # 4. Swing centrado en bar - lookback (ya tiene lookback velas a cada lado)
+        center = bar - self.lookback
+        if center - self._start >= self.lookback:
+            self._confirm_swing(center)
+
+    def _confirm_swing(self, i: int):
+        """Confirma (si aplica) el swing high/low de la vela i"""
+        lb = self.lookback
+        p = i - self._base
+
+        highs = self._high[p - lb:p + lb + 1]
+        current_high = self._high[p]
+        if all(h < current_high for j, h in enumerate(highs) if j != lb):
+            avg_surrounding = (np.mean(highs[:lb]) + np.mean(highs[lb + 1:])) / 2
+            strength = (current_high - avg_surrounding) / avg_surrounding * 100
+            seq = self._swing_highs.append(SwingPoint(
+                index=i,
+                price=current_high,
+                timestamp=self._timestamps[p],
+                swing_type='HIGH',
+                strength=min(strength, 5.0)
+            ))
+            self._journal['swing_high'] = True
+
+            # Las velas posteriores al swing sin BOS pueden romperlo ahora
+            for bar in range(i + 1, self._end):
+                q = bar - self._base
+                if self._bullish_breaks[q] is None and self._high[q] > current_high:
+                    self._add_break(bar, True, seq)
+
+            # OB bajista: última vela alcista antes del swing high
+            if self._close[p - 1] > self._open[p - 1]:
+                self._add_block(self._bearish_obs, self._order_block(i - 1, 'BEARISH'))
+
+        lows = self._low[p - lb:p + lb + 1]
+        current_low = self._low[p]
+        if all(l > current_low for j, l in enumerate(lows) if j != lb):
+            avg_surrounding = (np.mean(lows[:lb]) + np.mean(lows[lb + 1:])) / 2
+            strength = (avg_surrounding - current_low) / avg_surrounding * 100
+            seq = self._swing_lows.append(SwingPoint(
+                index=i,
+                price=current_low,
+                timestamp=self._timestamps[p],
+                swing_type='LOW',
+                strength=min(strength, 5.0)
+            ))
+            self._journal['swing_low'] = True
+
+            for bar in range(i + 1, self._end):
+                q = bar - self._base
+                if self._bearish_breaks[q] is None and self._low[q] < current_low:
+                    self._add_break(bar, False, seq)
+
+            # OB alcista: última vela bajista antes del swing low
+            if self._close[p - 1] < self._open[p - 1]:
+                self._add_block(self._bullish_obs, self._order_block(i - 1, 'BULLISH'))
+
+    def _check_break(self, bar: int, bullish: bool):
+        """Primer swing (en orden) de la ventana, anterior a la vela, que esta rompe"""
+        series = self._swing_highs if bullish else self._swing_lows
+        value = (self._high if bullish else self._low)[bar - self._base]
+        seq = series.first_broken(value, series.count_before(bar))
+        if seq is not None:
+            self._add_break(bar, bullish, seq)
+
+    def _add_break(self, bar: int, bullish: bool, seq: int):
+        if bullish:
+            series, slots, refs, values = (self._swing_highs, self._bullish_breaks,
+                                           self._bullish_refs, self._high)
+        else:
+            series, slots, refs, values = (self._swing_lows, self._bearish_breaks,
+                                           self._bearish_refs, self._low)
+        q = bar - self._base
+        slots[q] = (values[q], series.get(seq).strength, seq)
+        refs.setdefault(seq, []).append(bar)
+        if self._journal is not None:
+            self._journal['breaks'].append((bar, bullish, seq))
+
+    def _detect_fvg(self, i: int):
+        """Detecta el FVG de la vela i (misma regla que detect_fair_value_gaps)"""
+        p = i - self._base
+        prev_high, prev_low = self._high[p - 1], self._low[p - 1]
+
+        if self._low[p] > prev_high:
+            if self._low[p + 1] > prev_high:
+                self._add_block(self._fvgs, InstitutionalBlock(
+                    block_type=BlockType.FAIR_VALUE_GAP,
+                    start_index=i - 1,
+                    end_index=i,
+                    start_price=prev_high,
+                    end_price=self._low[p],
+                    timestamp=self._timestamps[p],
+                    direction='BULLISH',
+                    mitigated=False,
+                    strength=2.0
+                ))
+        elif self._high[p] < prev_low:
+            if self._high[p + 1] < prev_low:
+                self._add_block(self._fvgs, InstitutionalBlock(
+                    block_type=BlockType.FAIR_VALUE_GAP,
+                    start_index=i - 1,
+                    end_index=i,
+                    start_price=prev_low,
+                    end_price=self._high[p],
+                    timestamp=self._timestamps[p],
+                    direction='BEARISH',
+                    mitigated=False,
+                    strength=2.0
+                ))
+
+    def _order_block(self, i: int, direction: str) -> InstitutionalBlock:
+        p = i - self._base
+        return InstitutionalBlock(
+            block_type=BlockType.ORDER_BLOCK,
+            start_index=i,
+            end_index=i,
+            start_price=self._low[p],
+            end_price=self._high[p],
+            timestamp=self._timestamps[p],
+            direction=direction,
+            mitigated=False,
+            strength=3.0
+        )
+
+    def _add_block(self, target: Deque[InstitutionalBlock], block: InstitutionalBlock):
+        """Registra un bloque y resuelve su mitigación con las velas ya conocidas"""
+        target.append(block)
+
+        # Como mucho lookback + 1 velas desde end_index hasta la última
+        for bar in range(block.end_index + 1, self._end):
+            if self._touches(block, bar):
+                block.mitigated = True
+                block.mitigation_index = bar
+                break
+
+        entry = None
+        if not block.mitigated:
+            self._block_seq += 1
+            if block.direction == 'BULLISH':
+                entry = (-block.end_price, self._block_seq, block)
+                heapq.heappush(self._open_bullish, entry)
+            else:
+                entry = (block.start_price, self._block_seq, block)
+                heapq.heappush(self._open_bearish, entry)
+
+        self._journal['blocks'].append((target, entry))
+
+    def _touches(self, block: InstitutionalBlock, bar: int) -> bool:
+        if block.direction == 'BULLISH':
+            return self._low[bar - self._base] <= block.end_price
+        return self._high[bar - self._base] >= block.start_price
+
+    def _expired(self, block: InstitutionalBlock) -> bool:
+        """True si el bloque salió de la ventana (un OB sale con su swing)"""
+        if block.block_type == BlockType.FAIR_VALUE_GAP:
+            return block.start_index < self._start
+        return block.start_index < self._start + self.lookback - 1
+
+    def _mitigate_open_blocks(self, bar: int):
+        """Saca de los heaps los bloques que toca la vela"""
+        low, high = self._low[bar - self._base], self._high[bar - self._base]
+
+        while self._open_bullish and -self._open_bullish[0][0] >= low:
+            self._close_open_block(self._open_bullish, bar)
+
+        while self._open_bearish and self._open_bearish[0][0] <= high:
+            self._close_open_block(self._open_bearish, bar)
+
+    def _close_open_block(self, heap: List, bar: int):
+        """Saca la cima del heap: la marca mitigada o la descarta si ya salió de la ventana"""
+        entry = heapq.heappop(heap)
+        if self._expired(entry[2]):
+            self._expired_open -= 1
+        else:
+            entry[2].mitigated = True
+            entry[2].mitigation_index = bar
+        self._journal['mitigated'].append((heap, entry))
+
+    def _undo_last_push(self):
+        """Revierte el último push() (solo un nivel)"""
+        journal = self._journal
+        self._journal = None
+
+        for target, entry in reversed(journal['blocks']):
+            target.pop()
+            if entry is not None:
+                heap = self._open_bullish if entry[2].direction == 'BULLISH' else self._open_bearish
+                heap.remove(entry)
+                heapq.heapify(heap)
+
+        for heap, entry in journal['mitigated']:
+            if self._expired(entry[2]):
+                self._expired_open += 1
+            else:
+                entry[2].mitigated = False
+                entry[2].mitigation_index = None
+            heapq.heappush(heap, entry)
+
+        for bar, bullish, seq in journal['breaks']:
+            refs = self._bullish_refs if bullish else self._bearish_refs
+            refs[seq].remove(bar)
+            if not refs[seq]:
+                del refs[seq]
+
+        if journal['swing_high']:
+            self._swing_highs.pop()
+        if journal['swing_low']:
+            self._swing_lows.pop()
+
+        # Los BOS de velas anteriores rompían el swing revertido: quedan sin BOS
+        for bar, bullish, seq in journal['breaks']:
+            (self._bullish_breaks if bullish else self._bearish_breaks)[bar - self._base] = None
+
+        for column in self._columns():
+            column.pop()
+
+    def _trim(self, count: int):
+        """
+        Descarta las `count` velas más antiguas (la ventana se desplazó).
+
+        Deja el mismo estado que procesar solo las velas restantes, tocando
+        solo lo que sale por el principio:
+        - Un swing necesita lookback velas a cada lado dentro de la ventana,
+          así que salen los de las primeras lookback velas (y sus OB)
+        - Un FVG necesita la vela anterior dentro de la ventana
+        - Solo se recalculan los BOS cuyo primer swing roto salió; para el
+          resto sigue siendo el primero de los swings que quedan
+        - Los bloques abiertos que salen se descartan al llegar a la cima
+          del heap, o al compactarlo
+        """
+        if count <= 0:
+            return
+        # El registro del último push() no contempla el recorte
+        self._journal = None
+        self._start += count
+
+        for bullish in (True, False):
+            series = self._swing_highs if bullish else self._swing_lows
+            refs = self._bullish_refs if bullish else self._bearish_refs
+            slots = self._bullish_breaks if bullish else self._bearish_breaks
+            stale = []
+            for seq in series.drop_before(self._start + self.lookback):
+                stale.extend(bar for bar in refs.pop(seq, ()) if bar >= self._start)
+            if not stale:
+                continue
+
+            # Suele ser la mayoría de las velas que rompieron el swing más antiguo:
+            # se resuelven todas juntas
+            prices = self._high if bullish else self._low
+            values = np.array([prices[bar - self._base] for bar in stale], dtype=np.float64)
+            seqs = series.first_broken_many(values, np.asarray(stale, dtype=np.int64))
+            for bar, seq in zip(stale, seqs.tolist()):
+                slots[bar - self._base] = None
+                if seq >= 0:
+                    self._add_break(bar, bullish, seq)
+
+        for blocks in (self._fvgs, self._bullish_obs, self._bearish_obs):
+            while blocks and self._expired(blocks[0]):
+                if not blocks.popleft().mitigated:
+                    self._expired_open += 1
+
+        heaps = (self._open_bullish, self._open_bearish)
+        if self._expired_open > 0 and 2 * self._expired_open >= len(heaps[0]) + len(heaps[1]):
+            for heap in heaps:
+                heap[:] = [entry for entry in heap if not self._expired(entry[2])]
+                heapq.heapify(heap)
+            self._expired_open = 0
+
+        # Compacta las velas cuando las descartadas superan a las de la ventana
+        dead = self._start - self._base
+        if dead >= self.n_bars:
+            for column in self._columns():
+                del column[:dead]
+            self._base = self._start
+
+    def _columns(self) -> Tuple[list, ...]:
+        """Listas alineadas con las velas"""
+        return (self._timestamps, self._open, self._high, self._low, self._close,
+                self._bullish_breaks, self._bearish_breaks)
+
+    # ==================== CONSULTAS ====================
+
+    def _origin(self, data: Optional[pd.DataFrame]) -> int:
+        """Índice absoluto de la primera vela de `data`"""
+        if data is None:
+            return self._start
+        return self._end - len(data)
+
+    def swings(self, data: Optional[pd.DataFrame] = None) -> Tuple[List[SwingPoint], List[SwingPoint]]:
+        """
+        Swings confirmados (equivalente a detect_swings).
+
+        Args:
+            data: DataFrame de referencia para los índices (opcional)
+
+        Returns:
+            Tupla con (swing highs, swing lows)
+        """
+        origin = self._origin(data)
+        return (
+            [replace(s, index=s.index - origin) for s in self._swing_highs.window() if s.index >= origin],
+            [replace(s, index=s.index - origin) for s in self._swing_lows.window() if s.index >= origin]
+        )
+
+    def structure_breaks(self, data: Optional[pd.DataFrame] = None) -> List[StructureBreak]:
+        """
+        BOS y CHoCH (equivalente a detect_bos_choch con los swings confirmados).
+
+        Args:
+            data: DataFrame de referencia para los índices (opcional)
+
+        Returns:
+            Lista de StructureBreak en el mismo orden que detect_bos_choch
+        """
+        origin = self._origin(data)
+        first = max(origin, self._start)
+        breaks = []
+
+        for direction, slots in (('BULLISH', self._bullish_breaks), ('BEARISH', self._bearish_breaks)):
+            for bar in range(first, self._end):
+                entry = slots[bar - self._base]
+                if entry is None:
+                    continue
+                breaks.append(StructureBreak(
+                    index=bar - origin,
+                    timestamp=self._timestamps[bar - self._base],
+                    break_type='BOS',
+                    direction=direction,
+                    price=entry[0],
+                    strength=entry[1]
+                ))
+
+        swing_highs, swing_lows = self.swings(data)
+        recent = self._end - 50 - origin  # Últimas 50 velas
+
+        if len(swing_lows) >= 3:
+            recent_lows = [s for s in swing_lows if s.index >= recent]
+            if len(recent_lows) >= 2 and recent_lows[-1].price > recent_lows[-2].price:
+                breaks.append(StructureBreak(
+                    index=recent_lows[-1].index,
+                    timestamp=recent_lows[-1].timestamp,
+                    break_type='CHoCH',
+                    direction='BULLISH',
+                    price=recent_lows[-1].price,
+                    strength=2.0
+                ))
+
+        if len(swing_highs) >= 3:
+            recent_highs = [s for s in swing_highs if s.index >= recent]
+            if len(recent_highs) >= 2 and recent_highs[-1].price < recent_highs[-2].price:
+                breaks.append(StructureBreak(
+                    index=recent_highs[-1].index,
+                    timestamp=recent_highs[-1].timestamp,
+                    break_type='CHoCH',
+                    direction='BEARISH',
+                    price=recent_highs[-1].price,
+                    strength=2.0
+                ))
+
+        return breaks
+
+    def _export_blocks(self, blocks: Deque[InstitutionalBlock], data: Optional[pd.DataFrame],
+                       with_mitigation: bool) -> List[InstitutionalBlock]:
+        """Copias de los bloques con índices de `data` (el estado interno nunca se expone)"""
+        origin = self._origin(data)
+        exported = []
+        for block in blocks:
+            if block.start_index < origin:
+                continue
+            mitigated = block.mitigated and with_mitigation
+            exported.append(replace(
+                block,
+                start_index=block.start_index - origin,
+                end_index=block.end_index - origin,
+                mitigated=mitigated,
+                mitigation_index=block.mitigation_index - origin if mitigated else None
+            ))
+        return exported
+
+    def fair_value_gaps(self, data: Optional[pd.DataFrame] = None,
+                        with_mitigation: bool = True) -> List[InstitutionalBlock]:
+        """
+        FVGs detectados (equivalente a detect_fair_value_gaps, más
+        detect_mitigation_blocks si with_mitigation=True).
+        """
+        return self._export_blocks(self._fvgs, data, with_mitigation)
+
+    def order_blocks(self, data: Optional[pd.DataFrame] = None,
+                     with_mitigation: bool = True) -> List[InstitutionalBlock]:
+        """
+        Order Blocks detectados (equivalente a detect_order_blocks, más
+        detect_mitigation_blocks si with_mitigation=True).
+        """
+        return (self._export_blocks(self._bullish_obs, data, with_mitigation) +
+                self._export_blocks(self._bearish_obs, data, with_mitigation))
@@ -35,7 +35,8 @@ try:
     
     # Inicializa Telegram
     print("Inicializando Telegram...")
-    telegram = TelegramAlerts(TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID)
+    # Envío síncrono: el script necesita saber si el mensaje llegó
+    telegram = TelegramAlerts(TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID, background=False)
     
     if not telegram.enabled:
         print("❌ Telegram no está habilitado")
@@ -0,0 +1,127 @@
+"""
+tests/test_batch_signals.py - Tests de la evaluación en lote de la entrada sniper
+"""
+
+import contextlib
+import io
+import os
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from backtest.ict_backtest_engine import ICTBacktestEngine
+from strategy.batch_signals import SIGNAL_COLUMNS, evaluate_sniper_batch
+from strategy.ict_hybrid_strategy import ICTHybridStrategy, MultiTimeframeContext, StrategyParams
+from strategy.ict_utils import TrendDirection
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+# Prefijo de cada justificación de find_sniper_entry → columna de confirmación
+JUSTIFICATION_FLAGS = {
+    'Barrida': 'sweep',
+    'Mitigación': 'mitigation',
+    'BOS/CHoCH': 'bos_choch',
+    'Vela institucional': 'institutional_candle',
+    'Divergencia': 'rsi_divergence'
+}
+
+
+def load_csv(name, bars):
+    df = pd.read_csv(os.path.join(DATA_DIR, name))
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    df.set_index('timestamp', inplace=True)
+    return df.tail(bars)
+
+
+class TestEvaluateSniperBatch(unittest.TestCase):
+    """Cada fila equivale a find_sniper_entry con las velas hasta esa vela"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.df = load_csv('XAUUSD_3m.csv', 3000).iloc[:220]
+
+    def assert_matches_per_bar(self, params, d1_trend):
+        strategy = ICTHybridStrategy(params=params)
+        batch = strategy.generate_signals(self.df, d1_trend=d1_trend)
+        self.assertEqual(list(batch.columns), SIGNAL_COLUMNS)
+        self.assertTrue(batch.index.equals(self.df.index))
+        self.assertTrue((batch['signal'].iloc[:49] == 'HOLD').all())
+
+        context = MultiTimeframeContext()
+        signals = 0
+        for t in range(49, len(self.df)):
+            context.d1_trend = d1_trend[t]
+            window = self.df.iloc[:t + 1]
+            with contextlib.redirect_stdout(io.StringIO()):
+                expected = strategy.find_sniper_entry(window, window, context)
+            row = batch.iloc[t]
+
+            if expected is None:
+                self.assertEqual(row['signal'], 'HOLD', f"vela {t}")
+                continue
+            signals += 1
+            flags = {flag for text in expected.justifications
+                     for prefix, flag in JUSTIFICATION_FLAGS.items() if text.startswith(prefix)}
+            self.assertEqual(flags, {flag for flag in JUSTIFICATION_FLAGS.values() if row[flag]})
+            self.assertEqual(
+                (row['signal'], row['direction'], row['entry_price'], row['stop_loss'],
+                 row['take_profit_1'], row['take_profit_2'], row['take_profit_final'], row['risk_reward']),
+                (expected.operation_type, expected.direction, expected.entry_price, expected.stop_loss,
+                 expected.take_profit_1, expected.take_profit_2, expected.take_profit_final,
+                 expected.risk_reward)
+            )
+        self.assertGreater(signals, 0)
+        return batch
+
+    def test_matches_find_sniper_entry(self):
+        # Tendencia D1 que cambia a mitad de los datos (alineada vela a vela)
+        d1_trend = np.array([None] * 120 + [TrendDirection.BEARISH] * 100, dtype=object)
+        self.assert_matches_per_bar(StrategyParams(), d1_trend)
+
+    def test_custom_params(self):
+        params = StrategyParams(lookback_sniper=3, min_score=2.5,
+                                confirmation_weights={'SWEEP': 1.0, 'RSI_DIVERGENCE': 1.5})
+        self.assert_matches_per_bar(params, np.full(len(self.df), None, dtype=object))
+
+    def test_short_data(self):
+        signals = evaluate_sniper_batch(self.df.iloc[:10], StrategyParams())
+        self.assertEqual(len(signals), 10)
+        self.assertTrue((signals['signal'] == 'HOLD').all())
+        self.assertEqual(len(evaluate_sniper_batch(self.df.iloc[:0], StrategyParams())), 0)
+
+
+class TestBatchBacktest(unittest.TestCase):
+    """El backtest con señales en lote hace las mismas operaciones que vela a vela"""
+
+    def test_same_trades(self):
+        data = {
+            'D1': load_csv('XAUUSD_1d.csv', 40),
+            'H4': load_csv('XAUUSD_4h.csv', 60),
+            'H1': load_csv('XAUUSD_1h.csv', 120),
+            'M15': load_csv('XAUUSD_15m.csv', 200),
+            'M5': load_csv('XAUUSD_5m.csv', 300),
+            'M3': load_csv('XAUUSD_3m.csv', 250)
+        }
+        results = []
+        for batch_signals in (False, True):
+            engine = ICTBacktestEngine(initial_capital=10000, commission=0.0001,
+                                       batch_signals=batch_signals)
+            with contextlib.redirect_stdout(io.StringIO()):
+                results.append(engine.run(data, ICTHybridStrategy()))
+
+        per_bar, batch = results
+        self.assertGreater(per_bar.total_trades, 0)
+        self.assertEqual(per_bar.signals_generated, batch.signals_generated)
+        self.assertEqual(
+            [(t.entry_time, t.exit_time, t.direction, t.entry_price, t.stop_loss,
+              t.take_profit_final, t.pnl) for t in per_bar.trades],
+            [(t.entry_time, t.exit_time, t.direction, t.entry_price, t.stop_loss,
+              t.take_profit_final, t.pnl) for t in batch.trades]
+        )
+        self.assertEqual(per_bar.total_pnl, batch.total_pnl)
+
+
+if __name__ == '__main__':
+    unittest.main()
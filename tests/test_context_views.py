@@ -0,0 +1,137 @@
+"""
+tests/test_context_views.py - Tests de las vistas de contexto del backtest
+"""
+
+import os
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from backtest.context_views import ContextViewProvider, read_only_frame
+from utils.timeframes import TIMEFRAME_PERIODS
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+
+def load_csv(name, bars):
+    df = pd.read_csv(os.path.join(DATA_DIR, name))
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    df.set_index('timestamp', inplace=True)
+    return df.tail(bars)
+
+
+class TestContextViewProvider(unittest.TestCase):
+    """Las vistas equivalen al filtro df[df.index <= current_time]"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.data = {
+            'H4': load_csv('XAUUSD_4h.csv', 100),
+            'H1': load_csv('XAUUSD_1h.csv', 300),
+            'M5': load_csv('XAUUSD_5m.csv', 500)
+        }
+        cls.base = cls.data['M5']
+        cls.provider = ContextViewProvider(cls.data, cls.base.index)
+
+    def test_matches_mask_filter(self):
+        """Mismas velas que el filtro original en cada vela base (sin futuro)"""
+        self.assertEqual(len(self.provider), len(self.base))
+        for i in range(0, len(self.base), 7):
+            current_time = self.base.index[i]
+            contexto = self.provider.context_at(i)
+            for tf_key, df in self.data.items():
+                expected = df[df.index <= current_time]
+                pd.testing.assert_frame_equal(expected, contexto[tf_key])
+                if len(contexto[tf_key]):
+                    self.assertLessEqual(contexto[tf_key].index[-1], current_time)
+
+    def test_views_do_not_copy(self):
+        """Las vistas comparten memoria con los datos precargados"""
+        view = self.provider.context_at(len(self.base) - 1)['H1']
+        full = self.provider.frames['H1']
+        self.assertTrue(np.shares_memory(view['close'].to_numpy(), full['close'].to_numpy()))
+
+    def test_views_are_read_only(self):
+        """La estrategia no puede modificar los datos del backtest"""
+        view = self.provider.context_at(len(self.base) - 1)['H1']
+        original = self.data['H1']['high'].iloc[0]
+
+        with self.assertRaises(ValueError):
+            view['high'].to_numpy()[0] = 0.0
+
+        view.loc[view.index[0], 'high'] = 0.0
+        view['signal'] = 'HOLD'
+        self.assertEqual(self.provider.frames['H1']['high'].iloc[0], original)
+        self.assertNotIn('signal', self.provider.frames['H1'].columns)
+        self.assertNotIn('signal', self.data['H1'].columns)
+
+    def test_unsorted_index(self):
+        """Con un índice desordenado las vistas siguen siendo correctas"""
+        shuffled = self.data['H4'].sample(frac=1.0, random_state=1)
+        provider = ContextViewProvider({'H4': shuffled}, self.base.index)
+        current_time = self.base.index[-1]
+        pd.testing.assert_frame_equal(
+            shuffled[shuffled.index <= current_time].sort_index(),
+            provider.context_at(len(self.base) - 1)['H4']
+        )
+
+    def test_read_only_frame_keeps_values(self):
+        """read_only_frame conserva índice, columnas y valores"""
+        df = self.data['H4']
+        pd.testing.assert_frame_equal(df, read_only_frame(df))
+
+
+class TestClosedCandleViews(unittest.TestCase):
+    """Con base_period solo se ven velas superiores ya cerradas"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.data = {
+            'D1': load_csv('XAUUSD_1d.csv', 30),
+            'H4': load_csv('XAUUSD_4h.csv', 100),
+            'H1': load_csv('XAUUSD_1h.csv', 300),
+            'M5': load_csv('XAUUSD_5m.csv', 500)
+        }
+        cls.base = cls.data['M5']
+        cls.provider = ContextViewProvider(cls.data, cls.base.index,
+                                           base_period=TIMEFRAME_PERIODS['M5'])
+
+    def test_excludes_forming_candles(self):
+        """La última vela de cada timeframe cierra antes que la vela base y la siguiente no"""
+        base_close = self.base.index + TIMEFRAME_PERIODS['M5']
+        for i in range(0, len(self.base), 7):
+            contexto = self.provider.context_at(i)
+            for tf_key, df in self.data.items():
+                period = TIMEFRAME_PERIODS[tf_key]
+                view = contexto[tf_key]
+                expected = df[df.index + period <= base_close[i]]
+                pd.testing.assert_frame_equal(expected, view)
+                if len(view) < len(df):
+                    self.assertGreater(df.index[len(view)] + period, base_close[i])
+
+    def test_base_timeframe_includes_current_bar(self):
+        """La vela base actual cuenta como cerrada: se decide a su cierre"""
+        contexto = self.provider.context_at(len(self.base) - 1)
+        self.assertEqual(contexto['M5'].index[-1], self.base.index[-1])
+
+    def test_forming_candle_visible_without_base_period(self):
+        """El corte por timestamp incluye la vela H4 en formación"""
+        open_provider = ContextViewProvider(self.data, self.base.index)
+        i = len(self.base) - 1
+        self.assertGreater(len(open_provider.context_at(i)['H4']),
+                           len(self.provider.context_at(i)['H4']))
+
+    def test_unknown_timeframe_uses_timestamp_cut(self):
+        data = {'custom': self.data['H1']}
+        provider = ContextViewProvider(data, self.base.index, base_period=TIMEFRAME_PERIODS['M5'])
+        current_time = self.base.index[-1]
+        pd.testing.assert_frame_equal(
+            data['custom'][data['custom'].index <= current_time],
+            provider.context_at(len(self.base) - 1)['custom']
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,505 @@
+"""
+tests/test_database.py - Tests de la base de datos de trading
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from utils.database import MIGRATIONS, REBUILD_AGGREGATES_SQL, TradingDatabase
+
+
+SIGNAL = {
+    "symbol": "XAUUSD",
+    "signal": "BUY",
+    "entry_price": 2000.0,
+    "stop_loss": 1990.0,
+    "take_profit_1": 2020.0,
+    "risk_reward": 2.0,
+    "justifications": ["BOS", "FVG"]
+}
+
+
+def record_session(db: TradingDatabase):
+    """Secuencia típica del loop: señales, trade, actualizaciones, cierre y estado"""
+    db.save_signal(SIGNAL, status="REJECTED", rejection_reason="RR insuficiente")
+    signal_id = db.save_signal(SIGNAL, status="ACCEPTED")
+    trade_id = db.save_trade(1001, SIGNAL, 0.1, 2000.0, 1990.0, 2020.0, signal_id=signal_id)
+    db.save_trade(1002, SIGNAL, 0.2, 2001.0, 1991.0, 2021.0, signal_id=signal_id)
+    for price in (2005.0, 2010.0):
+        db.update_position(1002, price, (price - 2001.0) * 20)
+    db.close_trade(1001, 2020.0, "TP1", 200.0, 1.0)
+    for blocked in (False, True):
+        db.save_bot_state("XAUUSD", "NORMAL", blocked, ["NFP"] if blocked else [], spread=20.0)
+    return signal_id, trade_id
+
+
+class TestTradingDatabase(unittest.TestCase):
+    """El modo write-behind guarda lo mismo que el modo síncrono"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def open(self, name: str, **kwargs) -> TradingDatabase:
+        db = TradingDatabase(os.path.join(self.tmp.name, name), **kwargs)
+        self.addCleanup(db.close)
+        return db
+
+    def dump(self, db: TradingDatabase):
+        db.flush()
+        tables = {}
+        for table, columns in (("signals", "id, status, rejection_reason"),
+                               ("trades", "id, signal_id, ticket, exit_price, pnl"),
+                               ("positions", "trade_id, ticket, current_price, unrealized_pnl"),
+                               ("bot_state", "blocked, reasons")):
+            rows = db.conn.execute(f"SELECT {columns} FROM {table} ORDER BY id").fetchall()
+            tables[table] = [tuple(row) for row in rows]
+        return tables
+
+    def test_write_behind_matches_sync(self):
+        sync_db = self.open("sync.db")
+        batched_db = self.open("batched.db", write_behind=True)
+        self.assertEqual(record_session(sync_db), record_session(batched_db))
+        self.assertEqual(self.dump(batched_db), self.dump(sync_db))
+        self.assertEqual(batched_db.get_open_positions()[0]["ticket"], 1002)
+        self.assertEqual(batched_db.get_performance_metrics()["total_trades"], 1)
+
+    def test_wal_journal(self):
+        db = self.open("wal.db", write_behind=True)
+        self.assertEqual(db.conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+
+    def test_ids_continue_after_reopen(self):
+        path = os.path.join(self.tmp.name, "reopen.db")
+        first = TradingDatabase(path, write_behind=True)
+        record_session(first)
+        first.close()
+        second = self.open("reopen.db", write_behind=True)
+        self.assertEqual(second.save_signal(SIGNAL), 3)
+        self.assertEqual(second.save_trade(1003, SIGNAL, 0.1, 2000.0, 1990.0, 2020.0), 3)
+
+    def test_ids_shared_with_other_writers(self):
+        bot = self.open("shared.db", write_behind=True, flush_interval=60)
+        # Otro proceso (script de validación, CLI) escribe en el mismo archivo
+        script = self.open("shared.db")
+        bot_ids = [bot.save_signal(SIGNAL) for _ in range(3)]
+        script_ids = [script.save_signal(SIGNAL) for _ in range(3)]
+        bot_ids.append(bot.save_signal(SIGNAL, status="ACCEPTED"))
+        bot.flush()
+        self.assertFalse(set(bot_ids) & set(script_ids))
+        self.assertEqual(bot.writer.failed, 0)
+        rows = bot.conn.execute("SELECT id FROM signals ORDER BY id").fetchall()
+        self.assertEqual(sorted(bot_ids + script_ids), [row[0] for row in rows])
+        self.assertEqual(bot.conn.execute("SELECT status FROM signals WHERE id = ?",
+                                          (bot_ids[-1],)).fetchone()[0], "ACCEPTED")
+
+    def test_rejection_reason_follows_pending_insert(self):
+        db = self.open("rejection.db", write_behind=True, flush_interval=60)
+        signal_id = db.save_signal(SIGNAL, status="ACCEPTED")
+        db.set_signal_rejection_reason(signal_id, "Error al ejecutar orden en MT5")
+        db.flush()
+        reason = db.conn.execute("SELECT rejection_reason FROM signals WHERE id = ?", (signal_id,)).fetchone()[0]
+        self.assertEqual(reason, "Error al ejecutar orden en MT5")
+
+    def test_close_flushes_pending_writes(self):
+        path = os.path.join(self.tmp.name, "close.db")
+        db = TradingDatabase(path, write_behind=True, flush_interval=60)
+        record_session(db)
+        db.close()
+        conn = sqlite3.connect(path)
+        self.addCleanup(conn.close)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM signals").fetchone()[0], 2)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM bot_state").fetchone()[0], 2)
+
+    def test_failed_write_does_not_lose_batch(self):
+        db = self.open("failed.db", write_behind=True, flush_interval=60)
+        db.save_trade(1001, SIGNAL, 0.1, 2000.0, 1990.0, 2020.0)
+        with mock.patch("builtins.print"):
+            # Ticket duplicado: falla solo esa escritura
+            db.save_trade(1001, SIGNAL, 0.1, 2000.0, 1990.0, 2020.0)
+            db.save_signal(SIGNAL)
+            db.flush()
+        self.assertEqual(db.writer.failed, 1)
+        self.assertEqual(len(db.get_trade_history()), 1)
+        self.assertEqual([p["trade_id"] for p in db.get_open_positions()], [1])
+        self.assertEqual(db.conn.execute("SELECT COUNT(*) FROM signals").fetchone()[0], 1)
+
+
+class TestSchema(unittest.TestCase):
+    """Migraciones versionadas y consultas por fecha con índice"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "schema.db")
+        self.db = TradingDatabase(self.path)
+        self.addCleanup(self.db.close)
+
+    def insert_trade(self, ticket, entry_time, exit_time=None, pnl=None):
+        self.db.conn.execute("""
+            INSERT INTO trades (ticket, symbol, direction, entry_time, entry_price,
+                                lot_size, stop_loss, take_profit, exit_time, pnl)
+            VALUES (?, 'XAUUSD', 'BUY', ?, 2000.0, 0.1, 1990.0, 2020.0, ?, ?)
+        """, (ticket, entry_time, exit_time, pnl))
+        self.db.conn.commit()
+
+    def test_migrations_applied_once(self):
+        latest = MIGRATIONS[-1].version
+        self.assertEqual(self.db.schema_version(), latest)
+        reopened = TradingDatabase(self.path)
+        self.addCleanup(reopened.close)
+        rows = reopened.conn.execute("SELECT version FROM schema_version").fetchall()
+        self.assertEqual([row[0] for row in rows], [m.version for m in MIGRATIONS])
+
+    def test_concurrent_open_skips_applied_migrations(self):
+        # Otro proceso migró entre la lectura de la versión y la transacción
+        with mock.patch.object(TradingDatabase, 'schema_version', return_value=0):
+            reopened = TradingDatabase(self.path)
+        self.addCleanup(reopened.close)
+        rows = reopened.conn.execute("SELECT version FROM schema_version").fetchall()
+        self.assertEqual([row[0] for row in rows], [m.version for m in MIGRATIONS])
+
+    def test_day_queries_use_indexes(self):
+        plans = {
+            "idx_trades_exit_time": "SELECT * FROM trades WHERE exit_time IS NOT NULL "
+                                    "AND exit_time >= ? AND exit_time < ?",
+            "idx_trades_entry_time": "SELECT * FROM trades WHERE entry_time IS NOT NULL "
+                                     "AND entry_time >= ? AND entry_time < ?",
+        }
+        for index, query in plans.items():
+            plan = " ".join(row[3] for row in self.db.conn.execute(
+                f"EXPLAIN QUERY PLAN {query}", ("2024-01-15", "2024-01-16")))
+            self.assertIn(index, plan)
+
+    def test_day_boundaries(self):
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        yesterday_late = today - timedelta(microseconds=1)
+        tomorrow = today + timedelta(days=1)
+        self.insert_trade(1, yesterday_late, yesterday_late, -50.0)
+        self.insert_trade(2, today, today, 100.0)
+        # Formato ISO con 'T' (como guarda save_bot_state)
+        self.insert_trade(3, today.isoformat(), (today + timedelta(hours=23)).isoformat(), -30.0)
+        self.insert_trade(4, tomorrow, tomorrow, 10.0)
+        self.db.rebuild_aggregates()
+
+        self.assertEqual({t["ticket"] for t in self.db.get_today_trades()}, {2, 3})
+        self.assertEqual({t["ticket"] for t in self.db.get_today_closed_trades()}, {2, 3})
+        metrics = self.db.get_performance_metrics(today_only=True)
+        self.assertEqual(metrics["total_trades"], 2)
+        self.assertAlmostEqual(metrics["total_pnl"], 70.0)
+        self.assertAlmostEqual(metrics["profit_factor"], 100.0 / 30.0)
+
+        week = self.db.get_trade_history(start_date=(today - timedelta(days=6)).date(), end_date=today.date())
+        self.assertEqual([t["ticket"] for t in week][-1], 1)
+        self.assertEqual(len(week), 3)
+        self.assertEqual(self.db.get_performance_metrics(start_date=tomorrow.date())["total_trades"], 1)
+        self.assertEqual(len(self.db.get_trade_history()), 4)
+
+
+class TestPerformanceAggregates(unittest.TestCase):
+    """Agregados incrementales de close_trade frente a recalcularlos desde trades"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def open(self, name: str, **kwargs) -> TradingDatabase:
+        db = TradingDatabase(os.path.join(self.tmp.name, name), **kwargs)
+        self.addCleanup(db.close)
+        return db
+
+    def aggregates(self, db: TradingDatabase):
+        db.flush()
+        queries = {
+            "performance_aggregates": "SELECT * FROM performance_aggregates ORDER BY period, symbol",
+            "daily_metrics": """
+                SELECT date, total_signals, accepted_signals, rejected_signals, trades_opened,
+                       trades_closed, total_pnl, win_rate, profit_factor, avg_risk_reward
+                FROM daily_metrics ORDER BY date
+            """
+        }
+        return {table: [tuple(row) for row in db.conn.execute(query)] for table, query in queries.items()}
+
+    def record_trades(self, db: TradingDatabase):
+        record_session(db)
+        silver = dict(SIGNAL, symbol="XAGUSD", risk_reward=3.0)
+        db.save_trade(2001, silver, 1.0, 25.0, 24.0, 28.0)
+        db.close_trade(2001, 24.0, "SL", -100.0, -0.5)
+        db.close_trade(1002, 2010.0, "TP1", 180.0, 0.9)
+        # Cerrar dos veces el mismo trade no lo cuenta dos veces
+        db.close_trade(1002, 2010.0, "TP1", 180.0, 0.9)
+
+    def test_incremental_matches_rebuild(self):
+        for write_behind in (False, True):
+            db = self.open(f"aggregates_{write_behind}.db", write_behind=write_behind)
+            self.record_trades(db)
+            incremental = self.aggregates(db)
+            db.rebuild_aggregates()
+            self.assertEqual(incremental, self.aggregates(db))
+
+    def test_metrics(self):
+        db = self.open("metrics.db")
+        self.record_trades(db)
+        metrics = db.get_performance_metrics()
+        self.assertEqual(metrics["total_trades"], 3)
+        self.assertEqual((metrics["winning_trades"], metrics["losing_trades"]), (2, 1))
+        self.assertAlmostEqual(metrics["total_pnl"], 280.0)
+        self.assertAlmostEqual(metrics["profit_factor"], 3.8)
+        self.assertAlmostEqual(metrics["avg_risk_reward"], 7.0 / 3)
+        self.assertAlmostEqual(metrics["avg_pnl"], 280.0 / 3)
+        self.assertEqual(db.get_performance_metrics(today_only=True), metrics)
+        self.assertEqual(db.get_performance_metrics(symbol="XAGUSD")["total_trades"], 1)
+        self.assertAlmostEqual(db.get_daily_drawdown_pct(), 280.0 / (2000.0 * 0.1 * 100) * 100)
+
+        day = db.conn.execute("SELECT * FROM daily_metrics").fetchone()
+        self.assertEqual((day["total_signals"], day["accepted_signals"], day["rejected_signals"]), (2, 1, 1))
+        self.assertEqual((day["trades_opened"], day["trades_closed"]), (3, 3))
+        self.assertAlmostEqual(day["win_rate"], 200.0 / 3)
+
+    def test_avg_pnl_ignores_missing_pnl(self):
+        db = self.open("null_pnl.db")
+        self.record_trades(db)
+        db.save_trade(3001, SIGNAL, 0.1, 2000.0, 1990.0, 2020.0)
+        db.close_trade(3001, 2000.0, "MANUAL", None, None)
+        incremental = db.get_performance_metrics()
+        self.assertEqual(incremental["total_trades"], 4)
+        # Igual que AVG(pnl) sobre trades: el trade sin pnl no cuenta
+        expected = db.conn.execute("SELECT AVG(pnl) FROM trades WHERE exit_time IS NOT NULL").fetchone()[0]
+        self.assertAlmostEqual(incremental["avg_pnl"], expected)
+        db.rebuild_aggregates()
+        self.assertEqual(db.get_performance_metrics(), incremental)
+
+    def test_migration_backfills_existing_trades(self):
+        path = os.path.join(self.tmp.name, "backfill.db")
+        # Base de datos anterior a los agregados (solo la migración 1)
+        with mock.patch("utils.database.MIGRATIONS", MIGRATIONS[:1]):
+            db = TradingDatabase(path)
+        now = datetime.now()
+        for ticket, pnl in ((1, 100.0), (2, -40.0)):
+            db.conn.execute("""
+                INSERT INTO trades (ticket, symbol, direction, entry_time, entry_price, lot_size,
+                                    stop_loss, take_profit, exit_time, pnl, risk_reward)
+                VALUES (?, 'XAUUSD', 'BUY', ?, 2000.0, 0.1, 1990.0, 2020.0, ?, ?, 2.0)
+            """, (ticket, now, now, pnl))
+        db.conn.commit()
+        db.close()
+
+        reopened = self.open("backfill.db")
+        self.assertEqual(reopened.schema_version(), MIGRATIONS[-1].version)
+        metrics = reopened.get_performance_metrics(today_only=True)
+        self.assertEqual(metrics["total_trades"], 2)
+        self.assertAlmostEqual(metrics["profit_factor"], 2.5)
+        self.assertEqual(reopened.conn.execute("SELECT trades_closed FROM daily_metrics").fetchone()[0], 2)
+
+    def test_upgrade_backfills_pnl_count(self):
+        path = os.path.join(self.tmp.name, "pnl_count.db")
+        # Base de datos con los agregados pero sin pnl_count (hasta la migración 3)
+        with mock.patch("utils.database.MIGRATIONS", MIGRATIONS[:3]):
+            db = TradingDatabase(path)
+        now = datetime.now()
+        for ticket, pnl in ((1, 100.0), (2, -40.0), (3, None)):
+            db.conn.execute("""
+                INSERT INTO trades (ticket, symbol, direction, entry_time, entry_price, lot_size,
+                                    stop_loss, take_profit, exit_time, pnl, risk_reward)
+                VALUES (?, 'XAUUSD', 'BUY', ?, 2000.0, 0.1, 1990.0, 2020.0, ?, ?, 2.0)
+            """, (ticket, now, now, pnl))
+        db.conn.commit()
+        db.close()
+
+        reopened = self.open("pnl_count.db")
+        expected = reopened.conn.execute("SELECT AVG(pnl) FROM trades WHERE exit_time IS NOT NULL").fetchone()[0]
+        self.assertAlmostEqual(reopened.get_performance_metrics()["avg_pnl"], expected)
+        # Las migraciones no copian el SQL del recálculo (puede cambiar después)
+        for migration in MIGRATIONS:
+            self.assertFalse(set(migration.statements) & set(REBUILD_AGGREGATES_SQL), migration.version)
+
+class TestBotStateRetention(unittest.TestCase):
+    """Run-length encoding de bot_state y compactación por horas"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def open(self, name: str, **kwargs) -> TradingDatabase:
+        db = TradingDatabase(os.path.join(self.tmp.name, name), **kwargs)
+        self.addCleanup(db.close)
+        return db
+
+    def record_states(self, db: TradingDatabase):
+        for spread in (20.0, 35.0, 25.0):
+            db.save_bot_state("XAUUSD", "NORMAL", False, [], spread=spread, atr_ratio=1.1)
+        db.save_bot_state("XAUUSD", "BLOCKED", True, ["NFP"], spread=60.0, atr_ratio=2.5)
+        db.save_bot_state("XAUUSD", "BLOCKED", True, ["NFP"], spread=40.0, atr_ratio=1.5)
+        db.save_bot_state("XAUUSD", "NORMAL", False, [], spread=22.0, atr_ratio=1.0)
+
+    def rows(self, db: TradingDatabase):
+        db.flush()
+        return [tuple(row) for row in db.conn.execute("""
+            SELECT news_mode, blocked, samples, spread, spread_min, spread_max, atr_ratio_max
+            FROM bot_state ORDER BY id
+        """)]
+
+    def test_only_state_changes_are_stored(self):
+        expected = [
+            ("NORMAL", 0, 3, 25.0, 20.0, 35.0, 1.1),
+            ("BLOCKED", 1, 2, 40.0, 40.0, 60.0, 2.5),
+            ("NORMAL", 0, 1, 22.0, 22.0, 22.0, 1.0),
+        ]
+        for write_behind in (False, True):
+            db = self.open(f"rle_{write_behind}.db", write_behind=write_behind)
+            self.record_states(db)
+            self.assertEqual(self.rows(db), expected)
+
+    def test_compaction_keeps_recent_rows(self):
+        db = self.open("compact.db")
+        old = datetime.now(timezone.utc) - timedelta(days=10)
+        old = old.replace(minute=0, second=0, microsecond=0)
+        for minute, mode, blocked, spread in ((0, "NORMAL", 0, 20.0), (10, "BLOCKED", 1, 80.0),
+                                              (20, "NORMAL", 0, 30.0), (70, "NORMAL", 0, 25.0)):
+            db.conn.execute("""
+                INSERT INTO bot_state (timestamp_utc, symbol, news_mode, blocked, spread, atr_ratio, daily_dd_pct)
+                VALUES (?, 'XAUUSD', ?, ?, ?, 1.0, -1.0)
+            """, ((old + timedelta(minutes=minute)).isoformat(), mode, blocked, spread))
+        db.conn.commit()
+        self.record_states(db)
+
+        result = db.compact_bot_state(raw_days=7)
+        self.assertEqual((result["compacted_rows"], result["hours"]), (4, 2))
+        self.assertEqual(len(self.rows(db)), 3)
+
+        hourly = [tuple(row) for row in db.conn.execute("""
+            SELECT samples, runs, mode_transitions, blocked_samples, spread_min, spread_max
+            FROM bot_state_hourly ORDER BY hour_utc
+        """)]
+        self.assertEqual(hourly, [(3, 3, 2, 1, 20.0, 80.0), (1, 1, 0, 0, 25.0, 25.0)])
+
+        # Los runs compactados no se extienden: el siguiente estado abre fila nueva
+        db.compact_bot_state(raw_days=0, now=datetime.now(timezone.utc) + timedelta(hours=2))
+        db.save_bot_state("XAUUSD", "NORMAL", False, [], spread=21.0)
+        self.assertEqual(self.rows(db), [("NORMAL", 0, 1, 21.0, 21.0, 21.0, None)])
+        self.assertEqual(db.conn.execute("SELECT SUM(samples) FROM bot_state_hourly").fetchone()[0], 10)
+
+    def test_transition_between_compactions(self):
+        db = self.open("transitions.db")
+        old = (datetime.now(timezone.utc) - timedelta(days=10)).replace(minute=0, second=0, microsecond=0)
+        for hour, mode in ((0, "NORMAL"), (2, "BLOCKED"), (4, "BLOCKED"), (4.5, "NORMAL")):
+            db.conn.execute("""
+                INSERT INTO bot_state (timestamp_utc, symbol, news_mode, blocked, spread)
+                VALUES (?, 'XAUUSD', ?, 0, 20.0)
+            """, ((old + timedelta(hours=hour)).isoformat(), mode))
+        db.conn.commit()
+
+        # Cada compactación resume un tramo: el cambio NORMAL -> BLOCKED queda entre dos
+        for hours in (1, 3, 5):
+            db.compact_bot_state(raw_days=7, now=old + timedelta(days=7, hours=hours))
+        hourly = [tuple(row) for row in db.conn.execute(
+            "SELECT runs, mode_transitions, last_mode FROM bot_state_hourly ORDER BY hour_utc"
+        )]
+        self.assertEqual(hourly, [(1, 0, "NORMAL"), (1, 1, "BLOCKED"), (2, 1, "NORMAL")])
+
+    def test_run_spanning_cutoff_is_kept(self):
+        db = self.open("spanning.db")
+        now = datetime.now(timezone.utc)
+        # Estado estable desde hace 10 días: un solo run que sigue abierto
+        for spread in (20.0, 22.0, 21.0):
+            db.save_bot_state("XAUUSD", "NORMAL", False, [], spread=spread)
+        db.conn.execute("UPDATE bot_state SET timestamp_utc = ?", ((now - timedelta(days=10)).isoformat(),))
+        db.conn.commit()
+
+        result = db.compact_bot_state(raw_days=7, now=now)
+        self.assertEqual((result["compacted_rows"], result["hours"]), (0, 0))
+        self.assertEqual(db.conn.execute("SELECT COUNT(*) FROM bot_state_hourly").fetchone()[0], 0)
+
+        # El run sigue abierto: la siguiente muestra lo extiende
+        db.save_bot_state("XAUUSD", "NORMAL", False, [], spread=25.0)
+        self.assertEqual(self.rows(db), [("NORMAL", 0, 4, 25.0, 20.0, 25.0, None)])
+
+        # Cuando termina antes del corte se compacta entero en la hora en que empezó
+        result = db.compact_bot_state(raw_days=7, now=now + timedelta(days=8))
+        self.assertEqual(result["compacted_rows"], 1)
+        self.assertEqual(db.conn.execute("SELECT SUM(samples) FROM bot_state_hourly").fetchone()[0], 4)
+
+    def test_incremental_vacuum(self):
+        db = self.open("vacuum.db")
+        self.assertEqual(db.conn.execute("PRAGMA auto_vacuum").fetchone()[0], 2)
+
+        # Base de datos creada sin auto_vacuum: la primera compactación lo activa
+        path = os.path.join(self.tmp.name, "legacy.db")
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE legacy (x)")
+        conn.close()
+        legacy = self.open("legacy.db")
+        self.assertEqual(legacy.conn.execute("PRAGMA auto_vacuum").fetchone()[0], 0)
+        legacy.compact_bot_state()
+        with legacy.pool.writer() as conn:
+            self.assertEqual(conn.execute("PRAGMA auto_vacuum").fetchone()[0], 2)
+
+
+class TestConcurrency(unittest.TestCase):
+    """Lecturas de reportes en otros hilos mientras el loop escribe"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def open(self, name: str, **kwargs) -> TradingDatabase:
+        db = TradingDatabase(os.path.join(self.tmp.name, name), **kwargs)
+        self.addCleanup(db.close)
+        return db
+
+    def run_reports_while_writing(self, db: TradingDatabase):
+        errors = []
+        done = threading.Event()
+
+        def report():
+            try:
+                while not done.is_set():
+                    db.get_performance_metrics()
+                    db.get_trade_history(limit=10)
+                    db.get_daily_drawdown_pct()
+            except Exception as e:
+                errors.append(e)
+
+        readers = [threading.Thread(target=report) for _ in range(3)]
+        for thread in readers:
+            thread.start()
+        try:
+            for ticket in range(50):
+                db.save_trade(ticket, SIGNAL, 0.1, 2000.0, 1990.0, 2020.0)
+                db.close_trade(ticket, 2020.0, "TP1", 10.0, 1.0)
+        finally:
+            done.set()
+            for thread in readers:
+                thread.join(10)
+        self.assertEqual(errors, [])
+        self.assertEqual(db.get_performance_metrics()["total_trades"], 50)
+
+    def test_reports_in_threads(self):
+        self.run_reports_while_writing(self.open("sync.db"))
+
+    def test_reports_in_threads_write_behind(self):
+        self.run_reports_while_writing(self.open("wb.db", write_behind=True, flush_interval=0.01))
+
+    def test_nested_transaction_rolls_back(self):
+        db = self.open("tx.db")
+        with db.transaction() as conn:
+            conn.execute("CREATE TABLE notes (text TEXT)")
+        with self.assertRaises(RuntimeError):
+            with db.transaction() as conn:
+                conn.execute("INSERT INTO notes VALUES ('exterior')")
+                with db.transaction() as inner:
+                    inner.execute("INSERT INTO notes VALUES ('anidada')")
+                raise RuntimeError()
+        self.assertEqual(db.conn.execute("SELECT COUNT(*) FROM notes").fetchone()[0], 0)
+
+        with db.transaction() as conn:
+            conn.execute("INSERT INTO notes VALUES ('exterior')")
+        self.assertEqual(db.conn.execute("SELECT COUNT(*) FROM notes").fetchone()[0], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
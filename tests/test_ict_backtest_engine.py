@@ -0,0 +1,154 @@
+"""
+tests/test_ict_backtest_engine.py - Tests del núcleo por eventos de ICTBacktestEngine
+"""
+
+import contextlib
+import io
+import os
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from backtest.ict_backtest_engine import ICTBacktestEngine, BacktestResults
+from strategy.ict_hybrid_strategy import ICTHybridStrategy, TradingSignal
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+
+def load_csv(name, bars):
+    df = pd.read_csv(os.path.join(DATA_DIR, name))
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    df.set_index('timestamp', inplace=True)
+    return df.tail(bars)
+
+
+class ScriptedStrategy(ICTHybridStrategy):
+    """Estrategia determinista: una señal cada `every` velas, sin análisis real"""
+
+    def __init__(self, every=23):
+        super().__init__()
+        self.every = every
+        self.analyzed = []
+
+    def analyze_D1(self, df_D1):
+        self.analyzed.append(df_D1.index[-1])
+
+    def analyze_H4(self, df_H4):
+        pass
+
+    def analyze_H1(self, df_H1):
+        pass
+
+    def analyze_M15_M5(self, df_M15, df_M5):
+        pass
+
+    def find_sniper_entry(self, df_M1, df_M3, contexto_global):
+        if len(df_M1) % self.every:
+            return None
+        price = df_M1['close'].iloc[-1]
+        direction = 'BUY' if (len(df_M1) // self.every) % 2 else 'SELL'
+        sign = 1 if direction == 'BUY' else -1
+        return TradingSignal(
+            direction='BULLISH' if direction == 'BUY' else 'BEARISH',
+            active_zones=[],
+            operation_type=direction,
+            entry_price=price,
+            stop_loss=price * (1 - sign * 0.002),
+            take_profit_1=price * (1 + sign * 0.002),
+            take_profit_2=price * (1 + sign * 0.004),
+            take_profit_final=price * (1 + sign * 0.006),
+            risk_reward=2.0,
+            justifications=[],
+            chart_data={}
+        )
+
+
+def reference_run(engine, data_dict, strategy):
+    """Bucle original vela a vela (iloc + equity por vela) como referencia"""
+    execution_data = data_dict['M3'].copy()
+    analysis_interval = max(1, len(execution_data) // 100)
+
+    for i in range(len(execution_data)):
+        current_bar = execution_data.iloc[i]
+        current_time = execution_data.index[i]
+
+        if i % analysis_interval == 0 or i == 0:
+            current_data_dict = {
+                tf_key: df[df.index <= current_time].copy() for tf_key, df in data_dict.items()
+            }
+            engine._run_multi_timeframe_analysis(current_data_dict, strategy, current_time)
+
+        if engine.position is not None:
+            engine._manage_position(current_bar['high'], current_bar['low'], current_time)
+
+        if engine.position is None:
+            signal = engine._check_for_signals(strategy, current_time, execution_data, i)
+            if signal:
+                engine._execute_signal(signal, current_bar['close'], current_time)
+
+        engine.equity_curve.append({
+            'timestamp': current_time,
+            'equity': engine._calculate_equity(current_bar['close']),
+            'capital': engine.capital
+        })
+
+    engine._equity = np.array([e['equity'] for e in engine.equity_curve])
+    if engine.position is not None:
+        engine._close_position(execution_data['close'].iloc[-1], execution_data.index[-1], 'END_OF_DATA')
+    return engine._calculate_results()
+
+
+class TestEventDrivenEngine(unittest.TestCase):
+    """El núcleo por eventos da los mismos resultados que el bucle vela a vela"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.data = {
+            'D1': load_csv('XAUUSD_1d.csv', 60),
+            'M3': load_csv('XAUUSD_3m.csv', 3000)
+        }
+
+    def run_both(self, every):
+        with contextlib.redirect_stdout(io.StringIO()):
+            expected = reference_run(ICTBacktestEngine(initial_capital=10000, commission=0.0001),
+                                     self.data, ScriptedStrategy(every))
+            strategy = ScriptedStrategy(every)
+            actual = ICTBacktestEngine(initial_capital=10000, commission=0.0001).run(self.data, strategy)
+        return expected, actual, strategy
+
+    def test_same_results_as_bar_loop(self):
+        """Mismos trades, métricas y curva de equity"""
+        for every in (23, 200):
+            expected, actual, _ = self.run_both(every)
+            self.assertIsInstance(actual, BacktestResults)
+            self.assertGreater(actual.total_trades, 5)
+
+            self.assertEqual(
+                [(t.entry_time, t.exit_time, t.direction, t.exit_reason) for t in expected.trades],
+                [(t.entry_time, t.exit_time, t.direction, t.exit_reason) for t in actual.trades]
+            )
+            for exp, act in zip(expected.trades, actual.trades):
+                self.assertAlmostEqual(exp.pnl, act.pnl, places=9)
+
+            self.assertEqual(len(expected.equity_curve), len(actual.equity_curve))
+            for exp, act in zip(expected.equity_curve, actual.equity_curve):
+                self.assertEqual(exp['timestamp'], act['timestamp'])
+                self.assertAlmostEqual(exp['equity'], act['equity'], places=6)
+                self.assertAlmostEqual(exp['capital'], act['capital'], places=6)
+
+            for name in ('final_capital', 'total_pnl', 'win_rate_pct', 'profit_factor',
+                         'max_drawdown_pct', 'max_drawdown_duration', 'sharpe_ratio'):
+                self.assertAlmostEqual(getattr(expected, name), getattr(actual, name), places=6, msg=name)
+            self.assertEqual(expected.signals_executed, actual.signals_executed)
+
+    def test_skips_superseded_analyses(self):
+        """Durante una posición solo se repite el último análisis antes de la salida"""
+        _, actual, strategy = self.run_both(23)
+        self.assertGreater(len(strategy.analyzed), 0)
+        self.assertLessEqual(len(strategy.analyzed), 101)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+"""
+tests/test_ict_hybrid_strategy.py - Tests de la caché de análisis de ICTHybridStrategy
+"""
+
+import contextlib
+import io
+import os
+import unittest
+
+import pandas as pd
+
+from strategy.ict_hybrid_strategy import ICTHybridStrategy, frame_cache_key
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+TIMEFRAME_FILES = {
+    'D1': 'XAUUSD_1d.csv',
+    'H4': 'XAUUSD_4h.csv',
+    'H1': 'XAUUSD_1h.csv',
+    'M15': 'XAUUSD_15m.csv',
+    'M5': 'XAUUSD_5m.csv',
+    'M3': 'XAUUSD_3m.csv'
+}
+
+
+def load_csv(name):
+    df = pd.read_csv(os.path.join(DATA_DIR, name))
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    df.set_index('timestamp', inplace=True)
+    return df
+
+
+def build_contexts(data, steps, step_bars=5, bars=200):
+    """Contextos como los de run_backtest: velas de cada timeframe hasta cada vela base"""
+    base = data['M3']
+    contexts = []
+    for i in range(len(base) - steps * step_bars, len(base), step_bars):
+        current_time = base.index[i]
+        contexts.append({
+            tf: df[df.index <= current_time].tail(bars)
+            for tf, df in data.items()
+        })
+    return contexts
+
+
+def run_quietly(strategy, contexto):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return strategy.generate_signal(contexto)
+
+
+class TestAnalysisCache(unittest.TestCase):
+    """La caché por timeframe no cambia el contexto ni las señales"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.data = {tf: load_csv(name) for tf, name in TIMEFRAME_FILES.items()}
+        cls.contexts = build_contexts(cls.data, steps=40)
+
+    def test_same_context_as_without_cache(self):
+        """Mismo contexto multi-temporal y misma señal en cada paso"""
+        cached = ICTHybridStrategy()
+        uncached = ICTHybridStrategy(analysis_cache_size=0)
+
+        for step, contexto in enumerate(self.contexts):
+            signal = run_quietly(cached, contexto)
+            expected = run_quietly(uncached, contexto)
+            self.assertEqual(expected, signal, f"paso {step}")
+            self.assertEqual(uncached.context, cached.context, f"paso {step}")
+
+        # D1/H4/H1 apenas cambian en 40 pasos de M3: casi todo son aciertos
+        self.assertGreater(cached.cache_hits, cached.cache_misses)
+        self.assertEqual(uncached.cache_hits, 0)
+
+    def test_cached_blocks_are_not_shared(self):
+        """Las mitigaciones de H1 no se filtran a la copia cacheada de H4"""
+        strategy = ICTHybridStrategy()
+        contexto = self.contexts[-1]
+        run_quietly(strategy, contexto)
+        first = strategy.context
+        strategy.context = type(first)()
+        run_quietly(strategy, contexto)
+
+        self.assertEqual(first, strategy.context)
+        self.assertIsNot(first.h4_order_blocks, strategy.context.h4_order_blocks)
+
+    def test_lru_eviction(self):
+        """La caché no supera analysis_cache_size entradas"""
+        strategy = ICTHybridStrategy(analysis_cache_size=3)
+        for contexto in self.contexts[:10]:
+            run_quietly(strategy, contexto)
+        self.assertLessEqual(len(strategy.analysis_cache), 3)
+
+        strategy.clear_analysis_cache()
+        self.assertEqual(len(strategy.analysis_cache), 0)
+
+    def test_frame_key_detects_forming_candle(self):
+        """Un cambio en la última vela (vela en formación) cambia la clave"""
+        df = self.data['H1'].tail(50)
+        revised = df.copy()
+        revised.iloc[-1, revised.columns.get_loc('high')] += 1.0
+        self.assertEqual(frame_cache_key(df), frame_cache_key(df.copy()))
+        self.assertNotEqual(frame_cache_key(df), frame_cache_key(revised))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,653 @@
+"""
+tests/test_ict_utils.py - Tests de equivalencia para los detectores ICT
+"""
+
+import os
+import unittest
+import glob
+
+import numpy as np
+import pandas as pd
+
+from strategy.ict_utils import (
+    SwingPoint, StructureBreak, InstitutionalBlock, BlockType, BLOCK_DTYPE,
+    detect_swings, detect_bos_choch, detect_bos_choch_columns,
+    detect_fair_value_gaps, detect_order_blocks, detect_rejection_blocks,
+    detect_blocks_array, blocks_from_array, detect_mitigation_blocks,
+    detect_breaker_blocks, detect_liquidity_sweeps, FirstTouchResolver, LiquiditySweep
+)
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+# Velas por archivo usadas en la comparación (la versión de referencia es lenta)
+SAMPLE_BARS = 600
+
+
+def load_sample_csvs():
+    """Carga las últimas SAMPLE_BARS velas de cada data/XAUUSD_*.csv"""
+    frames = {}
+    for csv_path in sorted(glob.glob(os.path.join(DATA_DIR, 'XAUUSD_*.csv'))):
+        df = pd.read_csv(csv_path)
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+        df.set_index('timestamp', inplace=True)
+        frames[os.path.basename(csv_path)] = df.tail(SAMPLE_BARS)
+    return frames
+
+
+def reference_detect_swings(data, lookback=5):
+    """Implementación original vela a vela de detect_swings (referencia)"""
+    highs = []
+    lows = []
+
+    for i in range(lookback, len(data) - lookback):
+        current_high = data.iloc[i]['high']
+        is_swing_high = True
+
+        for j in range(i - lookback, i + lookback + 1):
+            if j != i and data.iloc[j]['high'] >= current_high:
+                is_swing_high = False
+                break
+
+        if is_swing_high:
+            avg_surrounding = (data.iloc[i-lookback:i]['high'].mean() +
+                             data.iloc[i+1:i+lookback+1]['high'].mean()) / 2
+            strength = (current_high - avg_surrounding) / avg_surrounding * 100
+
+            highs.append(SwingPoint(
+                index=i,
+                price=current_high,
+                timestamp=data.index[i],
+                swing_type='HIGH',
+                strength=min(strength, 5.0)
+            ))
+
+        current_low = data.iloc[i]['low']
+        is_swing_low = True
+
+        for j in range(i - lookback, i + lookback + 1):
+            if j != i and data.iloc[j]['low'] <= current_low:
+                is_swing_low = False
+                break
+
+        if is_swing_low:
+            avg_surrounding = (data.iloc[i-lookback:i]['low'].mean() +
+                             data.iloc[i+1:i+lookback+1]['low'].mean()) / 2
+            strength = (avg_surrounding - current_low) / avg_surrounding * 100
+
+            lows.append(SwingPoint(
+                index=i,
+                price=current_low,
+                timestamp=data.index[i],
+                swing_type='LOW',
+                strength=min(strength, 5.0)
+            ))
+
+    return highs, lows
+
+
+def reference_detect_bos_choch(data, swing_highs, swing_lows):
+    """Implementación original de detect_bos_choch (referencia)"""
+    breaks = []
+
+    for i in range(len(data)):
+        current_high = data.iloc[i]['high']
+        for swing in swing_highs:
+            if swing.index < i and current_high > swing.price:
+                already_detected = any(
+                    b.index == i and b.break_type == 'BOS' and b.direction == 'BULLISH'
+                    for b in breaks
+                )
+                if not already_detected:
+                    breaks.append(StructureBreak(
+                        index=i,
+                        timestamp=data.index[i],
+                        break_type='BOS',
+                        direction='BULLISH',
+                        price=current_high,
+                        strength=swing.strength
+                    ))
+                    break
+
+    for i in range(len(data)):
+        current_low = data.iloc[i]['low']
+        for swing in swing_lows:
+            if swing.index < i and current_low < swing.price:
+                already_detected = any(
+                    b.index == i and b.break_type == 'BOS' and b.direction == 'BEARISH'
+                    for b in breaks
+                )
+                if not already_detected:
+                    breaks.append(StructureBreak(
+                        index=i,
+                        timestamp=data.index[i],
+                        break_type='BOS',
+                        direction='BEARISH',
+                        price=current_low,
+                        strength=swing.strength
+                    ))
+                    break
+
+    if len(swing_lows) >= 3:
+        recent_lows = [s for s in swing_lows if s.index >= len(data) - 50]
+        if len(recent_lows) >= 2:
+            if recent_lows[-1].price > recent_lows[-2].price:
+                breaks.append(StructureBreak(
+                    index=recent_lows[-1].index,
+                    timestamp=recent_lows[-1].timestamp,
+                    break_type='CHoCH',
+                    direction='BULLISH',
+                    price=recent_lows[-1].price,
+                    strength=2.0
+                ))
+
+    if len(swing_highs) >= 3:
+        recent_highs = [s for s in swing_highs if s.index >= len(data) - 50]
+        if len(recent_highs) >= 2:
+            if recent_highs[-1].price < recent_highs[-2].price:
+                breaks.append(StructureBreak(
+                    index=recent_highs[-1].index,
+                    timestamp=recent_highs[-1].timestamp,
+                    break_type='CHoCH',
+                    direction='BEARISH',
+                    price=recent_highs[-1].price,
+                    strength=2.0
+                ))
+
+    return breaks
+
+
+def reference_detect_fair_value_gaps(data):
+    """Implementación original vela a vela de detect_fair_value_gaps (referencia)"""
+    fvgs = []
+
+    for i in range(1, len(data) - 1):
+        prev_candle = data.iloc[i - 1]
+        current_candle = data.iloc[i]
+        next_candle = data.iloc[i + 1]
+
+        if current_candle['low'] > prev_candle['high']:
+            if next_candle['low'] > prev_candle['high']:
+                fvgs.append(InstitutionalBlock(
+                    block_type=BlockType.FAIR_VALUE_GAP,
+                    start_index=i - 1,
+                    end_index=i,
+                    start_price=prev_candle['high'],
+                    end_price=current_candle['low'],
+                    timestamp=data.index[i],
+                    direction='BULLISH',
+                    mitigated=False,
+                    strength=2.0
+                ))
+        elif current_candle['high'] < prev_candle['low']:
+            if next_candle['high'] < prev_candle['low']:
+                fvgs.append(InstitutionalBlock(
+                    block_type=BlockType.FAIR_VALUE_GAP,
+                    start_index=i - 1,
+                    end_index=i,
+                    start_price=prev_candle['low'],
+                    end_price=current_candle['high'],
+                    timestamp=data.index[i],
+                    direction='BEARISH',
+                    mitigated=False,
+                    strength=2.0
+                ))
+
+    return fvgs
+
+
+def reference_detect_order_blocks(data, swing_highs, swing_lows):
+    """Implementación original de detect_order_blocks (referencia)"""
+    obs = []
+
+    for swing_low in swing_lows:
+        if swing_low.index > 0:
+            prev_candle = data.iloc[swing_low.index - 1]
+            if prev_candle['close'] < prev_candle['open']:
+                obs.append(InstitutionalBlock(
+                    block_type=BlockType.ORDER_BLOCK,
+                    start_index=swing_low.index - 1,
+                    end_index=swing_low.index - 1,
+                    start_price=prev_candle['low'],
+                    end_price=prev_candle['high'],
+                    timestamp=prev_candle.name,
+                    direction='BULLISH',
+                    mitigated=False,
+                    strength=3.0
+                ))
+
+    for swing_high in swing_highs:
+        if swing_high.index > 0:
+            prev_candle = data.iloc[swing_high.index - 1]
+            if prev_candle['close'] > prev_candle['open']:
+                obs.append(InstitutionalBlock(
+                    block_type=BlockType.ORDER_BLOCK,
+                    start_index=swing_high.index - 1,
+                    end_index=swing_high.index - 1,
+                    start_price=prev_candle['low'],
+                    end_price=prev_candle['high'],
+                    timestamp=prev_candle.name,
+                    direction='BEARISH',
+                    mitigated=False,
+                    strength=3.0
+                ))
+
+    return obs
+
+
+def reference_detect_liquidity_sweeps(data, swing_highs, swing_lows):
+    """Implementación original de detect_liquidity_sweeps (referencia)"""
+    sweeps = []
+
+    for swing in swing_highs:
+        if swing.index >= len(data) - 20:
+            continue
+
+        for i in range(swing.index + 1, min(swing.index + 20, len(data))):
+            if data.iloc[i]['high'] > swing.price:
+                if data.iloc[i]['close'] < swing.price:
+                    sweeps.append(LiquiditySweep(
+                        index=i,
+                        timestamp=data.index[i],
+                        sweep_type='HIGH_SWEEP',
+                        price=data.iloc[i]['high'],
+                        target_price=swing.price,
+                        confirmed=True
+                    ))
+                    break
+
+    for swing in swing_lows:
+        if swing.index >= len(data) - 20:
+            continue
+
+        for i in range(swing.index + 1, min(swing.index + 20, len(data))):
+            if data.iloc[i]['low'] < swing.price:
+                if data.iloc[i]['close'] > swing.price:
+                    sweeps.append(LiquiditySweep(
+                        index=i,
+                        timestamp=data.index[i],
+                        sweep_type='LOW_SWEEP',
+                        price=data.iloc[i]['low'],
+                        target_price=swing.price,
+                        confirmed=True
+                    ))
+                    break
+
+    return sweeps
+
+
+def reference_detect_rejection_blocks(data, lookback=5):
+    """Implementación original de detect_rejection_blocks (referencia)"""
+    rejections = []
+
+    for i in range(lookback, len(data) - lookback):
+        candle = data.iloc[i]
+        upper_wick = candle['high'] - max(candle['open'], candle['close'])
+        body = abs(candle['close'] - candle['open'])
+
+        if upper_wick > body * 2 and candle['close'] < candle['open']:
+            rejected = True
+            for j in range(i + 1, min(i + 10, len(data))):
+                if data.iloc[j]['high'] >= candle['high']:
+                    rejected = False
+                    break
+
+            if rejected:
+                rejections.append(InstitutionalBlock(
+                    block_type=BlockType.REJECTION_BLOCK,
+                    start_index=i,
+                    end_index=i,
+                    start_price=candle['high'] - upper_wick * 0.5,
+                    end_price=candle['high'],
+                    timestamp=candle.name,
+                    direction='BEARISH',
+                    mitigated=False,
+                    strength=2.5
+                ))
+
+        lower_wick = min(candle['open'], candle['close']) - candle['low']
+
+        if lower_wick > body * 2 and candle['close'] > candle['open']:
+            rejected = True
+            for j in range(i + 1, min(i + 10, len(data))):
+                if data.iloc[j]['low'] <= candle['low']:
+                    rejected = False
+                    break
+
+            if rejected:
+                rejections.append(InstitutionalBlock(
+                    block_type=BlockType.REJECTION_BLOCK,
+                    start_index=i,
+                    end_index=i,
+                    start_price=candle['low'],
+                    end_price=candle['low'] + lower_wick * 0.5,
+                    timestamp=candle.name,
+                    direction='BULLISH',
+                    mitigated=False,
+                    strength=2.5
+                ))
+
+    return rejections
+
+
+def reference_detect_mitigation_blocks(data, blocks):
+    """Implementación original de detect_mitigation_blocks (referencia)"""
+    for block in blocks:
+        if not block.mitigated:
+            for i in range(block.end_index + 1, len(data)):
+                candle = data.iloc[i]
+                if block.direction == 'BULLISH':
+                    if candle['low'] <= block.end_price:
+                        block.mitigated = True
+                        block.mitigation_index = i
+                        break
+                else:
+                    if candle['high'] >= block.start_price:
+                        block.mitigated = True
+                        block.mitigation_index = i
+                        break
+
+    return blocks
+
+
+def reference_detect_breaker_blocks(data, order_blocks):
+    """Implementación original de detect_breaker_blocks (referencia)"""
+    breakers = []
+
+    for ob in order_blocks:
+        for i in range(ob.end_index + 1, len(data)):
+            candle = data.iloc[i]
+
+            if ob.direction == 'BULLISH':
+                if candle['low'] < ob.start_price:
+                    for j in range(i + 1, min(i + 10, len(data))):
+                        if data.iloc[j]['low'] >= ob.start_price and data.iloc[j]['close'] > ob.start_price:
+                            breakers.append(InstitutionalBlock(
+                                block_type=BlockType.BREAKER_BLOCK,
+                                start_index=ob.start_index,
+                                end_index=ob.end_index,
+                                start_price=ob.start_price,
+                                end_price=ob.end_price,
+                                timestamp=ob.timestamp,
+                                direction='BULLISH',
+                                mitigated=False,
+                                strength=4.0
+                            ))
+                            break
+                    break
+            else:
+                if candle['high'] > ob.end_price:
+                    for j in range(i + 1, min(i + 10, len(data))):
+                        if data.iloc[j]['high'] <= ob.end_price and data.iloc[j]['close'] < ob.end_price:
+                            breakers.append(InstitutionalBlock(
+                                block_type=BlockType.BREAKER_BLOCK,
+                                start_index=ob.start_index,
+                                end_index=ob.end_index,
+                                start_price=ob.start_price,
+                                end_price=ob.end_price,
+                                timestamp=ob.timestamp,
+                                direction='BEARISH',
+                                mitigated=False,
+                                strength=4.0
+                            ))
+                            break
+                    break
+
+    return breakers
+
+
+class TestDetectSwings(unittest.TestCase):
+    """Equivalencia del motor vectorizado de swings con la versión original"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.frames = load_sample_csvs()
+
+    def assertSwingsEqual(self, expected, actual, label):
+        self.assertEqual(len(expected), len(actual), label)
+        for exp, act in zip(expected, actual):
+            self.assertEqual(exp.index, act.index, label)
+            self.assertEqual(exp.price, act.price, label)
+            self.assertEqual(exp.timestamp, act.timestamp, label)
+            self.assertEqual(exp.swing_type, act.swing_type, label)
+            self.assertAlmostEqual(exp.strength, act.strength, places=12, msg=label)
+
+    def test_matches_reference_on_csv_data(self):
+        """Mismos swings (índices, precios y fuerza) en los CSV de XAUUSD"""
+        self.assertTrue(self.frames, "No se encontraron data/XAUUSD_*.csv")
+        for name, df in self.frames.items():
+            for lookback in (3, 5, 7, 10):
+                label = f"{name} lookback={lookback}"
+                exp_highs, exp_lows = reference_detect_swings(df, lookback)
+                highs, lows = detect_swings(df, lookback)
+                self.assertSwingsEqual(exp_highs, highs, label)
+                self.assertSwingsEqual(exp_lows, lows, label)
+
+    def test_ties_are_not_swings(self):
+        """Un empate con una vela vecina descarta el swing (desigualdad estricta)"""
+        index = pd.date_range('2024-01-01', periods=7, freq='h')
+        df = pd.DataFrame({
+            'open': [1.0] * 7,
+            'high': [1.0, 2.0, 3.0, 5.0, 5.0, 2.0, 1.0],
+            'low': [3.0, 2.0, 1.0, 0.5, 0.5, 2.0, 3.0],
+            'close': [1.0] * 7,
+            'volume': [1.0] * 7
+        }, index=index)
+
+        highs, lows = detect_swings(df, lookback=2)
+        self.assertEqual(highs, [])
+        self.assertEqual(lows, [])
+        self.assertEqual(reference_detect_swings(df, 2), (highs, lows))
+
+    def test_short_data(self):
+        """Sin suficientes velas no hay swings"""
+        df = next(iter(self.frames.values())).head(6)
+        self.assertEqual(detect_swings(df, lookback=3), ([], []))
+
+
+class TestDetectBosChoch(unittest.TestCase):
+    """Equivalencia del barrido lineal de BOS con la versión original"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.frames = load_sample_csvs()
+
+    def test_matches_reference_on_csv_data(self):
+        """Mismas rupturas (vela, tipo, precio y fuerza) en los CSV de XAUUSD"""
+        for name, df in self.frames.items():
+            for lookback in (3, 5, 10):
+                highs, lows = detect_swings(df, lookback)
+                self.assertEqual(reference_detect_bos_choch(df, highs, lows),
+                                 detect_bos_choch(df, highs, lows),
+                                 f"{name} lookback={lookback}")
+
+    def test_unsorted_swings(self):
+        """Con swings fuera de orden se respeta el orden de la lista"""
+        df = next(iter(self.frames.values()))
+        highs, lows = detect_swings(df, 3)
+        highs, lows = highs[::-1], lows[::-1]
+        self.assertEqual(reference_detect_bos_choch(df, highs, lows),
+                         detect_bos_choch(df, highs, lows))
+
+    def test_columns(self):
+        """La versión columnar tiene las mismas rupturas sin crear objetos"""
+        df = next(iter(self.frames.values()))
+        highs, lows = detect_swings(df, 5)
+        columns = detect_bos_choch_columns(df, highs, lows)
+        breaks = detect_bos_choch(df, highs, lows)
+
+        self.assertEqual(len(columns), len(breaks))
+        self.assertEqual(int((columns.direction > 0).sum()),
+                         sum(1 for b in breaks if b.direction == 'BULLISH'))
+        self.assertEqual(int(columns.is_choch.sum()),
+                         sum(1 for b in breaks if b.break_type == 'CHoCH'))
+        self.assertEqual(columns.to_list(df), breaks)
+
+    def test_no_swings(self):
+        """Sin swings no hay rupturas"""
+        df = next(iter(self.frames.values()))
+        self.assertEqual(detect_bos_choch(df, [], []), [])
+        self.assertEqual(len(detect_bos_choch_columns(df, [], [])), 0)
+
+
+class TestBlockDetectors(unittest.TestCase):
+    """Equivalencia de los detectores de bloques vectorizados con los originales"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.frames = load_sample_csvs()
+
+    def test_fair_value_gaps_match_reference(self):
+        """Mismos FVG en los CSV de XAUUSD"""
+        for name, df in self.frames.items():
+            self.assertEqual(reference_detect_fair_value_gaps(df),
+                             detect_fair_value_gaps(df), name)
+
+    def test_order_blocks_match_reference(self):
+        """Mismos Order Blocks en los CSV de XAUUSD"""
+        for name, df in self.frames.items():
+            for lookback in (3, 5, 7):
+                highs, lows = detect_swings(df, lookback)
+                self.assertEqual(reference_detect_order_blocks(df, highs, lows),
+                                 detect_order_blocks(df, highs, lows),
+                                 f"{name} lookback={lookback}")
+
+    def test_rejection_blocks_match_reference(self):
+        """Mismos Rejection Blocks, incluidas las velas cerca del final"""
+        for name, df in self.frames.items():
+            for lookback in (2, 5):
+                self.assertEqual(reference_detect_rejection_blocks(df, lookback),
+                                 detect_rejection_blocks(df, lookback),
+                                 f"{name} lookback={lookback}")
+            tail = df.tail(14)
+            self.assertEqual(reference_detect_rejection_blocks(tail, 2),
+                             detect_rejection_blocks(tail, 2), f"{name} tail")
+
+    def test_liquidity_sweeps_match_reference(self):
+        """Mismas barridas de liquidez en los CSV de XAUUSD"""
+        for name, df in self.frames.items():
+            for lookback in (3, 5, 10):
+                highs, lows = detect_swings(df, lookback)
+                self.assertEqual(reference_detect_liquidity_sweeps(df, highs, lows),
+                                 detect_liquidity_sweeps(df, highs, lows),
+                                 f"{name} lookback={lookback}")
+        df = next(iter(self.frames.values()))
+        self.assertEqual(detect_liquidity_sweeps(df.head(15), *detect_swings(df.head(15), 2)), [])
+
+    def test_blocks_array(self):
+        """detect_blocks_array agrupa FVG, OB y Rejection Blocks en un solo array"""
+        df = next(iter(self.frames.values()))
+        highs, lows = detect_swings(df, 5)
+        blocks = detect_blocks_array(df, highs, lows)
+
+        self.assertEqual(blocks.dtype, BLOCK_DTYPE)
+        self.assertEqual(blocks_from_array(blocks, df, BlockType.FAIR_VALUE_GAP),
+                         detect_fair_value_gaps(df))
+        self.assertEqual(blocks_from_array(blocks, df, BlockType.ORDER_BLOCK),
+                         detect_order_blocks(df, highs, lows))
+        self.assertEqual(blocks_from_array(blocks, df, BlockType.REJECTION_BLOCK),
+                         detect_rejection_blocks(df))
+        self.assertEqual(len(blocks_from_array(blocks, df)), len(blocks))
+
+        no_rejections = detect_blocks_array(df, highs, lows, rejection_lookback=None)
+        self.assertEqual(blocks_from_array(no_rejections, df, BlockType.REJECTION_BLOCK), [])
+
+    def test_short_data(self):
+        """Con muy pocas velas no hay bloques"""
+        df = next(iter(self.frames.values())).head(2)
+        self.assertEqual(detect_fair_value_gaps(df), [])
+        self.assertEqual(detect_rejection_blocks(df), [])
+        self.assertEqual(len(detect_blocks_array(df, [], [])), 0)
+
+
+class TestFirstTouchResolver(unittest.TestCase):
+    """Resolución de mitigaciones y breakers por primer toque"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.frames = load_sample_csvs()
+
+    def test_queries_match_brute_force(self):
+        """Cada consulta devuelve la primera vela del rango que toca el nivel"""
+        rng = np.random.default_rng(7)
+        df = next(iter(self.frames.values()))
+        resolver = FirstTouchResolver(df)
+        low, high = df['low'].to_numpy(), df['high'].to_numpy()
+        n = len(df)
+
+        start = rng.integers(0, n + 5, size=300)
+        stop = rng.integers(0, n + 5, size=300)
+        level = rng.uniform(low.min(), high.max(), size=300)
+
+        queries = [
+            (resolver.first_low_at_or_below, lambda i, t: low[i] <= t),
+            (resolver.first_high_at_or_above, lambda i, t: high[i] >= t),
+            (resolver.first_low_below, lambda i, t: low[i] < t),
+            (resolver.first_high_above, lambda i, t: high[i] > t),
+        ]
+        for query, touches in queries:
+            result = query(start, level, stop)
+            for k in range(len(start)):
+                expected = next((i for i in range(start[k], min(stop[k], n))
+                                 if touches(i, level[k])), -1)
+                self.assertEqual(expected, result[k])
+
+    def test_mitigation_matches_reference(self):
+        """Mismos bloques mitigados y mismo índice de mitigación"""
+        for name, df in self.frames.items():
+            highs, lows = detect_swings(df, 5)
+            expected = reference_detect_mitigation_blocks(
+                df, detect_fair_value_gaps(df) + detect_order_blocks(df, highs, lows))
+            actual = detect_mitigation_blocks(
+                df, detect_fair_value_gaps(df) + detect_order_blocks(df, highs, lows))
+            self.assertEqual(expected, actual, name)
+
+    def test_mitigation_random_levels(self):
+        """Niveles aleatorios: bloques que se mitigan tarde o nunca"""
+        df = next(iter(self.frames.values()))
+        low, high = df['low'].min(), df['high'].max()
+
+        def random_blocks():
+            rng_blocks = np.random.default_rng(3)
+            blocks = []
+            for _ in range(200):
+                end_index = int(rng_blocks.integers(0, len(df)))
+                a, b = sorted(rng_blocks.uniform(low, high, size=2))
+                blocks.append(InstitutionalBlock(
+                    block_type=BlockType.ORDER_BLOCK,
+                    start_index=end_index,
+                    end_index=end_index,
+                    start_price=a,
+                    end_price=b,
+                    timestamp=df.index[end_index],
+                    direction='BULLISH' if rng_blocks.random() < 0.5 else 'BEARISH',
+                    mitigated=bool(rng_blocks.random() < 0.1),
+                    strength=3.0
+                ))
+            return blocks
+
+        expected = reference_detect_mitigation_blocks(df, random_blocks())
+        actual = detect_mitigation_blocks(df, random_blocks())
+        self.assertEqual(expected, actual)
+        self.assertTrue(any(b.mitigation_index is None for b in actual))
+        self.assertTrue(any((b.mitigation_index or 0) > b.end_index + 1 for b in actual))
+
+    def test_breakers_match_reference(self):
+        """Mismos Breaker Blocks en los CSV de XAUUSD"""
+        for name, df in self.frames.items():
+            for lookback in (3, 5):
+                highs, lows = detect_swings(df, lookback)
+                obs = detect_order_blocks(df, highs, lows)
+                self.assertEqual(reference_detect_breaker_blocks(df, obs),
+                                 detect_breaker_blocks(df, obs), f"{name} lookback={lookback}")
+
+    def test_empty(self):
+        """Sin velas o sin bloques no hay toques"""
+        df = next(iter(self.frames.values()))
+        self.assertEqual(FirstTouchResolver(df.head(0)).first_low_at_or_below(0, 1.0).tolist(), [-1])
+        self.assertEqual(len(FirstTouchResolver(df).first_touch([])), 0)
+        self.assertEqual(detect_breaker_blocks(df, []), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
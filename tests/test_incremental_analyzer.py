@@ -0,0 +1,172 @@
+"""
+tests/test_incremental_analyzer.py - Tests para el análisis ICT incremental
+"""
+
+import os
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from strategy.ict_utils import (
+    detect_swings, detect_bos_choch, detect_fair_value_gaps,
+    detect_order_blocks, detect_mitigation_blocks
+)
+from strategy.incremental_analyzer import IncrementalStructureAnalyzer
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+
+def load_csv(name, bars):
+    df = pd.read_csv(os.path.join(DATA_DIR, name))
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    df.set_index('timestamp', inplace=True)
+    return df.tail(bars)
+
+
+def batch_state(df, lookback):
+    """Resultado de los detectores batch sobre el DataFrame completo"""
+    highs, lows = detect_swings(df, lookback)
+    return {
+        'swings': (highs, lows),
+        'breaks': detect_bos_choch(df, highs, lows),
+        'fvgs': detect_mitigation_blocks(df, detect_fair_value_gaps(df)),
+        'order_blocks': detect_mitigation_blocks(df, detect_order_blocks(df, highs, lows))
+    }
+
+
+def incremental_state(analyzer, df):
+    return {
+        'swings': analyzer.swings(df),
+        'breaks': analyzer.structure_breaks(df),
+        'fvgs': analyzer.fair_value_gaps(df),
+        'order_blocks': analyzer.order_blocks(df)
+    }
+
+
+class TestIncrementalStructureAnalyzer(unittest.TestCase):
+    """El estado incremental coincide con los detectores batch"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.df = load_csv('XAUUSD_3m.csv', 400)
+
+    def assertStatesEqual(self, expected, actual, label):
+        exp_highs, exp_lows = expected['swings']
+        highs, lows = actual['swings']
+        self.assertEqual([(s.index, s.price) for s in exp_highs], [(s.index, s.price) for s in highs], label)
+        self.assertEqual([(s.index, s.price) for s in exp_lows], [(s.index, s.price) for s in lows], label)
+        for exp, act in zip(exp_highs + exp_lows, highs + lows):
+            self.assertAlmostEqual(exp.strength, act.strength, places=12, msg=label)
+
+        key = lambda b: (b.index, b.timestamp, b.break_type, b.direction, b.price, round(b.strength, 12))
+        self.assertEqual([key(b) for b in expected['breaks']], [key(b) for b in actual['breaks']], label)
+
+        block_key = lambda b: (b.block_type, b.start_index, b.end_index, b.start_price, b.end_price,
+                               b.timestamp, b.direction, b.mitigated, b.mitigation_index)
+        for name in ('fvgs', 'order_blocks'):
+            self.assertEqual([block_key(b) for b in expected[name]],
+                             [block_key(b) for b in actual[name]], f"{label} {name}")
+
+    def test_push_matches_batch(self):
+        """push() vela a vela == detectores batch sobre el prefijo"""
+        for lookback in (3, 5):
+            analyzer = IncrementalStructureAnalyzer(lookback=lookback)
+            for i in range(len(self.df)):
+                analyzer.push(self.df.iloc[i])
+                n = i + 1
+                if n % 50 == 0 or n == len(self.df):
+                    prefix = self.df.iloc[:n]
+                    self.assertStatesEqual(batch_state(prefix, lookback),
+                                           incremental_state(analyzer, prefix),
+                                           f"lookback={lookback} n={n}")
+
+    def test_update_only_processes_new_bars(self):
+        """update() con el mismo DataFrame más una vela solo procesa esa vela"""
+        analyzer = IncrementalStructureAnalyzer(lookback=5)
+        self.assertEqual(analyzer.update(self.df.iloc[:300]), 300)
+        self.assertEqual(analyzer.update(self.df.iloc[:300]), 0)
+        self.assertEqual(analyzer.update(self.df.iloc[:301]), 1)
+        self.assertEqual(analyzer.n_bars, 301)
+
+    def test_update_revises_forming_candle(self):
+        """Si la última vela cambia (vela en formación) se revierte y reprocesa"""
+        analyzer = IncrementalStructureAnalyzer(lookback=5)
+        forming = self.df.iloc[:300].copy()
+        forming.iloc[-1, forming.columns.get_loc('high')] += 50.0
+        forming.iloc[-1, forming.columns.get_loc('low')] -= 50.0
+        analyzer.update(forming)
+
+        final = self.df.iloc[:300]
+        self.assertEqual(analyzer.update(final), 1)
+        self.assertStatesEqual(batch_state(final, 5), incremental_state(analyzer, final), "revisión")
+
+    def test_sliding_window_indices(self):
+        """Con una ventana deslizante los índices quedan relativos a la ventana"""
+        analyzer = IncrementalStructureAnalyzer(lookback=5)
+        analyzer.update(self.df.iloc[:300])
+        window = self.df.iloc[50:310]
+        self.assertEqual(analyzer.update(window), 10)
+
+        highs, lows = analyzer.swings(window)
+        for swing in highs + lows:
+            self.assertEqual(window.index[swing.index], swing.timestamp)
+        for block in analyzer.fair_value_gaps(window) + analyzer.order_blocks(window):
+            self.assertGreaterEqual(block.start_index, 0)
+            if block.mitigated:
+                self.assertGreater(block.mitigation_index, block.end_index)
+
+    def test_sliding_window_matches_batch(self):
+        """Ventana de 300 velas que se desplaza vela a vela == batch sobre cada ventana"""
+        df = load_csv('XAUUSD_15m.csv', 500)
+        analyzer = IncrementalStructureAnalyzer(lookback=7)
+        for step in range(200):
+            window = df.iloc[step:step + 300]
+            analyzer.update(window)
+            self.assertEqual(analyzer.n_bars, len(window))
+            self.assertStatesEqual(batch_state(window, 7), incremental_state(analyzer, window),
+                                   f"paso={step}")
+
+    def test_sliding_window_revises_forming_candle(self):
+        """La ventana se desplaza y a la vez se cierra la vela que estaba en formación"""
+        df = load_csv('XAUUSD_15m.csv', 500)
+        analyzer = IncrementalStructureAnalyzer(lookback=7)
+        forming = df.iloc[:300].copy()
+        forming.iloc[-1, forming.columns.get_loc('high')] += 50.0
+        analyzer.update(forming)
+
+        window = df.iloc[20:301]
+        self.assertEqual(analyzer.update(window), 2)
+        self.assertStatesEqual(batch_state(window, 7), incremental_state(analyzer, window), "revisión")
+
+    def test_sliding_window_expires_open_blocks(self):
+        """Con bloques sin mitigar que salen de la ventana, el estado queda acotado"""
+        # Tendencias con huecos entre velas: quedan FVG y OB abiertos
+        rng = np.random.default_rng(5)
+        n = 1500
+        trend = np.where((np.arange(n) // 600) % 2 == 0, 1, -1)
+        opens = 1000 + np.cumsum(trend * np.abs(rng.normal(2, 3, n)) * np.sign(rng.random(n) - 0.3))
+        closes = opens + rng.normal(0, 2, n)
+        df = pd.DataFrame({
+            'open': opens,
+            'high': np.maximum(opens, closes) + rng.random(n) * 0.5,
+            'low': np.minimum(opens, closes) - rng.random(n) * 0.5,
+            'close': closes
+        }, index=pd.date_range('2024-01-01', periods=n, freq='min'))
+
+        analyzer = IncrementalStructureAnalyzer(lookback=3)
+        start = 0
+        for step in range(400):
+            window = df.iloc[start:start + 200]
+            analyzer.update(window)
+            self.assertStatesEqual(batch_state(window, 3), incremental_state(analyzer, window),
+                                   f"inicio={start}")
+            self.assertLessEqual(len(analyzer._timestamps), 2 * len(window))
+            start += (1, 1, 2, 7)[step % 4]
+            if start + 200 > n:
+                break
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+"""
+tests/test_market_data_store.py - Tests de la caché binaria de CSV de velas
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from utils.market_data_store import (
+    cache_path_for, load_ohlcv, load_ohlcv_mmap, read_cache, read_ohlcv_csv,
+    save_mmap_frame
+)
+from utils.multi_timeframe_loader import load_multi_timeframe_data
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+
+class TestMarketDataStore(unittest.TestCase):
+    """La caché devuelve lo mismo que el CSV y se invalida cuando cambia"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.csv_path = os.path.join(self.directory, 'XAUUSD_4h.csv')
+        shutil.copy(os.path.join(DATA_DIR, 'XAUUSD_4h.csv'), self.csv_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_matches_csv(self):
+        """Primera carga (escribe la caché) y segunda (la lee) iguales al CSV"""
+        expected = read_ohlcv_csv(self.csv_path)
+        first = load_ohlcv(self.csv_path)
+        self.assertTrue(os.path.exists(cache_path_for(self.csv_path)))
+        second = load_ohlcv(self.csv_path)
+
+        pd.testing.assert_frame_equal(expected, first)
+        pd.testing.assert_frame_equal(expected, second)
+
+        # Timestamps en epoch-ns y columnas con su tipo
+        with np.load(cache_path_for(self.csv_path)) as npz:
+            self.assertEqual(npz['timestamp'].dtype, np.int64)
+            self.assertEqual(npz['col_0'].dtype, np.float64)
+
+    def test_rebuilds_when_content_changes(self):
+        load_ohlcv(self.csv_path)
+
+        df = read_ohlcv_csv(self.csv_path)
+        df.loc[df.index[-1], 'close'] = 1.0
+        df.iloc[:-1].to_csv(self.csv_path)
+        os.utime(self.csv_path, ns=(0, os.stat(self.csv_path).st_mtime_ns + 10**9))
+
+        loaded = load_ohlcv(self.csv_path)
+        pd.testing.assert_frame_equal(read_ohlcv_csv(self.csv_path), loaded)
+        self.assertEqual(len(loaded), len(df) - 1)
+
+    def test_touch_without_changes_keeps_cache(self):
+        """Si solo cambia la fecha de modificación, se reutiliza la caché y se actualiza su firma"""
+        load_ohlcv(self.csv_path)
+        _, meta = read_cache(cache_path_for(self.csv_path))
+
+        new_mtime = os.stat(self.csv_path).st_mtime_ns + 10**9
+        os.utime(self.csv_path, ns=(new_mtime, new_mtime))
+        loaded = load_ohlcv(self.csv_path)
+
+        _, new_meta = read_cache(cache_path_for(self.csv_path))
+        self.assertEqual(new_meta['source']['mtime_ns'], new_mtime)
+        self.assertEqual(new_meta['source']['sha1'], meta['source']['sha1'])
+        pd.testing.assert_frame_equal(read_ohlcv_csv(self.csv_path), loaded)
+
+    def test_time_column_and_custom_cache_dir(self):
+        """Acepta 'time' como columna de tiempo y una carpeta de caché propia"""
+        df = read_ohlcv_csv(self.csv_path).tail(20)
+        df.index = df.index.tz_localize('UTC')
+        df.index.name = 'time'
+        df.to_csv(self.csv_path)
+
+        cache_dir = os.path.join(self.directory, 'cache')
+        loaded = load_ohlcv(self.csv_path, cache_dir=cache_dir)
+        cached = load_ohlcv(self.csv_path, cache_dir=cache_dir)
+
+        self.assertTrue(os.path.exists(cache_path_for(self.csv_path, cache_dir)))
+        self.assertEqual(cached.index.name, 'timestamp')
+        self.assertEqual(str(cached.index.tz), 'UTC')
+        pd.testing.assert_frame_equal(loaded, cached)
+
+
+class TestMmapBackend(unittest.TestCase):
+    """DataFrames sobre arrays memory-mapped de solo lectura"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for tf in ('1d', '4h', '1h'):
+            shutil.copy(os.path.join(DATA_DIR, f'XAUUSD_{tf}.csv'), self.directory)
+        self.csv_path = os.path.join(self.directory, 'XAUUSD_1h.csv')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_wraps_mapped_buffers(self):
+        expected = read_ohlcv_csv(self.csv_path)
+        for _ in range(2):  # Materializa y luego solo mapea
+            df = load_ohlcv_mmap(self.csv_path)
+            pd.testing.assert_frame_equal(expected, df)
+
+        values = df['close'].to_numpy()
+        self.assertFalse(values.flags.writeable)
+        base = values
+        while base is not None and not isinstance(base, np.memmap):
+            base = base.base
+        self.assertIsInstance(base, np.memmap)
+
+    def test_rebuilds_when_content_changes(self):
+        load_ohlcv_mmap(self.csv_path)
+        read_ohlcv_csv(self.csv_path).tail(50).to_csv(self.csv_path)
+        os.utime(self.csv_path, ns=(0, os.stat(self.csv_path).st_mtime_ns + 10**9))
+        self.assertEqual(len(load_ohlcv_mmap(self.csv_path)), 50)
+
+    def test_rebuilds_missing_or_truncated_arrays(self):
+        """JSON al día pero un .npy ausente, truncado o vacío: se reconstruye"""
+        expected = read_ohlcv_csv(self.csv_path)
+        base_path = os.path.splitext(cache_path_for(self.csv_path))[0]
+        damages = (
+            lambda path: os.remove(path),
+            lambda path: os.truncate(path, os.path.getsize(path) // 2),
+            lambda path: os.truncate(path, 0),
+        )
+        for suffix in ('timestamp', 'values'):
+            for damage in damages:
+                load_ohlcv_mmap(self.csv_path)
+                damage(f"{base_path}.{suffix}.npy")
+                with mock.patch('builtins.print'):
+                    pd.testing.assert_frame_equal(expected, load_ohlcv_mmap(self.csv_path))
+                # Reconstruido: la siguiente carga vuelve a mapear sin avisos
+                with mock.patch('builtins.print') as printed:
+                    load_ohlcv_mmap(self.csv_path)
+                printed.assert_not_called()
+
+    def test_interrupted_write_leaves_no_metadata(self):
+        """Si se corta la escritura de los arrays, el JSON anterior ya no está"""
+        load_ohlcv_mmap(self.csv_path)
+        base_path = os.path.splitext(cache_path_for(self.csv_path))[0]
+        df = read_ohlcv_csv(self.csv_path)
+        with mock.patch('utils.market_data_store._atomic_save', side_effect=OSError("disco lleno")):
+            with self.assertRaises(OSError):
+                save_mmap_frame(df, base_path)
+        self.assertFalse(os.path.exists(f"{base_path}.json"))
+
+    def test_loader_backends_match(self):
+        """load_multi_timeframe_data devuelve lo mismo con cada backend"""
+        kwargs = dict(start_date='2025-03-01', end_date='2025-06-01', data_dir=self.directory)
+        csv = load_multi_timeframe_data('XAUUSD', backend='csv', **kwargs)
+        mmap = load_multi_timeframe_data('XAUUSD', backend='mmap', **kwargs)
+        self.assertEqual(sorted(csv), ['D1', 'H1', 'H4'])
+        for tf_key, df in csv.items():
+            self.assertGreater(len(df), 0)
+            pd.testing.assert_frame_equal(df, mmap[tf_key])
+            pd.testing.assert_frame_equal(df, load_multi_timeframe_data('XAUUSD', **kwargs)[tf_key])
+
+        with self.assertRaises(ValueError):
+            load_multi_timeframe_data('XAUUSD', backend='parquet', data_dir=self.directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
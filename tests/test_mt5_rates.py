@@ -0,0 +1,114 @@
+"""
+tests/test_mt5_rates.py - Tests de la conversión y descarga concurrente de velas de MT5
+"""
+
+import threading
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from utils.mt5_rates import ParallelFetcher, rates_to_frame
+
+
+# Mismo dtype que devuelve mt5.copy_rates_from_pos
+RATES_DTYPE = np.dtype([
+    ('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+    ('tick_volume', '<u8'), ('spread', '<i4'), ('real_volume', '<u8')
+])
+
+
+def make_rates(n: int = 50) -> np.ndarray:
+    rates = np.zeros(n, dtype=RATES_DTYPE)
+    rates['time'] = 1700000000 + np.arange(n) * 60
+    rates['open'] = 2000 + np.arange(n)
+    rates['high'] = rates['open'] + 2
+    rates['low'] = rates['open'] - 2
+    rates['close'] = rates['open'] + 1
+    rates['tick_volume'] = np.arange(n) * 10
+    rates['spread'] = 20
+    return rates
+
+
+class TestRatesToFrame(unittest.TestCase):
+    """Mismo DataFrame que la conversión anterior, sin copiar las columnas"""
+
+    def test_matches_previous_conversion(self):
+        rates = make_rates()
+        expected = pd.DataFrame(rates)
+        expected['time'] = pd.to_datetime(expected['time'], unit='s')
+        expected.set_index('time', inplace=True)
+        expected.rename(columns={'tick_volume': 'volume'}, inplace=True)
+        expected = expected[['open', 'high', 'low', 'close', 'volume']]
+
+        df = rates_to_frame(rates)
+        pd.testing.assert_frame_equal(df, expected)
+        self.assertTrue(np.shares_memory(df['close'].to_numpy(), rates))
+
+    def test_missing_field(self):
+        rates = np.zeros(3, dtype=[('time', '<i8'), ('open', '<f8')])
+        self.assertIsNone(rates_to_frame(rates))
+
+
+class TestParallelFetcher(unittest.TestCase):
+    """Descargas a la vez, con tiempo máximo y sin repetir llamadas colgadas"""
+
+    def setUp(self):
+        self.fetcher = ParallelFetcher()
+        self.addCleanup(self.fetcher.close)
+
+    def test_runs_concurrently(self):
+        def fetch(tf, delay):
+            time.sleep(delay)
+            return tf
+
+        calls = {tf: (tf, 0.2) for tf in ("D1", "H4", "H1", "M15", "M5", "M3", "M1")}
+        start = time.monotonic()
+        results, timed_out = self.fetcher.fetch_all(fetch, calls, timeout=5)
+        elapsed = time.monotonic() - start
+        self.assertEqual(list(results), list(calls))
+        self.assertEqual(timed_out, [])
+        self.assertLess(elapsed, 1.0)
+
+    def test_timeout_reuses_pending_call(self):
+        release = threading.Event()
+        calls_made = []
+
+        def fetch(tf):
+            calls_made.append(tf)
+            if tf == "M1":
+                release.wait(5)
+            return tf
+
+        results, timed_out = self.fetcher.fetch_all(fetch, {"H1": ("H1",), "M1": ("M1",)}, timeout=0.1)
+        self.assertEqual(results, {"H1": "H1"})
+        self.assertEqual(timed_out, ["M1"])
+
+        # El siguiente ciclo espera a la llamada colgada en vez de lanzar otra
+        results, timed_out = self.fetcher.fetch_all(fetch, {"M1": ("M1",)}, timeout=0.1)
+        self.assertEqual(timed_out, ["M1"])
+        self.assertEqual(calls_made.count("M1"), 1)
+        self.assertEqual(self.fetcher.timeouts, 2)
+
+        # Terminada la llamada colgada, el siguiente ciclo descarga datos nuevos
+        release.set()
+        results, _ = self.fetcher.fetch_all(fetch, {"M1": ("M1",)}, timeout=5)
+        self.assertEqual(results, {"M1": "M1"})
+
+    def test_error_skips_only_that_call(self):
+        def fetch(tf):
+            if tf == "H4":
+                raise RuntimeError("sin conexión")
+            return tf
+
+        with mock.patch('builtins.print'):
+            results, timed_out = self.fetcher.fetch_all(fetch, {"D1": ("D1",), "H4": ("H4",)})
+        self.assertEqual(results, {"D1": "D1"})
+        self.assertEqual(timed_out, [])
+        self.assertEqual(self.fetcher.errors, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+"""
+tests/test_optimizer.py - Tests del optimizador de parámetros en paralelo
+"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from backtest.optimizer import (
+    grid_search_space, random_search_space, build_params,
+    save_shared_data, load_shared_data, optimize
+)
+from strategy.ict_hybrid_strategy import StrategyParams, CONFIRMATION_WEIGHTS
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+
+def load_csv(name, bars):
+    df = pd.read_csv(os.path.join(DATA_DIR, name))
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    df.set_index('timestamp', inplace=True)
+    return df.tail(bars)
+
+
+class TestSearchSpaces(unittest.TestCase):
+    """Generación y validación de combinaciones"""
+
+    def test_grid(self):
+        grid = grid_search_space({'lookback_h4': [3, 5], 'min_rr': [1.5, 2.0, 2.5]})
+        self.assertEqual(len(grid), 6)
+        self.assertIn({'lookback_h4': 5, 'min_rr': 2.5}, grid)
+
+    def test_random_is_reproducible(self):
+        space = {'lookback_sniper': (3, 7), 'min_score': (3.0, 5.0), 'weight.SWEEP': [1.0, 2.0]}
+        first = random_search_space(space, 10, seed=1)
+        self.assertEqual(first, random_search_space(space, 10, seed=1))
+        for sample in first:
+            self.assertIsInstance(sample['lookback_sniper'], int)
+            self.assertTrue(3.0 <= sample['min_score'] <= 5.0)
+            self.assertIn(sample['weight.SWEEP'], (1.0, 2.0))
+
+    def test_build_params(self):
+        params, engine_kwargs = build_params({'lookback_d1': 5, 'weight.SWEEP': 3.0, 'min_rr': 2.0})
+        self.assertEqual(params.lookback_d1, 5)
+        self.assertEqual(params.confirmation_weights['SWEEP'], 3.0)
+        self.assertEqual(engine_kwargs, {'min_rr': 2.0})
+        # Los pesos por defecto no se modifican
+        self.assertEqual(CONFIRMATION_WEIGHTS['SWEEP'], 2.0)
+        self.assertEqual(StrategyParams().confirmation_weights['SWEEP'], 2.0)
+
+        with self.assertRaises(ValueError):
+            build_params({'lookback_w1': 3})
+
+
+class TestOptimizer(unittest.TestCase):
+    """Datos compartidos y ejecución en paralelo"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.data = {
+            'D1': load_csv('XAUUSD_1d.csv', 40),
+            'H4': load_csv('XAUUSD_4h.csv', 60),
+            'H1': load_csv('XAUUSD_1h.csv', 60),
+            'M15': load_csv('XAUUSD_15m.csv', 60),
+            'M5': load_csv('XAUUSD_5m.csv', 60),
+            'M3': load_csv('XAUUSD_3m.csv', 150)
+        }
+
+    def test_shared_data_roundtrip(self):
+        """Los datos se releen memory-mapped, de solo lectura y sin cambios"""
+        with tempfile.TemporaryDirectory() as directory:
+            save_shared_data(self.data, directory)
+            loaded = load_shared_data(directory)
+            for tf_key, df in self.data.items():
+                pd.testing.assert_frame_equal(df, loaded[tf_key], check_freq=False)
+                values = loaded[tf_key]['close'].to_numpy()
+                self.assertFalse(values.flags.writeable)
+            del loaded
+
+    def test_pool_matches_serial(self):
+        """El pool de procesos da la misma tabla que la ejecución en serie"""
+        grid = grid_search_space({'lookback_sniper': [3, 5], 'min_rr': [None, 2.0]})
+        engine_kwargs = {'initial_capital': 10000, 'commission': 0.0001}
+
+        serial = optimize(self.data, grid, max_workers=1, engine_kwargs=engine_kwargs)
+        parallel = optimize(self.data, grid, max_workers=2, engine_kwargs=engine_kwargs)
+
+        pd.testing.assert_frame_equal(serial.table, parallel.table)
+        self.assertEqual(len(parallel.results), len(grid))
+        self.assertEqual(list(parallel.table['rank']), [1, 2, 3, 4])
+        sharpe = parallel.table['sharpe_ratio'].to_numpy()
+        self.assertTrue(np.all(sharpe[:-1] >= sharpe[1:]))
+        self.assertIn(parallel.best(), grid)
+
+
+if __name__ == '__main__':
+    unittest.main()
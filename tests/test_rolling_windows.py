@@ -0,0 +1,104 @@
+"""
+tests/test_rolling_windows.py - Tests de las primitivas de ventanas deslizantes
+"""
+
+import unittest
+
+import numpy as np
+
+from utils.rolling_windows import (
+    SMALL_WINDOW, SparseTable, first_true, next_greater, previous_greater,
+    window_indices, window_max, window_min
+)
+
+
+def random_values(rng, n, with_nan=True):
+    """Valores enteros con empates frecuentes y, a veces, un NaN"""
+    values = rng.integers(0, 20, n).astype(float)
+    if with_nan and n and rng.random() < 0.3:
+        values[rng.integers(0, n)] = np.nan
+    return values
+
+
+class TestWindowReduce(unittest.TestCase):
+    """window_max/window_min equivalen a reducir cada ventana por separado"""
+
+    def test_matches_brute_force(self):
+        rng = np.random.default_rng(1)
+        for _ in range(300):
+            n = int(rng.integers(0, 80))
+            values = random_values(rng, n)
+            length = int(rng.integers(1, 3 * SMALL_WINDOW))
+            offset = int(rng.integers(-length - 5, 10))
+            for func, reduce, fill in ((window_max, np.max, -np.inf), (window_min, np.min, np.inf)):
+                expected = np.array([
+                    reduce([values[j] if 0 <= j < n else fill for j in range(i + offset, i + offset + length)])
+                    for i in range(n)
+                ])
+                np.testing.assert_array_equal(func(values, offset, length), expected,
+                                              err_msg=f"n={n} offset={offset} length={length}")
+
+    def test_invalid_length(self):
+        with self.assertRaises(ValueError):
+            window_max(np.arange(5.0), 1, 0)
+
+
+class TestFirstInWindow(unittest.TestCase):
+    """window_indices + first_true: primera vela de cada ventana que cumple la condición"""
+
+    def test_matches_brute_force(self):
+        rng = np.random.default_rng(2)
+        for _ in range(100):
+            n = int(rng.integers(1, 60))
+            values = random_values(rng, n, with_nan=False)
+            start = rng.integers(-5, n + 5, 20)
+            level = rng.integers(0, 20, 20)
+            idx, inside = window_indices(start, 7, n)
+            first = first_true(inside & (values[idx] > level[:, None]))
+            for s, lv, f in zip(start, level, first):
+                hits = [k for k in range(7) if 0 <= s + k < n and values[s + k] > lv]
+                self.assertEqual(f, hits[0] if hits else -1)
+
+    def test_empty(self):
+        idx, inside = window_indices(np.array([], dtype=np.int64), 5, 10)
+        self.assertEqual(idx.shape, (0, 5))
+        self.assertEqual(len(first_true(inside)), 0)
+        self.assertEqual(first_true(np.zeros((3, 0), dtype=bool)).tolist(), [-1, -1, -1])
+
+
+class TestSparseTable(unittest.TestCase):
+    """Primera posición que cruza un nivel y siguiente/anterior elemento mayor"""
+
+    def test_first_matches_brute_force(self):
+        rng = np.random.default_rng(3)
+        for _ in range(100):
+            n = int(rng.integers(0, 70))
+            values = random_values(rng, n)
+            start = rng.integers(-2, n + 2, 30)
+            stop = rng.integers(0, n + 3, 30)
+            threshold = rng.integers(0, 20, 30).astype(float)
+            for combine, touches in ((np.fmax, np.greater), (np.fmax, np.greater_equal),
+                                     (np.fmin, np.less), (np.fmin, np.less_equal)):
+                got = SparseTable(values, combine).first(start, threshold, touches, stop)
+                for s, e, t, g in zip(start, stop, threshold, got):
+                    hits = [i for i in range(max(s, 0), min(e, n)) if touches(values[i], t)]
+                    self.assertEqual(g, hits[0] if hits else -1)
+
+    def test_next_and_previous_greater(self):
+        rng = np.random.default_rng(4)
+        for _ in range(200):
+            n = int(rng.integers(0, 60))
+            values = random_values(rng, n)
+            for strict in (True, False):
+                greater = np.greater if strict else np.greater_equal
+                nxt = next_greater(values, strict)
+                prev = previous_greater(values, strict)
+                for i in range(n):
+                    after = [j for j in range(i + 1, n) if greater(values[j], values[i])]
+                    before = [j for j in range(i - 1, -1, -1) if greater(values[j], values[i])]
+                    self.assertEqual(nxt[i], after[0] if after else -1)
+                    self.assertEqual(prev[i], before[0] if before else -1)
+
+
+if __name__ == '__main__':
+    unittest.main()
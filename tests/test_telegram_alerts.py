@@ -0,0 +1,146 @@
+"""
+tests/test_telegram_alerts.py - Tests de la cola de envío de Telegram
+"""
+
+import unittest
+from unittest import mock
+
+from live.telegram_alerts import (
+    PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL, OutgoingMessage, TelegramAlerts, TelegramOutbox
+)
+
+
+def response(status_code, payload):
+    return mock.Mock(status_code=status_code, json=mock.Mock(return_value=payload))
+
+
+GET_ME_OK = response(200, {"ok": True, "result": {"username": "moneybot"}})
+SEND_OK = response(200, {"ok": True})
+
+
+class TestTelegramOutbox(unittest.TestCase):
+    """Prioridades, agrupación y descarte de mensajes pendientes"""
+
+    def test_priority_order(self):
+        outbox = TelegramOutbox()
+        outbox.put(OutgoingMessage("low", priority=PRIORITY_LOW))
+        outbox.put(OutgoingMessage("normal 1"))
+        outbox.put(OutgoingMessage("high", priority=PRIORITY_HIGH))
+        outbox.put(OutgoingMessage("normal 2"))
+        self.assertEqual([outbox.get(0).text for _ in range(4)], ["high", "normal 1", "normal 2", "low"])
+        self.assertIsNone(outbox.get(0))
+
+    def test_coalesce_keeps_latest(self):
+        outbox = TelegramOutbox()
+        outbox.put(OutgoingMessage("spread 60", priority=PRIORITY_LOW, coalesce_key="market"))
+        outbox.put(OutgoingMessage("trade", priority=PRIORITY_HIGH))
+        outbox.put(OutgoingMessage("spread 80", priority=PRIORITY_LOW, coalesce_key="market"))
+        self.assertEqual(len(outbox), 2)
+        self.assertEqual(outbox.coalesced, 1)
+        self.assertEqual([outbox.get(0).text for _ in range(2)], ["trade", "spread 80"])
+
+    def test_backlog_drops_low_priority(self):
+        outbox = TelegramOutbox(maxsize=4, low_priority_backlog=2)
+        outbox.put(OutgoingMessage("low 1", priority=PRIORITY_LOW))
+        outbox.put(OutgoingMessage("normal 1"))
+        self.assertFalse(outbox.put(OutgoingMessage("low 2", priority=PRIORITY_LOW)))
+        outbox.put(OutgoingMessage("normal 2"))
+        outbox.put(OutgoingMessage("normal 3"))
+        # Cola llena: el nuevo desplaza al pendiente de menor prioridad
+        self.assertTrue(outbox.put(OutgoingMessage("high", priority=PRIORITY_HIGH)))
+        self.assertTrue(outbox.put(OutgoingMessage("high 2", priority=PRIORITY_HIGH)))
+        self.assertFalse(outbox.put(OutgoingMessage("normal 4", priority=PRIORITY_NORMAL)))
+        self.assertEqual(len(outbox), 4)
+        self.assertEqual(outbox.dropped, 4)
+        texts = [outbox.get(0).text for _ in range(4)]
+        self.assertEqual(texts, ["high", "high 2", "normal 2", "normal 3"])
+
+    def test_join_and_close(self):
+        outbox = TelegramOutbox()
+        outbox.put(OutgoingMessage("a"))
+        self.assertFalse(outbox.join(0))
+        outbox.close()
+        self.assertFalse(outbox.put(OutgoingMessage("b")))
+        self.assertEqual(outbox.get(0).text, "a")
+        outbox.task_done()
+        self.assertTrue(outbox.join(0))
+        self.assertIsNone(outbox.get(0))
+
+
+@mock.patch('live.telegram_alerts.time.sleep')
+@mock.patch('live.telegram_alerts.requests.Session')
+class TestTelegramAlerts(unittest.TestCase):
+    """Envío síncrono con reintentos y envío en segundo plano"""
+
+    def setUp(self):
+        # Sin escribir en el archivo de log real
+        patcher = mock.patch('live.telegram_alerts.logger')
+        self.logger = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_retries_transient_errors(self, session_cls, sleep):
+        session = session_cls.return_value
+        session.get.return_value = GET_ME_OK
+        session.post.side_effect = [
+            response(502, {}),
+            response(429, {"ok": False, "parameters": {"retry_after": 7}}),
+            SEND_OK
+        ]
+        with mock.patch('builtins.print'):
+            telegram = TelegramAlerts("token", "chat", background=False)
+        self.assertTrue(telegram.send_message("hola"))
+        self.assertEqual(session.post.call_count, 3)
+        self.assertEqual([c.args[0] for c in sleep.call_args_list], [2.0, 7.0])
+
+    def test_client_error_is_not_retried(self, session_cls, sleep):
+        session = session_cls.return_value
+        session.get.return_value = GET_ME_OK
+        session.post.return_value = response(400, {"ok": False})
+        with mock.patch('builtins.print'):
+            telegram = TelegramAlerts("token", "chat", background=False)
+        self.assertFalse(telegram.send_message("hola"))
+        self.assertEqual(session.post.call_count, 1)
+
+    def test_background_delivery(self, session_cls, sleep):
+        session = session_cls.return_value
+        session.get.return_value = GET_ME_OK
+        session.post.return_value = SEND_OK
+        with mock.patch('builtins.print'):
+            telegram = TelegramAlerts("token", "chat")
+            self.assertTrue(telegram.send_error("fallo"))
+            self.assertTrue(telegram.send_message("hola"))
+            self.assertTrue(telegram.flush(5))
+            telegram.close(5)
+        texts = [c.kwargs['json']['text'] for c in session.post.call_args_list]
+        self.assertEqual(len(texts), 2)
+        self.assertIn("fallo", texts[0])
+        self.assertFalse(telegram.send_message("después de cerrar"))
+
+    def test_invalid_token_disables_alerts(self, session_cls, sleep):
+        session = session_cls.return_value
+        session.get.return_value = response(401, {"ok": False})
+        with mock.patch('builtins.print'):
+            telegram = TelegramAlerts("token", "chat")
+            telegram._worker.join(5)
+        self.assertFalse(telegram.enabled)
+        self.assertFalse(telegram.send_message("hola"))
+        session.post.assert_not_called()
+
+    def test_discard_reasons(self, session_cls, sleep):
+        session = session_cls.return_value
+        session.get.return_value = GET_ME_OK
+        with mock.patch('builtins.print'):
+            telegram = TelegramAlerts("token", "chat")
+            telegram.close(5)
+        self.assertFalse(telegram.send_message("después de cerrar"))
+        self.logger.warning.assert_called_with("⚠️ Telegram cerrado: mensaje descartado")
+
+        # Bot deshabilitado por el hilo de envío después de comprobar enabled
+        telegram.enabled = True
+        with mock.patch.object(telegram.outbox, 'put', side_effect=lambda message: setattr(telegram, 'enabled', False)):
+            self.assertFalse(telegram.send_message("hola"))
+        self.assertIn("deshabilitado", self.logger.warning.call_args.args[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+"""
+tests/test_timeframes.py - Tests del re-muestreo y de los mapas de velas cerradas
+"""
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from backtest.backtest import synchronize_timeframes
+from backtest.context_views import ContextViewProvider
+from utils.multi_timeframe_loader import resample_to_timeframes
+from utils.timeframes import TIMEFRAME_PERIODS, last_closed_map, resample_ohlcv
+
+
+PANDAS_RULES = {'M3': '3min', 'M5': '5min', 'M15': '15min', 'H1': '1h', 'H4': '4h', 'D1': '1D'}
+
+
+def make_m1(n=30000, seed=0):
+    """Velas M1 sintéticas con huecos (fines de semana y velas sueltas)"""
+    rng = np.random.default_rng(seed)
+    index = pd.date_range('2024-01-01 00:00', periods=n, freq='1min')
+    keep = np.ones(n, dtype=bool)
+    keep[5000:9000] = False
+    keep[rng.integers(0, n, 1000)] = False
+    index = index[keep]
+    close = 2000 + np.cumsum(rng.normal(0, 1, len(index)))
+    df = pd.DataFrame({
+        'open': close + rng.normal(0, 0.1, len(index)),
+        'high': close + rng.random(len(index)),
+        'low': close - rng.random(len(index)),
+        'close': close,
+        'volume': rng.random(len(index)) * 100
+    }, index=index)
+    df.index.name = 'timestamp'
+    return df
+
+
+class TestResampleOHLCV(unittest.TestCase):
+    """El re-muestreo en una pasada equivale a DataFrame.resample"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.m1 = make_m1()
+        cls.result = resample_ohlcv(cls.m1, 'M1')
+
+    def test_matches_pandas_resample(self):
+        self.assertEqual(set(self.result), set(TIMEFRAME_PERIODS))
+        pd.testing.assert_frame_equal(self.m1, self.result['M1'])
+        for key, rule in PANDAS_RULES.items():
+            expected = self.m1.resample(rule).agg({
+                'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'
+            }).dropna()
+            pd.testing.assert_frame_equal(expected, self.result[key], check_freq=False)
+
+    def test_last_closed_only_includes_closed_bars(self):
+        """La vela superior solo aparece cuando la vela base llega a su cierre"""
+        base_close = self.m1.index + TIMEFRAME_PERIODS['M1']
+        for key in PANDAS_RULES:
+            last_closed = self.result.last_closed[key]
+            self.assertEqual(last_closed.dtype, np.int32)
+            self.assertEqual(len(last_closed), len(self.m1))
+            np.testing.assert_array_equal(
+                last_closed,
+                last_closed_map(self.m1.index, TIMEFRAME_PERIODS['M1'],
+                                self.result[key].index, TIMEFRAME_PERIODS[key])
+            )
+
+            bars = self.result[key]
+            period = TIMEFRAME_PERIODS[key]
+            for i in range(0, len(self.m1), 997):
+                k = last_closed[i]
+                if k >= 0:
+                    self.assertLessEqual(bars.index[k] + period, base_close[i])
+                if k + 1 < len(bars):
+                    self.assertGreater(bars.index[k + 1] + period, base_close[i])
+
+    def test_resample_to_timeframes_from_h1(self):
+        h1 = self.result['H1']
+        data = resample_to_timeframes(h1, '1h')
+        self.assertEqual(sorted(data), ['D1', 'H1', 'H4'])
+        pd.testing.assert_frame_equal(self.result['H4'], data['H4'])
+        pd.testing.assert_frame_equal(self.result['D1'], data['D1'])
+
+    def test_rejects_non_multiple_timeframe(self):
+        with self.assertRaises(ValueError):
+            resample_ohlcv(self.result['M5'], 'M5', timeframes=['M3'])
+
+
+class TestSynchronizeTimeframes(unittest.TestCase):
+    """synchronize_timeframes no duplica datos ni mira velas sin cerrar"""
+
+    def test_closed_candle_context(self):
+        m1 = make_m1(6000)
+        data = resample_ohlcv(m1, 'M1')
+        frames = {key: data[key] for key in ('D1', 'H4', 'H1', 'M1')}
+
+        synced = synchronize_timeframes(frames, base_timeframe='M1')
+        base = synced['M1']
+
+        # Empieza en la primera vela M1 con al menos una vela D1 cerrada
+        self.assertEqual(base.index[0] + TIMEFRAME_PERIODS['M1'],
+                         data['D1'].index[0] + TIMEFRAME_PERIODS['D1'])
+        self.assertLessEqual(len(synced['H1']), len(data['H1']))
+
+        provider = ContextViewProvider(synced, base.index, last_closed=synced.last_closed)
+        for i in range(0, len(base), 311):
+            context = provider.context_at(i)
+            base_close = base.index[i] + TIMEFRAME_PERIODS['M1']
+            for key in ('D1', 'H4', 'H1'):
+                bars = context[key]
+                self.assertGreater(len(bars), 0)
+                self.assertLessEqual(bars.index[-1] + TIMEFRAME_PERIODS[key], base_close)
+            self.assertEqual(context['M1'].index[-1], base.index[i])
+
+
+if __name__ == '__main__':
+    unittest.main()
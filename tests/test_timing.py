@@ -0,0 +1,94 @@
+"""
+tests/test_timing.py - Tests del registro de tiempos por etapa
+"""
+
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from utils.timing import StageTimer
+
+
+class TestStageTimer(unittest.TestCase):
+    """Spans, decorador y estadísticas por etapa"""
+
+    def test_record_stats(self):
+        timer = StageTimer()
+        for ms in range(1, 101):
+            timer.record('signal', ms / 1000)
+        stats = timer.snapshot()['signal']
+        self.assertEqual(stats['count'], 100)
+        self.assertAlmostEqual(stats['last_ms'], 100)
+        self.assertAlmostEqual(stats['max_ms'], 100)
+        self.assertAlmostEqual(stats['p50_ms'], 50.5)
+        self.assertAlmostEqual(stats['p95_ms'], 95.05)
+        self.assertAlmostEqual(stats['mean_ms'], 50.5)
+
+    def test_window_limits_percentiles_not_totals(self):
+        timer = StageTimer(window=10)
+        for _ in range(10):
+            timer.record('db', 1.0)
+        for _ in range(10):
+            timer.record('db', 0.001)
+        stats = timer.snapshot()['db']
+        self.assertEqual(stats['count'], 20)
+        self.assertAlmostEqual(stats['p95_ms'], 1)
+        self.assertAlmostEqual(stats['max_ms'], 1000)
+
+    def test_span_and_timed(self):
+        timer = StageTimer()
+
+        @timer.timed('order_send')
+        def send():
+            return 42
+
+        self.assertEqual(send(), 42)
+        with timer.span('context'):
+            pass
+        span = timer.start('cycle')
+        first = span.stop()
+        self.assertEqual(span.stop(), first)
+        with self.assertRaises(RuntimeError):
+            with timer.span('failing'):
+                raise RuntimeError()
+
+        snapshot = timer.snapshot()
+        self.assertEqual(list(snapshot), ['order_send', 'context', 'cycle', 'failing'])
+        self.assertTrue(all(stats['count'] == 1 for stats in snapshot.values()))
+
+    def test_format_line(self):
+        timer = StageTimer()
+        self.assertEqual(timer.format_line(), "⏱️ Sin mediciones")
+        timer.record('signal', 0.25)
+        timer.record('context', 0.01)
+        line = timer.format_line(['signal', 'missing'])
+        self.assertIn("signal 250/250/250ms (n=1)", line)
+        self.assertNotIn("context", line)
+
+    def test_write_json(self):
+        timer = StageTimer()
+        timer.record('signal', 0.1)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'logs', 'timing_stats.json')
+            timer.write_json(path)
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.assertEqual(data['stages']['signal']['count'], 1)
+            self.assertFalse(os.path.exists(f"{path}.tmp"))
+
+    def test_maybe_report_interval(self):
+        timer = StageTimer()
+        self.assertFalse(timer.maybe_report(60))
+        timer.record('signal', 0.1)
+        with mock.patch('utils.timing.time.monotonic', side_effect=[100.0, 130.0, 161.0]), \
+                mock.patch('builtins.print'):
+            self.assertFalse(timer.maybe_report(60))
+            self.assertFalse(timer.maybe_report(60))
+            self.assertTrue(timer.maybe_report(60))
+        self.assertFalse(timer.maybe_report(0))
+
+
+if __name__ == '__main__':
+    unittest.main()
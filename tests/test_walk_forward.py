@@ -0,0 +1,125 @@
+"""
+tests/test_walk_forward.py - Tests del análisis walk-forward
+"""
+
+import os
+import unittest
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from backtest.optimizer import grid_search_space, run_param_set
+from backtest.walk_forward import walk_forward, walk_forward_windows
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+
+def load_csv(name, bars):
+    df = pd.read_csv(os.path.join(DATA_DIR, name))
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    df.set_index('timestamp', inplace=True)
+    return df.tail(bars)
+
+
+class TestWalkForwardWindows(unittest.TestCase):
+    """Construcción de las ventanas IS/OOS"""
+
+    def setUp(self):
+        self.index = pd.date_range('2024-01-01', periods=2000, freq='3min')
+
+    def test_rolling_windows(self):
+        windows = walk_forward_windows(self.index, '1D', '12h')
+        self.assertGreater(len(windows), 3)
+        for k, window in enumerate(windows):
+            self.assertEqual(window.fold, k)
+            self.assertLess(window.is_start, window.is_end)
+            self.assertLess(window.is_end, window.oos_start)
+            self.assertLessEqual(window.oos_start, window.oos_end)
+            self.assertEqual(window.oos_start - window.is_start, pd.Timedelta('1D'))
+        # Con step = out_of_sample los tramos OOS son contiguos
+        for prev, nxt in zip(windows, windows[1:]):
+            self.assertEqual(nxt.oos_start - prev.oos_end, pd.Timedelta('3min'))
+        self.assertEqual(windows[-1].oos_end, self.index[-1])
+
+    def test_anchored_windows(self):
+        windows = walk_forward_windows(self.index, '1D', '12h', anchored=True)
+        self.assertTrue(all(window.is_start == self.index[0] for window in windows))
+        self.assertEqual(len(windows), len(walk_forward_windows(self.index, '1D', '12h')))
+
+    def test_gap_without_oos_bars_is_skipped(self):
+        index = self.index[:500].append(self.index[1500:])
+        for window in walk_forward_windows(index, '6h', '6h'):
+            self.assertTrue(index[(index >= window.oos_start) & (index <= window.oos_end)].size > 0)
+            self.assertLess(window.is_end, window.oos_start)
+
+    def test_invalid_durations(self):
+        with self.assertRaises(ValueError):
+            walk_forward_windows(self.index, '0D', '12h')
+
+
+class TestWalkForward(unittest.TestCase):
+    """Optimización por fold, ejecución en paralelo y equity OOS"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.data = {
+            'D1': load_csv('XAUUSD_1d.csv', 40),
+            'H4': load_csv('XAUUSD_4h.csv', 60),
+            'H1': load_csv('XAUUSD_1h.csv', 80),
+            'M15': load_csv('XAUUSD_15m.csv', 120),
+            'M5': load_csv('XAUUSD_5m.csv', 200),
+            'M3': load_csv('XAUUSD_3m.csv', 300)
+        }
+        cls.engine_kwargs = {'initial_capital': 10000, 'commission': 0.0001}
+
+    def test_pool_matches_serial(self):
+        """El pool de procesos da los mismos folds que la ejecución en serie"""
+        grid = grid_search_space({'lookback_sniper': [3, 5]})
+        kwargs = dict(in_sample='6h', out_of_sample='3h', engine_kwargs=self.engine_kwargs)
+
+        serial = walk_forward(self.data, grid, max_workers=1, **kwargs)
+        parallel = walk_forward(self.data, grid, max_workers=2, **kwargs)
+
+        self.assertGreater(len(serial.folds), 1)
+        pd.testing.assert_frame_equal(serial.table, parallel.table)
+        pd.testing.assert_series_equal(serial.oos_equity, parallel.oos_equity)
+        for fold in parallel.folds:
+            self.assertIn(fold.best_params, grid)
+
+        # Equity OOS encadenada: cronológica y dentro de las ventanas OOS
+        equity = parallel.oos_equity
+        self.assertTrue(equity.index.is_monotonic_increasing)
+        self.assertEqual(equity.index[0], parallel.folds[0].window.oos_start)
+        self.assertEqual(equity.index[-1], parallel.folds[-1].window.oos_end)
+        self.assertTrue(np.all(equity.to_numpy() > 0))
+        self.assertEqual(parallel.summary()['folds'], len(parallel.folds))
+
+    def test_shared_cache_reuses_analysis(self):
+        """Con la caché compartida un backtest repetido no recalcula análisis"""
+        index = self.data['M3'].index
+        start, end = index[100], index[250]
+        cache = OrderedDict()
+
+        first = run_param_set(self.data, {}, self.engine_kwargs, start, end,
+                              analysis_cache=cache, analysis_cache_size=1024)
+        self.assertGreater(len(cache), 0)
+
+        # Ventana solapada: solo se añaden los análisis de las velas nuevas
+        second = run_param_set(self.data, {}, self.engine_kwargs, index[150], end,
+                               analysis_cache=cache, analysis_cache_size=1024)
+        uncached = run_param_set(self.data, {}, self.engine_kwargs, index[150], end)
+        self.assertEqual(second.total_trades, uncached.total_trades)
+        self.assertAlmostEqual(second.total_pnl, uncached.total_pnl, places=9)
+
+        entries = len(cache)
+        again = run_param_set(self.data, {}, self.engine_kwargs, start, end,
+                              analysis_cache=cache, analysis_cache_size=1024)
+        self.assertEqual(len(cache), entries)
+        self.assertEqual(first.total_trades, again.total_trades)
+        self.assertAlmostEqual(first.total_pnl, again.total_pnl, places=9)
+
+
+if __name__ == '__main__':
+    unittest.main()
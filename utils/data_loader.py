@@ -8,6 +8,7 @@ Puedes obtenerlos de APIs gratuitas como Binance, Alpha Vantage, o archivos CSV.
 import pandas as pd
 import os
 from config import DATA_DIR, SYMBOL, TIMEFRAME
+from utils.market_data_store import load_ohlcv
 
 
 def load_historical_data(symbol=None, timeframe=None, start_date=None, end_date=None):
@@ -33,10 +34,7 @@ def load_historical_data(symbol=None, timeframe=None, start_date=None, end_date=
     # Si el archivo existe, lo carga
     if os.path.exists(csv_path):
         print(f"Cargando datos desde {csv_path}")
-        df = pd.read_csv(csv_path)
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df.set_index('timestamp', inplace=True)
-        return df
+        return load_ohlcv(csv_path)
     
     # Si no existe, aquí podrías llamar a una API para descargar datos
     # Ejemplo con Binance (necesitarías instalar python-binance):
@@ -7,11 +7,492 @@ Permite análisis histórico y mejora continua.
 
 import sqlite3
 import os
-from datetime import datetime, date, timezone
-from typing import Dict, List, Optional
+import itertools
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, date, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
 from pathlib import Path
 import json
 
+from utils.timing import timings
+
+
+# Write-behind: el hilo escritor confirma un lote cada FLUSH_INTERVAL segundos o MAX_BATCH escrituras
+DEFAULT_FLUSH_INTERVAL = 0.2
+DEFAULT_MAX_BATCH = 100
+# IDs que write-behind reserva de una vez en sqlite_sequence por tabla
+ID_BLOCK_SIZE = 100
+
+# Una escritura: sentencias (sql, params) que van en la misma transacción
+WriteUnit = List[Tuple[str, tuple]]
+
+_STOP = object()
+
+# Retención de bot_state: días con filas completas (las anteriores se resumen por hora)
+BOT_STATE_RAW_DAYS = 7
+# Páginas libres que devuelve al sistema cada compactación (PRAGMA incremental_vacuum)
+VACUUM_PAGES = 2000
+
+
+@dataclass
+class Migration:
+    """Cambio de esquema versionado (sus sentencias se aplican en una transacción)"""
+    version: int
+    description: str
+    statements: List[str]
+    # Recalcular performance_aggregates con rebuild_aggregates() tras aplicar todas las
+    # pendientes (la migración no copia REBUILD_AGGREGATES_SQL, que puede cambiar)
+    rebuild_aggregates: bool = False
+
+
+# Agregados de performance por periodo ('YYYY-MM-DD' o 'ALL') y símbolo ('*' = todos).
+# close_trade los actualiza en la misma transacción; REBUILD_AGGREGATES_SQL los
+# recalcula desde trades y signals.
+ALL_PERIODS = "ALL"
+ALL_SYMBOLS = "*"
+
+REBUILD_AGGREGATES_SQL: List[str] = [
+    "DELETE FROM performance_aggregates",
+    f"""
+    INSERT INTO performance_aggregates (
+        period, symbol, trades_closed, winning_trades, losing_trades,
+        gross_profit, gross_loss, sum_pnl, pnl_count, sum_risk_reward, risk_reward_count
+    )
+    SELECT t.period, CASE WHEN s.by_symbol THEN t.symbol ELSE '{ALL_SYMBOLS}' END AS agg_symbol,
+           COUNT(*), SUM(t.pnl > 0), SUM(t.pnl < 0), SUM(MAX(t.pnl, 0)), SUM(MAX(-t.pnl, 0)),
+           SUM(t.pnl), SUM(t.pnl_known), SUM(COALESCE(t.risk_reward, 0)), COUNT(t.risk_reward)
+    FROM (
+        SELECT '{ALL_PERIODS}' AS period, symbol, COALESCE(pnl, 0) AS pnl,
+               pnl IS NOT NULL AS pnl_known, risk_reward
+        FROM trades WHERE exit_time IS NOT NULL
+        UNION ALL
+        SELECT substr(exit_time, 1, 10), symbol, COALESCE(pnl, 0), pnl IS NOT NULL, risk_reward
+        FROM trades WHERE exit_time IS NOT NULL
+    ) t
+    CROSS JOIN (SELECT 0 AS by_symbol UNION ALL SELECT 1) s
+    GROUP BY t.period, agg_symbol
+    """,
+    "DELETE FROM daily_metrics",
+    """
+    INSERT INTO daily_metrics (date, total_signals, accepted_signals, rejected_signals)
+    SELECT substr(timestamp, 1, 10), COUNT(*), SUM(status = 'ACCEPTED'), SUM(status = 'REJECTED')
+    FROM signals
+    GROUP BY substr(timestamp, 1, 10)
+    """,
+    """
+    INSERT INTO daily_metrics (date, trades_opened)
+    SELECT substr(entry_time, 1, 10), COUNT(*)
+    FROM trades
+    GROUP BY substr(entry_time, 1, 10)
+    ON CONFLICT(date) DO UPDATE SET trades_opened = excluded.trades_opened
+    """,
+    f"""
+    INSERT INTO daily_metrics (date, trades_closed, total_pnl, win_rate, profit_factor, avg_risk_reward)
+    SELECT period, trades_closed, sum_pnl, 100.0 * winning_trades / trades_closed,
+           CASE WHEN gross_loss > 0 THEN gross_profit / gross_loss ELSE 0 END,
+           sum_risk_reward / NULLIF(risk_reward_count, 0)
+    FROM performance_aggregates
+    WHERE symbol = '{ALL_SYMBOLS}' AND period != '{ALL_PERIODS}'
+    ON CONFLICT(date) DO UPDATE SET
+        trades_closed = excluded.trades_closed,
+        total_pnl = excluded.total_pnl,
+        win_rate = excluded.win_rate,
+        profit_factor = excluded.profit_factor,
+        avg_risk_reward = excluded.avg_risk_reward
+    """,
+]
+
+# Migraciones en orden de versión. Nunca se edita una ya publicada: se añade otra.
+MIGRATIONS: List[Migration] = [
+    Migration(1, "Índices para consultas por fecha y estado", [
+        "CREATE INDEX IF NOT EXISTS idx_trades_exit_time ON trades(exit_time)",
+        "CREATE INDEX IF NOT EXISTS idx_trades_entry_time ON trades(entry_time)",
+        "CREATE INDEX IF NOT EXISTS idx_signals_timestamp_status ON signals(timestamp, status)",
+        "CREATE INDEX IF NOT EXISTS idx_bot_state_timestamp_symbol ON bot_state(timestamp_utc, symbol)",
+    ]),
+    Migration(2, "Agregados de performance incrementales y daily_metrics", [
+        """
+        CREATE TABLE IF NOT EXISTS performance_aggregates (
+            period TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            trades_closed INTEGER NOT NULL DEFAULT 0,
+            winning_trades INTEGER NOT NULL DEFAULT 0,
+            losing_trades INTEGER NOT NULL DEFAULT 0,
+            gross_profit REAL NOT NULL DEFAULT 0,
+            gross_loss REAL NOT NULL DEFAULT 0,
+            sum_pnl REAL NOT NULL DEFAULT 0,
+            sum_risk_reward REAL NOT NULL DEFAULT 0,
+            risk_reward_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (period, symbol)
+        )
+        """,
+        # El recálculo desde trades lo hace la migración 4 (REBUILD_AGGREGATES_SQL
+        # ya usa la columna pnl_count)
+    ]),
+    Migration(3, "bot_state por runs de estado y resumen horario", [
+        "ALTER TABLE bot_state ADD COLUMN last_seen_utc DATETIME",
+        "ALTER TABLE bot_state ADD COLUMN samples INTEGER NOT NULL DEFAULT 1",
+        "ALTER TABLE bot_state ADD COLUMN spread_min REAL",
+        "ALTER TABLE bot_state ADD COLUMN spread_max REAL",
+        "ALTER TABLE bot_state ADD COLUMN atr_ratio_max REAL",
+        """
+        CREATE TABLE IF NOT EXISTS bot_state_hourly (
+            hour_utc TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            samples INTEGER NOT NULL,
+            runs INTEGER NOT NULL,
+            mode_transitions INTEGER NOT NULL,
+            blocked_samples INTEGER NOT NULL,
+            spread_min REAL,
+            spread_max REAL,
+            atr_ratio_max REAL,
+            daily_dd_min REAL,
+            PRIMARY KEY (hour_utc, symbol)
+        )
+        """,
+    ]),
+    Migration(4, "Trades con pnl en los agregados (avg_pnl ignora los pnl NULL)", [
+        "ALTER TABLE performance_aggregates ADD COLUMN pnl_count INTEGER NOT NULL DEFAULT 0",
+    ], rebuild_aggregates=True),
+    Migration(5, "Último modo de cada hora resumida de bot_state", [
+        "ALTER TABLE bot_state_hourly ADD COLUMN last_mode TEXT",
+        # Horas ya resumidas: no se conoce su último modo, queda NULL (sin transición)
+    ]),
+]
+
+# Resume por hora (UTC) y símbolo las filas de bot_state anteriores al corte.
+# Se suma a la fila de la hora si ya existe (compactaciones anteriores).
+# El primer run de cada símbolo se compara con el último modo ya resumido
+# (last_mode de su hora más reciente): el cambio entre dos compactaciones cuenta.
+_COMPACT_BOT_STATE_SQL = """
+    INSERT INTO bot_state_hourly (
+        hour_utc, symbol, samples, runs, mode_transitions, blocked_samples,
+        spread_min, spread_max, atr_ratio_max, daily_dd_min, last_mode
+    )
+    SELECT hour_utc, symbol, SUM(samples), COUNT(*), SUM(mode_changed),
+           SUM(CASE WHEN blocked THEN samples ELSE 0 END),
+           MIN(COALESCE(spread_min, spread)), MAX(COALESCE(spread_max, spread)),
+           MAX(COALESCE(atr_ratio_max, atr_ratio)), MIN(daily_dd_pct),
+           MAX(CASE WHEN last_in_hour = 1 THEN news_mode END)
+    FROM (
+        SELECT *, substr(timestamp_utc, 1, 13) AS hour_utc,
+               COALESCE(news_mode != COALESCE(
+                   LAG(news_mode) OVER (PARTITION BY symbol ORDER BY timestamp_utc, id),
+                   (SELECT h.last_mode FROM bot_state_hourly h
+                    WHERE h.symbol = bot_state.symbol ORDER BY h.hour_utc DESC LIMIT 1)
+               ), 0) AS mode_changed,
+               ROW_NUMBER() OVER (PARTITION BY substr(timestamp_utc, 1, 13), symbol
+                                  ORDER BY timestamp_utc DESC, id DESC) AS last_in_hour
+        FROM bot_state
+        WHERE COALESCE(last_seen_utc, timestamp_utc) < ?
+    )
+    GROUP BY hour_utc, symbol
+    ON CONFLICT(hour_utc, symbol) DO UPDATE SET
+        samples = samples + excluded.samples,
+        runs = runs + excluded.runs,
+        mode_transitions = mode_transitions + excluded.mode_transitions,
+        blocked_samples = blocked_samples + excluded.blocked_samples,
+        spread_min = MIN(COALESCE(spread_min, excluded.spread_min), COALESCE(excluded.spread_min, spread_min)),
+        spread_max = MAX(COALESCE(spread_max, excluded.spread_max), COALESCE(excluded.spread_max, spread_max)),
+        atr_ratio_max = MAX(COALESCE(atr_ratio_max, excluded.atr_ratio_max),
+                            COALESCE(excluded.atr_ratio_max, atr_ratio_max)),
+        daily_dd_min = MIN(COALESCE(daily_dd_min, excluded.daily_dd_min), COALESCE(excluded.daily_dd_min, daily_dd_min)),
+        last_mode = excluded.last_mode
+"""
+
+
+@dataclass
+class BotStateRun:
+    """Fila de bot_state que se va extendiendo mientras el estado no cambia"""
+    state_key: tuple
+    row_id: int
+    samples: int = 1
+    spread_min: Optional[float] = None
+    spread_max: Optional[float] = None
+    atr_ratio_max: Optional[float] = None
+    
+    def add(self, spread: Optional[float], atr_ratio: Optional[float]) -> None:
+        self.samples += 1
+        if spread is not None:
+            self.spread_min = spread if self.spread_min is None else min(self.spread_min, spread)
+            self.spread_max = spread if self.spread_max is None else max(self.spread_max, spread)
+        if atr_ratio is not None:
+            self.atr_ratio_max = atr_ratio if self.atr_ratio_max is None else max(self.atr_ratio_max, atr_ratio)
+
+# Suma el trade que se cierra a los agregados (todos/símbolo x histórico/día).
+# La condición exit_time IS NULL evita contarlo dos veces: va antes del UPDATE de trades.
+_CLOSE_TRADE_AGGREGATES_SQL = f"""
+    INSERT INTO performance_aggregates (
+        period, symbol, trades_closed, winning_trades, losing_trades,
+        gross_profit, gross_loss, sum_pnl, pnl_count, sum_risk_reward, risk_reward_count
+    )
+    SELECT p.period, CASE WHEN s.by_symbol THEN t.symbol ELSE '{ALL_SYMBOLS}' END,
+           1, :pnl > 0, :pnl < 0, MAX(:pnl, 0), MAX(-:pnl, 0), :pnl, :pnl_known,
+           COALESCE(t.risk_reward, 0), t.risk_reward IS NOT NULL
+    FROM trades t
+    CROSS JOIN (SELECT '{ALL_PERIODS}' AS period UNION ALL SELECT :day) p
+    CROSS JOIN (SELECT 0 AS by_symbol UNION ALL SELECT 1) s
+    WHERE t.ticket = :ticket AND t.exit_time IS NULL
+    ON CONFLICT(period, symbol) DO UPDATE SET
+        trades_closed = trades_closed + excluded.trades_closed,
+        winning_trades = winning_trades + excluded.winning_trades,
+        losing_trades = losing_trades + excluded.losing_trades,
+        gross_profit = gross_profit + excluded.gross_profit,
+        gross_loss = gross_loss + excluded.gross_loss,
+        sum_pnl = sum_pnl + excluded.sum_pnl,
+        pnl_count = pnl_count + excluded.pnl_count,
+        sum_risk_reward = sum_risk_reward + excluded.sum_risk_reward,
+        risk_reward_count = risk_reward_count + excluded.risk_reward_count
+"""
+
+# Copia a daily_metrics los agregados del día (todos los símbolos)
+_CLOSE_TRADE_DAILY_METRICS_SQL = f"""
+    INSERT INTO daily_metrics (date, trades_closed, total_pnl, win_rate, profit_factor, avg_risk_reward)
+    SELECT period, trades_closed, sum_pnl, 100.0 * winning_trades / trades_closed,
+           CASE WHEN gross_loss > 0 THEN gross_profit / gross_loss ELSE 0 END,
+           sum_risk_reward / NULLIF(risk_reward_count, 0)
+    FROM performance_aggregates
+    WHERE period = ? AND symbol = '{ALL_SYMBOLS}'
+    ON CONFLICT(date) DO UPDATE SET
+        trades_closed = excluded.trades_closed,
+        total_pnl = excluded.total_pnl,
+        win_rate = excluded.win_rate,
+        profit_factor = excluded.profit_factor,
+        avg_risk_reward = excluded.avg_risk_reward
+"""
+
+
+def _date_bounds(start_date: Optional[date] = None, end_date: Optional[date] = None) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Límites [desde, hasta) de un rango de días como texto ISO.
+    
+    Las fechas se guardan como texto ISO ('2024-01-15 10:30:00' o con 'T'),
+    así que `columna >= '2024-01-15' AND columna < '2024-01-16'` selecciona
+    el día sin aplicar DATE() a la columna y puede usar su índice.
+    
+    Args:
+        start_date: Primer día incluido (None = sin límite inferior)
+        end_date: Último día incluido (None = sin límite superior)
+    
+    Returns:
+        (desde, hasta) con None en los lados sin límite
+    """
+    if isinstance(start_date, datetime):
+        start_date = start_date.date()
+    if isinstance(end_date, datetime):
+        end_date = end_date.date()
+    lower = start_date.isoformat() if start_date is not None else None
+    upper = (end_date + timedelta(days=1)).isoformat() if end_date is not None else None
+    return lower, upper
+
+
+def _range_condition(column: str, start_date: Optional[date] = None,
+                     end_date: Optional[date] = None) -> Tuple[str, tuple]:
+    """Condición SQL (usable con índice) y parámetros para filtrar `column` por días"""
+    lower, upper = _date_bounds(start_date, end_date)
+    conditions = [f"{column} IS NOT NULL"]
+    params = []
+    if lower is not None:
+        conditions.append(f"{column} >= ?")
+        params.append(lower)
+    if upper is not None:
+        conditions.append(f"{column} < ?")
+        params.append(upper)
+    return " AND ".join(conditions), tuple(params)
+
+
+class ConnectionPool:
+    """
+    Conexiones SQLite seguras entre hilos.
+    
+    - Lectura: una conexión por hilo (en WAL las lecturas no se bloquean
+      entre sí ni con el escritor), creada en el primer uso
+    - Escritura: una única conexión protegida por un lock; transaction()
+      abre la transacción y la confirma o deshace al salir del with
+    """
+    
+    def __init__(self, db_path: str, timeout: float = 30.0):
+        self.db_path = db_path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._readers: List[Tuple[threading.Thread, sqlite3.Connection]] = []
+        self._readers_lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        self._write_depth = 0
+        
+        # autocommit (isolation_level=None): las transacciones las abre transaction()
+        self._write_conn = self._connect(isolation_level=None)
+        # Vacuum incremental (solo tiene efecto al crear el archivo; ver _incremental_vacuum)
+        self._write_conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        # WAL: las lecturas no bloquean al escritor y los commits no hacen fsync
+        # (solo los checkpoints)
+        self._write_conn.execute("PRAGMA journal_mode=WAL")
+        self._write_conn.execute("PRAGMA synchronous=NORMAL")
+    
+    def _connect(self, **kwargs) -> sqlite3.Connection:
+        # check_same_thread=False solo para poder cerrarlas desde close(); cada
+        # conexión de lectura la usa un único hilo
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False, **kwargs)
+        conn.row_factory = sqlite3.Row  # Permite acceso por nombre de columna
+        return conn
+    
+    def reader(self) -> sqlite3.Connection:
+        """Conexión de lectura del hilo actual"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+            with self._readers_lock:
+                # Cierra las conexiones de hilos que ya terminaron
+                alive = []
+                for thread, reader in self._readers:
+                    if thread.is_alive():
+                        alive.append((thread, reader))
+                    else:
+                        reader.close()
+                self._readers = alive + [(threading.current_thread(), conn)]
+        return conn
+    
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        """Conexión de escritura en exclusiva (sin transacción: para PRAGMA y VACUUM)"""
+        with self._write_lock:
+            yield self._write_conn
+    
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Transacción de escritura: COMMIT al salir del with, ROLLBACK si hay excepción.
+        
+        Anidada en el mismo hilo, forma parte de la transacción exterior.
+        """
+        with self._write_lock:
+            if self._write_depth > 0:
+                self._write_depth += 1
+                try:
+                    yield self._write_conn
+                finally:
+                    self._write_depth -= 1
+                return
+            
+            self._write_conn.execute("BEGIN IMMEDIATE")
+            self._write_depth = 1
+            try:
+                yield self._write_conn
+            except BaseException:
+                self._write_conn.execute("ROLLBACK")
+                raise
+            else:
+                self._write_conn.execute("COMMIT")
+            finally:
+                self._write_depth = 0
+    
+    def close(self) -> None:
+        with self._readers_lock:
+            for _, reader in self._readers:
+                reader.close()
+            self._readers = []
+        with self._write_lock:
+            self._write_conn.close()
+
+
+class WriteBehindWriter:
+    """
+    Hilo escritor de la base de datos (modo write-behind).
+    
+    Recibe escrituras por una cola y las confirma por lotes con la conexión
+    de escritura del pool: una transacción por lote, con executemany para las sentencias
+    consecutivas con el mismo SQL. flush() es una barrera: vuelve cuando todo
+    lo encolado antes está confirmado.
+    """
+    
+    def __init__(self, pool: ConnectionPool, flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 max_batch: int = DEFAULT_MAX_BATCH):
+        self.pool = pool
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.queue: queue.Queue = queue.Queue()
+        self.failed = 0
+        self.last_error: Optional[Exception] = None
+        self.thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self.thread.start()
+    
+    def submit(self, unit: WriteUnit) -> None:
+        """Encola una escritura (no bloquea)"""
+        self.queue.put(unit)
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Espera a que se confirme todo lo encolado hasta ahora.
+        
+        Returns:
+            True si terminó antes del timeout
+        """
+        if not self.thread.is_alive():
+            return self.queue.empty()
+        done = threading.Event()
+        self.queue.put(done)
+        return done.wait(timeout)
+    
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Confirma lo pendiente y detiene el hilo"""
+        self.queue.put(_STOP)
+        self.thread.join(timeout)
+    
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            item = self.queue.get()
+            batch: List[WriteUnit] = []
+            barriers: List[threading.Event] = []
+            deadline = time.monotonic() + self.flush_interval
+            
+            # Acumula hasta max_batch escrituras, flush_interval segundos,
+            # una barrera de flush() o la parada
+            while True:
+                if item is _STOP:
+                    stop = True
+                    break
+                if isinstance(item, threading.Event):
+                    barriers.append(item)
+                    break
+                batch.append(item)
+                remaining = deadline - time.monotonic()
+                if len(batch) >= self.max_batch or remaining <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            
+            if batch:
+                self._commit(batch)
+            for barrier in barriers:
+                barrier.set()
+    
+    def _commit(self, batch: List[WriteUnit]) -> None:
+        start = time.perf_counter()
+        statements = [statement for unit in batch for statement in unit]
+        try:
+            with self.pool.transaction() as conn:
+                for sql, group in itertools.groupby(statements, key=lambda statement: statement[0]):
+                    conn.executemany(sql, [params for _, params in group])
+        except sqlite3.Error:
+            # El lote se deshizo: se reintenta escritura a escritura para no perder las válidas
+            for unit in batch:
+                try:
+                    with self.pool.transaction() as conn:
+                        for sql, params in unit:
+                            conn.execute(sql, params)
+                except sqlite3.Error as e:
+                    self.failed += 1
+                    self.last_error = e
+                    print(f"❌ Error al guardar en la base de datos: {e}", flush=True)
+        timings.record('db.write_batch', time.perf_counter() - start)
+
 
 class TradingDatabase:
     """
@@ -20,29 +501,70 @@ class TradingDatabase:
     - Operaciones ejecutadas
     - Posiciones abiertas
     - Métricas de performance
+    
+    Con write_behind=True las escrituras se encolan y las confirma por lotes
+    un hilo escritor (el loop de trading no espera a disco); las lecturas
+    llaman antes a flush() para ver lo escrito.
+    
+    Se puede usar desde varios hilos (loop, reportes, Telegram): cada hilo
+    lee con su propia conexión y las escrituras pasan por una única
+    conexión de escritura (ConnectionPool).
     """
     
-    def __init__(self, db_path: str = "data/trading_bot.db"):
+    def __init__(self, db_path: str = "data/trading_bot.db", write_behind: bool = False,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL, max_batch: int = DEFAULT_MAX_BATCH):
         """
         Inicializa la base de datos.
         
         Args:
             db_path: Ruta al archivo de base de datos
+            write_behind: Si True, escribe en segundo plano por lotes
+            flush_interval: Segundos máximos que una escritura espera a su lote
+            max_batch: Escrituras por lote como máximo
         """
         # Crear directorio si no existe
         db_dir = Path(db_path).parent
         db_dir.mkdir(parents=True, exist_ok=True)
         
         self.db_path = db_path
-        self.conn = None
+        self.pool = ConnectionPool(db_path)
+        self.writer: Optional[WriteBehindWriter] = None
+        # Run de estado actual por símbolo (save_bot_state solo inserta cuando cambia)
+        self._bot_state_runs: Dict[str, BotStateRun] = {}
         self._init_database()
+        
+        # En write-behind los IDs se asignan aquí (save_signal/save_trade los devuelven
+        # sin esperar) de bloques reservados en sqlite_sequence: (siguiente, último)
+        self._id_blocks: Dict[str, Tuple[int, int]] = {}
+        self._id_lock = threading.Lock()
+        if write_behind:
+            self.writer = WriteBehindWriter(self.pool, flush_interval, max_batch)
+    
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Conexión de lectura del hilo actual"""
+        return self.pool.reader()
+    
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Transacción de escritura síncrona (COMMIT al salir, ROLLBACK si hay error).
+        
+        Confirma antes las escrituras encoladas en write-behind para respetar el orden.
+        """
+        self.flush()
+        with self.pool.transaction() as conn:
+            yield conn
     
     def _init_database(self):
         """Crea las tablas si no existen"""
-        self.conn = sqlite3.connect(self.db_path)
-        self.conn.row_factory = sqlite3.Row  # Permite acceso por nombre de columna
+        with self.pool.transaction() as conn:
+            self._create_tables(conn.cursor())
         
-        cursor = self.conn.cursor()
+        self._apply_migrations()
+    
+    def _create_tables(self, cursor: sqlite3.Cursor):
+        """Tablas base (los cambios posteriores van en MIGRATIONS)"""
         
         # Tabla de señales (todas las señales generadas)
         cursor.execute("""
@@ -173,9 +695,128 @@ class TradingDatabase:
                 UNIQUE(date, symbol)
             )
         """)
+    
+    def _apply_migrations(self):
+        """Aplica en orden las migraciones de MIGRATIONS que aún no figuran en schema_version"""
+        with self.pool.transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    description TEXT NOT NULL,
+                    applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+        
+        current = self.schema_version()
+        if current >= MIGRATIONS[-1].version:
+            return
+        
+        # Las pendientes y el recálculo de agregados van en una sola transacción: el
+        # recálculo usa el esquema final y no puede quedar una migración aplicada sin él
+        with self.pool.transaction() as conn:
+            rebuild = False
+            for migration in MIGRATIONS:
+                if migration.version <= current:
+                    continue
+                # Se vuelve a comprobar con el lock de escritura tomado: otro proceso
+                # que abrió la misma base de datos a la vez puede haberla aplicado ya
+                applied = conn.execute(
+                    "SELECT 1 FROM schema_version WHERE version = ?", (migration.version,)
+                ).fetchone()
+                if applied:
+                    continue
+                for statement in migration.statements:
+                    conn.execute(statement)
+                conn.execute(
+                    "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                    (migration.version, migration.description)
+                )
+                rebuild = rebuild or migration.rebuild_aggregates
+            
+            if rebuild:
+                self.rebuild_aggregates()
+    
+    def schema_version(self) -> int:
+        """Versión de esquema aplicada (0 = solo las tablas base)"""
+        # Con la conexión de escritura: una de lectura abierta antes de migrar
+        # conservaría el esquema anterior en caché para EXPLAIN/PRAGMA
+        with self.pool.writer() as conn:
+            return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+    
+    def _allocate_id(self, table: str) -> Optional[int]:
+        """ID de la próxima fila de la tabla (en modo síncrono lo asigna SQLite: None)"""
+        if self.writer is None:
+            return None
+        with self._id_lock:
+            next_id, last_id = self._id_blocks.get(table, (1, 0))
+            if next_id > last_id:
+                next_id, last_id = self._reserve_ids(table, ID_BLOCK_SIZE)
+            self._id_blocks[table] = (next_id + 1, last_id)
+            return next_id
+    
+    def _reserve_ids(self, table: str, count: int) -> Tuple[int, int]:
+        """
+        Reserva count IDs de una tabla AUTOINCREMENT avanzando su sqlite_sequence.
+        
+        SQLite asigna los IDs nuevos por encima de sqlite_sequence, así que
+        otros procesos (scripts, la CLI, otro bot) no pueden usar los reservados.
+        
+        Returns:
+            (primer ID, último ID) del bloque
+        """
+        with self.pool.transaction() as conn:
+            seq = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+            max_id = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+            first = max(max_id, seq[0] if seq else 0) + 1
+            last = first + count - 1
+            if seq:
+                conn.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = ?", (last, table))
+            else:
+                conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (table, last))
+        return first, last
+    
+    def _write(self, unit: WriteUnit) -> Optional[int]:
+        """
+        Ejecuta una escritura (sus sentencias van en una transacción).
         
-        self.conn.commit()
+        En write-behind la encola y vuelve al instante; en modo síncrono la
+        ejecuta y confirma.
+        
+        Returns:
+            lastrowid de la última sentencia (None en write-behind)
+        """
+        if self.writer is not None:
+            self.writer.submit(unit)
+            return None
+        
+        with self.pool.transaction() as conn:
+            cursor = conn.cursor()
+            for sql, params in unit:
+                cursor.execute(sql, params)
+        return cursor.lastrowid
+    
+    def _daily_metrics_increment(self, day: date, **increments: int) -> Tuple[str, tuple]:
+        """Sentencia que suma contadores (total_signals, trades_opened, ...) a daily_metrics"""
+        columns = list(increments)
+        return (f"""
+            INSERT INTO daily_metrics (date, {", ".join(columns)})
+            VALUES (?, {", ".join("?" for _ in columns)})
+            ON CONFLICT(date) DO UPDATE SET
+                {", ".join(f"{column} = {column} + excluded.{column}" for column in columns)}
+        """, (day.isoformat(), *increments.values()))
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Espera a que estén confirmadas todas las escrituras encoladas.
+        
+        Returns:
+            True si terminó antes del timeout (siempre en modo síncrono)
+        """
+        if self.writer is None:
+            return True
+        return self.writer.flush(timeout)
     
+    @timings.timed('db.save_signal')
     def save_signal(self, signal: Dict, status: str = "GENERATED", rejection_reason: str = None) -> int:
         """
         Guarda una señal en la base de datos.
@@ -188,17 +829,25 @@ class TradingDatabase:
         Returns:
             ID de la señal guardada
         """
-        cursor = self.conn.cursor()
+        signal_id = self._allocate_id("signals")
+        now = datetime.now()
         
-        cursor.execute("""
+        # El INSERT va el último: en modo síncrono su lastrowid es el ID de la señal
+        row_id = self._write([self._daily_metrics_increment(
+            now.date(),
+            total_signals=1,
+            accepted_signals=int(status == "ACCEPTED"),
+            rejected_signals=int(status == "REJECTED")
+        ), ("""
             INSERT INTO signals (
-                timestamp, symbol, direction, entry_price, stop_loss,
+                id, timestamp, symbol, direction, entry_price, stop_loss,
                 take_profit_1, take_profit_2, take_profit_final,
                 risk_reward, confirmations, confirmations_list,
                 justifications, status, rejection_reason
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (
-            datetime.now(),
+            signal_id,
+            now,
             signal.get("symbol", "XAUUSD"),
             signal.get("signal", "HOLD"),
             signal.get("entry_price", 0.0),
@@ -212,11 +861,11 @@ class TradingDatabase:
             ", ".join(signal.get("justifications", [])),
             status,
             rejection_reason
-        ))
+        ))])
         
-        self.conn.commit()
-        return cursor.lastrowid
+        return signal_id or row_id
     
+    @timings.timed('db.save_trade')
     def save_trade(self, ticket: int, signal: Dict, lot_size: float, 
                    entry_price: float, stop_loss: float, take_profit: float,
                    signal_id: Optional[int] = None) -> int:
@@ -235,20 +884,23 @@ class TradingDatabase:
         Returns:
             ID del trade guardado
         """
-        cursor = self.conn.cursor()
+        trade_id = self._allocate_id("trades")
+        now = datetime.now()
+        opened_statement = self._daily_metrics_increment(now.date(), trades_opened=1)
         
-        cursor.execute("""
+        trade_statement = ("""
             INSERT INTO trades (
-                signal_id, ticket, symbol, direction, entry_time,
+                id, signal_id, ticket, symbol, direction, entry_time,
                 entry_price, lot_size, stop_loss, take_profit,
                 risk_reward, comment
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (
+            trade_id,
             signal_id,
             ticket,
             signal.get("symbol", "XAUUSD"),
             signal.get("signal", "BUY"),
-            datetime.now(),
+            now,
             entry_price,
             lot_size,
             stop_loss,
@@ -257,20 +909,29 @@ class TradingDatabase:
             f"ICT Strategy - RR:{signal.get('risk_reward', 0.0):.2f}"
         ))
         
-        self.conn.commit()
-        trade_id = cursor.lastrowid
-        
         # También guarda en positions
-        self.save_position(trade_id, ticket, signal, lot_size, entry_price, stop_loss, take_profit)
+        if self.writer is not None:
+            # Trade y posición en la misma transacción (el ID ya se conoce)
+            self._write([opened_statement, trade_statement, self._position_statement(
+                trade_id, ticket, signal, lot_size, entry_price, stop_loss, take_profit
+            )])
+        else:
+            trade_id = self._write([opened_statement, trade_statement])
+            self.save_position(trade_id, ticket, signal, lot_size, entry_price, stop_loss, take_profit)
         
         return trade_id
     
+    @timings.timed('db.save_position')
     def save_position(self, trade_id: int, ticket: int, signal: Dict,
                      lot_size: float, entry_price: float, stop_loss: float, take_profit: float):
         """Guarda o actualiza una posición abierta"""
-        cursor = self.conn.cursor()
-        
-        cursor.execute("""
+        self._write([self._position_statement(trade_id, ticket, signal, lot_size,
+                                              entry_price, stop_loss, take_profit)])
+    
+    def _position_statement(self, trade_id: int, ticket: int, signal: Dict, lot_size: float,
+                            entry_price: float, stop_loss: float, take_profit: float) -> Tuple[str, tuple]:
+        """Sentencia que guarda o actualiza una posición abierta"""
+        return ("""
             INSERT OR REPLACE INTO positions (
                 trade_id, ticket, symbol, direction, entry_time,
                 entry_price, lot_size, stop_loss, take_profit
@@ -286,16 +947,22 @@ class TradingDatabase:
             stop_loss,
             take_profit
         ))
+    
+    def set_signal_rejection_reason(self, signal_id: int, reason: str):
+        """
+        Anota por qué no se ejecutó una señal ya guardada.
         
-        self.conn.commit()
+        Va por la misma cola que save_signal: en write-behind se aplica
+        después del INSERT de la señal aunque este siga pendiente.
+        """
+        self._write([("UPDATE signals SET rejection_reason = ? WHERE id = ?", (reason, signal_id))])
     
+    @timings.timed('db.update_position')
     def update_position(self, ticket: int, current_price: float, unrealized_pnl: float,
                        sl_moved_to_be: bool = False, partial_close_1: bool = False,
                        partial_close_2: bool = False):
         """Actualiza información de una posición abierta"""
-        cursor = self.conn.cursor()
-        
-        cursor.execute("""
+        self._write([("""
             UPDATE positions SET
                 current_price = ?,
                 unrealized_pnl = ?,
@@ -304,15 +971,28 @@ class TradingDatabase:
                 partial_close_2 = ?,
                 last_update = ?
             WHERE ticket = ?
-        """, (current_price, unrealized_pnl, sl_moved_to_be, partial_close_1, partial_close_2, datetime.now(), ticket))
-        
-        self.conn.commit()
+        """, (current_price, unrealized_pnl, sl_moved_to_be, partial_close_1, partial_close_2, datetime.now(), ticket))])
     
+    @timings.timed('db.close_trade')
     def close_trade(self, ticket: int, exit_price: float, exit_reason: str, pnl: float, pnl_pct: float):
-        """Marca un trade como cerrado"""
-        cursor = self.conn.cursor()
+        """
+        Marca un trade como cerrado.
         
-        cursor.execute("""
+        En la misma transacción suma el trade a performance_aggregates y
+        actualiza la fila del día de daily_metrics (si el trade ya estaba
+        cerrado, los agregados no cambian).
+        """
+        now = datetime.now()
+        day = now.date().isoformat()
+        self._write([
+            (_CLOSE_TRADE_AGGREGATES_SQL, {
+                "ticket": ticket,
+                "day": day,
+                "pnl": pnl if pnl is not None else 0.0,
+                "pnl_known": pnl is not None
+            }),
+            (_CLOSE_TRADE_DAILY_METRICS_SQL, (day,)),
+            ("""
             UPDATE trades SET
                 exit_time = ?,
                 exit_price = ?,
@@ -320,114 +1000,140 @@ class TradingDatabase:
                 pnl = ?,
                 pnl_pct = ?
             WHERE ticket = ?
-        """, (datetime.now(), exit_price, exit_reason, pnl, pnl_pct, ticket))
-        
-        # Elimina de positions
-        cursor.execute("DELETE FROM positions WHERE ticket = ?", (ticket,))
-        
-        self.conn.commit()
+        """, (now, exit_price, exit_reason, pnl, pnl_pct, ticket)),
+            # Elimina de positions
+            ("DELETE FROM positions WHERE ticket = ?", (ticket,))
+        ])
     
     def get_open_positions(self) -> List[Dict]:
         """Obtiene todas las posiciones abiertas"""
+        self.flush()
         cursor = self.conn.cursor()
         cursor.execute("SELECT * FROM positions")
         rows = cursor.fetchall()
         return [dict(row) for row in rows]
     
-    def get_trade_history(self, limit: int = 100) -> List[Dict]:
-        """Obtiene historial de trades"""
+    def get_trade_history(self, limit: int = 100, start_date: Optional[date] = None,
+                          end_date: Optional[date] = None) -> List[Dict]:
+        """
+        Obtiene historial de trades (los más recientes primero).
+        
+        Args:
+            limit: Número máximo de trades
+            start_date: Primer día de entrada incluido (opcional)
+            end_date: Último día de entrada incluido (opcional)
+        """
+        self.flush()
         cursor = self.conn.cursor()
-        cursor.execute("""
+        condition, params = _range_condition("entry_time", start_date, end_date)
+        cursor.execute(f"""
             SELECT * FROM trades 
+            WHERE {condition}
             ORDER BY entry_time DESC 
             LIMIT ?
-        """, (limit,))
+        """, params + (limit,))
         rows = cursor.fetchall()
         return [dict(row) for row in rows]
     
     def get_today_trades(self) -> List[Dict]:
         """Obtiene todos los trades del día actual"""
+        self.flush()
         cursor = self.conn.cursor()
         today = datetime.now().date()
-        today_str = today.strftime('%Y-%m-%d')
         
-        # SQLite puede almacenar fechas como strings, así que usamos LIKE para mayor compatibilidad
-        cursor.execute("""
+        # Rango de texto en lugar de DATE(entry_time): usa idx_trades_entry_time
+        condition, params = _range_condition("entry_time", today, today)
+        cursor.execute(f"""
             SELECT * FROM trades 
-            WHERE entry_time LIKE ? OR DATE(entry_time) = ?
+            WHERE {condition}
             ORDER BY entry_time DESC
-        """, (f'{today_str}%', today))
+        """, params)
         rows = cursor.fetchall()
         return [dict(row) for row in rows]
     
     def get_today_closed_trades(self) -> List[Dict]:
         """Obtiene todos los trades cerrados del día actual"""
+        self.flush()
         cursor = self.conn.cursor()
         today = datetime.now().date()
-        cursor.execute("""
+        condition, params = _range_condition("exit_time", today, today)
+        cursor.execute(f"""
             SELECT * FROM trades 
-            WHERE DATE(exit_time) = ? AND exit_time IS NOT NULL
+            WHERE {condition}
             ORDER BY exit_time DESC
-        """, (today,))
+        """, params)
         rows = cursor.fetchall()
         return [dict(row) for row in rows]
     
-    def get_performance_metrics(self, today_only: bool = False) -> Dict:
-        """Calcula métricas de performance"""
-        cursor = self.conn.cursor()
+    @timings.timed('db.get_performance_metrics')
+    def get_performance_metrics(self, today_only: bool = False, start_date: Optional[date] = None,
+                                end_date: Optional[date] = None, symbol: Optional[str] = None) -> Dict:
+        """
+        Métricas de performance de los trades cerrados.
         
-        # Construye la consulta base
-        base_query = """
-            SELECT 
-                COUNT(*) as total_trades,
-                SUM(CASE WHEN pnl > 0 THEN 1 ELSE 0 END) as winning_trades,
-                SUM(CASE WHEN pnl < 0 THEN 1 ELSE 0 END) as losing_trades,
-                SUM(pnl) as total_pnl,
-                AVG(pnl) as avg_pnl,
-                AVG(risk_reward) as avg_rr
-            FROM trades
-            WHERE exit_time IS NOT NULL
+        Se leen de performance_aggregates (una fila para el histórico o para
+        un día; una por día del rango si se pide un rango), sin recorrer trades.
+        
+        Args:
+            today_only: Solo trades cerrados hoy
+            start_date: Primer día de cierre incluido (opcional)
+            end_date: Último día de cierre incluido (opcional)
+            symbol: Solo trades de este símbolo (default: todos)
         """
+        self.flush()
+        cursor = self.conn.cursor()
         
         if today_only:
-            today = datetime.now().date()
-            query = base_query + " AND DATE(exit_time) = ?"
-            cursor.execute(query, (today,))
+            start_date = end_date = datetime.now().date()
+        
+        conditions = ["symbol = ?"]
+        params = [symbol or ALL_SYMBOLS]
+        if start_date is None and end_date is None:
+            conditions.append("period = ?")
+            params.append(ALL_PERIODS)
         else:
-            cursor.execute(base_query)
+            lower, upper = _date_bounds(start_date, end_date)
+            conditions.append("period != ?")
+            params.append(ALL_PERIODS)
+            if lower is not None:
+                conditions.append("period >= ?")
+                params.append(lower)
+            if upper is not None:
+                conditions.append("period < ?")
+                params.append(upper)
+        
+        cursor.execute(f"""
+            SELECT 
+                COALESCE(SUM(trades_closed), 0) as total_trades,
+                SUM(winning_trades) as winning_trades,
+                SUM(losing_trades) as losing_trades,
+                SUM(gross_profit) as total_profit,
+                SUM(gross_loss) as total_loss,
+                SUM(sum_pnl) as total_pnl,
+                SUM(pnl_count) as pnl_count,
+                SUM(sum_risk_reward) as sum_rr,
+                SUM(risk_reward_count) as rr_count
+            FROM performance_aggregates
+            WHERE {" AND ".join(conditions)}
+        """, params)
         
         result = cursor.fetchone()
         
         if result and result['total_trades'] > 0:
-            win_rate = (result['winning_trades'] / result['total_trades']) * 100
-            
-            # Profit factor
-            pf_query = """
-                SELECT 
-                    SUM(CASE WHEN pnl > 0 THEN pnl ELSE 0 END) as total_profit,
-                    ABS(SUM(CASE WHEN pnl < 0 THEN pnl ELSE 0 END)) as total_loss
-                FROM trades
-                WHERE exit_time IS NOT NULL
-            """
-            if today_only:
-                today = datetime.now().date()
-                pf_query += " AND DATE(exit_time) = ?"
-                cursor.execute(pf_query, (today,))
-            else:
-                cursor.execute(pf_query)
-            
-            pf_result = cursor.fetchone()
-            profit_factor = (pf_result['total_profit'] / pf_result['total_loss']) if pf_result['total_loss'] > 0 else 0
+            total_trades = result['total_trades']
+            win_rate = (result['winning_trades'] / total_trades) * 100
+            profit_factor = (result['total_profit'] / result['total_loss']) if result['total_loss'] > 0 else 0
             
             return {
-                "total_trades": result['total_trades'],
+                "total_trades": total_trades,
                 "winning_trades": result['winning_trades'],
                 "losing_trades": result['losing_trades'],
                 "win_rate": win_rate,
                 "total_pnl": result['total_pnl'] or 0,
-                "avg_pnl": result['avg_pnl'] or 0,
+                # Como AVG(pnl): los trades sin pnl no cuentan
+                "avg_pnl": (result['total_pnl'] / result['pnl_count']) if result['pnl_count'] else 0,
                 "profit_factor": profit_factor,
-                "avg_risk_reward": result['avg_rr'] or 0
+                "avg_risk_reward": (result['sum_rr'] / result['rr_count']) if result['rr_count'] else 0
             }
         
         return {
@@ -441,6 +1147,17 @@ class TradingDatabase:
             "avg_risk_reward": 0
         }
     
+    def rebuild_aggregates(self):
+        """
+        Recalcula performance_aggregates y daily_metrics desde trades y signals.
+        
+        Para completar datos anteriores a los agregados o tras editar trades a mano.
+        """
+        with self.transaction() as conn:
+            for statement in REBUILD_AGGREGATES_SQL:
+                conn.execute(statement)
+    
+    @timings.timed('db.save_bot_state')
     def save_bot_state(self, symbol: str, news_mode: str, blocked: bool, 
                       reasons: List[str], cooldown_until_utc: Optional[datetime] = None,
                       spread: float = None, atr_ratio: float = None, 
@@ -458,8 +1175,6 @@ class TradingDatabase:
             atr_ratio: Ratio ATR actual/promedio
             daily_dd_pct: Drawdown diario porcentual
         """
-        cursor = self.conn.cursor()
-        
         # Validar y convertir todos los parámetros antes de insertar
         # SQLite necesita strings para fechas, no objetos datetime
         try:
@@ -507,24 +1222,129 @@ class TradingDatabase:
         atr_ratio_safe = float(atr_ratio) if atr_ratio is not None else None
         daily_dd_pct_safe = float(daily_dd_pct) if daily_dd_pct is not None else None
         
-        cursor.execute("""
+        # Run-length encoding: si el estado (modo, bloqueo, razones, cooldown) no
+        # cambió, se extiende la fila actual en lugar de insertar otra
+        symbol_str = str(symbol)
+        state_key = (str(news_mode), blocked_int, reasons_json, cooldown_safe_str)
+        run = self._bot_state_runs.get(symbol_str)
+        if run is not None and run.state_key == state_key:
+            run.add(spread_safe, atr_ratio_safe)
+            self._write([("""
+                UPDATE bot_state SET
+                    last_seen_utc = ?,
+                    samples = ?,
+                    spread = ?,
+                    atr_ratio = ?,
+                    daily_dd_pct = ?,
+                    spread_min = ?,
+                    spread_max = ?,
+                    atr_ratio_max = ?
+                WHERE id = ?
+            """, (
+                timestamp_utc_str,
+                run.samples,
+                spread_safe,
+                atr_ratio_safe,
+                daily_dd_pct_safe,
+                run.spread_min,
+                run.spread_max,
+                run.atr_ratio_max,
+                run.row_id
+            ))])
+            return
+        
+        row_id = self._allocate_id("bot_state")
+        inserted_id = self._write([("""
             INSERT INTO bot_state (
-                timestamp_utc, symbol, news_mode, blocked, reasons,
-                cooldown_until_utc, spread, atr_ratio, daily_dd_pct
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                id, timestamp_utc, symbol, news_mode, blocked, reasons,
+                cooldown_until_utc, spread, atr_ratio, daily_dd_pct,
+                last_seen_utc, samples, spread_min, spread_max, atr_ratio_max
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1, ?, ?, ?)
         """, (
+            row_id,
             timestamp_utc_str,  # String en lugar de datetime
-            str(symbol),
+            symbol_str,
             str(news_mode),
             blocked_int,
             reasons_json,
             cooldown_safe_str,  # String en lugar de datetime
             spread_safe,
             atr_ratio_safe,
-            daily_dd_pct_safe
-        ))
-        self.conn.commit()
+            daily_dd_pct_safe,
+            timestamp_utc_str,
+            spread_safe,
+            spread_safe,
+            atr_ratio_safe
+        ))])
+        self._bot_state_runs[symbol_str] = BotStateRun(
+            state_key, row_id or inserted_id,
+            spread_min=spread_safe, spread_max=spread_safe, atr_ratio_max=atr_ratio_safe
+        )
+    
+    def compact_bot_state(self, raw_days: int = BOT_STATE_RAW_DAYS, now: Optional[datetime] = None,
+                          vacuum_pages: int = VACUUM_PAGES) -> Dict[str, int]:
+        """
+        Retención de bot_state.
+        
+        Los runs que terminaron hace más de raw_days días (cortando en hora
+        completa) se resumen en bot_state_hourly (muestras, runs, cambios de
+        modo, muestras bloqueadas, spread mín/máx, ATR ratio máx, peor
+        drawdown) y se borran; después se devuelven al sistema hasta
+        vacuum_pages páginas libres. Cada run cuenta en la hora en la que
+        empezó; un run que sigue abierto o cruza el corte se conserva
+        completo hasta que termine antes del corte. Los cambios de modo
+        entre el último run de una compactación y el primero de la
+        siguiente también cuentan (ver last_mode).
+        
+        Args:
+            raw_days: Días de filas completas que se conservan
+            now: Momento de referencia (default: ahora, UTC)
+            vacuum_pages: Páginas máximas a liberar en esta llamada
+        
+        Returns:
+            {'compacted_rows', 'hours', 'freed_pages'}
+        """
+        now = now or datetime.now(timezone.utc)
+        cutoff = (now - timedelta(days=raw_days)).replace(minute=0, second=0, microsecond=0)
+        cutoff_str = cutoff.isoformat()
+        
+        with self.transaction() as conn:
+            hours = conn.execute(_COMPACT_BOT_STATE_SQL, (cutoff_str,)).rowcount
+            compacted = conn.execute(
+                "DELETE FROM bot_state WHERE COALESCE(last_seen_utc, timestamp_utc) < ?", (cutoff_str,)
+            ).rowcount
+            
+            # Un run que se borró ya no se puede extender: el próximo estado abre fila nueva
+            for symbol, run in list(self._bot_state_runs.items()):
+                if conn.execute("SELECT 1 FROM bot_state WHERE id = ?", (run.row_id,)).fetchone() is None:
+                    del self._bot_state_runs[symbol]
+        
+        return {
+            'compacted_rows': compacted,
+            'hours': hours,
+            'freed_pages': self._incremental_vacuum(vacuum_pages)
+        }
+    
+    def _incremental_vacuum(self, max_pages: int) -> int:
+        """
+        Devuelve al sistema hasta max_pages páginas libres.
+        
+        Las bases de datos creadas sin auto_vacuum=INCREMENTAL necesitan un
+        VACUUM completo (una sola vez) para activarlo.
+        
+        Returns:
+            Páginas liberadas
+        """
+        with self.pool.writer() as conn:
+            before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                conn.execute("VACUUM")
+            else:
+                conn.execute(f"PRAGMA incremental_vacuum({int(max_pages)})").fetchall()
+            return before - conn.execute("PRAGMA freelist_count").fetchone()[0]
     
+    @timings.timed('db.get_daily_drawdown_pct')
     def get_daily_drawdown_pct(self, target_date: Optional[date] = None) -> float:
         """
         Calcula el drawdown diario porcentual basado en P&L del día.
@@ -540,16 +1360,18 @@ class TradingDatabase:
         if target_date is None:
             target_date = datetime.now().date()
         
+        self.flush()
         cursor = self.conn.cursor()
         
-        # Obtiene P&L total del día
+        # Obtiene P&L total del día (fila del día en performance_aggregates)
+        day, _ = _date_bounds(target_date)
         cursor.execute("""
             SELECT 
-                COALESCE(SUM(pnl), 0) as total_pnl,
-                COUNT(*) as total_trades
-            FROM trades
-            WHERE DATE(exit_time) = ? AND exit_time IS NOT NULL
-        """, (target_date,))
+                sum_pnl as total_pnl,
+                trades_closed as total_trades
+            FROM performance_aggregates
+            WHERE period = ? AND symbol = ?
+        """, (day, ALL_SYMBOLS))
         
         result = cursor.fetchone()
         
@@ -557,13 +1379,14 @@ class TradingDatabase:
             total_pnl = result['total_pnl'] or 0
             
             # Obtiene el balance inicial del día (del primer trade)
-            cursor.execute("""
+            condition, params = _range_condition("entry_time", target_date, target_date)
+            cursor.execute(f"""
                 SELECT entry_price, lot_size, direction
                 FROM trades
-                WHERE DATE(entry_time) = ?
+                WHERE {condition}
                 ORDER BY entry_time ASC
                 LIMIT 1
-            """, (target_date,))
+            """, params)
             
             first_trade = cursor.fetchone()
             
@@ -586,7 +1409,38 @@ class TradingDatabase:
         return 0.0
     
     def close(self):
-        """Cierra la conexión a la base de datos"""
-        if self.conn:
-            self.conn.close()
+        """Cierra la conexión a la base de datos (antes confirma las escrituras pendientes)"""
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+            # Devuelve los IDs reservados sin usar si nadie reservó después
+            with self.pool.transaction() as conn:
+                for table, (next_id, last_id) in self._id_blocks.items():
+                    conn.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = ? AND seq = ?",
+                                 (next_id - 1, table, last_id))
+        self.pool.close()
 
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Mantenimiento de la base de datos de trading")
+    parser.add_argument('--db', default="data/trading_bot.db", help="Ruta a la base de datos")
+    parser.add_argument('--rebuild-aggregates', action='store_true',
+                        help="Recalcula performance_aggregates y daily_metrics desde trades y signals")
+    parser.add_argument('--compact-bot-state', type=int, metavar='DIAS', default=None,
+                        help="Resume por hora las filas de bot_state de más de DIAS días")
+    args = parser.parse_args()
+    
+    db = TradingDatabase(args.db)
+    print(f"🗄️ {args.db} (esquema v{db.schema_version()})")
+    if args.rebuild_aggregates:
+        db.rebuild_aggregates()
+        metrics = db.get_performance_metrics()
+        print(f"✅ Agregados recalculados: {metrics['total_trades']} trades cerrados, "
+              f"P&L ${metrics['total_pnl']:.2f}")
+    if args.compact_bot_state is not None:
+        result = db.compact_bot_state(args.compact_bot_state)
+        print(f"✅ bot_state compactado: {result['compacted_rows']} filas -> {result['hours']} horas, "
+              f"{result['freed_pages']} páginas liberadas")
+    db.close()
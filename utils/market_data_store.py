@@ -0,0 +1,353 @@
+"""
+utils/market_data_store.py - Caché binaria columnar de los CSV de velas
+
+Parsear un CSV de velas (pd.read_csv + pd.to_datetime sobre texto) cuesta
+cientos de milisegundos por timeframe y se paga en cada backtest y en cada
+carga de respaldo del trader en vivo.
+
+Este módulo guarda cada CSV una sola vez como archivo .npz (sin comprimir)
+en la carpeta `.cache` junto al CSV: una columna por array con su tipo
+(float64/int64) y los timestamps como int64 (epoch en nanosegundos).
+Recargarlo son unos pocos milisegundos.
+
+La caché se reconstruye sola cuando cambia el CSV de origen: si coinciden la
+fecha de modificación y el tamaño se usa directamente; si no, se compara el
+hash SHA-1 del contenido y solo se vuelve a parsear si el contenido cambió.
+
+Para varios procesos (backtests en paralelo) existe además el formato
+memory-mapped: timestamps y una matriz float64 contigua por columnas en .npy.
+Cada proceso los abre en solo lectura y los DataFrames envuelven los buffers
+mapeados, sin copias: todos comparten las mismas páginas del sistema operativo.
+"""
+
+import hashlib
+import json
+import os
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+CACHE_VERSION = 1
+CACHE_DIRNAME = ".cache"
+
+
+def cache_path_for(csv_path: str, cache_dir: Optional[str] = None) -> str:
+    """
+    Ruta del archivo de caché de un CSV.
+
+    Args:
+        csv_path: Ruta del CSV de origen
+        cache_dir: Carpeta de la caché (por defecto `.cache` junto al CSV)
+
+    Returns:
+        Ruta del .npz
+    """
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(csv_path)), CACHE_DIRNAME)
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(cache_dir, f"{name}.npz")
+
+
+def file_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    """Hash SHA-1 del contenido de un archivo (leído por bloques)"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _source_signature(csv_path: str) -> Dict:
+    stat = os.stat(csv_path)
+    return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+
+def read_ohlcv_csv(csv_path: str) -> pd.DataFrame:
+    """
+    Lee un CSV de velas con la columna de tiempo como índice.
+
+    Acepta la columna de tiempo como 'timestamp' o 'time'.
+
+    Args:
+        csv_path: Ruta del CSV
+
+    Returns:
+        DataFrame indexado por 'timestamp'
+    """
+    df = pd.read_csv(csv_path)
+    if 'timestamp' not in df.columns and 'time' in df.columns:
+        df.rename(columns={'time': 'timestamp'}, inplace=True)
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    df.set_index('timestamp', inplace=True)
+    return df
+
+
+# ==================== FORMATO DE LA CACHÉ ====================
+
+def write_cache(df: pd.DataFrame, cache_path: str, source: Dict) -> bool:
+    """
+    Escribe un DataFrame de velas en la caché (escritura atómica).
+
+    Args:
+        df: DataFrame indexado por timestamp
+        cache_path: Ruta del .npz
+        source: Firma del CSV de origen (mtime_ns, size, sha1)
+
+    Returns:
+        True si se escribió; False si el DataFrame tiene columnas no numéricas
+    """
+    if not all(pd.api.types.is_numeric_dtype(dtype) for dtype in df.dtypes):
+        return False
+
+    index = pd.DatetimeIndex(df.index)
+    meta = {
+        'version': CACHE_VERSION,
+        'source': source,
+        'columns': [str(col) for col in df.columns],
+        'index_name': index.name,
+        'index_unit': index.unit,
+        'index_tz': str(index.tz) if index.tz is not None else None
+    }
+    arrays = {'timestamp': index.as_unit('ns').asi8}
+    for i, col in enumerate(df.columns):
+        arrays[f"col_{i}"] = np.ascontiguousarray(df[col].to_numpy())
+    arrays['meta'] = np.array(json.dumps(meta))
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, cache_path)
+    return True
+
+
+def read_cache(cache_path: str) -> Tuple[pd.DataFrame, Dict]:
+    """
+    Lee un archivo de caché.
+
+    Args:
+        cache_path: Ruta del .npz
+
+    Returns:
+        Tupla (DataFrame, metadatos)
+    """
+    with np.load(cache_path, allow_pickle=False) as npz:
+        meta = json.loads(str(npz['meta']))
+        index = pd.DatetimeIndex(npz['timestamp'].view('datetime64[ns]'), name=meta['index_name'])
+        columns = {col: npz[f"col_{i}"] for i, col in enumerate(meta['columns'])}
+
+    if meta['index_tz'] is not None:
+        index = index.tz_localize('UTC').tz_convert(meta['index_tz'])
+    index = index.as_unit(meta['index_unit'])
+    return pd.DataFrame(columns, index=index, copy=False), meta
+
+
+def _valid_cache_meta(cache_path: str) -> Optional[Dict]:
+    """Metadatos de la caché si existe y es de esta versión"""
+    try:
+        with np.load(cache_path, allow_pickle=False) as npz:
+            meta = json.loads(str(npz['meta']))
+    except (OSError, KeyError, ValueError):
+        return None
+    return meta if meta.get('version') == CACHE_VERSION else None
+
+
+# ==================== CARGA ====================
+
+def _source_status(csv_path: str, source: Optional[Dict]) -> Tuple[str, Dict]:
+    """
+    Compara el CSV con la firma guardada en una caché.
+
+    Returns:
+        Tupla (estado, firma actual). Estado: 'fresh' (misma fecha y tamaño),
+        'touched' (cambió la fecha pero no el contenido) o 'stale'
+    """
+    signature = _source_signature(csv_path)
+    if source is not None and all(source.get(k) == v for k, v in signature.items()):
+        return 'fresh', source
+
+    # Cambió la fecha o el tamaño: solo se reconstruye si cambió el contenido
+    signature['sha1'] = file_hash(csv_path)
+    if source is not None and source.get('sha1') == signature['sha1']:
+        return 'touched', signature
+    return 'stale', signature
+
+
+def load_ohlcv(csv_path: str, use_cache: bool = True,
+               cache_dir: Optional[str] = None) -> pd.DataFrame:
+    """
+    Carga un CSV de velas usando la caché binaria.
+
+    Args:
+        csv_path: Ruta del CSV
+        use_cache: Si False, parsea el CSV directamente
+        cache_dir: Carpeta de la caché (por defecto `.cache` junto al CSV)
+
+    Returns:
+        DataFrame indexado por 'timestamp' (igual que read_ohlcv_csv)
+    """
+    if not use_cache:
+        return read_ohlcv_csv(csv_path)
+
+    cache_path = cache_path_for(csv_path, cache_dir)
+    meta = _valid_cache_meta(cache_path)
+    status, source = _source_status(csv_path, meta['source'] if meta else None)
+
+    if status == 'fresh':
+        return read_cache(cache_path)[0]
+
+    df = read_cache(cache_path)[0] if status == 'touched' else read_ohlcv_csv(csv_path)
+    _try_write_cache(df, cache_path, source)
+    return df
+
+
+def _try_write_cache(df: pd.DataFrame, cache_path: str, source: Dict):
+    """Escribe la caché sin interrumpir la carga si la carpeta no es escribible"""
+    try:
+        write_cache(df, cache_path, source)
+    except OSError as e:
+        print(f"⚠️ No se pudo escribir la caché {cache_path}: {e}")
+
+
+# ==================== ARRAYS MEMORY-MAPPED ====================
+
+def save_mmap_frame(df: pd.DataFrame, base_path: str,
+                    extra_meta: Optional[Dict] = None) -> Dict:
+    """
+    Escribe un DataFrame numérico como arrays .npy listos para memory-map.
+
+    Genera `<base_path>.timestamp.npy` (datetime64 en la unidad del índice),
+    `<base_path>.values.npy` (float64, orden Fortran: cada columna contigua)
+    y `<base_path>.json` con los metadatos. El JSON anterior se borra antes
+    de tocar los arrays y el nuevo se escribe al final: una escritura
+    interrumpida nunca deja metadatos que parezcan válidos.
+
+    Args:
+        df: DataFrame indexado por timestamp con columnas numéricas
+        base_path: Ruta base de los archivos (sin extensión)
+        extra_meta: Metadatos adicionales (p. ej. la firma del CSV de origen)
+
+    Returns:
+        Metadatos escritos
+    """
+    if not all(pd.api.types.is_numeric_dtype(dtype) for dtype in df.dtypes):
+        raise ValueError("save_mmap_frame solo admite columnas numéricas")
+
+    index = pd.DatetimeIndex(df.index)
+    meta = {
+        'version': CACHE_VERSION,
+        'columns': [str(col) for col in df.columns],
+        'index_name': index.name,
+        'index_tz': str(index.tz) if index.tz is not None else None
+    }
+    meta.update(extra_meta or {})
+
+    os.makedirs(os.path.dirname(os.path.abspath(base_path)), exist_ok=True)
+    try:
+        os.remove(f"{base_path}.json")
+    except FileNotFoundError:
+        pass
+    _atomic_save(f"{base_path}.timestamp.npy", np.asarray(index.values))
+    _atomic_save(f"{base_path}.values.npy", np.asfortranarray(df.to_numpy(dtype=np.float64)))
+    _write_json(f"{base_path}.json", meta)
+    return meta
+
+
+def open_mmap_frame(base_path: str) -> Tuple[pd.DataFrame, Dict]:
+    """
+    Abre los arrays de save_mmap_frame memory-mapped y de solo lectura.
+
+    Args:
+        base_path: Ruta base de los archivos (sin extensión)
+
+    Returns:
+        Tupla (DataFrame sobre los buffers mapeados, metadatos)
+    """
+    meta = _read_json(f"{base_path}.json")
+    if meta is None:
+        raise FileNotFoundError(f"{base_path}.json")
+
+    timestamps = _load_mapped(f"{base_path}.timestamp.npy")
+    values = _load_mapped(f"{base_path}.values.npy")
+
+    index = pd.DatetimeIndex(timestamps, name=meta['index_name'], copy=False)
+    if meta['index_tz'] is not None:
+        index = index.tz_localize('UTC').tz_convert(meta['index_tz'])
+    df = pd.DataFrame(values, index=index, columns=meta['columns'], copy=False)
+    return df, meta
+
+
+def load_ohlcv_mmap(csv_path: str, cache_dir: Optional[str] = None) -> pd.DataFrame:
+    """
+    Carga un CSV de velas como DataFrame sobre arrays memory-mapped.
+
+    Materializa los arrays la primera vez (o si el CSV cambió) y después solo
+    los mapea: el arranque es casi inmediato y no se copian datos. Las
+    columnas se devuelven como float64 y son de solo lectura.
+
+    Args:
+        csv_path: Ruta del CSV
+        cache_dir: Carpeta de los arrays (por defecto `.cache` junto al CSV)
+
+    Returns:
+        DataFrame indexado por 'timestamp'
+    """
+    base_path = os.path.splitext(cache_path_for(csv_path, cache_dir))[0]
+    meta = _read_json(f"{base_path}.json")
+    if meta is not None and meta.get('version') != CACHE_VERSION:
+        meta = None
+    status, source = _source_status(csv_path, meta['source'] if meta else None)
+
+    if status == 'touched':
+        meta['source'] = source
+        _write_json(f"{base_path}.json", meta)
+    if status != 'stale':
+        try:
+            return open_mmap_frame(base_path)[0]
+        except (OSError, ValueError, EOFError) as e:
+            # Metadatos al día pero arrays ausentes o truncados: se reconstruyen
+            print(f"⚠️ Arrays de {csv_path} incompletos ({e}): se reconstruyen")
+
+    df = load_ohlcv(csv_path, cache_dir=cache_dir)
+    try:
+        save_mmap_frame(df, base_path, {'source': source})
+    except ValueError:
+        # Columnas no numéricas: no se puede mapear como matriz float64
+        return df
+    except OSError as e:
+        print(f"⚠️ No se pudieron escribir los arrays de {csv_path}: {e}")
+        return df
+
+    return open_mmap_frame(base_path)[0]
+
+
+def _load_mapped(path: str) -> np.ndarray:
+    try:
+        return np.load(path, mmap_mode='r')
+    except ValueError:
+        # Arrays vacíos: no se pueden mapear
+        return np.load(path)
+
+
+def _atomic_save(path: str, array: np.ndarray):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def _write_json(path: str, data: Dict):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: str) -> Optional[Dict]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
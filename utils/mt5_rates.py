@@ -0,0 +1,133 @@
+"""
+utils/mt5_rates.py - Velas de MT5: conversión a DataFrame y descarga concurrente
+
+`mt5.copy_rates_from_pos` devuelve un array estructurado de numpy (time,
+open, high, low, close, tick_volume, spread, real_volume). rates_to_frame
+construye el DataFrame de velas directamente sobre los campos de ese array,
+sin pasar por un DataFrame intermedio con todas las columnas ni renombrarlas.
+
+ParallelFetcher lanza las descargas de todos los timeframes a la vez en un
+pool de hilos, con un tiempo máximo por llamada: el contexto multi-temporal
+tarda lo que la descarga más lenta y no la suma de las siete. La llamada a
+MT5 no se puede cancelar; si se pasa del tiempo, ese timeframe queda fuera
+del ciclo y el siguiente ciclo espera a la misma llamada en curso en vez
+de lanzar otra.
+
+No importa MetaTrader5: la función de descarga la pasa quien lo usa.
+"""
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# Columnas del DataFrame de velas y campo del array de MT5 del que sale cada una
+OHLCV_FIELDS = {
+    'open': 'open',
+    'high': 'high',
+    'low': 'low',
+    'close': 'close',
+    'volume': 'tick_volume'
+}
+
+DEFAULT_FETCH_TIMEOUT = 5.0
+
+
+def rates_to_frame(rates: np.ndarray) -> Optional[pd.DataFrame]:
+    """
+    DataFrame de velas (open/high/low/close/volume, índice 'time') a partir
+    del array estructurado de MT5.
+
+    Las columnas son vistas de los campos del array (sin copiarlas); solo se
+    crea el índice de fechas a partir de los segundos epoch de 'time'.
+
+    Args:
+        rates: Array devuelto por mt5.copy_rates_from_pos / copy_rates_range
+
+    Returns:
+        DataFrame de velas o None si al array le falta algún campo
+    """
+    names = rates.dtype.names or ()
+    if 'time' not in names or not all(field in names for field in OHLCV_FIELDS.values()):
+        return None
+    index = pd.DatetimeIndex(pd.to_datetime(rates['time'], unit='s'), name='time')
+    columns = {column: rates[field] for column, field in OHLCV_FIELDS.items()}
+    return pd.DataFrame(columns, index=index, copy=False)
+
+
+class ParallelFetcher:
+    """
+    Descargas concurrentes con tiempo máximo por llamada.
+
+    Uso:
+
+        fetcher = ParallelFetcher()
+        results, timed_out = fetcher.fetch_all(
+            fetch_candles,
+            {"D1": (symbol, "D1", 100), "H4": (symbol, "H4", 200)},
+            timeout=5.0
+        )
+    """
+
+    def __init__(self, max_workers: int = 8, thread_name_prefix: str = 'mt5-fetch'):
+        self.max_workers = max_workers
+        self.thread_name_prefix = thread_name_prefix
+        self.timeouts = 0
+        self.errors = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Llamada en curso por (clave, argumentos): no se lanza otra mientras no termine
+        self._pending: Dict[Tuple[Hashable, tuple], Future] = {}
+        self._lock = threading.Lock()
+
+    def _submit(self, fetch: Callable, key: Hashable, args: tuple) -> Future:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers, self.thread_name_prefix)
+            future = self._pending.get((key, args))
+            if future is None or future.done():
+                future = self._pending[(key, args)] = self._executor.submit(fetch, *args)
+            return future
+
+    def fetch_all(self, fetch: Callable, calls: Dict[Hashable, tuple],
+                  timeout: float = DEFAULT_FETCH_TIMEOUT) -> Tuple[Dict[Hashable, object], List[Hashable]]:
+        """
+        Ejecuta fetch(*args) para cada llamada a la vez y espera los resultados.
+
+        Args:
+            fetch: Función de descarga
+            calls: {clave: argumentos} (el resultado conserva este orden)
+            timeout: Segundos máximos por llamada (todas empiezan a la vez)
+
+        Returns:
+            Tupla ({clave: resultado}, claves que superaron el tiempo). Las
+            llamadas que lanzan una excepción o superan el tiempo no aparecen
+            en los resultados
+        """
+        deadline = time.monotonic() + timeout
+        futures = {key: self._submit(fetch, key, tuple(args)) for key, args in calls.items()}
+
+        results: Dict[Hashable, object] = {}
+        timed_out: List[Hashable] = []
+        for key, future in futures.items():
+            try:
+                results[key] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                timed_out.append(key)
+                self.timeouts += 1
+            except Exception as e:
+                self.errors += 1
+                print(f"⚠️ {key}: error en la descarga: {e}", flush=True)
+        return results, timed_out
+
+    def close(self) -> None:
+        """Detiene el pool sin esperar a las llamadas colgadas"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+            self._pending.clear()
@@ -9,10 +9,16 @@ import pandas as pd
 import os
 from typing import Dict, Optional
 from config import DATA_DIR
+from utils.market_data_store import load_ohlcv, load_ohlcv_mmap
+from utils.timeframes import resample_ohlcv
+
+
+DATA_BACKENDS = ('csv', 'cache', 'mmap')
 
 
 def load_multi_timeframe_data(symbol: str, start_date: Optional[str] = None,
-                              end_date: Optional[str] = None) -> Dict[str, pd.DataFrame]:
+                              end_date: Optional[str] = None, backend: str = 'cache',
+                              data_dir: Optional[str] = None) -> Dict[str, pd.DataFrame]:
     """
     Carga datos históricos de múltiples timeframes para análisis multi-temporal.
     
@@ -20,6 +26,12 @@ def load_multi_timeframe_data(symbol: str, start_date: Optional[str] = None,
         symbol: Par de trading (ej: "XAUUSD")
         start_date: Fecha de inicio (formato: "YYYY-MM-DD")
         end_date: Fecha de fin (formato: "YYYY-MM-DD")
+        backend: Cómo se leen los archivos:
+                 - 'csv': parsea el CSV
+                 - 'cache': caché binaria .npz (se reconstruye si cambia el CSV)
+                 - 'mmap': arrays memory-mapped de solo lectura, compartidos sin
+                   copias entre procesos (columnas float64)
+        data_dir: Carpeta de los CSV (por defecto DATA_DIR)
     
     Returns:
         Diccionario con DataFrames de cada timeframe:
@@ -33,25 +45,35 @@ def load_multi_timeframe_data(symbol: str, start_date: Optional[str] = None,
             'M1': DataFrame
         }
     """
+    if backend not in DATA_BACKENDS:
+        raise ValueError(f"backend debe ser uno de {DATA_BACKENDS}: {backend}")
+    
     timeframes = ['1d', '4h', '1h', '15m', '5m', '3m', '1m']
     timeframe_keys = ['D1', 'H4', 'H1', 'M15', 'M5', 'M3', 'M1']
     
     data = {}
     
     for tf, key in zip(timeframes, timeframe_keys):
-        csv_path = os.path.join(DATA_DIR, f"{symbol}_{tf}.csv")
+        csv_path = os.path.join(data_dir or DATA_DIR, f"{symbol}_{tf}.csv")
         
         if os.path.exists(csv_path):
             print(f"✓ Cargando {key} ({tf}) desde {csv_path}")
-            df = pd.read_csv(csv_path)
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            df.set_index('timestamp', inplace=True)
+            if backend == 'mmap':
+                df = load_ohlcv_mmap(csv_path)
+            else:
+                df = load_ohlcv(csv_path, use_cache=(backend == 'cache'))
             
             # Filtra por fechas si se especifican
-            if start_date:
-                df = df[df.index >= pd.to_datetime(start_date)]
-            if end_date:
-                df = df[df.index <= pd.to_datetime(end_date)]
+            # (con el índice ordenado se recorta con iloc: vista, sin copiar)
+            if df.index.is_monotonic_increasing:
+                start = df.index.searchsorted(pd.to_datetime(start_date), side='left') if start_date else 0
+                stop = df.index.searchsorted(pd.to_datetime(end_date), side='right') if end_date else len(df)
+                df = df.iloc[start:stop]
+            else:
+                if start_date:
+                    df = df[df.index >= pd.to_datetime(start_date)]
+                if end_date:
+                    df = df[df.index <= pd.to_datetime(end_date)]
             
             # Asegura que las columnas necesarias estén presentes
             required_columns = ['open', 'high', 'low', 'close', 'volume']
@@ -73,6 +95,11 @@ def resample_to_timeframes(base_data: pd.DataFrame,
     Útil cuando solo tienes datos de un timeframe pero necesitas otros.
     NOTA: Esto es una aproximación. Para backtesting preciso, usa datos reales de cada timeframe.
     
+    Genera el propio timeframe base y todos los superiores que son múltiplos
+    suyos, en una sola pasada (ver utils.timeframes.resample_ohlcv). El
+    resultado es un TimeframeSet: además de los DataFrames incluye, para cada
+    vela base, la última vela cerrada de cada timeframe (`last_closed`).
+    
     Args:
         base_data: DataFrame con datos OHLCV del timeframe base
         base_timeframe: Timeframe base (ej: '1h', '15m')
@@ -83,34 +110,9 @@ def resample_to_timeframes(base_data: pd.DataFrame,
     print(f"⚠️ Re-muestreando datos desde {base_timeframe} (aproximación)")
     print("   Para resultados precisos, usa datos reales de cada timeframe")
     
-    data = {}
-    
-    # Mapeo de timeframes objetivo
-    resample_map = {
-        'D1': 'D',
-        'H4': '4H',
-        'H1': '1H',
-        'M15': '15T',
-        'M5': '5T',
-        'M3': '3T',
-        'M1': '1T'
-    }
-    
-    for key, rule in resample_map.items():
-        try:
-            resampled = base_data.resample(rule).agg({
-                'open': 'first',
-                'high': 'max',
-                'low': 'min',
-                'close': 'last',
-                'volume': 'sum'
-            }).dropna()
-            
-            if len(resampled) > 0:
-                data[key] = resampled
-                print(f"   ✓ {key}: {len(resampled)} velas")
-        except Exception as e:
-            print(f"   ✗ {key}: Error al re-muestrear - {e}")
+    data = resample_ohlcv(base_data, base_timeframe)
+    for key, df in data.items():
+        print(f"   ✓ {key}: {len(df)} velas")
     
     return data
 
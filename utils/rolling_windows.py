@@ -0,0 +1,211 @@
+"""
+utils/rolling_windows.py - Primitivas de ventanas deslizantes (numpy puro)
+
+Los detectores ICT preguntan una y otra vez "¿alguna de las próximas k velas
+supera X?" o "¿cuál es el máximo/mínimo de esta ventana?". Estas funciones
+lo resuelven para todas las velas (o todas las consultas) a la vez, sin
+bucles de Python por vela:
+
+- window_max / window_min: máximo/mínimo de values[i + offset : i + offset + length]
+  para cada i, hacia adelante (offset = 1) o hacia atrás (offset = -length).
+  Ventanas cortas con sliding_window_view; largas con van Herk/Gil-Werman
+  (máximos acumulados por bloques: O(n) para cualquier longitud, el mismo
+  coste que una deque monótona pero en unas pocas operaciones de numpy)
+- window_indices / first_true: primera posición de cada ventana que cumple
+  una condición arbitraria
+- SparseTable: máximo/mínimo de rangos de 2^k elementos; encuentra la
+  primera posición desde `start` que cruza un nivel en O(log n) por consulta
+- next_greater / previous_greater: siguiente/anterior elemento mayor (lo
+  que da una pila monótona), con saltos sobre una SparseTable
+"""
+
+from typing import List, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+# Hasta esta longitud sliding_window_view (O(n·length)) es más rápido que
+# van Herk/Gil-Werman (tres pasadas O(n) con más memoria temporal)
+SMALL_WINDOW = 16
+
+
+def _van_herk_gil_werman(values: np.ndarray, length: int, combine, fill: float) -> np.ndarray:
+    """
+    combine-reduce de cada ventana values[k:k + length] (k = 0..len - length).
+
+    Parte el array en bloques de `length`: cada ventana es el sufijo de un
+    bloque más el prefijo del siguiente, así que basta con los acumulados
+    hacia adelante y hacia atrás de cada bloque.
+    """
+    n_windows = len(values) - length + 1
+    padded_len = -(-len(values) // length) * length
+    blocks = np.full(padded_len, fill)
+    blocks[:len(values)] = values
+    blocks = blocks.reshape(-1, length)
+
+    prefix = combine.accumulate(blocks, axis=1).ravel()
+    suffix = combine.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    return combine(suffix[:n_windows], prefix[length - 1:length - 1 + n_windows])
+
+
+def _window_reduce(values, offset: int, length: int, reduce, combine, fill: float) -> np.ndarray:
+    values = np.asarray(values, dtype=np.float64)
+    if length < 1:
+        raise ValueError("length debe ser >= 1")
+    n = len(values)
+    if n == 0:
+        return np.empty(0, dtype=np.float64)
+
+    # Relleno para que la ventana de cada vela quede dentro del array
+    pad_left = max(0, -offset)
+    pad_right = max(0, offset + length - 1)
+    padded = np.concatenate([np.full(pad_left, fill), values, np.full(pad_right, fill)])
+    first = offset + pad_left
+
+    if length <= SMALL_WINDOW:
+        reduced = reduce(sliding_window_view(padded, length)[first:first + n], axis=1)
+        return np.asarray(reduced, dtype=np.float64)
+    return _van_herk_gil_werman(padded, length, combine, fill)[first:first + n]
+
+
+def window_max(values, offset: int, length: int, fill: float = -np.inf) -> np.ndarray:
+    """
+    Máximo de values[i + offset : i + offset + length] para cada i.
+
+    Las posiciones fuera del array cuentan como fill. Un NaN dentro de la
+    ventana da NaN, igual que np.max.
+
+    Args:
+        values: Array de valores (highs, lows, ...)
+        offset: Inicio de la ventana relativo a i (1 = velas siguientes,
+                -length = velas anteriores)
+        length: Longitud de la ventana
+        fill: Valor de las posiciones fuera del array
+
+    Returns:
+        Array float64 del mismo largo que values
+    """
+    return _window_reduce(values, offset, length, np.max, np.maximum, fill)
+
+
+def window_min(values, offset: int, length: int, fill: float = np.inf) -> np.ndarray:
+    """Mínimo de values[i + offset : i + offset + length] para cada i (ver window_max)"""
+    return _window_reduce(values, offset, length, np.min, np.minimum, fill)
+
+
+def window_indices(start, length: int, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Índices de las ventanas [start, start + length) de un array de largo n.
+
+    Para evaluar una condición en todas las ventanas a la vez:
+        idx, inside = window_indices(start, 19, len(high))
+        hits = inside & (high[idx] > level[:, None])
+        first = first_true(hits)
+
+    Args:
+        start: Inicio de cada ventana (escalar o array)
+        length: Longitud de las ventanas
+        n: Largo del array
+
+    Returns:
+        Tupla (matriz (ventanas, length) de índices recortados a [0, n),
+        máscara de los índices que caen dentro del array)
+    """
+    idx = np.atleast_1d(np.asarray(start, dtype=np.int64))[:, None] + np.arange(length)
+    inside = (idx >= 0) & (idx < n)
+    return np.clip(idx, 0, max(n - 1, 0)), inside
+
+
+def first_true(mask: np.ndarray) -> np.ndarray:
+    """Columna del primer True de cada fila de una matriz booleana (-1 si no hay)"""
+    if mask.shape[1] == 0:
+        return np.full(mask.shape[0], -1, dtype=np.int64)
+    return np.where(mask.any(axis=1), mask.argmax(axis=1), -1).astype(np.int64)
+
+
+class SparseTable:
+    """
+    Tabla de rangos de 2^k elementos (table[k][i] = combine(values[i:i + 2^k])).
+
+    Se construye en O(n log n) una vez. Con combine=np.fmax responde "primera
+    posición >= start con valor > nivel"; con np.fmin, "< nivel". Cada consulta
+    salta bloques que no cruzan el nivel, de mayor a menor tamaño: O(log n)
+    por consulta, todas las consultas a la vez. fmax/fmin ignoran los NaN.
+    """
+
+    def __init__(self, values, combine=np.fmax):
+        values = np.asarray(values, dtype=np.float64)
+        self.n = len(values)
+        self.combine = combine
+        self.table: List[np.ndarray] = [values]
+        size = 1
+        while size * 2 <= self.n:
+            prev = self.table[-1]
+            self.table.append(combine(prev[:-size], prev[size:]))
+            size *= 2
+
+    def first(self, start, threshold, touches, stop=None) -> np.ndarray:
+        """
+        Primera posición i en [start, stop) con touches(values[i], threshold).
+
+        Args:
+            start: Posición inicial (escalar o array, una por consulta)
+            threshold: Nivel (escalar o array)
+            touches: Comparación (np.greater, np.greater_equal con tablas de
+                     máximos; np.less, np.less_equal con tablas de mínimos)
+            stop: Posición final exclusiva (por defecto, el final del array)
+
+        Returns:
+            Array de posiciones (-1 si ninguna cruza el nivel)
+        """
+        start = np.atleast_1d(np.asarray(start, dtype=np.int64))
+        threshold = np.broadcast_to(np.asarray(threshold, dtype=np.float64), start.shape)
+        if stop is None:
+            stop = np.full(start.shape, self.n, dtype=np.int64)
+        else:
+            stop = np.minimum(np.broadcast_to(np.asarray(stop, dtype=np.int64), start.shape), self.n)
+
+        if self.n == 0:
+            return np.full(start.shape, -1, dtype=np.int64)
+
+        pos = np.maximum(start, 0)
+        for k in range(len(self.table) - 1, -1, -1):
+            size = 1 << k
+            can_jump = pos + size <= stop
+            # Salta el bloque [pos, pos + 2^k) si ningún valor cruza el nivel
+            block_value = self.table[k][np.where(can_jump, pos, 0)]
+            pos = np.where(can_jump & ~touches(block_value, threshold), pos + size, pos)
+
+        return np.where(pos < stop, pos, -1)
+
+
+def next_greater(values, strict: bool = True, table: Optional[SparseTable] = None) -> np.ndarray:
+    """
+    Índice del siguiente elemento mayor que cada uno (>= si strict=False).
+
+    Da lo mismo que el recorrido con una pila monótona, pero con las n
+    consultas vectorizadas sobre una SparseTable de máximos. Un NaN nunca
+    es mayor ni tiene siguiente mayor.
+
+    Args:
+        values: Array de valores
+        strict: True para '>', False para '>='
+        table: SparseTable(values, np.fmax) ya construida (opcional)
+
+    Returns:
+        Array int64 (-1 si no hay ninguno mayor después)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if table is None:
+        table = SparseTable(values, np.fmax)
+    touches = np.greater if strict else np.greater_equal
+    return table.first(np.arange(1, len(values) + 1), values, touches)
+
+
+def previous_greater(values, strict: bool = True) -> np.ndarray:
+    """Índice del elemento mayor anterior más cercano a cada uno (-1 si no hay, ver next_greater)"""
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    reverse = next_greater(values[::-1], strict=strict)
+    return np.where(reverse >= 0, n - 1 - reverse, -1)[::-1]
@@ -0,0 +1,193 @@
+"""
+utils/timeframes.py - Re-muestreo y alineación de timeframes
+
+Construye todos los timeframes a partir de las velas base (normalmente M1)
+y, para cada vela base, el índice de la última vela *cerrada* de cada
+timeframe superior.
+
+En lugar de copiar D1/H4/... con forward-fill sobre el índice base (un
+DataFrame de longitud n_base por timeframe), la alineación se guarda como un
+array int32 por timeframe: `last_closed[tf][i]` es la posición de la última
+vela de `tf` ya cerrada al cierre de la vela base i (-1 si todavía no hay
+ninguna). El contexto de la vela base i es `frames[tf].iloc[:last_closed[tf][i] + 1]`.
+
+Las velas de cada timeframe se agregan con reduceat de numpy, en cascada
+(M1 → M3 y M5, M5 → M15 → H1 → H4 → D1): M1 se recorre una sola vez y cada
+timeframe superior se construye a partir del anterior, que es mucho más corto.
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+# Duración de cada timeframe
+TIMEFRAME_PERIODS: Dict[str, pd.Timedelta] = {
+    'M1': pd.Timedelta(minutes=1),
+    'M3': pd.Timedelta(minutes=3),
+    'M5': pd.Timedelta(minutes=5),
+    'M15': pd.Timedelta(minutes=15),
+    'H1': pd.Timedelta(hours=1),
+    'H4': pd.Timedelta(hours=4),
+    'D1': pd.Timedelta(days=1),
+}
+
+# Nombres de archivo ('1h', '15m', ...) → claves de timeframe
+TIMEFRAME_ALIASES = {
+    '1m': 'M1', '3m': 'M3', '5m': 'M5', '15m': 'M15',
+    '1h': 'H1', '4h': 'H4', '1d': 'D1',
+}
+
+OHLCV_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+
+def timeframe_key(timeframe: str) -> str:
+    """Normaliza '1h' / 'H1' a la clave de timeframe ('H1')"""
+    key = TIMEFRAME_ALIASES.get(timeframe.lower(), timeframe.upper())
+    if key not in TIMEFRAME_PERIODS:
+        raise ValueError(f"Timeframe desconocido: {timeframe}")
+    return key
+
+
+class TimeframeSet(dict):
+    """
+    Diccionario {timeframe: DataFrame} con los mapas de últimas velas cerradas.
+
+    Se usa igual que el diccionario de DataFrames de siempre; además
+    `last_closed[tf]` tiene, alineado con las velas de `base_timeframe`,
+    la posición de la última vela cerrada de tf (int32, -1 = ninguna).
+    """
+
+    def __init__(self, base_timeframe: str, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.base_timeframe = base_timeframe
+        self.last_closed: Dict[str, np.ndarray] = {}
+
+
+# ==================== ALINEACIÓN ====================
+
+def last_closed_map(base_index: pd.DatetimeIndex, base_period: pd.Timedelta,
+                    tf_index: pd.DatetimeIndex, tf_period: pd.Timedelta) -> np.ndarray:
+    """
+    Última vela cerrada de un timeframe al cierre de cada vela base.
+
+    Una vela de tf abierta en t está cerrada en t + tf_period; la vela base
+    abierta en s se cierra en s + base_period. Ambos índices deben estar ordenados.
+
+    Args:
+        base_index: Timestamps de apertura de las velas base
+        base_period: Duración de la vela base
+        tf_index: Timestamps de apertura de las velas del timeframe
+        tf_period: Duración de la vela del timeframe
+
+    Returns:
+        Array int32 (len(base_index)) con la posición en tf_index (-1 = ninguna)
+    """
+    tf_close = tf_index + tf_period
+    base_close = base_index + base_period
+    return (tf_close.searchsorted(base_close, side='right') - 1).astype(np.int32)
+
+
+# ==================== RE-MUESTREO ====================
+
+def _aggregate(times: np.ndarray, columns: Dict[str, np.ndarray], period_ns: int):
+    """
+    Agrega velas ordenadas en velas de period_ns (alineadas a la época).
+
+    Returns:
+        Tupla (timestamps int64 de apertura, columnas agregadas,
+        grupo int64 de cada vela de entrada)
+    """
+    bucket = times // period_ns
+    is_start = np.empty(len(bucket), dtype=bool)
+    is_start[:1] = True
+    np.not_equal(bucket[1:], bucket[:-1], out=is_start[1:])
+    starts = np.flatnonzero(is_start)
+    ends = np.append(starts[1:], len(bucket)) - 1
+
+    aggregated = {
+        'open': columns['open'][starts],
+        'high': np.fmax.reduceat(columns['high'], starts),
+        'low': np.fmin.reduceat(columns['low'], starts),
+        'close': columns['close'][ends],
+    }
+    if 'volume' in columns:
+        aggregated['volume'] = np.add.reduceat(np.nan_to_num(columns['volume']), starts)
+
+    group = np.cumsum(is_start) - 1
+    return bucket[starts] * period_ns, aggregated, group
+
+
+def _cascade_parent(key: str, built: List[str]) -> str:
+    """Timeframe ya construido más largo cuyo periodo divide al de key"""
+    period = TIMEFRAME_PERIODS[key]
+    divisors = [k for k in built if period % TIMEFRAME_PERIODS[k] == pd.Timedelta(0)]
+    return max(divisors, key=lambda k: TIMEFRAME_PERIODS[k])
+
+
+def resample_ohlcv(base_data: pd.DataFrame, base_timeframe: str = 'M1',
+                   timeframes: Optional[List[str]] = None) -> TimeframeSet:
+    """
+    Construye todos los timeframes a partir de las velas base en una pasada.
+
+    Las velas se alinean a la época como en `DataFrame.resample` (medianoche
+    para D1; UTC si el índice tiene zona horaria) y solo se generan velas con
+    datos (sin huecos que eliminar después).
+
+    Args:
+        base_data: DataFrame OHLCV(V) del timeframe base, indexado por timestamp
+        base_timeframe: Timeframe de base_data ('M1', '1m', ...)
+        timeframes: Timeframes a generar (por defecto, todos los múltiplos del base)
+
+    Returns:
+        TimeframeSet con los DataFrames y el mapa last_closed de cada timeframe
+    """
+    base_key = timeframe_key(base_timeframe)
+    base_period = TIMEFRAME_PERIODS[base_key]
+    if timeframes is None:
+        timeframes = [k for k, p in TIMEFRAME_PERIODS.items() if p % base_period == pd.Timedelta(0)]
+    timeframes = [timeframe_key(tf) for tf in timeframes]
+    for key in timeframes:
+        if TIMEFRAME_PERIODS[key] % base_period != pd.Timedelta(0):
+            raise ValueError(f"{key} no es múltiplo del timeframe base {base_key}")
+
+    if not base_data.index.is_monotonic_increasing:
+        base_data = base_data.sort_index(kind='stable')
+    index = pd.DatetimeIndex(base_data.index)
+    unit = index.unit
+    times = index.as_unit('ns').asi8
+    base_close = times + base_period.value
+
+    columns = {
+        col: base_data[col].to_numpy(dtype=np.float64)
+        for col in OHLCV_COLUMNS if col in base_data.columns
+    }
+
+    result = TimeframeSet(base_key)
+    if len(times) == 0:
+        return result
+
+    # Cada nivel guarda (timestamps, columnas, grupo de cada vela base)
+    levels = {base_key: (times, columns, np.arange(len(times)))}
+    for key in sorted(timeframes, key=lambda k: TIMEFRAME_PERIODS[k]):
+        if key == base_key:
+            continue
+        parent = _cascade_parent(key, list(levels))
+        parent_times, parent_columns, parent_group = levels[parent]
+        period_ns = TIMEFRAME_PERIODS[key].value
+        bar_times, aggregated, group = _aggregate(parent_times, parent_columns, period_ns)
+        levels[key] = (bar_times, aggregated, group[parent_group])
+
+    for key in timeframes:
+        bar_times, aggregated, group = levels[key]
+        bar_index = pd.DatetimeIndex(bar_times.view('datetime64[ns]'), name=index.name)
+        if index.tz is not None:
+            bar_index = bar_index.tz_localize('UTC').tz_convert(index.tz)
+        result[key] = pd.DataFrame(aggregated, index=bar_index.as_unit(unit))
+
+        # La vela del grupo solo está cerrada si la vela base llega a su cierre
+        closed = base_close >= bar_times[group] + TIMEFRAME_PERIODS[key].value
+        result.last_closed[key] = (group - ~closed).astype(np.int32)
+
+    return result
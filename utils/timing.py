@@ -0,0 +1,225 @@
+"""
+utils/timing.py - Medición de tiempos por etapa del ciclo de trading
+
+Cronómetros ligeros (context manager y decorador) que acumulan, por etapa,
+un histograma de las últimas duraciones: p50/p95/max, número de mediciones
+y último valor. Sirve para saber en qué se va el tiempo de cada ciclo del
+bot (velas de MT5, ATR, News Gate, señal, base de datos, Telegram, orden).
+
+Uso:
+
+    from utils.timing import timings
+
+    with timings.span('context'):
+        context = build_multitimeframe_context()
+
+    @timings.timed('telegram.send')
+    def send_message(...):
+        ...
+
+    # En el loop: una línea de log y el JSON de estadísticas cada 15 min
+    timings.maybe_report(900, logger, 'logs/timing_stats.json')
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, Deque, Dict, Iterator, List, Optional
+
+import numpy as np
+
+
+# Mediciones recientes por etapa usadas para los percentiles
+DEFAULT_WINDOW = 1024
+
+
+class StageStats:
+    """Duraciones de una etapa: totales de siempre y ventana reciente para percentiles"""
+
+    def __init__(self, window: int = DEFAULT_WINDOW):
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.last = seconds
+
+    def snapshot(self) -> Dict[str, float]:
+        """Estadísticas en milisegundos (p50/p95 de la ventana reciente)"""
+        p50, p95 = np.percentile(np.fromiter(self.samples, dtype=np.float64), [50, 95])
+        return {
+            'count': self.count,
+            'last_ms': self.last * 1000,
+            'p50_ms': float(p50) * 1000,
+            'p95_ms': float(p95) * 1000,
+            'max_ms': self.max * 1000,
+            'mean_ms': self.total / self.count * 1000,
+            'total_s': self.total
+        }
+
+
+class Span:
+    """Medición en curso de una etapa (se registra al llamar a stop o al salir del with)"""
+
+    def __init__(self, timer: 'StageTimer', name: str):
+        self.timer = timer
+        self.name = name
+        self.start = time.perf_counter()
+        self.elapsed: Optional[float] = None
+
+    def stop(self) -> float:
+        """Registra la duración (solo la primera vez) y la devuelve en segundos"""
+        if self.elapsed is None:
+            self.elapsed = time.perf_counter() - self.start
+            self.timer.record(self.name, self.elapsed)
+        return self.elapsed
+
+    def __enter__(self) -> 'Span':
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        self.stop()
+        return False
+
+
+class StageTimer:
+    """
+    Registro de tiempos por etapa, seguro entre hilos.
+
+    Las etapas se identifican por nombre ('context', 'mt5.copy_rates',
+    'db.save_signal', ...) y se listan en el orden en que se midieron por
+    primera vez.
+    """
+
+    def __init__(self, window: int = DEFAULT_WINDOW):
+        self.window = window
+        self.stages: Dict[str, StageStats] = {}
+        self.started_at = datetime.now(timezone.utc)
+        self.last_report: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float) -> None:
+        """Añade una duración (o cualquier latencia en segundos) a la etapa"""
+        with self._lock:
+            stats = self.stages.get(name)
+            if stats is None:
+                stats = self.stages[name] = StageStats(self.window)
+            stats.add(seconds)
+
+    def start(self, name: str) -> Span:
+        """Empieza a medir una etapa que termina con span.stop()"""
+        return Span(self, name)
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[Span]:
+        """Mide el bloque with (también si lanza una excepción)"""
+        span = Span(self, name)
+        try:
+            yield span
+        finally:
+            span.stop()
+
+    def timed(self, name: Optional[str] = None) -> Callable:
+        """Decorador que mide cada llamada a la función (por defecto con su nombre)"""
+        def decorator(func: Callable) -> Callable:
+            stage = name or func.__qualname__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(stage):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Estadísticas de todas las etapas ({etapa: {count, last_ms, p50_ms, ...}})"""
+        with self._lock:
+            return {name: stats.snapshot() for name, stats in self.stages.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stages.clear()
+            self.started_at = datetime.now(timezone.utc)
+
+    def format_line(self, stages: Optional[List[str]] = None) -> str:
+        """Resumen en una línea: 'etapa p50/p95/max ms (n)' por etapa"""
+        snapshot = self.snapshot()
+        names = [s for s in (stages or snapshot) if s in snapshot]
+        if not names:
+            return "⏱️ Sin mediciones"
+        parts = [
+            f"{name} {snapshot[name]['p50_ms']:.0f}/{snapshot[name]['p95_ms']:.0f}/"
+            f"{snapshot[name]['max_ms']:.0f}ms (n={snapshot[name]['count']})"
+            for name in names
+        ]
+        return "⏱️ p50/p95/max: " + " | ".join(parts)
+
+    def write_json(self, path: str) -> None:
+        """Guarda las estadísticas en un JSON (escritura atómica: nunca queda a medias)"""
+        data = {
+            'generated_at': datetime.now(timezone.utc).isoformat(),
+            'started_at': self.started_at.isoformat(),
+            'stages': self.snapshot()
+        }
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def report(self, logger=None, path: Optional[str] = None) -> str:
+        """Escribe la línea de resumen en el log (o stdout) y el JSON si hay ruta"""
+        line = self.format_line()
+        if logger:
+            logger.info(line)
+        else:
+            print(line, flush=True)
+        if path:
+            self.write_json(path)
+        return line
+
+    def maybe_report(self, interval: float, logger=None, path: Optional[str] = None) -> bool:
+        """
+        Llama a report() si pasaron al menos `interval` segundos desde el último.
+
+        Args:
+            interval: Segundos entre reportes (<= 0 desactiva los reportes)
+            logger: Logger donde escribir la línea (por defecto, print)
+            path: Archivo JSON de estadísticas (opcional)
+
+        Returns:
+            True si se generó el reporte
+        """
+        now = time.monotonic()
+        if interval <= 0 or not self.stages:
+            return False
+        if self.last_report is None:
+            # El primer reporte se hace tras un intervalo completo
+            self.last_report = now
+            return False
+        if now - self.last_report < interval:
+            return False
+        self.last_report = now
+        try:
+            self.report(logger, path)
+        except OSError as e:
+            if logger:
+                logger.warning(f"No se pudo guardar el JSON de tiempos: {e}")
+        return True
+
+
+# Registro global compartido por el loop de trading, la base de datos y Telegram
+timings = StageTimer()